@@ -6,6 +6,13 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 
 from app.services.chat_service import chat_service
+from app.services.fsm_service import fsm_service
+from app.services.rag_service import rag_service
+from app.services.persistence_service import persistence_service
+from app.services.rollup_service import rollup_refresher
+from app.services.partition_service import partition_maintainer
+from app.services.database_service import DatabaseService
+from app.core import database
 from app.services.session_service import session_service
 from app.models.chat import ChatRequest, ChatResponse
 from app.core.config import settings
@@ -30,6 +37,74 @@ async def chat_with_bot(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/stats")
+async def get_questionnaire_stats():
+    """Average turns and skipped questions per completed evaluation (this worker)"""
+    return fsm_service.get_stats()
+
+
+@router.get("/persistence")
+async def get_persistence_stats():
+    """Write-behind queue depth and records written to the database (this worker)"""
+    return persistence_service.get_stats()
+
+
+@router.get("/dashboard")
+async def get_dashboard(days: int = 30):
+    """Daily sessions and evaluations from the rollups, with overall totals aggregated in the database"""
+    if database.AsyncSessionLocal is None:
+        raise HTTPException(status_code=503, detail="Database is not configured")
+    try:
+        async with database.AsyncSessionLocal() as db:
+            service = DatabaseService(db)
+            return {
+                "sessions": await service.get_session_stats(),
+                "evaluations": await service.get_evaluation_stats(),
+                "daily": await service.get_daily_stats(days),
+                "rollups": rollup_refresher.get_stats(),
+                "message_partitions": partition_maintainer.get_stats()
+            }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/answer-cache")
+async def get_answer_cache_stats():
+    """Hit rate of the off-track answer cache (this worker)"""
+    if rag_service.answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **rag_service.answer_cache.get_stats()}
+
+
+@router.delete("/answer-cache")
+async def invalidate_answer_cache(question: Optional[str] = None):
+    """Drop the cached answer to one question, or every cached answer"""
+    if rag_service.answer_cache is None:
+        raise HTTPException(status_code=400, detail="Answer cache is disabled")
+    try:
+        dropped = await rag_service.answer_cache.invalidate(question)
+        return {"invalidated": question or "all", "local_entries_dropped": dropped}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/knowledge")
+async def get_knowledge_stats():
+    """Version of the FAQs, rules and scenarios this worker is serving, and its loaded country packs"""
+    return {**rag_service.knowledge_base.get_stats(),
+            "country_packs": rag_service.knowledge_base.current.country_packs.get_stats()}
+
+
+@router.post("/knowledge/reload")
+async def reload_knowledge(force: bool = False):
+    """Rebuild the knowledge indexes now instead of at the next poll (this worker)"""
+    swapped = await rag_service.knowledge_base.reload(force=force)
+    stats = rag_service.knowledge_base.get_stats()
+    if not swapped and stats["last_error"]:
+        raise HTTPException(status_code=422, detail=f"Kept version {stats['version']}: {stats['last_error']}")
+    return {"swapped": swapped, **stats}
+
+
 @router.get("/status/{session_id}")
 async def get_session_status(session_id: str):
     """Get current session status and progress"""
@@ -72,6 +147,20 @@ async def get_evaluation_summary(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/evaluation/{session_id}/whatif")
+async def get_what_if(session_id: str, pairs: bool = True, limit: int = 10):
+    """Single and paired answer changes that would improve the outcome band, ranked by impact"""
+    try:
+        result = await chat_service.get_what_if(session_id, pairs=pairs, limit=limit)
+        if "error" in result:
+            raise HTTPException(status_code=404, detail=result["error"])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/history/{session_id}")
 async def get_chat_history(session_id: str):
     """Get chat history for a session"""
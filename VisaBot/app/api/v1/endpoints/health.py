@@ -27,7 +27,12 @@ async def detailed_health_check():
     # Check Redis connection
     try:
         await redis_client.ping()
-        health_status["dependencies"]["redis"] = "healthy"
+        if redis_client.degraded:
+            health_status["dependencies"]["redis"] = "unreachable (in-memory fallback)"
+            health_status["status"] = "degraded"
+        else:
+            health_status["dependencies"]["redis"] = "healthy"
+        health_status["dependencies"]["storage_backend"] = redis_client.backend_name
     except Exception as e:
         logger.error(f"Redis health check failed: {e}")
         health_status["dependencies"]["redis"] = "unhealthy"
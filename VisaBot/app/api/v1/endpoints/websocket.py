@@ -3,61 +3,97 @@ WebSocket endpoints for real-time chat
 """
 import json
 from typing import Dict, Any
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from loguru import logger
 
-from app.services.chat_service import ChatService
-from app.services.session_service import SessionService
-from app.services.websocket_manager import WebSocketManager
+from app.services.chat_service import chat_service
+from app.services.websocket_manager import websocket_manager
+from app.services.session_service import is_valid_session_id
 
 router = APIRouter()
-websocket_manager = WebSocketManager()
 
 
 @router.websocket("/ws/{session_id}")
-async def websocket_endpoint(
-    websocket: WebSocket,
-    session_id: str,
-    chat_service: ChatService = Depends(ChatService),
-    session_service: SessionService = Depends(SessionService)
-):
-    """WebSocket endpoint for real-time chat"""
-    await websocket_manager.connect(websocket, session_id)
-    
+async def websocket_endpoint(websocket: WebSocket, session_id: str):
+    """
+    WebSocket endpoint for real-time chat
+
+    Frames sent for a chat turn: ``typing`` while the reply is prepared, zero or
+    more ``message_delta`` frames with partial LLM output, then a final
+    ``message`` frame whose text supersedes any deltas.
+
+    The server sends ``ping`` frames to quiet clients; any frame back (normally
+    ``pong``) keeps the connection alive.
+
+    session_id must be 16-64 URL-safe characters (a UUID works); others are
+    closed with code 1008.
+    """
+    if not is_valid_session_id(session_id):
+        # Policy violation: ids must be 16-64 URL-safe characters
+        await websocket.close(code=1008)
+        return
+
+    connection = await websocket_manager.connect(websocket, session_id)
+
     try:
         # Send welcome message
-        await websocket.send_text(json.dumps({
+        await connection.send({
             "type": "connection",
             "session_id": session_id,
             "message": "Connected to VisaBot. How can I help you today?"
-        }))
-        
+        })
+
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
-            
+            try:
+                message_data = json.loads(data)
+            except json.JSONDecodeError:
+                connection.touch()
+                await connection.send({
+                    "type": "error",
+                    "session_id": session_id,
+                    "message": "Invalid message format."
+                })
+                continue
+
+            connection.touch(activity=message_data.get("type") in ("message", "typing"))
+
             # Process message
             if message_data.get("type") == "message":
                 user_message = message_data.get("message", "")
-                
-                # Process through chat service
-                response = await chat_service.process_message(
-                    session_id=session_id,
-                    message=user_message,
-                    context=message_data.get("context")
-                )
-                
+
+                async def on_delta(delta: str):
+                    await connection.send({
+                        "type": "message_delta",
+                        "session_id": session_id,
+                        "delta": delta
+                    })
+
+                # Process through the same turn pipeline as the REST endpoint
+                connection.busy = True
+                try:
+                    async with websocket_manager.typing(session_id):
+                        response = await chat_service.process_message(
+                            session_id=session_id,
+                            message=user_message,
+                            context=message_data.get("context"),
+                            on_delta=on_delta,
+                            allow_client_id=True
+                        )
+                finally:
+                    connection.busy = False
+
                 # Send response back to client
-                await websocket.send_text(json.dumps({
+                await connection.send({
                     "type": "message",
                     "session_id": session_id,
                     "message": response.message,
                     "state": response.state,
                     "metadata": response.metadata,
                     "timestamp": response.timestamp.isoformat()
-                }))
-                
+                })
+
                 # Broadcast to other connected clients if needed
                 await websocket_manager.broadcast_to_session(
                     session_id,
@@ -69,7 +105,7 @@ async def websocket_endpoint(
                     },
                     exclude_websocket=websocket
                 )
-            
+
             elif message_data.get("type") == "typing":
                 # Handle typing indicators
                 await websocket_manager.broadcast_to_session(
@@ -81,34 +117,51 @@ async def websocket_endpoint(
                     },
                     exclude_websocket=websocket
                 )
-            
+
             elif message_data.get("type") == "ping":
                 # Handle ping/pong for connection health
-                await websocket.send_text(json.dumps({
+                await connection.send({
                     "type": "pong",
                     "session_id": session_id
-                }))
-    
+                })
+
+            # "pong" replies to server pings only need the touch above
+
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for session: {session_id}")
-        websocket_manager.disconnect(websocket, session_id)
-    
+
     except Exception as e:
         logger.error(f"WebSocket error for session {session_id}: {e}")
-        await websocket.send_text(json.dumps({
+        await connection.send({
             "type": "error",
             "session_id": session_id,
             "message": "An error occurred. Please try again."
-        }))
+        })
+        await connection.flush()
+
+    finally:
         websocket_manager.disconnect(websocket, session_id)
 
 
 @router.get("/ws/status/{session_id}")
 async def get_websocket_status(session_id: str):
-    """Get WebSocket connection status for a session"""
-    connections = websocket_manager.get_session_connections(session_id)
+    """Get WebSocket connection status for a session across all workers"""
+    local_clients = websocket_manager.get_connection_count(session_id)
+    node_counts = await websocket_manager.get_cluster_connection_counts(session_id)
+    connected_clients = sum(node_counts.values())
     return {
         "session_id": session_id,
-        "connected_clients": len(connections),
-        "is_connected": len(connections) > 0
-    } 
\ No newline at end of file
+        "connected_clients": connected_clients,
+        "local_clients": local_clients,
+        "nodes": node_counts,
+        "is_connected": connected_clients > 0
+    }
+
+
+@router.get("/ws/metrics")
+async def get_websocket_metrics():
+    """Connection, delivery and heartbeat metrics for this worker"""
+    metrics = websocket_manager.get_stats()
+    if websocket_manager.backplane:
+        metrics["backplane"] = websocket_manager.backplane.get_stats()
+    return metrics
@@ -39,7 +39,13 @@ class Settings(BaseSettings):
     # Redis settings
     REDIS_URL: str = "redis://localhost:6379"
     REDIS_DB: int = 0
-    
+
+    # Storage backend settings ("redis" or "memory")
+    STORAGE_BACKEND: str = "redis"
+    STORAGE_FALLBACK_TO_MEMORY: bool = True  # Degrade to in-process storage when Redis is unreachable
+    STORAGE_WHEEL_TICK: float = 1.0  # TTL wheel resolution in seconds
+    STORAGE_WHEEL_SIZE: int = 3600
+
     # Database settings (optional)
     DATABASE_URL: Optional[str] = None
     DB_ENGINE: Optional[str] = None
@@ -58,7 +64,65 @@ class Settings(BaseSettings):
     # Bot settings
     BOT_SESSION_TIMEOUT: int = 3600  # 1 hour in seconds
     MAX_CONVERSATION_HISTORY: int = 10
-    
+    FSM_EARLY_EXIT: bool = True  # Skip questions that can no longer change the success ratio or recommendations
+
+    # Evaluation cache settings
+    EVALUATION_CACHE_SIZE: int = 1024  # Evaluations/narratives kept in each worker's LRU
+    EVALUATION_CACHE_TTL: int = 604800  # Seconds shared entries live in Redis (7 days)
+
+    # Scenario matching settings
+    SCENARIO_MATCH_TOP_K: int = 3  # Matched scenarios returned (and shown to the LLM when polishing)
+    SCENARIO_LLM_POLISH: bool = False  # Let the LLM refine the deterministic scenario match
+
+    # FAQ retrieval settings
+    FAQ_SEMANTIC_SEARCH: bool = True  # Fuse offline hashed n-gram embeddings into FAQ keyword search
+    FAQ_EMBEDDING_CACHE_DIR: Optional[str] = None  # Save FAQ vectors here and memory-map them on later starts
+
+    # Knowledge retrieval settings
+    KNOWLEDGE_TOP_K: int = 3  # Most app/prompts/*.md sections added to an LLM prompt
+    KNOWLEDGE_MAX_TOKENS: int = 1000  # Token budget for those sections (prompts are truncated at OPENAI_MAX_TOKENS)
+    KNOWLEDGE_SOURCE: str = "files"  # "files" (app/prompts) or "database" (knowledge_documents rows over the files)
+    KNOWLEDGE_RELOAD_INTERVAL: float = 30.0  # Seconds between checks for changed knowledge; 0 disables hot reload
+    COUNTRY_PACK_CACHE_SIZE: int = 8  # Country rule packs (app/prompts/countries) kept in each worker
+
+    # Off-track answer cache settings
+    ANSWER_CACHE_ENABLED: bool = True  # Reuse generated off-track answers for repeated questions
+    ANSWER_CACHE_SIZE: int = 512  # Answers kept (and searchable for rephrasings) in each worker
+    ANSWER_CACHE_TTL: int = 86400  # Seconds a generated answer is reused (1 day)
+    ANSWER_CACHE_SIMILARITY: float = 0.85  # Cosine similarity at which a rephrased question is a hit
+
+    # Turn classification settings
+    TURN_LOG_PATH: Optional[str] = None  # Append classified turns here (JSONL, redacted features) to train the next turn model
+
+    # Persistence settings (write-behind to the database)
+    PERSISTENCE_ENABLED: bool = True  # Store messages, session states and evaluations when a database is configured
+    PERSIST_BATCH_SIZE: int = 500  # Records written per transaction at most
+    PERSIST_FLUSH_INTERVAL: float = 1.0  # Seconds a record may wait for its batch to fill
+    PERSIST_QUEUE_SIZE: int = 10000  # Records queued per worker before new ones are dropped
+    PERSIST_MAX_RETRIES: int = 3  # Retries of a failed batch before it is dropped
+    PERSIST_DRAIN_TIMEOUT: float = 10.0  # Seconds shutdown waits for queued records to be written
+    PERSIST_USE_COPY: bool = False  # Write messages with COPY instead of multi-row INSERT (asyncpg only)
+
+    # Dashboard rollup settings (daily aggregates refreshed in the background)
+    ROLLUP_REFRESH_INTERVAL: float = 300.0  # Seconds between refreshes of the daily rollups; 0 disables
+    ROLLUP_LOOKBACK_DAYS: int = 2  # Days before the last rolled-up day recomputed on each refresh, with older days whose sessions changed since
+
+    # Chat message partition settings (chat_messages is range-partitioned by month)
+    MESSAGE_PARTITIONS_AHEAD: int = 2  # Monthly partitions created ahead of the current month
+    MESSAGE_RETENTION_MONTHS: int = 0  # Months of messages kept before their partition is dropped; 0 keeps all
+    PARTITION_MAINTENANCE_INTERVAL: float = 3600.0  # Seconds between partition create/drop runs; 0 disables
+
+    # WebSocket settings
+    WS_SEND_QUEUE_SIZE: int = 100  # Outbound frames buffered per connection before it is evicted
+    WS_SEND_TIMEOUT: float = 5.0  # Seconds a single frame may take to send before the client is evicted
+    WS_TYPING_REFRESH_INTERVAL: float = 3.0  # Re-send typing indicator while a reply is generated
+    WS_BACKPLANE_ENABLED: bool = True  # Relay session broadcasts between workers over Redis pub/sub
+    WS_BACKPLANE_HEARTBEAT: float = 10.0  # Seconds between worker liveness heartbeats
+    WS_PING_INTERVAL: float = 20.0  # Ping a client after this many seconds without a frame from it
+    WS_PONG_TIMEOUT: float = 10.0  # Close the connection if no frame arrives this long after a ping
+    WS_IDLE_TIMEOUT: float = 1800.0  # Close connections without chat activity for this long (0 disables)
+    WS_REAPER_TICK: float = 1.0  # Resolution of the heartbeat timing wheel in seconds
+
     # File upload settings (optional)
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB in bytes
@@ -1,18 +1,29 @@
 """
 Database connection and session management
 """
+from typing import Optional
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from loguru import logger
 
 from app.core.config import settings
 from app.models.database import Base
+from app.services.partition_service import partition_maintainer
 
 # Create async engine for Supabase PostgreSQL
 engine = None
 AsyncSessionLocal = None
 
 
+def get_database_url() -> Optional[str]:
+    """DATABASE_URL, or one constructed from the individual DB_* settings"""
+    database_url = settings.DATABASE_URL
+    if not database_url and all([settings.DB_USER, settings.DB_PASSWORD, settings.DB_HOST, settings.DB_PORT, settings.DB_NAME]):
+        database_url = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+        logger.info("Constructed DATABASE_URL from individual components")
+    return database_url
+
+
 async def init_database():
     """Initialize database connection"""
     global engine, AsyncSessionLocal
@@ -23,12 +34,7 @@ async def init_database():
         engine = None
         AsyncSessionLocal = None
     
-    # Construct DATABASE_URL from individual components if not provided
-    database_url = settings.DATABASE_URL
-    if not database_url and all([settings.DB_USER, settings.DB_PASSWORD, settings.DB_HOST, settings.DB_PORT, settings.DB_NAME]):
-        database_url = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
-        logger.info("Constructed DATABASE_URL from individual components")
-    
+    database_url = get_database_url()
     if not database_url:
         logger.warning("DATABASE_URL not set and individual DB components not provided, skipping database initialization")
         return
@@ -94,6 +100,8 @@ async def create_tables():
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            # A new chat_messages table is partitioned and takes no rows until its partitions exist
+            await partition_maintainer.maintain(conn)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Failed to create tables: {e}")
@@ -1,12 +1,21 @@
 """
 Application event handlers
 """
+import asyncio
 from typing import Callable
 from fastapi import FastAPI
 from loguru import logger
 
 from app.core.config import settings
 from app.services.redis_service import redis_client
+from app.services.websocket_manager import websocket_manager
+from app.services.websocket_backplane import websocket_backplane
+from app.services.rag_service import rag_service
+from app.services.persistence_service import persistence_service
+from app.services.rollup_service import rollup_refresher
+from app.services.partition_service import partition_maintainer
+from app.services.classification.turns import turn_classifier
+from app.core import database
 from app.core.database import init_database, create_tables, close_database
 
 
@@ -19,10 +28,23 @@ def create_start_app_handler(app: FastAPI) -> Callable:
         # Initialize Redis connection
         try:
             await redis_client.ping()
-            logger.info("Redis connection established")
+            if redis_client.degraded:
+                logger.warning("Storage running in degraded mode (in-memory)")
+            else:
+                logger.info(f"Storage backend ready: {redis_client.backend_name}")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
         
+        # Ping WebSocket clients and reap dead or idle connections
+        websocket_manager.start_heartbeat()
+        
+        # Relay WebSocket broadcasts between workers
+        if settings.WS_BACKPLANE_ENABLED:
+            try:
+                await websocket_backplane.start()
+            except Exception as e:
+                logger.error(f"Failed to start WebSocket backplane: {e}")
+        
         # Initialize database connection
         try:
             await init_database()
@@ -31,6 +53,20 @@ def create_start_app_handler(app: FastAPI) -> Callable:
         except Exception as e:
             logger.error(f"Failed to connect to database: {e}")
         
+        # Write chat history and evaluations to the database in the background
+        if settings.PERSISTENCE_ENABLED and database.AsyncSessionLocal is not None:
+            persistence_service.start()
+        
+        # Keep the daily dashboard rollups current, and message partitions created and pruned
+        if database.AsyncSessionLocal is not None:
+            rollup_refresher.start()
+            partition_maintainer.start()
+        
+        # Pick up knowledge edits (files or database rows) without a restart
+        if settings.KNOWLEDGE_SOURCE == "database":
+            await rag_service.knowledge_base.reload()
+        rag_service.knowledge_base.start_watching()
+        
         logger.info(f"VisaBot started successfully on {settings.HOST}:{settings.PORT}")
     
     return start_app
@@ -42,13 +78,26 @@ def create_stop_app_handler(app: FastAPI) -> Callable:
     async def stop_app() -> None:
         logger.info("Shutting down VisaBot application...")
         
+        # Stop relaying and WebSocket writer tasks
+        await websocket_backplane.stop()
+        await websocket_manager.stop_heartbeat()
+        await websocket_manager.close_all()
+        await rag_service.knowledge_base.stop_watching()
+        await asyncio.to_thread(turn_classifier.flush)
+        
         # Close Redis connection
         try:
-            await redis_client.close()
+            await redis_client.disconnect()
             logger.info("Redis connection closed")
         except Exception as e:
             logger.error(f"Error closing Redis connection: {e}")
         
+        await rollup_refresher.stop()
+        await partition_maintainer.stop()
+        
+        # Write out queued chat history before the database goes away
+        await persistence_service.stop()
+        
         # Close database connection
         try:
             await close_database()
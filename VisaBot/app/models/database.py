@@ -3,7 +3,8 @@ SQLAlchemy database models for visa evaluation and guidance bot
 """
 from datetime import datetime
 from typing import Optional, Dict, Any
-from sqlalchemy import Column, String, DateTime, Text, Boolean, Integer, JSON, ForeignKey
+from sqlalchemy import Column, String, Date, DateTime, Text, Boolean, Integer, JSON, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -31,15 +32,19 @@ class ChatSession(Base):
     __tablename__ = "chat_sessions"
     
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=True, index=True)
     session_id = Column(String, unique=True, index=True, nullable=False)
     current_state = Column(String, default="ask_profession")  # Updated to match FSM initial state
-    context = Column(JSON, default={})  # Stores FSM evaluation context
+    context = Column(JSONB, default={})  # Stores FSM evaluation context
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Rollups refresh by day
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)  # Rollups rescan changed days
     last_activity = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_chat_sessions_context", "context", postgresql_using="gin", postgresql_ops={"context": "jsonb_path_ops"}),
+    )
+    
     # Relationships
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
     user = relationship("User", back_populates="sessions")
@@ -47,15 +52,28 @@ class ChatSession(Base):
 
 
 class ChatMessage(Base):
-    """Individual chat message for evaluation conversation"""
+    """
+    Individual chat message for evaluation conversation
+    
+    Range-partitioned by month on created_at (chat_messages_yYYYYmMM), so old
+    months are dropped whole instead of deleted row by row; see
+    app/services/partition_service.py.
+    """
     __tablename__ = "chat_messages"
     
-    id = Column(String, primary_key=True, index=True)
+    id = Column(String, primary_key=True)
     session_id = Column(String, ForeignKey("chat_sessions.session_id"), nullable=False)
     role = Column(String, nullable=False)  # "user", "assistant", "system" - aligned with database service
     content = Column(Text, nullable=False)
-    message_metadata = Column(JSON, nullable=True)  # Intent, confidence, evaluation step
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    message_metadata = Column(JSONB, nullable=True)  # Intent, confidence, evaluation step
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())  # Partition key, so part of the primary key
+    
+    __table_args__ = (
+        Index("ix_chat_messages_session_created", "session_id", "created_at"),  # get_chat_history
+        Index("ix_chat_messages_metadata", "message_metadata", postgresql_using="gin",
+              postgresql_ops={"message_metadata": "jsonb_path_ops"}),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
@@ -66,7 +84,7 @@ class VisaEvaluation(Base):
     __tablename__ = "visa_evaluations"
     
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=True, index=True)  # Chat evaluations are usually anonymous
     session_id = Column(String, ForeignKey("chat_sessions.session_id"), nullable=False)
     evaluation_number = Column(String, unique=True, index=True)
     
@@ -88,11 +106,16 @@ class VisaEvaluation(Base):
     risk_level = Column(String, nullable=True)  # low, medium, high
     
     # Detailed assessment
-    evaluation_data = Column(JSON, nullable=True)  # All collected evaluation data from FSM
+    evaluation_data = Column(JSONB, nullable=True)  # All collected evaluation data from FSM
     assessment_notes = Column(Text, nullable=True)  # Detailed assessment notes
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Rollups refresh by day
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        Index("ix_visa_evaluations_evaluation_data", "evaluation_data", postgresql_using="gin",
+              postgresql_ops={"evaluation_data": "jsonb_path_ops"}),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="evaluations")
     session = relationship("ChatSession", back_populates="evaluations")
@@ -129,6 +152,39 @@ class VisaRecommendation(Base):
     evaluation = relationship("VisaEvaluation", back_populates="recommendations")
 
 
+class DailySessionRollup(Base):
+    """Sessions started per day (UTC) by current FSM state; refreshed incrementally from chat_sessions"""
+    __tablename__ = "daily_session_rollups"
+    
+    day = Column(Date, primary_key=True)
+    current_state = Column(String, primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+    active_sessions = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class DailyEvaluationRollup(Base):
+    """Evaluations per day (UTC), destination country, score band and status; refreshed from visa_evaluations"""
+    __tablename__ = "daily_evaluation_rollups"
+    
+    day = Column(Date, primary_key=True)
+    destination_country = Column(String, primary_key=True)
+    score_band = Column(String, primary_key=True)  # "0-25", "26-50", "51-75", "76-100"
+    eligibility_status = Column(String, primary_key=True)
+    evaluations = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)  # Averages are score_sum / evaluations over any grouping
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class KnowledgeDocument(Base):
+    """Knowledge file content edited in the database; overrides the bundled app/prompts file of the same name"""
+    __tablename__ = "knowledge_documents"
+    
+    name = Column(String, primary_key=True)  # "faqs.json", "scenarios.json", "countries/germany.json", ...
+    content = Column(Text, nullable=False)  # Full file content, in the same format as the bundled file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 # Add back references
 User.sessions = relationship("ChatSession", back_populates="user")
 User.evaluations = relationship("VisaEvaluation", back_populates="user") 
\ No newline at end of file
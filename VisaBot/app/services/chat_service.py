@@ -1,15 +1,18 @@
 """
 Chat service for visa evaluation bot - integrates FSM, OpenAI, and session services
 """
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
 from loguru import logger
 
 from app.services.fsm_service import fsm_service, FSMStates
 from app.services.openai_service import openai_service
 from app.services.session_service import session_service
+from app.services.persistence_service import persistence_service
 from app.models.chat import ChatRequest, ChatResponse
 from app.services.rag_service import rag_service
 from app.services.evaluation_service import evaluation_service
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.whatif import what_if
 
 
 class ChatService:
@@ -23,9 +26,30 @@ class ChatService:
         Process a chat message and return appropriate response
         Now integrates with RAG for enhanced handling
         """
+        return await self.process_message(
+            session_id=chat_request.session_id,
+            message=chat_request.message,
+            context=chat_request.context
+        )
+    
+    async def process_message(
+        self,
+        session_id: Optional[str],
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        allow_client_id: bool = False
+    ) -> ChatResponse:
+        """
+        Run one conversation turn. Shared by the REST and WebSocket paths.
+        on_delta receives partial LLM output as it is generated; the returned
+        response always carries the final message. allow_client_id lets the
+        WebSocket path start a session under the id it connected with.
+        """
+        requested_session_id = session_id
         try:
             # Get or create session
-            session_id, session_data = await session_service.get_or_create_session(chat_request.session_id)
+            session_id, session_data = await session_service.get_or_create_session(session_id, allow_client_id)
             
             # Get current FSM state from FSM service (single source of truth)
             fsm_state_info = await fsm_service.get_current_state(session_id)
@@ -46,6 +70,7 @@ class ChatService:
                 
                 # Add assistant message to history
                 await session_service.add_message(session_id, "assistant", initial_question)
+                persistence_service.record_message(session_id, "assistant", initial_question)
                 
                 return ChatResponse(
                     session_id=session_id,
@@ -55,13 +80,15 @@ class ChatService:
                 )
             
             # Add user message to history
-            await session_service.add_message(session_id, "user", chat_request.message)
+            await session_service.add_message(session_id, "user", message)
+            persistence_service.record_message(session_id, "user", message)
             
             # Process the message based on current state
             if current_state == FSMStates.COMPLETE:
                 # Session is complete, offer to restart
                 response_message = "Your visa evaluation is complete. Would you like to start a new evaluation?"
                 await session_service.add_message(session_id, "assistant", response_message)
+                persistence_service.record_message(session_id, "assistant", response_message)
                 
                 return ChatResponse(
                     session_id=session_id,
@@ -71,7 +98,7 @@ class ChatService:
                 )
             
             # Parse user input using OpenAI for enhanced information extraction
-            parsed_input = await self.openai_service.parse_user_input(current_state.value, chat_request.message)
+            parsed_input = await self.openai_service.parse_user_input(current_state.value, message)
             logger.info(f"Enhanced parsing result: {parsed_input}")
             
             # Extract the structured information for smart processing
@@ -79,7 +106,7 @@ class ChatService:
             
             # Process with FSM using smart processing (now includes RAG integration)
             logger.info(f"Processing user input for session {session_id} in state {current_state.value}")
-            fsm_result = await fsm_service.process_user_input(session_id, chat_request.message, extracted_info)
+            fsm_result = await fsm_service.process_user_input(session_id, message, extracted_info, on_delta)
             logger.info(f"FSM result: {fsm_result}")
             
             # Update session with new state and parsed data
@@ -96,6 +123,15 @@ class ChatService:
             # Add assistant message to history
             await session_service.add_message(session_id, "assistant", response_message)
             
+            # Queue the turn for the database; the write happens in the background
+            persistence_service.record_message(session_id, "assistant", response_message,
+                                               {"state": next_state.value, "rag_handled": bool(fsm_result.get("rag_handled"))})
+            persistence_service.record_session(session_id, next_state.value, fsm_result["answers"])
+            if fsm_result.get("evaluation"):
+                target_country = fsm_result["answers"].get("selected_country") or fsm_result["answers"].get("country")
+                persistence_service.record_evaluation(session_id, fsm_result["evaluation"], fsm_result["answers"],
+                                                      target_country)
+            
             # Prepare metadata with RAG information
             metadata = {
                 "parsed_input": parsed_input,
@@ -128,11 +164,11 @@ class ChatService:
             # Return error response
             error_message = "I apologize, but I encountered an error processing your request. Please try again."
             
-            if chat_request.session_id:
-                await session_service.add_message(chat_request.session_id, "assistant", error_message)
+            if requested_session_id:
+                await session_service.add_message(requested_session_id, "assistant", error_message)
             
             return ChatResponse(
-                session_id=chat_request.session_id or "error",
+                session_id=requested_session_id or "error",
                 message=error_message,
                 state="error",
                 metadata={"error": str(e)}
@@ -148,27 +184,18 @@ class ChatService:
             current_state = session_service.get_session_state(session_id)
             answers = session_service.get_session_answers(session_id)
             
-            # Calculate progress
-            state_order = [
-                FSMStates.GREETING,
-                FSMStates.ASK_COUNTRY,
-                FSMStates.ASK_PROFESSION,
-                FSMStates.ASK_TAX_INFO,
-                FSMStates.ASK_BALANCE,
-                FSMStates.ASK_TRAVEL,
-                FSMStates.EVALUATION,
-                FSMStates.COMPLETE
-            ]
-            
-            try:
-                progress = (state_order.index(current_state) + 1) / len(state_order) * 100
-            except ValueError:
-                progress = 0
+            # Progress counts the questions answered on this applicant's branch
+            fsm = await fsm_service.get_fsm(session_id)
+            provisional = fsm.provisional or fsm.refresh_profile()
+            progress = fsm.get_progress()
             
             return {
                 "session_id": session_id,
                 "current_state": current_state.value if current_state else "unknown",
-                "progress": progress,
+                "progress": progress["percent"],
+                "questions_answered": progress["answered"],
+                "questions_remaining": progress["remaining"],
+                "provisional": provisional.to_dict(),
                 "answers": answers,
                 "is_complete": current_state == FSMStates.COMPLETE,
                 "last_activity": session_data["last_activity"]
@@ -206,12 +233,14 @@ class ChatService:
                 return {"error": "Evaluation not complete"}
             
             answers = session_service.get_session_answers(session_id)
-            evaluation = answers.get("evaluation", {})
             
             # Get target country from answers
             target_country = answers.get("selected_country") or answers.get("country")
             
-            # Generate fresh evaluation summary using the evaluation service
+            # Stored evaluation if still current, otherwise a cached re-evaluation under the current rubric
+            evaluation = await evaluation_service.get_current_evaluation(answers, target_country)
+            
+            # Narrative is served from the evaluation cache after the first read
             evaluation_summary = await evaluation_service.get_evaluation_summary(answers, target_country)
             
             return {
@@ -234,6 +263,24 @@ class ChatService:
             logger.error(f"Error getting evaluation summary: {e}")
             return {"error": str(e)}
     
+    async def get_what_if(self, session_id: str, pairs: bool = True, limit: Optional[int] = 10) -> Dict[str, Any]:
+        """Changes to a completed profile that would move it into a better outcome band"""
+        try:
+            session_data = await session_service.get_session(session_id)
+            if not session_data:
+                return {"error": "Session not found"}
+            
+            if session_service.get_session_state(session_id) != FSMStates.COMPLETE:
+                return {"error": "Evaluation not complete"}
+            
+            answers = session_service.get_session_answers(session_id)
+            result = what_if(extract_features(answers), pairs=pairs, limit=limit)
+            return {"session_id": session_id, **result}
+            
+        except Exception as e:
+            logger.error(f"Error computing what-if scenarios: {e}")
+            return {"error": str(e)}
+    
     async def list_active_sessions(self) -> Dict[str, Any]:
         """List all active sessions"""
         try:
@@ -0,0 +1,386 @@
+"""
+On-track/off-track classification of questionnaire turns.
+
+Per-state answer rules decide the clear cases; a naive Bayes model trained on
+labelled turns decides the rest. The model is trained offline from seed
+examples plus logged turns:
+
+Usage:
+    python -m app.services.classification.turns app/prompts/turn_examples.jsonl [turns.jsonl ...] \
+        -o app/prompts/turn_model.json [--alpha 1.0]
+
+Seed records are {"state", "text", "on_track"}. Logged turns hold the
+turn's features with numbers left out, never the raw text, and are used only
+when a rule decided them ("source": "rule"), so the model never learns from
+its own guesses.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import queue
+import re
+import sys
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.evaluation.normalizer import HEAVY_VISA_COUNTRIES, SCHENGEN_COUNTRIES
+from app.services.evaluation.parsing import UNSURE_WORDS, parse_amount, parse_year, parse_yes_no
+from app.services.retrieval.bm25 import tokenize
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "prompts", "turn_model.json")
+TURN_LOG_QUEUE_SIZE = 10_000  # Turns waiting for the log writer; further turns are dropped from the log
+
+# Places applicants name as destinations or past trips
+PLACES = {c.lower() for c in SCHENGEN_COUNTRIES | HEAVY_VISA_COUNTRIES} | {
+    "europe", "schengen", "holland", "ireland", "bulgaria", "romania", "cyprus", "america", "us", "uae",
+    "dubai", "abu dhabi", "saudi", "saudi arabia", "ksa", "umrah", "hajj", "qatar", "oman", "bahrain",
+    "kuwait", "turkey", "malaysia", "thailand", "singapore", "indonesia", "bali", "sri lanka", "maldives",
+    "china", "japan", "korea", "azerbaijan", "baku", "georgia", "egypt", "iran", "iraq", "india", "nepal",
+    "kenya", "new zealand", "hong kong", "vietnam", "uzbekistan", "kazakhstan", "russia",
+}
+
+
+def _words(*words: str) -> re.Pattern:
+    return re.compile(r"(?<![\w'])(?:" + "|".join(sorted(map(re.escape, words), key=len, reverse=True)) + r")(?![\w'])")
+
+
+_PLACE_RE = _words(*PLACES)
+_UNSURE_RE = _words(*UNSURE_WORDS)
+_NO_TRAVEL_RE = _words("none", "never", "nowhere", "no travel", "not travelled", "not traveled", "no history",
+                       "no country", "no countries", "first time")
+_PROFESSION_RE = re.compile(
+    r"\b(?:business\w*|job|jobs|employee|employed|salaried|self[- ]employed|shop|shopkeeper|trader|owner|"
+    r"company|factory|doctor|engineer|teacher|lecturer|professor|banker|accountant|nurse|manager|officer|"
+    r"government|govt|freelanc\w*|retired|student|housewife|service|servant|work(?:ing)?)\b")
+_BUSINESS_TYPE_RE = re.compile(
+    r"\b(?:sole|proprietor\w*|private|pvt|limited|ltd|partnership|llc|aop|firm|company|smc|individual)\b")
+_SALARY_MODE_RE = re.compile(r"\b(?:bank|banks|transfer\w*|account|cash|hand|cheque|check|online|direct)\b")
+_AGE_RE = re.compile(r"\b(1[6-9]|[2-8]\d|9[0-9])\b|\byears? old\b")
+
+# Opening words of a question or an interruption, counted only at the start of a turn
+QUESTION_STARTERS = frozenset("""
+what whats what's how why when where which who whom whose can could should would will is are am do does did
+shall may might tell explain kindly please help wait stop hold enough
+""".split())
+
+# Broad topic of an off-track question, used as the FAQ category prior
+QUESTION_TYPES = {
+    "general_info": ["what is", "how does", "can you tell", "explain", "information"],
+    "country_selection": ["best country", "which country", "recommend", "suggest", "good country", "good ratio", "visa ratio", "visa success", "success rate"],
+    "fees": ["cost", "fee", "price", "how much", "charge"],
+    "timing": ["how long", "when", "time", "duration", "processing"],
+    "documents": ["documents", "papers", "requirements", "what needed"],
+    "rejection": ["rejected", "denied", "refused", "appeal", "what if"],
+    "application_process": ["visa process", "how to apply", "application process", "procedure", "steps", "how to get visa", "apply visa"],
+    "travel_history": ["no travel history", "travel history", "first time", "no previous travel", "should apply", "apply without travel"],
+    "general_help": ["help", "assist", "guide", "advice", "support"]
+}
+
+# The keyword check used before this classifier (it covered eight states, and
+# everything else went to FAQ search and the LLM); kept to report the LLM
+# calls the classifier avoids
+PREVIOUS_EXPECTED_KEYWORDS = {
+    "ask_country": ["country", "nation", "destination", "where"],
+    "ask_profession": ["business", "job", "employee", "profession", "work"],
+    "ask_business_type": ["sole", "proprietor", "private", "limited", "company"],
+    "ask_salary": ["salary", "income", "earnings", "pay", "amount"],
+    "ask_salary_mode": ["bank", "transfer", "cash", "payment", "mode"],
+    "ask_tax_info": ["tax", "filer", "income", "annual", "return"],
+    "ask_balance": ["balance", "bank", "money", "account", "funds"],
+    "ask_travel": ["travel", "history", "countries", "visited", "trip"]
+}
+
+
+def _is_yes_no(text: str) -> bool:
+    return parse_yes_no(text) is not None or _UNSURE_RE.search(text) is not None
+
+
+def _is_amount(text: str) -> bool:
+    return bool(parse_amount(text))
+
+
+# What a plain answer to each question looks like
+ANSWER_RULES: Dict[str, Callable[[str], bool]] = {
+    "ask_country": lambda t: _PLACE_RE.search(t) is not None,
+    "country_not_supported": _is_yes_no,
+    "ask_profession": lambda t: _PROFESSION_RE.search(t) is not None,
+    "ask_business_type": lambda t: _BUSINESS_TYPE_RE.search(t) is not None,
+    "ask_salary": _is_amount,
+    "ask_salary_mode": lambda t: _SALARY_MODE_RE.search(t) is not None,
+    "ask_tax_info": lambda t: _is_yes_no(t) or _is_amount(t),
+    "ask_balance": lambda t: _is_yes_no(t) or _is_amount(t),
+    "ask_travel": lambda t: _PLACE_RE.search(t) is not None or _NO_TRAVEL_RE.search(t) is not None or _is_yes_no(t),
+    "ask_last_travel_year": lambda t: parse_year(t) is not None or _NO_TRAVEL_RE.search(t) is not None,
+    "ask_valid_visa": lambda t: _is_yes_no(t) or _PLACE_RE.search(t) is not None,
+    "ask_schengen_rejection": lambda t: _is_yes_no(t) or parse_year(t) is not None,
+    "ask_age": lambda t: _AGE_RE.search(t) is not None,
+    "ask_business_premises": _is_yes_no,
+    "ask_business_online_presence": _is_yes_no,
+    "ask_business_assets": _is_yes_no,
+}
+
+
+def _looks_like_question(text: str) -> bool:
+    if "?" in text:
+        return True
+    words = text.split(None, 1)
+    return bool(words) and words[0].strip(",.!") in QUESTION_STARTERS
+
+
+def question_type(text: str) -> str:
+    """Topic of an off-track question"""
+    text = text.lower()
+    for name, patterns in QUESTION_TYPES.items():
+        if any(pattern in text for pattern in patterns):
+            return name
+    return "general"
+
+
+def turn_features(state: str, text: str) -> List[str]:
+    """Features of a turn: words, words conditioned on the state, and the rule signals"""
+    text = text.lower().strip()
+    tokens = tokenize(text, drop_stop_words=False)
+    features = {f"w:{t}" for t in tokens} | {f"s:{state}:{t}" for t in tokens}
+    rule = ANSWER_RULES.get(state)
+    if rule is not None and rule(text):
+        features.add("answer")
+        features.add(f"answer:{state}")
+    if _looks_like_question(text):
+        features.add("question")
+    if "?" in text:
+        features.add("qmark")
+    if any(t.isdigit() for t in tokens):
+        features.add("number")
+    features.add(f"len:{min(len(tokens), 12) // 3}")
+    return sorted(features)
+
+
+def redacted_features(state: str, text: str) -> List[str]:
+    """Turn features safe to log: word features holding digits (amounts, ages, years) are left out"""
+    return [f for f in turn_features(state, text)
+            if not (f.startswith(("w:", "s:")) and any(c.isdigit() for c in f.rsplit(":", 1)[-1]))]
+
+
+def _example_features(state: str, text: Any) -> List[str]:
+    """Features of a seed example's text, or the features a turn log already holds"""
+    return text if isinstance(text, list) else turn_features(state, text)
+
+
+@dataclass(frozen=True)
+class TurnDecision:
+    on_track: bool
+    question_type: str  # "on_track" for answers
+    source: str  # "rule", "model" or "default" (no model loaded)
+    confidence: float
+
+
+class TurnModel:
+    """
+    Naive Bayes over binary turn features, compiled to one weight per feature.
+
+    A turn's log-odds of being on-track is the bias plus the weights of its
+    features; features never seen in training are ignored.
+    """
+
+    def __init__(self, bias: float, weights: Dict[str, float], examples: int = 0):
+        self.bias = bias
+        self.weights = weights
+        self.examples = examples
+
+    def log_odds(self, features: Iterable[str]) -> float:
+        weights = self.weights
+        return self.bias + sum(weights.get(f, 0.0) for f in features)
+
+    def probability(self, state: str, text: str) -> float:
+        """Probability that a turn answers the current question"""
+        score = self.log_odds(turn_features(state, text))
+        return 1.0 / (1.0 + math.exp(-max(min(score, 50.0), -50.0)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"bias": self.bias, "examples": self.examples, "weights": self.weights}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TurnModel":
+        return cls(float(data["bias"]), {k: float(v) for k, v in data["weights"].items()}, int(data.get("examples", 0)))
+
+
+def train_model(examples: Iterable[Tuple[str, Any, bool]], alpha: float = 1.0) -> TurnModel:
+    """Fit the model on (state, text or logged features, on_track) examples with Laplace smoothing"""
+    counts = {True: Counter(), False: Counter()}
+    totals = Counter()
+    for state, text, on_track in examples:
+        totals[bool(on_track)] += 1
+        counts[bool(on_track)].update(_example_features(state, text))
+    if not totals[True] or not totals[False]:
+        raise ValueError("Training needs both on-track and off-track examples")
+
+    weights = {}
+    for feature in set(counts[True]) | set(counts[False]):
+        on = (counts[True][feature] + alpha) / (totals[True] + 2 * alpha)
+        off = (counts[False][feature] + alpha) / (totals[False] + 2 * alpha)
+        weights[feature] = round(math.log(on / off), 4)
+    bias = math.log(totals[True] / totals[False])
+    return TurnModel(round(bias, 4), weights, totals[True] + totals[False])
+
+
+def load_model(path: str = DEFAULT_MODEL_PATH) -> Optional[TurnModel]:
+    """Trained model from a file, or None when there is none"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return TurnModel.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Failed to load turn model from {path}: {e}")
+        return None
+
+
+class TurnClassifier:
+    """
+    Decides whether a turn answers the current question or goes off-track.
+
+    An answer that matches the state's rule and does not read as a question is
+    on-track, and a question that matches no rule is off-track. Everything in
+    between goes to the model. Decisions are counted, and with a log_path each
+    recorded turn's redacted features are appended as JSONL for training the
+    next model. The file is written by a background thread, so classifying a
+    turn never waits on disk.
+    """
+
+    def __init__(self, model: Optional[TurnModel] = None, log_path: Optional[str] = None):
+        self.model = model
+        self.log_path = log_path
+        self.turns = 0
+        self.on_track = 0
+        self.sources: Counter = Counter()
+        self.llm_calls_avoided = 0
+        self.log_dropped = 0
+        self._log_queue: "queue.Queue[str]" = queue.Queue(maxsize=TURN_LOG_QUEUE_SIZE)
+        self._log_writer: Optional[threading.Thread] = None
+
+    def classify(self, text: str, state: str, record: bool = True) -> TurnDecision:
+        """Classify a turn; record=False leaves the statistics and turn log untouched"""
+        lower = text.lower().strip()
+        rule = ANSWER_RULES.get(state)
+        answered = rule is not None and rule(lower)
+        question = _looks_like_question(lower)
+
+        if answered and not question:
+            decision = TurnDecision(True, "on_track", "rule", 1.0)
+        elif question and not answered:
+            decision = TurnDecision(False, question_type(lower), "rule", 1.0)
+        elif self.model is not None:
+            probability = self.model.probability(state, lower)
+            on_track = probability >= 0.5
+            decision = TurnDecision(on_track, "on_track" if on_track else question_type(lower), "model",
+                                    round(max(probability, 1.0 - probability), 4))
+        else:
+            on_track = not question
+            decision = TurnDecision(on_track, "on_track" if on_track else question_type(lower), "default", 0.5)
+
+        if record:
+            self._record(text, state, decision)
+        return decision
+
+    def _record(self, text: str, state: str, decision: TurnDecision):
+        self.turns += 1
+        self.sources[decision.source] += 1
+        if decision.on_track:
+            self.on_track += 1
+            expected = PREVIOUS_EXPECTED_KEYWORDS.get(state, ())
+            if not any(keyword in text.lower() for keyword in expected):
+                self.llm_calls_avoided += 1
+        if self.log_path:
+            line = json.dumps({"state": state, "features": redacted_features(state, text),
+                               "decision": decision.on_track, "source": decision.source}, ensure_ascii=False)
+            if self._log_writer is None:
+                self._log_writer = threading.Thread(target=self._write_log, name="turn-log", daemon=True)
+                self._log_writer.start()
+            try:
+                self._log_queue.put_nowait(line + "\n")
+            except queue.Full:
+                self.log_dropped += 1
+
+    def _write_log(self):
+        """Append queued turns to the log, one open per batch"""
+        while True:
+            lines = [self._log_queue.get()]
+            while True:
+                try:
+                    lines.append(self._log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except OSError as e:
+                logger.error(f"Error writing turn log: {e}")
+            finally:
+                for _ in lines:
+                    self._log_queue.task_done()
+
+    def flush(self):
+        """Block until every queued turn has been written"""
+        if self._log_writer is not None:
+            self._log_queue.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Classification counts for monitoring (this worker)"""
+        return {
+            "model_loaded": self.model is not None,
+            "turns": self.turns,
+            "on_track": self.on_track,
+            "off_track": self.turns - self.on_track,
+            "decided_by": dict(self.sources),
+            # On-track turns the previous keyword check would have sent to FAQ search and the LLM
+            "llm_calls_avoided": self.llm_calls_avoided,
+            "log_dropped": self.log_dropped,
+        }
+
+
+def read_examples(paths: Iterable[str]) -> Iterator[Tuple[str, Any, bool]]:
+    """Labelled (state, text or logged features, on_track) examples from seed files and turn logs"""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "on_track" in record:
+                    yield record["state"], record["text"], bool(record["on_track"])
+                elif record.get("source") == "rule":
+                    yield record["state"], record.get("features", record.get("text")), bool(record["decision"])
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Train the on-track/off-track turn model")
+    parser.add_argument("inputs", nargs="+", help="JSONL seed examples and turn logs")
+    parser.add_argument("-o", "--output", default=DEFAULT_MODEL_PATH, help="Where to write the model JSON")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Laplace smoothing")
+    args = parser.parse_args(argv)
+
+    examples = list(read_examples(args.inputs))
+    model = train_model(examples, alpha=args.alpha)
+    correct = sum((model.log_odds(_example_features(state, text)) >= 0) == label for state, text, label in examples)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(model.to_dict(), f, indent=1, sort_keys=True)
+        f.write("\n")
+    print(f"Trained on {len(examples)} turns ({sum(l for _, _, l in examples)} on-track), "
+          f"{len(model.weights)} features, training accuracy {correct / len(examples):.3f}")
+    return 0
+
+
+# Global turn classifier instance
+turn_classifier = TurnClassifier(load_model(), settings.TURN_LOG_PATH)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
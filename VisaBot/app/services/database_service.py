@@ -2,21 +2,158 @@
 Database service for persistent storage operations - aligned with FSM visa evaluation bot
 """
 import uuid
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import Iterable, List, Optional, Dict, Any
+from datetime import date, datetime, time, timedelta, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import Date, Select, and_, case, cast, delete, distinct, func, insert, literal_column, or_, select, update
 from sqlalchemy.orm import selectinload
 from loguru import logger
 
+from app.core.config import settings
 from app.models.database import (
-    User, ChatSession, ChatMessage, VisaEvaluation, VisaRecommendation
+    User, ChatSession, ChatMessage, VisaEvaluation, VisaRecommendation,
+    DailySessionRollup, DailyEvaluationRollup
 )
 from app.models.chat import ChatRequest, ChatResponse
 from app.models.session import SessionInfo
 from app.services.fsm_service import FSMStates
 
 
+ROLLUP_LOCK_KEY = 0x7669736162  # Advisory lock held while a refresh runs
+SCORE_BANDS = (("0-25", 25), ("26-50", 50), ("51-75", 75), ("76-100", None))
+
+
+def _band_label(band: str) -> str:
+    return "band_" + band.replace("-", "_")
+
+
+def _score():
+    return func.coalesce(VisaEvaluation.eligibility_score, 0)
+
+
+def _positions(count: int):
+    # Group by select-list position: the day and band expressions carry bound
+    # parameters, and Postgres only matches GROUP BY expressions with the same ones
+    return [literal_column(str(i)) for i in range(1, count + 1)]
+
+
+def _utc_day(column):
+    return cast(func.timezone("UTC", column), Date)
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, timezone.utc)
+
+
+def _created_on(days: Iterable[date]):
+    """created_at within any of the days, as index-friendly ranges (consecutive days merged)"""
+    ranges: List[List[date]] = []
+    for day in sorted(set(days)):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [and_(ChatSession.created_at >= _day_start(first), ChatSession.created_at < _day_start(end))
+            for first, end in ranges]
+
+
+def score_band():
+    """Score band of an evaluation, as in the dashboards"""
+    score = _score()
+    return case(*((score <= upper, band) for band, upper in SCORE_BANDS if upper is not None),
+                else_=SCORE_BANDS[-1][0])
+
+
+def session_stats_query(user_id: Optional[str] = None) -> Select:
+    """Sessions per state, with the overall totals on every row"""
+    query = select(
+        ChatSession.current_state,
+        func.count().label("sessions"),
+        func.sum(func.count()).over().label("total"),
+        func.sum(func.count().filter(ChatSession.is_active.is_(True))).over().label("active"),
+        func.sum(func.count().filter(ChatSession.is_active.is_not(True))).over().label("completed"),
+    ).group_by(ChatSession.current_state)
+    if user_id:
+        query = query.where(ChatSession.user_id == user_id)
+    return query
+
+
+def evaluation_stats_query(user_id: Optional[str] = None) -> Select:
+    """Count, score bands, average and percentiles of evaluations in one row"""
+    score = _score()
+    bands = []
+    lower = None
+    for band, upper in SCORE_BANDS:
+        condition = score <= upper if lower is None else (score > lower) & (score <= upper) if upper else score > lower
+        bands.append(func.count().filter(condition).label(_band_label(band)))
+        lower = upper
+    query = select(
+        func.count().label("total"),
+        *bands,
+        func.avg(score).label("average"),
+        func.percentile_cont(0.5).within_group(VisaEvaluation.eligibility_score).label("median"),
+        func.percentile_cont(0.9).within_group(VisaEvaluation.eligibility_score).label("p90"),
+    )
+    if user_id:
+        query = query.where(VisaEvaluation.user_id == user_id)
+    return query
+
+
+def evaluation_status_query(user_id: Optional[str] = None) -> Select:
+    query = select(VisaEvaluation.eligibility_status, func.count().label("evaluations")) \
+        .group_by(VisaEvaluation.eligibility_status)
+    if user_id:
+        query = query.where(VisaEvaluation.user_id == user_id)
+    return query
+
+
+def changed_session_days_query(since: date) -> Select:
+    """Days before `since` with sessions that changed (state, answers, active flag) since then"""
+    start = _day_start(since)
+    return select(distinct(_utc_day(ChatSession.created_at))).where(
+        ChatSession.updated_at >= start, ChatSession.created_at < start
+    )
+
+
+def session_rollup_select(since: Optional[date] = None, changed_days: Iterable[date] = ()) -> Select:
+    """Sessions per creation day and current state, for days from `since` on plus the changed older days"""
+    day = _utc_day(ChatSession.created_at)
+    query = select(
+        day.label("day"),
+        func.coalesce(ChatSession.current_state, "unknown").label("current_state"),
+        func.count().label("sessions"),
+        func.count().filter(ChatSession.is_active.is_(True)).label("active_sessions"),
+    ).group_by(*_positions(2))
+    if since is not None:
+        query = query.where(or_(ChatSession.created_at >= _day_start(since), *_created_on(changed_days)))
+    return query
+
+
+def evaluation_rollup_select(since: Optional[date] = None) -> Select:
+    day = _utc_day(VisaEvaluation.created_at)
+    query = select(
+        day.label("day"),
+        func.lower(VisaEvaluation.destination_country).label("destination_country"),
+        score_band().label("score_band"),
+        VisaEvaluation.eligibility_status,
+        func.count().label("evaluations"),
+        func.sum(_score()).label("score_sum"),
+    ).group_by(*_positions(4))
+    if since is not None:
+        query = query.where(VisaEvaluation.created_at >= _day_start(since))
+    return query
+
+
+def calculate_risk_level(score: int) -> str:
+    """Risk level for an eligibility score"""
+    if score >= 70:
+        return "low"
+    elif score >= 50:
+        return "medium"
+    else:
+        return "high"
+
+
 class DatabaseService:
     """Service for database operations - aligned with FSM visa evaluation bot"""
     
@@ -261,66 +398,96 @@ class DatabaseService:
     
     # Analytics and reporting - aligned with FSM states
     async def get_session_stats(self, user_id: str = None) -> Dict[str, Any]:
-        """Get session statistics with FSM state breakdown"""
-        query = select(ChatSession)
-        if user_id:
-            query = query.where(ChatSession.user_id == user_id)
-        
-        result = await self.db.execute(query)
-        sessions = result.scalars().all()
-        
-        # Count sessions by FSM state
-        state_counts = {}
-        for session in sessions:
-            state = session.current_state
-            state_counts[state] = state_counts.get(state, 0) + 1
-        
+        """Get session statistics with FSM state breakdown, counted in the database"""
+        rows = (await self.db.execute(session_stats_query(user_id))).all()
+        # One row per state; the totals are window sums over all of them
         return {
-            "total_sessions": len(sessions),
-            "active_sessions": len([s for s in sessions if s.is_active]),
-            "completed_sessions": len([s for s in sessions if not s.is_active]),
-            "state_breakdown": state_counts
+            "total_sessions": rows[0].total if rows else 0,
+            "active_sessions": rows[0].active if rows else 0,
+            "completed_sessions": rows[0].completed if rows else 0,
+            "state_breakdown": {row.current_state: row.sessions for row in rows}
         }
     
     async def get_evaluation_stats(self, user_id: str = None) -> Dict[str, Any]:
-        """Get evaluation statistics"""
-        query = select(VisaEvaluation)
-        if user_id:
-            query = query.where(VisaEvaluation.user_id == user_id)
+        """Get evaluation statistics, aggregated in the database"""
+        totals = (await self.db.execute(evaluation_stats_query(user_id))).one()
+        statuses = (await self.db.execute(evaluation_status_query(user_id))).all()
         
-        result = await self.db.execute(query)
-        evaluations = result.scalars().all()
-        
-        status_counts = {}
-        score_ranges = {"0-25": 0, "26-50": 0, "51-75": 0, "76-100": 0}
+        return {
+            "total_evaluations": totals.total,
+            "status_breakdown": {row.eligibility_status: row.evaluations for row in statuses},
+            "score_breakdown": {band: getattr(totals, _band_label(band)) for band, _ in SCORE_BANDS},
+            "average_score": float(totals.average or 0),
+            "median_score": float(totals.median) if totals.median is not None else None,
+            "p90_score": float(totals.p90) if totals.p90 is not None else None
+        }
+    
+    # Daily rollups backing the dashboards
+    async def refresh_rollups(self, lookback_days: int = None) -> Optional[Dict[str, Any]]:
+        """
+        Recompute the daily rollups from the last rolled-up day (less lookback_days) onward.
         
-        for eval in evaluations:
-            # Count by status
-            status_counts[eval.eligibility_status] = status_counts.get(eval.eligibility_status, 0) + 1
-            
-            # Count by score range
-            score = eval.eligibility_score or 0
-            if score <= 25:
-                score_ranges["0-25"] += 1
-            elif score <= 50:
-                score_ranges["26-50"] += 1
-            elif score <= 75:
-                score_ranges["51-75"] += 1
+        The first refresh rolls up the whole history; later ones only rescan the
+        recent days, where rows still arrive, plus the older days whose sessions
+        changed state since the start of that window (sessions are counted by the
+        day they were created, under their current state), so each refresh reads
+        a bounded slice of the tables. Returns None when another worker is
+        refreshing.
+        """
+        if lookback_days is None:
+            lookback_days = settings.ROLLUP_LOOKBACK_DAYS
+        # Every worker runs the refresher; the first to take the lock does the work
+        if not (await self.db.execute(select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_KEY)))).scalar():
+            return None
+        refreshed = {}
+        for rollup, source, select_rows in (
+            (DailySessionRollup, ChatSession, session_rollup_select),
+            (DailyEvaluationRollup, VisaEvaluation, evaluation_rollup_select),
+        ):
+            last_day = (await self.db.execute(select(func.max(rollup.day)))).scalar()
+            since = last_day - timedelta(days=lookback_days) if last_day else None
+            stale = delete(rollup)
+            if since is None:
+                rows = select_rows()
+            elif rollup is DailySessionRollup:
+                changed_days = (await self.db.execute(changed_session_days_query(since))).scalars().all()
+                stale = stale.where(or_(rollup.day >= since, rollup.day.in_(changed_days)))
+                rows = select_rows(since, changed_days)
             else:
-                score_ranges["76-100"] += 1
-        
+                stale = stale.where(rollup.day >= since)
+                rows = select_rows(since)
+            await self.db.execute(stale)
+            await self.db.execute(insert(rollup).from_select([c.name for c in rows.selected_columns], rows))
+            refreshed[rollup.__tablename__] = since.isoformat() if since else "all"
+        await self.db.commit()
+        return refreshed
+    
+    async def get_daily_stats(self, days: int = 30) -> Dict[str, Any]:
+        """Dashboard series for the last `days` days, read from the rollups only"""
+        since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+        sessions = await self.db.execute(
+            select(DailySessionRollup).where(DailySessionRollup.day >= since)
+            .order_by(DailySessionRollup.day, DailySessionRollup.current_state)
+        )
+        evaluations = await self.db.execute(
+            select(DailyEvaluationRollup).where(DailyEvaluationRollup.day >= since)
+            .order_by(DailyEvaluationRollup.day, DailyEvaluationRollup.destination_country,
+                      DailyEvaluationRollup.score_band, DailyEvaluationRollup.eligibility_status)
+        )
         return {
-            "total_evaluations": len(evaluations),
-            "status_breakdown": status_counts,
-            "score_breakdown": score_ranges,
-            "average_score": sum(e.eligibility_score or 0 for e in evaluations) / len(evaluations) if evaluations else 0
+            "since": since.isoformat(),
+            "sessions": [
+                {"day": r.day.isoformat(), "state": r.current_state, "sessions": r.sessions,
+                 "active_sessions": r.active_sessions}
+                for r in sessions.scalars()
+            ],
+            "evaluations": [
+                {"day": r.day.isoformat(), "country": r.destination_country, "score_band": r.score_band,
+                 "status": r.eligibility_status, "evaluations": r.evaluations, "score_sum": r.score_sum}
+                for r in evaluations.scalars()
+            ]
         }
     
     def _calculate_risk_level(self, score: int) -> str:
         """Calculate risk level based on eligibility score"""
-        if score >= 70:
-            return "low"
-        elif score >= 50:
-            return "medium"
-        else:
-            return "high" 
\ No newline at end of file
+        return calculate_risk_level(score)
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .normalizer import NormalizedFeatures, extract_features
+from .rubric import CompiledRubric, RubricError, Tier, rubric_loader
+
+
+# Tri-state booleans (True/False/None) are stored as int8 1/0/-1
+TRUE, FALSE, UNKNOWN = 1, 0, -1
+
+_INT64_MIN = int(np.iinfo(np.int64).min)
+_INT64_MAX = int(np.iinfo(np.int64).max)
+
+
+def _tri(value: Optional[bool]) -> int:
+    if value is None:
+        return UNKNOWN
+    return TRUE if value else FALSE
+
+
+def _clamp(value: int) -> int:
+    # Rubric thresholds only compare, so clamping absurd parsed numbers is lossless
+    return max(_INT64_MIN, min(_INT64_MAX, value))
+
+
+@dataclass
+class FeatureColumns:
+    """Columnar view of many NormalizedFeatures, one NumPy array per field"""
+    is_business: np.ndarray
+    has_business_type: np.ndarray
+    business_premises: np.ndarray
+    business_online_presence: np.ndarray
+    business_assets: np.ndarray
+
+    is_tax_filer: np.ndarray
+    annual_income_pk: np.ndarray
+    closing_balance_pk: np.ndarray
+
+    travel_count: np.ndarray
+    has_schengen_travel: np.ndarray
+    has_heavy_visa: np.ndarray
+    years_since_last_travel: np.ndarray  # -1 when unknown
+    travel_known: np.ndarray
+
+    previous_schengen_rejection: np.ndarray
+    previous_schengen_rejection_years_ago: np.ndarray  # 0 when unknown
+
+    age: np.ndarray
+    age_known: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.is_business)
+
+    @classmethod
+    def from_features(cls, features: Sequence[NormalizedFeatures]) -> "FeatureColumns":
+        def column(values: Iterable[Any], dtype) -> np.ndarray:
+            return np.fromiter(values, dtype=dtype, count=len(features))
+
+        return cls(
+            is_business=column((bool(f.is_business) for f in features), np.bool_),
+            has_business_type=column((bool(f.business_type) for f in features), np.bool_),
+            business_premises=column((_tri(f.business_premises) for f in features), np.int8),
+            business_online_presence=column((_tri(f.business_online_presence) for f in features), np.int8),
+            business_assets=column((_tri(f.business_assets) for f in features), np.int8),
+            is_tax_filer=column((_tri(f.is_tax_filer) for f in features), np.int8),
+            annual_income_pk=column((_clamp(f.annual_income_pk) for f in features), np.int64),
+            closing_balance_pk=column((_clamp(f.closing_balance_pk) for f in features), np.int64),
+            travel_count=column((f.travel_count for f in features), np.int64),
+            has_schengen_travel=column((bool(f.has_schengen_travel) for f in features), np.bool_),
+            has_heavy_visa=column((_tri(f.has_heavy_visa) for f in features), np.int8),
+            years_since_last_travel=column(
+                (-1 if f.years_since_last_travel is None else _clamp(f.years_since_last_travel) for f in features),
+                np.int64,
+            ),
+            travel_known=column((f.years_since_last_travel is not None for f in features), np.bool_),
+            previous_schengen_rejection=column((_tri(f.previous_schengen_rejection) for f in features), np.int8),
+            previous_schengen_rejection_years_ago=column(
+                (_clamp(f.previous_schengen_rejection_years_ago or 0) for f in features), np.int64
+            ),
+            age=column((0 if f.age is None else _clamp(f.age) for f in features), np.int64),
+            age_known=column((f.age is not None for f in features), np.bool_),
+        )
+
+    @classmethod
+    def from_answers(cls, answers_list: Sequence[Dict[str, Any]]) -> "FeatureColumns":
+        return cls.from_features([extract_features(answers) for answers in answers_list])
+
+
+@dataclass
+class BatchScores:
+    """Per-profile rubric results, aligned with the input order"""
+    ties: np.ndarray
+    travel: np.ndarray
+    financials: np.ndarray
+    age: np.ndarray
+    penalties: np.ndarray
+    base_score: np.ndarray
+    success_ratio: np.ndarray
+    confidence: np.ndarray
+    should_apply: np.ndarray
+    rubric_version: str = ""
+
+    def __len__(self) -> int:
+        return len(self.success_ratio)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        names = [f.name for f in fields(self) if f.name != "rubric_version"]
+        columns = [getattr(self, name).tolist() for name in names]
+        return [dict(zip(names, row), rubric_version=self.rubric_version) for row in zip(*columns)]
+
+
+_TRI_STATE_FIELDS = {
+    "business_premises", "business_online_presence", "business_assets",
+    "is_tax_filer", "has_heavy_visa", "previous_schengen_rejection",
+}
+_BOOLEAN_FIELDS = {"is_business", "has_schengen_travel"}
+# Numeric columns and the mask telling which rows are known (None means always known)
+_NUMERIC_FIELDS = {
+    "annual_income_pk": None,
+    "closing_balance_pk": None,
+    "travel_count": None,
+    "age": "age_known",
+    "years_since_last_travel": "travel_known",
+    "previous_schengen_rejection_years_ago": None,  # unknown is stored as 0
+}
+_COMPARISONS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+
+
+def _unsupported(field: str, op: str) -> RubricError:
+    return RubricError(f"Vectorized scoring does not support '{op}' on {field}")
+
+
+def _clause_mask(spec: Dict[str, Any], cols: FeatureColumns) -> np.ndarray:
+    field, op, value, fallback = spec.get("field"), spec.get("op"), spec.get("value"), spec.get("or")
+    size = len(cols)
+
+    if field in _TRI_STATE_FIELDS:
+        column = getattr(cols, field)
+        if op in ("is", "is_not"):
+            mask = column == _tri(value)
+            return mask if op == "is" else ~mask
+        if op in ("truthy", "falsy"):
+            return column == TRUE if op == "truthy" else column != TRUE
+        raise _unsupported(field, op)
+
+    if field in _BOOLEAN_FIELDS:
+        column = getattr(cols, field)
+        if op in ("is", "is_not"):
+            mask = column == value if isinstance(value, bool) else np.zeros(size, dtype=np.bool_)
+            return mask if op == "is" else ~mask
+        if op in ("truthy", "falsy"):
+            return column if op == "truthy" else ~column
+        raise _unsupported(field, op)
+
+    if field not in _NUMERIC_FIELDS:
+        raise _unsupported(field, op)
+    values = getattr(cols, field)
+    known_field = _NUMERIC_FIELDS[field]
+    known = getattr(cols, known_field) if known_field else np.ones(size, dtype=np.bool_)
+    if field == "previous_schengen_rejection_years_ago":
+        known = values != 0
+    if fallback is not None:
+        # `x or fallback`: unknown and zero both become the fallback
+        values = np.where(known & (values != 0), values, fallback)
+        known = np.ones(size, dtype=np.bool_)
+
+    if op in _COMPARISONS:
+        return known & _COMPARISONS[op](values, value)
+    if op in ("==", "!="):
+        mask = ~known if value is None else known & (values == value)
+        return mask if op == "==" else ~mask
+    if op in ("is", "is_not") and value is None:
+        return ~known if op == "is" else known
+    if op in ("truthy", "falsy"):
+        mask = known & (values != 0)
+        return mask if op == "truthy" else ~mask
+    raise _unsupported(field, op)
+
+
+def condition_mask(spec: Optional[Dict[str, Any]], cols: FeatureColumns) -> np.ndarray:
+    """Rows satisfying a rubric condition, evaluated over whole columns"""
+    if spec is None:
+        return np.ones(len(cols), dtype=np.bool_)
+    if "all" in spec or "any" in spec:
+        is_all = "all" in spec
+        masks = [condition_mask(clause, cols) for clause in spec["all" if is_all else "any"]]
+        if not masks:
+            # all([]) is True, any([]) is False
+            return np.full(len(cols), is_all, dtype=np.bool_)
+        return np.logical_and.reduce(masks) if is_all else np.logical_or.reduce(masks)
+    return _clause_mask(spec, cols)
+
+
+def _tier_points(value: np.ndarray, tiers: Sequence[Tier], otherwise: Optional[Tier], by_min: bool) -> np.ndarray:
+    """Points of the first matching tier, as CompiledRubric's tier tables are walked"""
+    conditions = [value >= t.bound if by_min else value <= t.bound for t in tiers]
+    default = otherwise.points if otherwise else 0
+    return np.select(conditions, [t.points for t in tiers], default)
+
+
+def _score_ties(cols: FeatureColumns, rubric: CompiledRubric) -> np.ndarray:
+    premises = cols.business_premises == TRUE
+    assets = np.where(
+        cols.business_assets == TRUE,
+        rubric.tie_assets.points,
+        np.where(premises & cols.has_business_type, rubric.tie_inferred_assets.points, 0),
+    )
+    score = (
+        rubric.tie_premises.points * premises
+        + rubric.tie_online.points * (cols.business_online_presence == TRUE)
+        + assets
+    )
+    return np.where(cols.is_business, score, np.minimum(score, rubric.non_business_tie_cap))
+
+
+def _score_travel(cols: FeatureColumns, rubric: CompiledRubric) -> np.ndarray:
+    count = _tier_points(cols.travel_count, rubric.travel_count, rubric.travel_count_otherwise, by_min=True)
+    years = np.where(cols.travel_known, cols.years_since_last_travel, rubric.travel_unknown_years)
+    recency = _tier_points(years, rubric.recency, rubric.recency_otherwise, by_min=False)
+    visa = np.where(
+        (cols.has_heavy_visa == TRUE) | cols.has_schengen_travel,
+        _tier_points(years, rubric.visa, rubric.visa_otherwise, by_min=False),
+        0,
+    )
+    return count + recency + visa
+
+
+def _score_financials(cols: FeatureColumns, rubric: CompiledRubric) -> np.ndarray:
+    balance = _tier_points(cols.closing_balance_pk, rubric.balance, rubric.balance_otherwise, by_min=True)
+    income = _tier_points(cols.annual_income_pk, rubric.income, rubric.income_otherwise, by_min=True)
+    # astype truncates toward zero like int()
+    income = np.where(cols.is_tax_filer == FALSE, (income * rubric.non_filer_factor).astype(np.int64), income)
+    return balance + income
+
+
+def _score_age(cols: FeatureColumns, rubric: CompiledRubric) -> np.ndarray:
+    return np.where(cols.age_known, _tier_points(cols.age, rubric.age, None, by_min=True), 0)
+
+
+def _penalties(cols: FeatureColumns, rubric: CompiledRubric) -> np.ndarray:
+    # Unknown and zero years both count as unknown, as in the scalar rubric
+    years = cols.previous_schengen_rejection_years_ago
+    years = np.where(years != 0, years, rubric.rejection_unknown_years)
+    points = _tier_points(years, rubric.rejection, rubric.rejection_otherwise, by_min=False)
+    return np.where(cols.previous_schengen_rejection == TRUE, points, 0)
+
+
+def _confidence(cols: FeatureColumns, rubric: CompiledRubric) -> np.ndarray:
+    missing = np.zeros(len(cols), dtype=np.int64)
+    for spec in rubric.missing_specs:
+        missing += condition_mask(spec, cols)
+    conf = rubric.confidence_base - rubric.confidence_per_missing * missing
+    return np.clip(conf, rubric.confidence_min, rubric.confidence_max)
+
+
+def score_columns(cols: FeatureColumns, rubric: Optional[CompiledRubric] = None) -> BatchScores:
+    """Vectorized equivalent of rubric.score_profile's numeric results"""
+    rubric = rubric or rubric_loader.get()
+    ties = _score_ties(cols, rubric)
+    travel = _score_travel(cols, rubric)
+    financials = _score_financials(cols, rubric)
+    age = _score_age(cols, rubric)
+    penalties = _penalties(cols, rubric)
+
+    base_score = np.clip(ties + travel + financials + age - penalties, 0, 100)
+    success_ratio = np.select(
+        [base_score >= min_score for min_score, _ in rubric.bands],
+        [ratio for _, ratio in rubric.bands],
+        rubric.bands[-1][1],
+    )
+
+    for max_ratio, _, when in rubric.caps:
+        success_ratio = np.where(condition_mask(when, cols), np.minimum(success_ratio, max_ratio), success_ratio)
+
+    return BatchScores(
+        ties=ties,
+        travel=travel,
+        financials=financials,
+        age=age,
+        penalties=penalties,
+        base_score=base_score,
+        success_ratio=success_ratio,
+        confidence=_confidence(cols, rubric),
+        should_apply=success_ratio >= rubric.should_apply_min_ratio,
+        rubric_version=rubric.version,
+    )
+
+
+def score_batch(answers_list: Sequence[Dict[str, Any]], rubric: Optional[CompiledRubric] = None) -> BatchScores:
+    """Normalize and score many answer dicts at once"""
+    return score_columns(FeatureColumns.from_answers(answers_list), rubric)
@@ -0,0 +1,396 @@
+"""
+Offline bulk evaluation of exported session answers.
+
+Streams answer records from JSONL, CSV or Parquet, evaluates them in chunks
+across a process pool (normalize -> score -> narrative) and writes one result
+per record, optionally with a diff against a previous run's results.
+
+Usage:
+    python -m app.services.evaluation.bulk answers.jsonl -o results.jsonl \
+        [--baseline previous.jsonl --diff diff.jsonl] [--workers 8] [--chunk-size 500] \
+        [--rubric app/prompts/rubric.json] [--scores-only]
+
+Input records are either plain answer dicts or {"session_id", "answers",
+"target_country"} envelopes. In CSV, cells holding JSON (lists, objects,
+true/false/null) are decoded and empty cells are treated as missing.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .batch import FeatureColumns, score_columns
+from .narrative import build_narrative
+from .normalizer import extract_features
+from .rubric import DEFAULT_RUBRIC_PATH, CompiledRubric, load_rubric
+
+STAGES = ("read", "normalize", "score", "narrative", "write")
+# Fields compared against the baseline run
+DIFF_FIELDS = ("success_ratio", "should_apply", "base_score", "confidence")
+DIFF_COLUMNS = ["id", "rubric_version", "changes"]
+
+
+@dataclass
+class BulkSummary:
+    records: int = 0
+    errors: int = 0
+    wall_seconds: float = 0.0
+    rubric_version: str = ""
+    # Worker stages are summed across processes, so they can exceed wall time
+    stage_seconds: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+    compared: int = 0
+    changed: int = 0
+    missing_in_baseline: int = 0
+    ratio_transitions: Counter = field(default_factory=Counter)
+    should_apply_flips: int = 0
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.wall_seconds if self.wall_seconds else 0.0
+
+
+# -----------------------
+# Reading
+# -----------------------
+def _decode_cell(value: str) -> Any:
+    if value == "":
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _read_csv(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {key: _decode_cell(value) for key, value in row.items()}
+
+
+def _read_parquet(path: str) -> Iterator[Dict[str, Any]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Reading Parquet requires pyarrow (pip install pyarrow)")
+    for batch in pq.ParquetFile(path).iter_batches():
+        yield from batch.to_pylist()
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream input records, choosing the reader from the file extension"""
+    if path.endswith(".csv"):
+        return _read_csv(path)
+    if path.endswith(".parquet"):
+        return _read_parquet(path)
+    return _read_jsonl(path)
+
+
+def _unwrap(record: Dict[str, Any], index: int) -> Tuple[str, Dict[str, Any], Optional[str]]:
+    """(record id, answers, target country) for an input record"""
+    answers = record.get("answers") if isinstance(record.get("answers"), dict) else record
+    record_id = record.get("session_id") or record.get("id") or str(index)
+    target_country = (
+        record.get("target_country") or answers.get("selected_country") or answers.get("country")
+    )
+    return str(record_id), answers, target_country
+
+
+def _chunks(records: Iterable[Dict[str, Any]], size: int, timings: Dict[str, float]) -> Iterator[List[tuple]]:
+    chunk: List[tuple] = []
+    start = time.perf_counter()
+    for index, record in enumerate(records):
+        chunk.append(_unwrap(record, index))
+        if len(chunk) >= size:
+            timings["read"] += time.perf_counter() - start
+            yield chunk
+            chunk = []
+            start = time.perf_counter()
+    timings["read"] += time.perf_counter() - start
+    if chunk:
+        yield chunk
+
+
+# -----------------------
+# Worker
+# -----------------------
+_worker_rubric: Optional[CompiledRubric] = None
+
+
+def _init_worker(rubric_path: str):
+    global _worker_rubric
+    _worker_rubric = load_rubric(rubric_path)
+
+
+def _evaluate_chunk(chunk: List[tuple], scores_only: bool) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """Evaluate one chunk in a worker; returns results in input order plus stage timings"""
+    rubric = _worker_rubric
+    timings = dict.fromkeys(("normalize", "score", "narrative"), 0.0)
+    results: List[Dict[str, Any]] = []
+
+    start = time.perf_counter()
+    features = []
+    for record_id, answers, _ in chunk:
+        try:
+            features.append(extract_features(answers))
+        except Exception as e:
+            features.append(e)
+    timings["normalize"] = time.perf_counter() - start
+
+    if scores_only:
+        start = time.perf_counter()
+        valid = [f for f in features if not isinstance(f, Exception)]
+        scored = iter(score_columns(FeatureColumns.from_features(valid), rubric).to_dicts()) if valid else iter(())
+        for (record_id, _, _), feat in zip(chunk, features):
+            if isinstance(feat, Exception):
+                results.append({"id": record_id, "error": repr(feat)})
+            else:
+                results.append({"id": record_id, **next(scored)})
+        timings["score"] = time.perf_counter() - start
+        return results, timings
+
+    for (record_id, answers, target_country), feat in zip(chunk, features):
+        if isinstance(feat, Exception):
+            results.append({"id": record_id, "error": repr(feat)})
+            continue
+        start = time.perf_counter()
+        try:
+            evaluation, base_score, breakdown = rubric.evaluate(feat)
+        except Exception as e:
+            results.append({"id": record_id, "error": repr(e)})
+            continue
+        scored_at = time.perf_counter()
+        timings["score"] += scored_at - start
+        try:
+            narrative = build_narrative(evaluation, answers, target_country)
+        except Exception as e:
+            narrative = None
+            evaluation["narrative_error"] = repr(e)
+        timings["narrative"] += time.perf_counter() - scored_at
+
+        results.append({
+            "id": record_id,
+            **asdict(breakdown),
+            "base_score": base_score,
+            **{k: v for k, v in evaluation.items() if k != "required_documents"},
+            "narrative": narrative,
+        })
+    return results, timings
+
+
+class _InlineExecutor(Executor):
+    """Runs chunks in this process (workers=0), mainly for tests and profiling"""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+# -----------------------
+# Writing and diffing
+# -----------------------
+def result_columns(rubric: CompiledRubric, scores_only: bool) -> List[str]:
+    """Every field a result row can carry, so a CSV header never depends on which record comes first"""
+    feat = extract_features({})
+    if scores_only:
+        fields = list(score_columns(FeatureColumns.from_features([feat]), rubric).to_dicts()[0])
+    else:
+        evaluation, _, breakdown = rubric.evaluate(feat)
+        fields = (list(asdict(breakdown)) + ["base_score"]
+                  + [k for k in evaluation if k != "required_documents"] + ["narrative", "narrative_error"])
+    return ["id"] + list(dict.fromkeys(f for f in fields if f != "id")) + ["error"]
+
+
+class _ResultWriter:
+    def __init__(self, path: str, fieldnames: List[str]):
+        self.path = path
+        self.fieldnames = fieldnames
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._csv: Optional[csv.DictWriter] = None
+
+    def write(self, result: Dict[str, Any]):
+        if not self.path.endswith(".csv"):
+            self._file.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+            return
+        # JSON-encode cells that CSV cannot round-trip, matching how _decode_cell reads them back
+        row = {
+            k: json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict, bool)) or v is None else v
+            for k, v in result.items()
+        }
+        if self._csv is None:
+            self._csv = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction="ignore")
+            self._csv.writeheader()
+        self._csv.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    """Previous results keyed by record id (only the compared fields are kept)"""
+    baseline = {}
+    for record in read_records(path):
+        baseline[str(record.get("id"))] = {k: record.get(k) for k in DIFF_FIELDS + ("rubric_version",)}
+    return baseline
+
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        try:
+            return abs(float(a) - float(b)) < 1e-9
+        except (TypeError, ValueError):
+            return False
+    return a == b
+
+
+def _diff(result: Dict[str, Any], previous: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    changes = {
+        name: {"before": previous.get(name), "after": result.get(name)}
+        for name in DIFF_FIELDS
+        if not _same(previous.get(name), result.get(name))
+    }
+    if not changes:
+        return None
+    return {
+        "id": result["id"],
+        "rubric_version": {"before": previous.get("rubric_version"), "after": result.get("rubric_version")},
+        "changes": changes,
+    }
+
+
+# -----------------------
+# Driver
+# -----------------------
+def run_bulk(input_path: str, output_path: str, baseline_path: str = None, diff_path: str = None,
+             workers: int = None, chunk_size: int = 500, rubric_path: str = DEFAULT_RUBRIC_PATH,
+             scores_only: bool = False) -> BulkSummary:
+    """Evaluate every record in input_path and write results (and a diff) in input order"""
+    rubric = load_rubric(rubric_path)
+    summary = BulkSummary(rubric_version=rubric.version)
+    timings = summary.stage_seconds
+    wall_start = time.perf_counter()
+
+    baseline = load_baseline(baseline_path) if baseline_path else None
+    writer = _ResultWriter(output_path, result_columns(rubric, scores_only))
+    diff_writer = _ResultWriter(diff_path, DIFF_COLUMNS) if diff_path else None
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 0:
+        executor: Executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                 initargs=(rubric_path,))
+    else:
+        _init_worker(rubric_path)
+        executor = _InlineExecutor()
+
+    def drain(future: Future):
+        results, chunk_timings = future.result()
+        for stage, seconds in chunk_timings.items():
+            timings[stage] += seconds
+        start = time.perf_counter()
+        for result in results:
+            summary.records += 1
+            if "error" in result:
+                summary.errors += 1
+            writer.write(result)
+            if baseline is None or "error" in result:
+                continue
+            previous = baseline.get(result["id"])
+            if previous is None:
+                summary.missing_in_baseline += 1
+                continue
+            summary.compared += 1
+            change = _diff(result, previous)
+            if change:
+                summary.changed += 1
+                summary.ratio_transitions[(previous.get("success_ratio"), result.get("success_ratio"))] += 1
+                if previous.get("should_apply") != result.get("should_apply"):
+                    summary.should_apply_flips += 1
+                if diff_writer:
+                    diff_writer.write(change)
+        timings["write"] += time.perf_counter() - start
+
+    # Bounded window of in-flight chunks keeps memory flat and output in input order
+    pending: Deque[Future] = deque()
+    try:
+        for chunk in _chunks(read_records(input_path), chunk_size, timings):
+            pending.append(executor.submit(_evaluate_chunk, chunk, scores_only))
+            if len(pending) >= max(2, workers * 2):
+                drain(pending.popleft())
+        while pending:
+            drain(pending.popleft())
+    finally:
+        executor.shutdown(cancel_futures=True)
+        writer.close()
+        if diff_writer:
+            diff_writer.close()
+
+    summary.wall_seconds = time.perf_counter() - wall_start
+    return summary
+
+
+def format_summary(summary: BulkSummary) -> str:
+    lines = [
+        f"Rubric version:   {summary.rubric_version}",
+        f"Records:          {summary.records} ({summary.errors} errors)",
+        f"Wall time:        {summary.wall_seconds:.2f} s",
+        f"Throughput:       {summary.records_per_second:,.0f} records/sec",
+        "Stage timings (worker stages summed across processes):",
+    ]
+    for stage in STAGES:
+        seconds = summary.stage_seconds[stage]
+        per_record = seconds / summary.records * 1e6 if summary.records else 0.0
+        lines.append(f"  {stage:<10} {seconds:8.3f} s  {per_record:8.1f} us/record")
+    if summary.compared or summary.missing_in_baseline:
+        lines.append(f"Compared:         {summary.compared} ({summary.missing_in_baseline} not in baseline)")
+        lines.append(f"Changed:          {summary.changed} ({summary.should_apply_flips} should_apply flips)")
+        for (before, after), count in summary.ratio_transitions.most_common(10):
+            lines.append(f"  success_ratio {before} -> {after}: {count}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Bulk-evaluate exported session answers")
+    parser.add_argument("input", help="JSONL, CSV or Parquet file of answer records")
+    parser.add_argument("-o", "--output", required=True, help="Results file (.jsonl or .csv)")
+    parser.add_argument("--baseline", help="Results of a previous run to diff against")
+    parser.add_argument("--diff", help="Write changed records here (requires --baseline)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (0 runs inline)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--rubric", default=DEFAULT_RUBRIC_PATH, help="Rubric definition to evaluate with")
+    parser.add_argument("--scores-only", action="store_true",
+                        help="Vectorized scores only; skips recommendations and narratives")
+    args = parser.parse_args(argv)
+    if args.diff and not args.baseline:
+        parser.error("--diff requires --baseline")
+
+    summary = run_bulk(
+        args.input, args.output, baseline_path=args.baseline, diff_path=args.diff,
+        workers=args.workers, chunk_size=args.chunk_size, rubric_path=args.rubric,
+        scores_only=args.scores_only,
+    )
+    print(format_summary(summary))
+    return 1 if summary.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
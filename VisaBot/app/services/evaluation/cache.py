@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.redis_service import redis_client
+from app.services.storage.base import StorageBackend
+
+from . import narrative, normalizer, rubric
+from .normalizer import NormalizedFeatures
+
+CACHE_KEY_PREFIX = "evalcache:"
+
+
+def _source_fingerprint(*modules) -> str:
+    digest = hashlib.sha256()
+    for module in modules:
+        digest.update(Path(module.__file__).read_bytes())
+    return digest.hexdigest()[:12]
+
+
+# Any edit to normalization, scoring or narrative code yields a new version, so
+# entries written by older code are simply never looked up again.
+CODE_VERSION = _source_fingerprint(normalizer, rubric, narrative)
+
+
+def _digest(payload: Any) -> str:
+    text = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EvaluationCache:
+    """
+    Content-addressed cache for rubric evaluations and narratives.
+
+    Evaluations are keyed by a hash of the normalized features and narratives by
+    a hash of everything build_narrative reads, both under the rubric version,
+    so a rubric reload invalidates every entry without touching storage.
+    Entries live in a small per-process LRU in front of the storage backend, so
+    other workers share results through Redis.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: int = None, version: str = None,
+                 backend: Optional[StorageBackend] = None):
+        self.max_entries = max_entries or settings.EVALUATION_CACHE_SIZE
+        self.ttl = ttl or settings.EVALUATION_CACHE_TTL
+        self._version = version
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    @property
+    def version(self) -> str:
+        """Current rubric version plus code fingerprint; changes when the rubric is hot-reloaded"""
+        return self.version_for(rubric.rubric_loader.get())
+
+    def version_for(self, compiled: "rubric.CompiledRubric") -> str:
+        return self._version or f"{compiled.version}.{CODE_VERSION}"
+
+    # -----------------------
+    # Keys
+    # -----------------------
+    def evaluation_key(self, features: NormalizedFeatures,
+                       compiled: Optional["rubric.CompiledRubric"] = None) -> str:
+        """Key for an evaluation; pass the rubric used to score so a concurrent reload cannot mix versions"""
+        version = self.version_for(compiled) if compiled else self.version
+        return f"{CACHE_KEY_PREFIX}{version}:evaluation:{_digest(asdict(features))}"
+
+    def narrative_key(self, evaluation: Dict[str, Any], answers: Dict[str, Any],
+                      target_country: Optional[str]) -> str:
+        payload = {
+            "evaluation": {field: evaluation.get(field) for field in narrative.EVALUATION_FIELDS},
+            "answers": {field: answers.get(field) for field in narrative.ANSWER_FIELDS},
+            "target_country": target_country,
+        }
+        return f"{CACHE_KEY_PREFIX}{self.version}:narrative:{_digest(payload)}"
+
+    # -----------------------
+    # Lookup
+    # -----------------------
+    async def _get_backend(self) -> StorageBackend:
+        return self.backend or await redis_client.get_backend()
+
+    def _remember(self, key: str, text: str):
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached value for a key, checking this process before the storage backend"""
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+        else:
+            try:
+                backend = await self._get_backend()
+                text = await backend.get(key)
+            except Exception as e:
+                logger.error(f"Error reading evaluation cache: {e}")
+                text = None
+            if text is None:
+                self.misses += 1
+                return None
+            self._remember(key, text)
+        self.hits += 1
+        # Decode per hit so callers never share a mutable cached object
+        return json.loads(text)
+
+    async def set(self, key: str, value: Any):
+        """Store a JSON-serializable value locally and in the storage backend"""
+        text = json.dumps(value, default=str)
+        self._remember(key, text)
+        try:
+            backend = await self._get_backend()
+            await backend.set(key, text, ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Error writing evaluation cache: {e}")
+
+    def clear(self):
+        """Drop this process's entries (shared entries expire on their own)"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics for monitoring"""
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global evaluation cache instance
+evaluation_cache = EvaluationCache()
@@ -0,0 +1,396 @@
+"""
+Offline rubric calibration against historical visa outcomes.
+
+Loads past answer records with their real outcome, scores them once with the
+vectorized scorer, then grid-searches section weights and band cut-offs over
+NumPy arrays. Each candidate is judged by AUC (does a higher ratio mean a
+likelier approval?) and expected calibration error (does a 70% ratio mean
+approval 70% of the time?). Band and cap ratios are fitted to the observed
+approval rates, and the winning candidate is written out as a rubric config.
+
+Usage:
+    python -m app.services.evaluation.calibration history.jsonl -o rubric.calibrated.json \
+        [--rubric app/prompts/rubric.json] [--weights 0.5,0.75,1,1.25,1.5] [--cutoff-step 5] \
+        [--top-k 20] [--auc-tolerance 0.01] [--min-samples 30] [--round-to 5]
+
+Input records are bulk-evaluation records (plain answers or {"answers": ...}
+envelopes) carrying an outcome: "approved" true/false, or "outcome" as
+approved/granted/issued vs rejected/refused/denied. Records without a known
+outcome are skipped.
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import itertools
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import FeatureColumns, condition_mask, score_columns
+from .bulk import _unwrap, read_records
+from .normalizer import extract_features
+from .parsing import parse_yes_no
+from .rubric import DEFAULT_RUBRIC_PATH, CompiledRubric, load_rubric
+
+SECTIONS = ("ties", "travel", "financials", "age", "penalties")
+# Sign of each section in the base score
+_SECTION_SIGNS = np.array([1, 1, 1, 1, -1])
+DEFAULT_WEIGHTS = (0.5, 0.75, 1.0, 1.25, 1.5)
+# Scores and ratios are both integers in 0..100, so metrics work on 101-bin histograms
+_BINS = 101
+
+_APPROVED = {"approved", "granted", "issued", "accepted", "success"}
+_REJECTED = {"rejected", "refused", "denied", "declined", "failure"}
+
+
+def record_outcome(record: Dict[str, Any]) -> Optional[bool]:
+    """Real visa outcome attached to a history record, None when unknown"""
+    if "approved" in record:
+        return parse_yes_no(record["approved"])
+    outcome = record.get("outcome")
+    if outcome is None:
+        return None
+    text = str(outcome).strip().lower()
+    if text in _APPROVED:
+        return True
+    if text in _REJECTED:
+        return False
+    return parse_yes_no(outcome)
+
+
+@dataclass
+class CalibrationData:
+    """Per-record section scores, cap matches and outcomes"""
+    sections: np.ndarray  # (records, 5) int64, columns in SECTIONS order
+    cap_masks: np.ndarray  # (records, caps) bool
+    approved: np.ndarray  # (records,) bool
+    columns: FeatureColumns = field(repr=False, default=None)
+    skipped: int = 0
+
+    def __len__(self) -> int:
+        return len(self.approved)
+
+
+def load_history(path: str, rubric: CompiledRubric) -> CalibrationData:
+    features, outcomes, skipped = [], [], 0
+    for index, record in enumerate(read_records(path)):
+        outcome = record_outcome(record)
+        if outcome is None:
+            skipped += 1
+            continue
+        _, answers, _ = _unwrap(record, index)
+        features.append(extract_features(answers))
+        outcomes.append(outcome)
+    if not features:
+        raise SystemExit(f"No records with a known outcome in {path}")
+
+    cols = FeatureColumns.from_features(features)
+    scores = score_columns(cols, rubric)
+    return CalibrationData(
+        sections=np.stack([getattr(scores, s) for s in SECTIONS], axis=1).astype(np.int64),
+        cap_masks=np.stack([condition_mask(when, cols) for _, _, when in rubric.caps], axis=1)
+        if rubric.caps else np.zeros((len(features), 0), dtype=np.bool_),
+        approved=np.array(outcomes, dtype=np.bool_),
+        columns=cols,
+        skipped=skipped,
+    )
+
+
+# -----------------------
+# Metrics
+# -----------------------
+def _histograms(values: np.ndarray, approved: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(approved, rejected) counts per value 0..100, one row per column of values"""
+    values = values.reshape(len(approved), -1)
+    columns = values.shape[1]
+    index = (values + _BINS * np.arange(columns)).ravel()
+    weights = np.repeat(approved, columns).astype(np.float64)
+    pos = np.bincount(index, weights=weights, minlength=_BINS * columns).reshape(columns, _BINS)
+    total = np.bincount(index, minlength=_BINS * columns).reshape(columns, _BINS)
+    return pos, total - pos
+
+
+def auc_from_histograms(pos: np.ndarray, neg: np.ndarray) -> np.ndarray:
+    """Mann-Whitney AUC per row; ties count half"""
+    below = np.cumsum(neg, axis=-1) - neg
+    pairs = pos.sum(axis=-1) * neg.sum(axis=-1)
+    wins = (pos * (below + 0.5 * neg)).sum(axis=-1)
+    return np.divide(wins, pairs, out=np.full(wins.shape, 0.5), where=pairs > 0)
+
+
+def calibration_error_from_histograms(pos: np.ndarray, neg: np.ndarray) -> np.ndarray:
+    """Expected calibration error per row, reading the bin value as a predicted percentage"""
+    total = pos + neg
+    gap = np.abs(pos - total * (np.arange(_BINS) / 100.0)).sum(axis=-1)
+    return gap / np.maximum(total.sum(axis=-1), 1)
+
+
+def auc(values: np.ndarray, approved: np.ndarray) -> float:
+    return float(auc_from_histograms(*_histograms(values, approved))[0])
+
+
+def calibration_error(ratios: np.ndarray, approved: np.ndarray) -> float:
+    return float(calibration_error_from_histograms(*_histograms(ratios, approved))[0])
+
+
+# -----------------------
+# Search
+# -----------------------
+@dataclass
+class Candidate:
+    weights: Tuple[float, ...]
+    cutoffs: Tuple[int, ...]  # Band min_scores above the bottom band, descending
+    band_ratios: Tuple[int, ...]
+    cap_ratios: Tuple[int, ...]
+    auc: float
+    calibration_error: float
+    score_auc: float  # AUC of the unbanded base score
+
+
+@dataclass
+class CalibrationReport:
+    records: int
+    skipped: int
+    weights_tried: int
+    candidates_tried: int
+    seconds: float
+    baseline_auc: float
+    baseline_calibration_error: float
+    best: Candidate
+    calibrated_auc: float = 0.0
+    calibrated_calibration_error: float = 0.0
+    top: List[Candidate] = field(default_factory=list)
+
+
+def _round_ratio(rate: np.ndarray, round_to: int) -> np.ndarray:
+    return (np.rint(rate * 100 / round_to) * round_to).clip(0, 100).astype(np.int64)
+
+
+def _base_scores(sections: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """(records, weight vectors) clamped base scores"""
+    return np.rint(sections @ (weights * _SECTION_SIGNS).T).clip(0, 100).astype(np.int64)
+
+
+def _fit_caps(data: CalibrationData, rubric: CompiledRubric, min_samples: int, round_to: int) -> np.ndarray:
+    """Each cap's max ratio set to the approval rate of the records it matches"""
+    fitted = []
+    for index, (max_ratio, _, _) in enumerate(rubric.caps):
+        matched = data.cap_masks[:, index]
+        count = int(matched.sum())
+        fitted.append(_round_ratio(data.approved[matched].mean(), round_to) if count >= min_samples else max_ratio)
+    return np.array(fitted, dtype=np.int64)
+
+
+def _cap_groups(data: CalibrationData, cap_ratios: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Group id per record for each distinct set of matching caps, and each group's ratio ceiling"""
+    if not data.cap_masks.shape[1]:
+        return np.zeros(len(data), dtype=np.int64), np.array([100], dtype=np.int64)
+    patterns, groups = np.unique(data.cap_masks, axis=0, return_inverse=True)
+    ceilings = np.array([cap_ratios[p].min() if p.any() else 100 for p in patterns], dtype=np.int64)
+    return groups.reshape(-1), ceilings
+
+
+def _cutoff_grid(step: int, bands: int) -> np.ndarray:
+    points = range(step, 100, step)
+    return np.array(list(itertools.combinations(sorted(points, reverse=True), bands - 1)), dtype=np.int64)
+
+
+def _search_cutoffs(scores: np.ndarray, data: CalibrationData, groups: np.ndarray, ceilings: np.ndarray,
+                    cutoffs: np.ndarray, fallback_ratios: np.ndarray, min_samples: int,
+                    round_to: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Fitted band ratios, AUC and calibration error for every cut-off set under one weight vector"""
+    group_count = len(ceilings)
+    index = groups * _BINS + scores
+    total = np.bincount(index, minlength=group_count * _BINS).reshape(group_count, _BINS)
+    pos = np.bincount(index, weights=data.approved.astype(np.float64),
+                      minlength=group_count * _BINS).reshape(group_count, _BINS)
+    neg = total - pos
+
+    # band[t, s]: band of score s under cut-off set t (0 is the top band)
+    band = (np.arange(_BINS)[None, :, None] < cutoffs[:, None, :]).sum(axis=2)
+    bands = cutoffs.shape[1] + 1
+    one_hot = band[:, :, None] == np.arange(bands)  # (cut-offs, scores, bands)
+
+    # Band ratios come from records no cap touches
+    uncapped = ceilings >= 100
+    band_pos = np.einsum("tsb,s->tb", one_hot, pos[uncapped].sum(axis=0))
+    band_total = np.einsum("tsb,s->tb", one_hot, total[uncapped].sum(axis=0).astype(np.float64))
+    rate = np.divide(band_pos, band_total, out=np.zeros_like(band_pos), where=band_total > 0)
+    ratios = np.where(band_total >= min_samples, _round_ratio(rate, round_to), fallback_ratios[None, :])
+    # A higher band never gets a lower ratio than the band below it
+    ratios = np.maximum.accumulate(ratios[:, ::-1], axis=1)[:, ::-1]
+
+    predicted = np.minimum(np.take_along_axis(ratios, band, axis=1)[:, None, :], ceilings[None, :, None])
+    flat = (predicted + _BINS * np.arange(len(cutoffs))[:, None, None]).ravel()
+    size = len(cutoffs) * _BINS
+    pred_pos = np.bincount(flat, weights=np.broadcast_to(pos, predicted.shape).ravel(), minlength=size)
+    pred_neg = np.bincount(flat, weights=np.broadcast_to(neg, predicted.shape).ravel(), minlength=size)
+    pred_pos, pred_neg = pred_pos.reshape(-1, _BINS), pred_neg.reshape(-1, _BINS)
+    return ratios, auc_from_histograms(pred_pos, pred_neg), calibration_error_from_histograms(pred_pos, pred_neg)
+
+
+def calibrate(data: CalibrationData, rubric: CompiledRubric, weight_grid: Sequence[float] = DEFAULT_WEIGHTS,
+              cutoff_step: int = 5, top_k: int = 20, auc_tolerance: float = 0.01, min_samples: int = 30,
+              round_to: int = 5, block_size: int = 256) -> CalibrationReport:
+    """
+    Grid-search section weights and band cut-offs for the best-calibrated rubric.
+
+    Weight vectors are ranked by the AUC of their unbanded base score; the
+    top_k go on to a search over every descending set of band cut-offs. The
+    winner is the lowest calibration error among candidates whose AUC is
+    within auc_tolerance of the best AUC seen.
+    """
+    start = time.perf_counter()
+    weights = np.array(list(itertools.product(weight_grid, repeat=len(SECTIONS))), dtype=np.float64)
+
+    score_aucs = np.empty(len(weights))
+    rows = max(1, len(data))
+    block = max(1, min(block_size, 20_000_000 // rows))
+    for offset in range(0, len(weights), block):
+        scores = _base_scores(data.sections, weights[offset:offset + block])
+        score_aucs[offset:offset + block] = auc_from_histograms(*_histograms(scores, data.approved))
+    shortlist = np.argsort(-score_aucs, kind="stable")[:top_k]
+
+    cap_ratios = _fit_caps(data, rubric, min_samples, round_to)
+    groups, ceilings = _cap_groups(data, cap_ratios)
+    cutoffs = _cutoff_grid(cutoff_step, len(rubric.bands))
+    fallback_ratios = np.array([ratio for _, ratio in rubric.bands], dtype=np.int64)
+
+    candidates: List[Candidate] = []
+    for index in shortlist:
+        scores = _base_scores(data.sections, weights[index:index + 1])[:, 0]
+        ratios, aucs, errors = _search_cutoffs(scores, data, groups, ceilings, cutoffs,
+                                               fallback_ratios, min_samples, round_to)
+        for t in range(len(cutoffs)):
+            candidates.append(Candidate(
+                weights=tuple(float(w) for w in weights[index]),
+                cutoffs=tuple(int(c) for c in cutoffs[t]),
+                band_ratios=tuple(int(r) for r in ratios[t]),
+                cap_ratios=tuple(int(r) for r in cap_ratios),
+                auc=float(aucs[t]),
+                calibration_error=float(errors[t]),
+                score_auc=float(score_aucs[index]),
+            ))
+
+    best_auc = max(c.auc for c in candidates)
+    eligible = [c for c in candidates if c.auc >= best_auc - auc_tolerance]
+    eligible.sort(key=lambda c: (c.calibration_error, -c.auc))
+
+    baseline = score_columns(data.columns, rubric).success_ratio
+    return CalibrationReport(
+        records=len(data),
+        skipped=data.skipped,
+        weights_tried=len(weights),
+        candidates_tried=len(candidates),
+        seconds=time.perf_counter() - start,
+        baseline_auc=auc(baseline, data.approved),
+        baseline_calibration_error=calibration_error(baseline, data.approved),
+        best=eligible[0],
+        top=eligible[:10],
+    )
+
+
+# -----------------------
+# Output
+# -----------------------
+def _scale_points(node: Any, weight: float):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "points" and isinstance(value, (int, float)):
+                node[key] = int(round(value * weight))
+            else:
+                _scale_points(value, weight)
+    elif isinstance(node, list):
+        for item in node:
+            _scale_points(item, weight)
+
+
+def calibrated_spec(rubric: CompiledRubric, candidate: Candidate, version: Optional[str] = None) -> Dict[str, Any]:
+    """The rubric definition with a candidate's weights, bands and caps applied"""
+    spec = copy.deepcopy(rubric.spec)
+    weights = dict(zip(SECTIONS, candidate.weights))
+    for section in SECTIONS:
+        _scale_points(spec[section], weights[section])
+    spec["ties"]["non_business_cap"] = int(round(spec["ties"]["non_business_cap"] * weights["ties"]))
+    spec["bands"] = [
+        {"min_score": min_score, "ratio": ratio}
+        for min_score, ratio in zip(list(candidate.cutoffs) + [0], candidate.band_ratios)
+    ]
+    for cap, ratio in zip(spec["caps"], candidate.cap_ratios):
+        cap["max_ratio"] = ratio
+    spec["version"] = version or f"{spec['version']}-calibrated"
+    return spec
+
+
+def run_calibration(input_path: str, output_path: str, rubric_path: str = DEFAULT_RUBRIC_PATH,
+                    version: Optional[str] = None, **search) -> CalibrationReport:
+    rubric = load_rubric(rubric_path)
+    data = load_history(input_path, rubric)
+    report = calibrate(data, rubric, **search)
+
+    spec = calibrated_spec(rubric, report.best, version)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(spec, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+    # Point scaling rounds per tier, so re-score the written rubric exactly
+    ratios = score_columns(data.columns, CompiledRubric(spec)).success_ratio
+    report.calibrated_auc = auc(ratios, data.approved)
+    report.calibrated_calibration_error = calibration_error(ratios, data.approved)
+    return report
+
+
+def format_report(report: CalibrationReport) -> str:
+    best = report.best
+    lines = [
+        f"Records:       {report.records:,} ({report.skipped:,} without outcome skipped)",
+        f"Searched:      {report.weights_tried:,} weight vectors, {report.candidates_tried:,} candidates "
+        f"in {report.seconds:.2f}s",
+        f"Current:       AUC {report.baseline_auc:.4f}, calibration error {report.baseline_calibration_error:.4f}",
+        f"Calibrated:    AUC {report.calibrated_auc:.4f}, calibration error "
+        f"{report.calibrated_calibration_error:.4f}",
+        "Weights:       " + ", ".join(f"{s} {w:g}" for s, w in zip(SECTIONS, best.weights)),
+        "Bands:         " + ", ".join(f">={c} -> {r}%" for c, r in zip(list(best.cutoffs) + [0], best.band_ratios)),
+        "Caps:          " + ", ".join(f"{r}%" for r in best.cap_ratios),
+        "Top candidates (AUC / calibration error):",
+    ]
+    for candidate in report.top:
+        lines.append(f"  {candidate.auc:.4f} / {candidate.calibration_error:.4f}  "
+                     f"weights={candidate.weights} cutoffs={candidate.cutoffs} ratios={candidate.band_ratios}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Calibrate the rubric against historical visa outcomes")
+    parser.add_argument("input", help="JSONL, CSV or Parquet file of answer records with outcomes")
+    parser.add_argument("-o", "--output", required=True, help="Where to write the calibrated rubric JSON")
+    parser.add_argument("--rubric", default=DEFAULT_RUBRIC_PATH, help="Rubric definition to start from")
+    parser.add_argument("--version", help="Version string for the calibrated rubric")
+    parser.add_argument("--weights", default=",".join(f"{w:g}" for w in DEFAULT_WEIGHTS),
+                        help="Comma-separated multipliers tried for each section")
+    parser.add_argument("--cutoff-step", type=int, default=5, help="Spacing of candidate band cut-offs")
+    parser.add_argument("--top-k", type=int, default=20, help="Weight vectors carried into the band search")
+    parser.add_argument("--auc-tolerance", type=float, default=0.01,
+                        help="AUC a candidate may give up for better calibration")
+    parser.add_argument("--min-samples", type=int, default=30,
+                        help="Records a band or cap needs before its ratio is refitted")
+    parser.add_argument("--round-to", type=int, default=5, help="Round fitted ratios to this step")
+    args = parser.parse_args(argv)
+
+    report = run_calibration(
+        args.input, args.output, rubric_path=args.rubric, version=args.version,
+        weight_grid=[float(w) for w in args.weights.split(",")], cutoff_step=args.cutoff_step,
+        top_k=args.top_k, auc_tolerance=args.auc_tolerance, min_samples=args.min_samples,
+        round_to=args.round_to,
+    )
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+
+COUNTRY_PACKS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'prompts', 'countries')
+PACK_PREFIX = "countries/"  # Knowledge document names of the packs: "countries/germany.json"
+DEFAULTS_FILE = "_defaults.json"  # Fields every pack starts from
+ALIASES_FILE = "_aliases.json"  # {"german": "germany", ...}; file names are the canonical slugs
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+class CountryPackError(ValueError):
+    """Raised when a country pack file is malformed"""
+
+
+def slugify(country: str) -> str:
+    return "_".join(_WORD_RE.findall(country.lower()))
+
+
+def _deep_size(obj: Any) -> int:
+    """Approximate bytes held by a JSON-like object and everything it references"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(item) for item in obj)
+    return size
+
+
+@dataclass(frozen=True)
+class CountryPack:
+    """Rules for one destination country, merged over the shared defaults"""
+    slug: str
+    country: str
+    preferred_professions: Tuple[str, ...]
+    financial_requirements: str
+    documentation_standards: str
+    notes: Tuple[str, ...]
+    raw: Dict[str, Any] = field(compare=False, repr=False)
+
+    def render(self) -> str:
+        """Rules as prompt lines"""
+        lines = [
+            f"Country: {self.country}",
+            f"Preferred profiles: {', '.join(self.preferred_professions)}",
+            f"Financial requirements: {self.financial_requirements}",
+            f"Documentation standards: {self.documentation_standards}",
+        ]
+        lines.extend(f"- {note}" for note in self.notes)
+        return "\n".join(lines)
+
+
+def merge_pack(defaults: Dict[str, Any], raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Pack fields replace the defaults, except notes, which are added to the default notes"""
+    merged = {**defaults, **raw}
+    merged["notes"] = list(defaults.get("notes", [])) + list(raw.get("notes", []))
+    return merged
+
+
+def compile_pack(slug: str, raw: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None) -> CountryPack:
+    merged = merge_pack(defaults or {}, raw)
+    try:
+        return CountryPack(
+            slug=slug,
+            country=str(merged["country"]),
+            preferred_professions=tuple(merged.get("preferred_professions", ())),
+            financial_requirements=str(merged.get("financial_requirements", "")),
+            documentation_standards=str(merged.get("documentation_standards", "")),
+            notes=tuple(merged["notes"]),
+            raw=merged,
+        )
+    except (KeyError, TypeError) as e:
+        raise CountryPackError(f"Country pack '{slug}' is invalid: {e}") from e
+
+
+def read_pack_files(directory: str = COUNTRY_PACKS_DIR) -> Dict[str, str]:
+    """Text of every pack file (and the defaults and aliases) in a directory, by file name"""
+    files: Dict[str, str] = {}
+    if not os.path.isdir(directory):
+        return files
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                files[name] = f.read()
+    return files
+
+
+def check_pack_files(files: Dict[str, str]):
+    """Raise CountryPackError if a pack file is not a JSON object"""
+    for name, text in files.items():
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise CountryPackError(f"Country pack '{name}' is not valid JSON: {e}") from e
+        if not isinstance(data, dict):
+            raise CountryPackError(f"Country pack '{name}' must contain an object")
+
+
+@dataclass
+class _Entry:
+    pack: CountryPack
+    load_ms: float
+    size_bytes: int
+    hits: int = 0
+
+
+class CountryPackLoader:
+    """
+    Per-country rule packs, compiled on first use.
+
+    The loader holds the text of the pack files from one knowledge snapshot
+    (app/prompts/countries, or countries/<slug>.json rows in the database), so
+    an edited pack arrives with a new snapshot, changes its content digest and
+    rekeys the answer cache like any other knowledge document. Only the packs
+    for countries users actually ask about are parsed, and at most max_packs
+    stay compiled (least recently used first out). Compile time and
+    approximate memory are recorded per pack.
+    """
+
+    def __init__(self, files: Dict[str, str], max_packs: int = None):
+        self.files = files
+        self.max_packs = max_packs or settings.COUNTRY_PACK_CACHE_SIZE
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._defaults: Optional[Dict[str, Any]] = None
+        self._aliases: Optional[Dict[str, str]] = None
+        self._slugs = frozenset(self.available())
+        self._packs: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, directory: str = COUNTRY_PACKS_DIR, max_packs: int = None) -> "CountryPackLoader":
+        return cls(read_pack_files(directory), max_packs)
+
+    def _optional_json(self, name: str) -> Dict[str, Any]:
+        return json.loads(self.files[name]) if name in self.files else {}
+
+    @property
+    def aliases(self) -> Dict[str, str]:
+        if self._aliases is None:
+            self._aliases = {slugify(alias): slug for alias, slug in self._optional_json(ALIASES_FILE).items()}
+        return self._aliases
+
+    def resolve(self, country: Optional[str]) -> Optional[str]:
+        """Slug of the pack for a country name or alias, if one exists"""
+        slug = slugify(country or "")
+        slug = self.aliases.get(slug, slug)
+        return slug if slug in self._slugs else None
+
+    def find_in_text(self, text: str) -> Optional[CountryPack]:
+        """Pack for the first country (or alias) mentioned in free text"""
+        words = _WORD_RE.findall((text or "").lower())
+        for size in (2, 1):
+            for start in range(len(words) - size + 1):
+                slug = self.resolve(" ".join(words[start:start + size]))
+                if slug:
+                    return self.get(slug)
+        return None
+
+    def _load(self, slug: str) -> _Entry:
+        if self._defaults is None:
+            self._defaults = self._optional_json(DEFAULTS_FILE)
+        start = time.perf_counter()
+        try:
+            pack = compile_pack(slug, json.loads(self.files[f"{slug}.json"]), self._defaults)
+        except json.JSONDecodeError as e:
+            raise CountryPackError(f"Country pack '{slug}' is not valid JSON: {e}") from e
+        load_ms = (time.perf_counter() - start) * 1000
+        return _Entry(pack, round(load_ms, 3), _deep_size(pack.raw))
+
+    def get(self, country: Optional[str]) -> Optional[CountryPack]:
+        """Rules for a country, or None when there is no pack for it"""
+        slug = self.resolve(country)
+        if slug is None:
+            return None
+        with self._lock:
+            entry = self._packs.get(slug)
+            if entry is None:
+                self.misses += 1
+                try:
+                    entry = self._load(slug)
+                except CountryPackError as e:
+                    logger.error(f"Failed to load country pack '{slug}': {e}")
+                    return None
+                self._packs[slug] = entry
+                while len(self._packs) > self.max_packs:
+                    self._packs.popitem(last=False)
+                    self.evictions += 1
+                logger.info(f"Loaded country pack '{slug}' in {entry.load_ms} ms")
+            else:
+                self.hits += 1
+                self._packs.move_to_end(slug)
+            entry.hits += 1
+            return entry.pack
+
+    def available(self) -> List[str]:
+        """Slugs of every pack (without compiling them)"""
+        return sorted(name[:-5] for name in self.files if name.endswith(".json") and not name.startswith("_"))
+
+    def clear(self):
+        """Drop every compiled pack, the defaults and the alias index"""
+        with self._lock:
+            self._packs.clear()
+            self._defaults = None
+            self._aliases = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics plus load time and memory of each resident pack (this worker)"""
+        lookups = self.hits + self.misses
+        packs = {
+            slug: {"load_ms": entry.load_ms, "size_bytes": entry.size_bytes, "hits": entry.hits}
+            for slug, entry in self._packs.items()
+        }
+        return {
+            "available": len(self._slugs),
+            "resident": len(packs),
+            "max_packs": self.max_packs,
+            "resident_bytes": sum(p["size_bytes"] for p in packs.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "packs": packs,
+        }
+
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import copy
+import itertools
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .normalizer import ANSWER_EXTRACTORS, NormalizedFeatures, extract_features
+from .rubric import SECTION_FIELDS, CompiledRubric, rubric_loader
+
+
+# Feature fields an answer can still change while it is unanswered
+ANSWER_FEATURES = {
+    "profession": ("is_business", "is_job_holder"),
+    "business_type": ("business_type",),
+    "business_premises": ("business_premises",),
+    "business_online_presence": ("business_online_presence",),
+    "business_assets": ("business_assets",),
+    "is_tax_filer": ("is_tax_filer",),
+    "annual_income": ("annual_income_pk",),
+    "closing_balance": ("closing_balance_pk",),
+    "travel_history": ("travel_count", "has_schengen_travel", "has_heavy_visa"),
+    "last_travel_year": ("years_since_last_travel",),
+    "valid_visa": ("has_heavy_visa",),
+    "schengen_rejection": ("previous_schengen_rejection", "previous_schengen_rejection_years_ago"),
+    "age": ("age",),
+}
+
+_TRI_STATE = (True, False, None)
+
+
+@dataclass
+class ProvisionalScore:
+    """Live estimate for a partially answered profile"""
+    success_ratio: int  # What the rubric gives if no further answers arrive
+    min_ratio: int
+    max_ratio: int
+    base_score: int
+    min_score: int
+    max_score: int
+    open_answers: List[str]
+    rubric_version: str
+
+    @property
+    def is_settled(self) -> bool:
+        """True once no remaining answer can change the ratio"""
+        return self.min_ratio == self.max_ratio
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+# -----------------------
+# Candidate values for unanswered fields
+# -----------------------
+def _walk_clauses(spec: Optional[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    if not spec:
+        return
+    if "all" in spec or "any" in spec:
+        for clause in spec.get("all", spec.get("any")):
+            yield from _walk_clauses(clause)
+    else:
+        yield spec
+
+
+def condition_fields(spec: Optional[Dict[str, Any]]) -> Set[str]:
+    return {clause["field"] for clause in _walk_clauses(spec)}
+
+
+def _thresholds(rubric: CompiledRubric, field: str, tiers: Iterable) -> List[Optional[int]]:
+    """One representative per interval the rubric distinguishes, plus unknown"""
+    points = {0}
+    bounds = [t.bound for tier_set in tiers for t in tier_set]
+    bounds += [clause["value"] for _, _, when in rubric.caps for clause in _walk_clauses(when)
+               if clause["field"] == field and isinstance(clause.get("value"), (int, float))
+               and not isinstance(clause.get("value"), bool)]
+    for bound in bounds:
+        points.update((int(bound) - 1, int(bound), int(bound) + 1))
+    return sorted(points)
+
+
+@lru_cache(maxsize=8)
+def _answer_candidates(rubric: CompiledRubric) -> Dict[str, Tuple[Dict[str, Any], ...]]:
+    """Every distinct feature assignment an unanswered question could produce under a rubric"""
+    amounts_balance = _thresholds(rubric, "closing_balance_pk", [rubric.balance])
+    amounts_income = _thresholds(rubric, "annual_income_pk", [rubric.income])
+    counts = _thresholds(rubric, "travel_count", [rubric.travel_count])
+    years = _thresholds(rubric, "years_since_last_travel", [rubric.recency, rubric.visa])
+    rejection_years = _thresholds(rubric, "previous_schengen_rejection_years_ago", [rubric.rejection])
+    ages = _thresholds(rubric, "age", [rubric.age])
+
+    candidates = {
+        "profession": (
+            {"is_business": True, "is_job_holder": False},
+            {"is_business": False, "is_job_holder": True},
+            {"is_business": False, "is_job_holder": False},
+        ),
+        "business_type": ({"business_type": None}, {"business_type": "business"}),
+        "annual_income": tuple({"annual_income_pk": v} for v in amounts_income),
+        "closing_balance": tuple({"closing_balance_pk": v} for v in amounts_balance),
+        "travel_history": tuple(
+            {"travel_count": count, "has_schengen_travel": schengen, "has_heavy_visa": heavy}
+            for count in counts if count >= 0
+            for schengen in ((False, True) if count else (False,))
+            # An explicit valid_visa answer overrides the travel-based guess
+            for heavy in _TRI_STATE
+        ),
+        "last_travel_year": tuple({"years_since_last_travel": v} for v in [None] + [y for y in years if y >= 0]),
+        "valid_visa": tuple({"has_heavy_visa": v} for v in _TRI_STATE),
+        "schengen_rejection": (
+            {"previous_schengen_rejection": False, "previous_schengen_rejection_years_ago": None},
+            {"previous_schengen_rejection": None, "previous_schengen_rejection_years_ago": None},
+        ) + tuple(
+            {"previous_schengen_rejection": True, "previous_schengen_rejection_years_ago": v}
+            for v in [99] + [y for y in rejection_years if y > 0]
+        ),
+        "age": tuple({"age": v} for v in [None] + ages),
+    }
+    for key in ("business_premises", "business_online_presence", "business_assets", "is_tax_filer"):
+        candidates[key] = tuple({key: v} for v in _TRI_STATE)
+    return candidates
+
+
+_BLANK = extract_features({})
+
+
+def _project(fields: Tuple[str, ...], features: NormalizedFeatures) -> Tuple[Any, ...]:
+    return tuple(getattr(features, f) for f in fields)
+
+
+def _assignments(fields: Tuple[str, ...], known: Tuple[Any, ...], open_keys: Tuple[str, ...],
+                 candidates: Dict[str, Tuple[Dict[str, Any], ...]]) -> Set[Tuple[Any, ...]]:
+    """Distinct values the fields can take once the open answers arrive"""
+    base = dict(zip(fields, known))
+    projected = set()
+    for combo in itertools.product(*(candidates[key] for key in open_keys)):
+        values = dict(base)
+        for assignment in combo:
+            values.update(assignment)
+        projected.add(tuple(values[f] for f in fields))
+    return projected
+
+
+@lru_cache(maxsize=4096)
+def _section_range(rubric: CompiledRubric, section: str, known: Tuple[Any, ...],
+                   open_keys: Tuple[str, ...]) -> Tuple[int, int]:
+    # A component reads only its own fields, so the rest can stay blank
+    fields = SECTION_FIELDS[section]
+    scores = [rubric.section_score(section, replace(_BLANK, **dict(zip(fields, values))))
+              for values in _assignments(fields, known, open_keys, _answer_candidates(rubric))]
+    return min(scores), max(scores)
+
+
+def _conditions(rubric: CompiledRubric, kind: str) -> List[Tuple[Any, Optional[Dict[str, Any]]]]:
+    """(predicate, condition spec) pairs for the rubric's caps or recommendations"""
+    if kind == "cap":
+        return [(applies, when) for _, applies, when in rubric.caps]
+    return [(applies, spec.get("when")) for (_, applies), spec in zip(rubric.recommendations,
+                                                                      rubric.spec["recommendations"])]
+
+
+@lru_cache(maxsize=4096)
+def _condition_outcomes(rubric: CompiledRubric, kind: str, index: int, fields: Tuple[str, ...],
+                        known: Tuple[Any, ...], open_keys: Tuple[str, ...]) -> frozenset:
+    applies, _ = _conditions(rubric, kind)[index]
+    return frozenset(applies(replace(_BLANK, **dict(zip(fields, values))))
+                     for values in _assignments(fields, known, open_keys, _answer_candidates(rubric)))
+
+
+def _outcomes(rubric: CompiledRubric, kind: str, index: int, when: Optional[Dict[str, Any]],
+              features: NormalizedFeatures, open_answers: List[str]) -> Tuple[Tuple[str, ...], frozenset]:
+    """Fields a condition reads and the truth values it can still take"""
+    fields = tuple(sorted(condition_fields(when)))
+    return fields, _condition_outcomes(rubric, kind, index, fields, _project(fields, features),
+                                       _touching(open_answers, fields))
+
+
+def _touching(open_answers: Iterable[str], fields: Iterable[str]) -> Tuple[str, ...]:
+    fields = set(fields)
+    return tuple(key for key in open_answers if fields.intersection(ANSWER_FEATURES[key]))
+
+
+def estimate(features: NormalizedFeatures, open_answers: Iterable[str],
+             rubric: Optional[CompiledRubric] = None) -> ProvisionalScore:
+    """
+    Provisional ratio plus the range it can still move in.
+
+    Each breakdown component reads its own feature fields, so the score range
+    is the sum of per-component ranges, each found by trying the candidate
+    values of only the open answers that component reads. Caps are checked the
+    same way over the fields their conditions read. Ranges are memoized per
+    rubric, so most turns only look them up.
+    """
+    rubric = rubric or rubric_loader.get()
+    open_set = set(open_answers)
+    open_answers = [key for key in ANSWER_FEATURES if key in open_set]
+
+    scores, _, _ = rubric.breakdown(features)
+    base_score = rubric.base_score(scores)
+    success_ratio = rubric.apply_caps(rubric.banded_ratio(base_score), features)
+
+    low = high = 0
+    for section, fields in SECTION_FIELDS.items():
+        section_low, section_high = _section_range(
+            rubric, section, _project(fields, features), _touching(open_answers, fields))
+        if section == "penalties":
+            low, high = low - section_high, high - section_low
+        else:
+            low, high = low + section_low, high + section_high
+    min_score, max_score = max(0, min(100, low)), max(0, min(100, high))
+
+    # Band ratios reachable anywhere in the score range
+    reachable = {min_score, max_score} | {s for s, _ in rubric.bands if min_score <= s <= max_score}
+    ratios = [rubric.banded_ratio(s) for s in reachable]
+    min_ratio, max_ratio = min(ratios), max(ratios)
+    for index, (max_cap, _, when) in enumerate(rubric.caps):
+        _, outcomes = _outcomes(rubric, "cap", index, when, features, open_answers)
+        if True in outcomes:
+            min_ratio = min(min_ratio, max_cap)
+            if False not in outcomes:
+                max_ratio = min(max_ratio, max_cap)
+
+    return ProvisionalScore(
+        success_ratio=success_ratio,
+        min_ratio=min_ratio,
+        max_ratio=max_ratio,
+        base_score=base_score,
+        min_score=min_score,
+        max_score=max_score,
+        open_answers=open_answers,
+        rubric_version=rubric.version,
+    )
+
+
+def live_fields(features: NormalizedFeatures, open_answers: Iterable[str],
+                rubric: Optional[CompiledRubric] = None,
+                provisional: Optional[ProvisionalScore] = None) -> Set[str]:
+    """
+    Feature fields that can still change the success ratio, should_apply or a recommendation.
+
+    An open answer that feeds none of these fields cannot change what the
+    applicant is told, so the question behind it can be skipped.
+    """
+    rubric = rubric or rubric_loader.get()
+    if provisional is None or provisional.rubric_version != rubric.version:
+        provisional = estimate(features, open_answers, rubric)
+    open_answers = provisional.open_answers
+
+    live: Set[str] = set()
+    # The ratio itself is shown, so sharing an outcome text is not enough
+    ratio_settled = (
+        provisional.min_ratio == provisional.max_ratio
+        and (provisional.min_ratio >= rubric.should_apply_min_ratio) ==
+            (provisional.max_ratio >= rubric.should_apply_min_ratio)
+    )
+    if not ratio_settled:
+        for fields in SECTION_FIELDS.values():
+            live.update(fields)
+        for _, _, when in rubric.caps:
+            live.update(condition_fields(when))
+    for index, (_, when) in enumerate(_conditions(rubric, "recommendation")):
+        fields, outcomes = _outcomes(rubric, "recommendation", index, when, features, open_answers)
+        if len(outcomes) > 1:
+            live.update(fields)
+    return live
+
+
+class IncrementalProfile:
+    """
+    Normalized features kept current one answer at a time.
+
+    sync() compares the answers with the values it last saw and re-runs only
+    the extractors that read a changed answer, so features stay ready after
+    every turn and the final evaluation can score them without re-normalizing.
+    """
+
+    def __init__(self):
+        self._seen: Dict[str, Any] = {}
+        self._values: Dict[str, Any] = asdict(extract_features({}))
+        self.features = NormalizedFeatures(**self._values)
+
+    def sync(self, answers: Dict[str, Any]) -> List[str]:
+        """Refresh features from the answers; returns the answer keys that changed"""
+        changed = [key for key in ANSWER_EXTRACTORS if answers.get(key) != self._seen.get(key)]
+        if not changed:
+            return changed
+        extractors = []
+        for key in changed:
+            self._seen[key] = copy.deepcopy(answers.get(key))
+            for extractor in ANSWER_EXTRACTORS[key]:
+                if extractor not in extractors:
+                    extractors.append(extractor)
+        for extractor in extractors:
+            self._values.update(extractor(answers))
+        self.features = NormalizedFeatures(**self._values)
+        return changed
+
+    def estimate(self, open_answers: Optional[Iterable[str]] = None,
+                 rubric: Optional[CompiledRubric] = None) -> ProvisionalScore:
+        """Provisional score; open_answers defaults to every answer not given yet"""
+        if open_answers is None:
+            open_answers = [key for key in ANSWER_FEATURES if self._seen.get(key) is None]
+        return estimate(self.features, open_answers, rubric)
+
+    def live_fields(self, open_answers: Iterable[str], provisional: Optional[ProvisionalScore] = None,
+                    rubric: Optional[CompiledRubric] = None) -> Set[str]:
+        """Feature fields whose open answers can still change the outcome (see live_fields)"""
+        return live_fields(self.features, open_answers, rubric, provisional)
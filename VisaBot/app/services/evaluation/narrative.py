@@ -2,6 +2,13 @@ from __future__ import annotations
 
 from typing import Dict, Any, Optional, List
 
+# Everything build_narrative reads; the evaluation cache keys narratives on these
+EVALUATION_FIELDS = ("success_ratio", "overall_recommendation", "recommendations", "application_strategy")
+ANSWER_FIELDS = (
+    "selected_country", "country", "profession", "business_type", "annual_income",
+    "closing_balance", "travel_history", "last_travel_year",
+)
+
 
 def build_narrative(evaluation: Dict[str, Any], answers: Dict[str, Any], target_country: Optional[str]) -> str:
     country = answers.get("selected_country") or answers.get("country") or target_country
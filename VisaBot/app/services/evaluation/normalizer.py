@@ -4,6 +4,8 @@ from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 from loguru import logger
 
+from .parsing import parse_amount, parse_yes_no, years_since
+
 
 SCHENGEN_COUNTRIES = {
     "Austria", "Belgium", "Czech", "Czech Republic", "Denmark", "Estonia", "Finland", "France",
@@ -41,36 +43,11 @@ class NormalizedFeatures:
 
 
 def _to_bool(value: Any) -> Optional[bool]:
-    if isinstance(value, bool):
-        return value
-    if value is None:
-        return None
-    if isinstance(value, (int, float)):
-        return bool(value)
-    text = str(value).strip().lower()
-    if text in {"yes", "y", "true", "1"}:
-        return True
-    if text in {"no", "n", "false", "0"}:
-        return False
-    return None
+    return parse_yes_no(value)
 
 
 def _to_int(value: Any) -> int:
-    if isinstance(value, (int, float)):
-        return int(value)
-    if isinstance(value, str):
-        import re
-        text = value.strip().lower()
-        # Try to detect multipliers (m = million)
-        if any(token in text for token in ["million", "mn", "m ", " m", "mio", "m."]):
-            numbers = re.findall(r"\d+", text)
-            if numbers:
-                return int(numbers[0]) * 1_000_000
-        # plain digits
-        numbers = re.findall(r"\d+", text)
-        if numbers:
-            return int(numbers[0])
-    return 0
+    return parse_amount(value) or 0
 
 
 def _parse_travel_countries(travel_value: Any) -> List[str]:
@@ -90,15 +67,7 @@ def _parse_travel_countries(travel_value: Any) -> List[str]:
 
 
 def _years_since(year_value: Any) -> Optional[int]:
-    try:
-        year = int(str(year_value).strip())
-        from datetime import datetime
-        current_year = datetime.now().year
-        if 1900 <= year <= current_year:
-            return max(0, current_year - year)
-    except Exception:
-        return None
-    return None
+    return years_since(year_value)
 
 
 def _years_since_rejection(rejection_field: Any) -> Optional[int]:
@@ -135,60 +104,99 @@ def _has_heavy_visa_from_answers(answers: Dict[str, Any], countries: List[str])
 
 def normalize_answers(answers: Dict[str, Any]) -> NormalizedFeatures:
     logger.info(f"Normalizing answers for evaluation: {answers}")
+    features = extract_features(answers)
+    logger.info(f"Normalized features: {features}")
+    return features
+
 
+# -----------------------
+# Per-answer feature extractors
+# -----------------------
+# Each extractor reads a few answer keys and returns the feature fields derived
+# from them, so a single new answer only re-runs the extractors that read it.
+def _profession_features(answers: Dict[str, Any]) -> Dict[str, Any]:
     profession = str(answers.get("profession", "")).lower()
     is_business = any(w in profession for w in ["business", "owner", "entrepreneur", "proprietor"])
     is_job_holder = any(w in profession for w in ["job", "employed", "employee", "worker", "salary"]) and not is_business
-    business_type = str(answers.get("business_type") or "") or None
+    return {"is_business": is_business, "is_job_holder": is_job_holder}
 
-    business_premises = _to_bool(answers.get("business_premises"))
-    business_online_presence = _to_bool(answers.get("business_online_presence"))
 
-    is_tax_filer = _to_bool(answers.get("is_tax_filer"))
-    annual_income_pk = _to_int(answers.get("annual_income"))
+def _business_features(answers: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "business_type": str(answers.get("business_type") or "") or None,
+        "business_premises": _to_bool(answers.get("business_premises")),
+        "business_online_presence": _to_bool(answers.get("business_online_presence")),
+        "business_assets": _to_bool(answers.get("business_assets")),
+    }
 
+
+def _financial_features(answers: Dict[str, Any]) -> Dict[str, Any]:
     closing_balance_raw = answers.get("closing_balance")
     if isinstance(closing_balance_raw, bool):
         closing_balance_pk = 2_000_000 if closing_balance_raw else 0
     else:
         closing_balance_pk = _to_int(closing_balance_raw)
+    return {
+        "is_tax_filer": _to_bool(answers.get("is_tax_filer")),
+        "annual_income_pk": _to_int(answers.get("annual_income")),
+        "closing_balance_pk": closing_balance_pk,
+    }
+
 
+def _travel_features(answers: Dict[str, Any]) -> Dict[str, Any]:
     travel_countries = _parse_travel_countries(answers.get("travel_history"))
-    travel_count = len(travel_countries)
-    has_schengen_travel = _has_schengen_travel(travel_countries)
-    has_heavy_visa = _has_heavy_visa_from_answers(answers, travel_countries)
-    years_since_last_travel = _years_since(answers.get("last_travel_year"))
+    return {
+        "travel_countries": travel_countries,
+        "travel_count": len(travel_countries),
+        "has_schengen_travel": _has_schengen_travel(travel_countries),
+        "has_heavy_visa": _has_heavy_visa_from_answers(answers, travel_countries),
+        "years_since_last_travel": _years_since(answers.get("last_travel_year")),
+    }
+
 
-    prev_rej_years = _years_since_rejection(answers.get("schengen_rejection"))
+def _rejection_features(answers: Dict[str, Any]) -> Dict[str, Any]:
+    rejection = answers.get("schengen_rejection")
+    return {
+        "previous_schengen_rejection": (_to_bool(rejection) if not isinstance(rejection, dict)
+                                        else _to_bool(rejection.get("has_rejection"))),
+        "previous_schengen_rejection_years_ago": _years_since_rejection(rejection),
+    }
 
+
+def _age_features(answers: Dict[str, Any]) -> Dict[str, Any]:
     try:
         age = int(str(answers.get("age")).strip()) if answers.get("age") is not None else None
     except Exception:
         age = None
-
-    features = NormalizedFeatures(
-        is_business=is_business,
-        is_job_holder=is_job_holder,
-        business_type=business_type,
-        business_premises=business_premises,
-        business_online_presence=business_online_presence,
-        business_assets=_to_bool(answers.get("business_assets")),
-        is_tax_filer=is_tax_filer,
-        annual_income_pk=annual_income_pk,
-        closing_balance_pk=closing_balance_pk,
-        travel_countries=travel_countries,
-        travel_count=travel_count,
-        has_schengen_travel=has_schengen_travel,
-        has_heavy_visa=has_heavy_visa,
-        years_since_last_travel=years_since_last_travel,
-        previous_schengen_rejection=(_to_bool(answers.get("schengen_rejection"))
-                                     if not isinstance(answers.get("schengen_rejection"), dict)
-                                     else _to_bool(answers.get("schengen_rejection", {}).get("has_rejection"))),
-        previous_schengen_rejection_years_ago=prev_rej_years,
-        age=age,
-    )
-
-    logger.info(f"Normalized features: {features}")
-    return features
+    return {"age": age}
+
+
+FEATURE_EXTRACTORS = (
+    _profession_features, _business_features, _financial_features,
+    _travel_features, _rejection_features, _age_features,
+)
+
+# Answer key -> extractors that read it
+ANSWER_EXTRACTORS = {
+    "profession": (_profession_features,),
+    "business_type": (_business_features,),
+    "business_premises": (_business_features,),
+    "business_online_presence": (_business_features,),
+    "business_assets": (_business_features,),
+    "is_tax_filer": (_financial_features,),
+    "annual_income": (_financial_features,),
+    "closing_balance": (_financial_features,),
+    "travel_history": (_travel_features,),
+    "last_travel_year": (_travel_features,),
+    "valid_visa": (_travel_features,),
+    "schengen_rejection": (_rejection_features,),
+    "age": (_age_features,),
+}
 
 
+def extract_features(answers: Dict[str, Any]) -> NormalizedFeatures:
+    """Normalize answers without logging (used for batch re-scoring)"""
+    values: Dict[str, Any] = {}
+    for extractor in FEATURE_EXTRACTORS:
+        values.update(extractor(answers))
+    return NormalizedFeatures(**values)
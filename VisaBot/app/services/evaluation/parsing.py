@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import re
+from datetime import date
+from typing import Any, Optional
+
+
+# -----------------------
+# Amounts
+# -----------------------
+# Multipliers for the units applicants actually type: western (k/million) and
+# South-Asian (lakh/crore). Longest spellings first so "mn" never reads as "m".
+AMOUNT_UNITS = {
+    "thousand": 1_000, "k": 1_000,
+    "lakhs": 100_000, "lakh": 100_000, "lacs": 100_000, "lac": 100_000, "lk": 100_000,
+    "millions": 1_000_000, "million": 1_000_000, "mio": 1_000_000, "mn": 1_000_000, "m": 1_000_000,
+    "crores": 10_000_000, "crore": 10_000_000, "cr": 10_000_000,
+    "billions": 1_000_000_000, "billion": 1_000_000_000, "bn": 1_000_000_000, "b": 1_000_000_000,
+}
+
+# Digits with optional thousands separators in either grouping ("2,500,000" or
+# "25,00,000"), an optional decimal part ("2.5" or "2,5"), an optional exponent
+# ("1e6") and an optional unit word. A comma followed by other than a full
+# group of digits is a decimal comma.
+_AMOUNT_RE = re.compile(
+    r"(\d{1,3}(?:,\d{3})+|\d{1,3}(?:,\d{2})+,\d{3}|\d+)([.,]\d+)?(?:e([+-]?\d{1,2}))?\s*("
+    + "|".join(sorted(AMOUNT_UNITS, key=len, reverse=True))
+    + r")?\b"
+)
+
+
+def parse_amount(value: Any) -> Optional[int]:
+    """
+    First amount in a value, in whole units.
+
+    Understands "2.5 million", "2,5 million", "500k", "25 lakh", "1.2 crore",
+    "1e6", "PKR 25,00,000" and plain numbers; returns None when the value
+    holds no number.
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    if value.isdigit() and value.isascii():
+        return int(value)
+    match = _AMOUNT_RE.search(value.lower())
+    if not match:
+        return None
+    whole, fraction, exponent, unit = match.groups()
+    digits = fraction[1:] if fraction else ""
+    # Exact integer arithmetic, so "2.3 million" is 2,300,000 and not 2,299,999
+    mantissa = int(whole.replace(",", "") + digits) * AMOUNT_UNITS.get(unit, 1)
+    power = int(exponent or 0) - len(digits)
+    return mantissa * 10 ** power if power >= 0 else mantissa // 10 ** -power
+
+
+# -----------------------
+# Years
+# -----------------------
+MIN_YEAR = 1900
+
+_YEAR_RE = re.compile(r"(?<!\d)(19\d{2}|20\d{2})(?!\d)")
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "couple of": 2, "few": 3,
+}
+
+_YEARS_AGO_RE = re.compile(
+    r"\b(\d{1,3}|" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r")\s*(?:years?|yrs?)\s*(?:ago|back)\b"
+)
+_MONTHS_AGO_RE = re.compile(r"\b(?:\d{1,2}|a|few|couple of|some)\s*months?\s*(?:ago|back)\b")
+_LAST_YEAR_RE = re.compile(r"\b(?:last|previous|past) year\b")
+_THIS_YEAR_RE = re.compile(r"\b(?:this|current) year\b")
+
+
+def parse_year(value: Any, current_year: Optional[int] = None) -> Optional[int]:
+    """
+    Calendar year in a value: "2021", "in 2019", "2 years ago", "last year".
+
+    Years outside 1900..current year are rejected.
+    """
+    current_year = current_year or date.today().year
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        year = int(value)
+        return year if MIN_YEAR <= year <= current_year else None
+    text = str(value).strip().lower()
+    if not text:
+        return None
+
+    match = _YEAR_RE.search(text)
+    if match:
+        year = int(match.group(1))
+        return year if year <= current_year else None
+    match = _YEARS_AGO_RE.search(text)
+    if match:
+        token = match.group(1)
+        years = int(token) if token.isdigit() else _NUMBER_WORDS[token]
+        year = current_year - years
+        return year if year >= MIN_YEAR else None
+    if _LAST_YEAR_RE.search(text):
+        return current_year - 1
+    if _THIS_YEAR_RE.search(text) or _MONTHS_AGO_RE.search(text):
+        return current_year
+    return None
+
+
+def years_since(value: Any, current_year: Optional[int] = None) -> Optional[int]:
+    """Whole years between a parsed year and now, None if no valid year"""
+    current_year = current_year or date.today().year
+    year = parse_year(value, current_year)
+    if year is None:
+        return None
+    return current_year - year
+
+
+# -----------------------
+# Yes / no
+# -----------------------
+YES_WORDS = (
+    "yes", "y", "yeah", "yea", "yep", "yup", "ya", "sure", "ok", "okay", "true", "correct",
+    "definitely", "absolutely", "of course", "haan", "han",
+)
+NO_WORDS = (
+    "no", "n", "nope", "nah", "not", "never", "none", "false", "don't", "dont", "do not",
+    "haven't", "havent", "have not", "didn't", "didnt", "nahi", "nahin", "na",
+)
+UNSURE_WORDS = ("not sure", "don't know", "dont know", "do not know", "maybe", "perhaps", "unsure", "no idea", "n/a")
+
+
+def _alternation(words) -> str:
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_UNSURE_RE = re.compile(r"\b(?:" + _alternation(UNSURE_WORDS) + r")\b")
+_YES_NO_RE = re.compile(
+    r"(?<![\w'])(?:(?P<yes>" + _alternation(YES_WORDS) + r")|(?P<no>" + _alternation(NO_WORDS) + r"))(?![\w'])"
+)
+_EXACT = {"1": True, "0": False, "true": True, "false": False}
+
+
+def parse_yes_no(value: Any) -> Optional[bool]:
+    """
+    Yes/no intent of an answer; the earliest yes or no marker wins.
+
+    "Yes, I have an office" is True, "no, never" is False, and hedges such as
+    "not sure" or "maybe" are None.
+    """
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return bool(value)
+    text = str(value).strip().lower().replace("\u2019", "'")
+    exact = _EXACT.get(text)
+    if exact is not None:
+        return exact
+    if not text or _UNSURE_RE.search(text):
+        return None
+    match = _YES_NO_RE.search(text)
+    if not match:
+        return None
+    return match.group("yes") is not None
@@ -1,12 +1,31 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List, Tuple
-from dataclasses import dataclass
+import hashlib
+import json
+import operator
+import os
+import threading
+import time
+from typing import Dict, Any, List, Tuple, Optional, Callable
+from dataclasses import dataclass, fields
 from loguru import logger
 
 from .normalizer import NormalizedFeatures
 
 
+DEFAULT_RUBRIC_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'prompts', 'rubric.json')
+RUBRIC_RELOAD_INTERVAL = 5.0  # Seconds between checks of the rubric file's mtime
+
+FEATURE_FIELDS = {f.name for f in fields(NormalizedFeatures)}
+
+_COMPARISONS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+_CONDITION_OPS = set(_COMPARISONS) | {"==", "!=", "is", "is_not", "truthy", "falsy"}
+
+
+class RubricError(ValueError):
+    """Raised when a rubric definition is malformed"""
+
+
 @dataclass
 class ScoreBreakdown:
     ties: int
@@ -16,322 +35,439 @@ class ScoreBreakdown:
     penalties: int
 
 
-def _score_ties(feat: NormalizedFeatures) -> Tuple[int, List[str]]:
-    score = 0
-    strengths: List[str] = []
-
-    # Business/home ties (max 40)
-    # Physical premises (20)
-    if feat.business_premises is True:
-        score += 20
-        strengths.append("Physical office/shop/warehouse with employees")
-
-    # Digital presence (10)
-    if feat.business_online_presence is True:
-        score += 10
-        strengths.append("Digital presence (website/Facebook)")
-
-    # Assets/inventory/manufacturing footprint (10)
-    if feat.business_assets is True:
-        score += 10
-        strengths.append("Manufacturing/inventory/agricultural assets")
-    else:
-        # fallback inference
-        inferred_assets = feat.business_premises is True and (feat.business_type or "")
-        if inferred_assets:
-            score += 10
-            strengths.append("Business footprint/inventory inferred from premises and type")
-
-    # If not a business profile, limit ties to at most 10 based on employment (we don't have explicit employment ties here)
-    if not feat.is_business:
-        score = min(score, 10)
-
-    return score, strengths
-
-
-def _score_travel(feat: NormalizedFeatures) -> Tuple[int, List[str], List[str]]:
-    score = 0
-    strengths: List[str] = []
-    risks: List[str] = []
-
-    # Travel count (max 15)
-    if feat.travel_count >= 3:
-        score += 15
-        strengths.append("3+ international trips")
-    elif feat.travel_count == 2:
-        score += 10
-        strengths.append("2 international trips")
-    elif feat.travel_count == 1:
-        score += 5
-        strengths.append("1 international trip")
-    else:
-        risks.append("No previous international travel")
-
-    # Recency (max 10)
-    y = feat.years_since_last_travel if feat.years_since_last_travel is not None else 99
-    if y <= 2:
-        score += 10
-        strengths.append("Recent travel within 2 years")
-    elif y <= 5:
-        score += 7
-        strengths.append("Travel within last 3–5 years")
-    elif y <= 10:
-        score += 3
-        strengths.append("Travel 6–10 years ago")
-    else:
-        # >10 or unknown
-        risks.append("Last international travel older than 10 years or unknown")
-
-    # Heavy/Schengen (max 10)
-    if feat.has_heavy_visa or feat.has_schengen_travel:
-        if y <= 2:
-            score += 10
-            strengths.append("Top-tier/Schengen visa with recent travel")
-        elif y <= 5:
-            score += 7
-            strengths.append("Top-tier/Schengen visa within 3–5 years")
-        elif y <= 10:
-            score += 3
-            strengths.append("Top-tier/Schengen visa within 6–10 years")
-        else:
-            score += 1
-            strengths.append("Historic top-tier/Schengen visa (>10 years)")
-
-    return score, strengths, risks
-
-
-def _score_financials(feat: NormalizedFeatures) -> Tuple[int, List[str], List[str]]:
-    score = 0
-    strengths: List[str] = []
-    risks: List[str] = []
-
-    # Closing balance (max 12)
-    cb = feat.closing_balance_pk
-    if cb >= 2_000_000:
-        score += 12
-        strengths.append("Closing balance ≥ 2M PKR")
-    elif 1_500_000 <= cb < 2_000_000:
-        score += 6
-        strengths.append("Closing balance 1.5–2M PKR")
-        risks.append("Closing balance below 2M PKR threshold")
-    elif 1_000_000 <= cb < 1_500_000:
-        score += 2
-        strengths.append("Closing balance 1–1.5M PKR")
-        risks.append("Closing balance below 2M PKR threshold")
-    else:
-        risks.append("Insufficient or unknown closing balance")
-
-    # Annual income declared (max 8)
-    inc = feat.annual_income_pk
-    inc_sub = 0
-    if inc >= 1_200_000:
-        inc_sub = 8
-        strengths.append("Annual income ≥ 1.2M PKR (tax-declared)")
-    elif 800_000 <= inc < 1_200_000:
-        inc_sub = 4
-        strengths.append("Annual income 0.8–1.2M PKR (tax-declared)")
-        risks.append("Income below 1.2M PKR ideal threshold")
-    elif 500_000 <= inc < 800_000:
-        inc_sub = 2
-        strengths.append("Annual income 0.5–0.8M PKR (tax-declared)")
-        risks.append("Income below 1.2M PKR ideal threshold")
-    else:
-        risks.append("Low or unknown annual income")
-
-    if feat.is_tax_filer is False:
-        inc_sub = int(inc_sub * 0.5)
-        risks.append("Not a tax filer (reduced credit for income)")
-    score += inc_sub
-
-    return score, strengths, risks
-
-
-def _score_age(feat: NormalizedFeatures) -> Tuple[int, List[str], List[str]]:
-    score = 0
-    strengths: List[str] = []
-    risks: List[str] = []
-    age = feat.age if feat.age is not None else -1
-    if age > 30:
-        score = 5
-        strengths.append("Age > 30 (maturity)")
-    elif 25 <= age <= 30:
-        score = 3
-        strengths.append("Age 25–30 (acceptable)")
-    elif 0 <= age < 25:
+# Feature fields each breakdown component reads; components share no fields
+SECTION_FIELDS = {
+    "ties": ("is_business", "business_type", "business_premises", "business_online_presence", "business_assets"),
+    "travel": ("travel_count", "years_since_last_travel", "has_heavy_visa", "has_schengen_travel"),
+    "financials": ("closing_balance_pk", "annual_income_pk", "is_tax_filer"),
+    "age": ("age",),
+    "penalties": ("previous_schengen_rejection", "previous_schengen_rejection_years_ago"),
+}
+
+
+@dataclass(frozen=True)
+class Tier:
+    bound: int  # Minimum value for "min" tiers, maximum years for "max_years" tiers
+    points: int = 0
+    strength: Optional[str] = None
+    risk: Optional[str] = None
+
+
+Predicate = Callable[[NormalizedFeatures], bool]
+
+
+def _tier(spec: Dict[str, Any], bound_key: str) -> Tier:
+    return Tier(
+        bound=spec.get(bound_key, 0),
+        points=int(spec.get("points", 0)),
+        strength=spec.get("strength"),
+        risk=spec.get("risk"),
+    )
+
+
+def _compile_tiers(spec: Dict[str, Any], bound_key: str, where: str) -> Tuple[Tuple[Tier, ...], Tier]:
+    """Ordered tiers plus the tier used when none match"""
+    try:
+        tiers = tuple(_tier(t, bound_key) for t in spec["tiers"])
+    except (KeyError, TypeError) as e:
+        raise RubricError(f"{where}: invalid tiers ({e})")
+    bounds = [t.bound for t in tiers]
+    # First match wins, so "min" tiers must descend and "max_years" tiers ascend
+    expected = sorted(bounds, reverse=(bound_key == "min"))
+    if bounds != expected:
+        raise RubricError(f"{where}: tiers must be ordered by {bound_key}")
+    return tiers, _tier(spec.get("otherwise", {}), bound_key)
+
+
+def _match_min(tiers: Tuple[Tier, ...], value: int) -> Optional[Tier]:
+    for tier in tiers:
+        if value >= tier.bound:
+            return tier
+    return None
+
+
+def _match_max(tiers: Tuple[Tier, ...], value: int) -> Optional[Tier]:
+    for tier in tiers:
+        if value <= tier.bound:
+            return tier
+    return None
+
+
+def _compile_clause(spec: Dict[str, Any]) -> Predicate:
+    field = spec.get("field")
+    op = spec.get("op")
+    if field not in FEATURE_FIELDS:
+        raise RubricError(f"Unknown feature field in condition: {field}")
+    if op not in _CONDITION_OPS:
+        raise RubricError(f"Unknown condition operator: {op}")
+    value = spec.get("value")
+    fallback = spec.get("or")  # Mirrors Python's `x or fallback`
+
+    def read(feat: NormalizedFeatures) -> Any:
+        v = getattr(feat, field)
+        return (v or fallback) if fallback is not None else v
+
+    if op in _COMPARISONS:
+        compare = _COMPARISONS[op]
+
+        def predicate(feat: NormalizedFeatures) -> bool:
+            # Unknown values never satisfy a comparison
+            v = read(feat)
+            return v is not None and compare(v, value)
+
+        return predicate
+    if op == "==":
+        return lambda feat: read(feat) == value
+    if op == "!=":
+        return lambda feat: read(feat) != value
+    if op == "is":
+        return lambda feat: read(feat) is value
+    if op == "is_not":
+        return lambda feat: read(feat) is not value
+    if op == "truthy":
+        return lambda feat: bool(read(feat))
+    return lambda feat: not read(feat)
+
+
+def compile_condition(spec: Optional[Dict[str, Any]]) -> Predicate:
+    """Compile an {"all": [...]} / {"any": [...]} condition (or a single clause) into a predicate"""
+    if spec is None:
+        return lambda feat: True
+    if "all" in spec or "any" in spec:
+        combine = all if "all" in spec else any
+        predicates = [compile_condition(clause) for clause in spec.get("all", spec.get("any"))]
+        return lambda feat: combine(p(feat) for p in predicates)
+    return _compile_clause(spec)
+
+
+class CompiledRubric:
+    """
+    Rubric definition compiled into tier tables and predicates.
+
+    All lookups into the definition happen here, once; scoring only walks the
+    precompiled tuples. Instances are immutable after construction, so a
+    request keeps scoring with the rubric it started with while a reload swaps
+    in a new one.
+    """
+
+    def __init__(self, spec: Dict[str, Any], digest: str = ""):
+        try:
+            self.spec = spec
+            self.version = f"{spec['version']}+{digest[:8]}" if digest else str(spec["version"])
+
+            ties = spec["ties"]
+            self.tie_premises = _tier(ties["premises"], "min")
+            self.tie_online = _tier(ties["online_presence"], "min")
+            self.tie_assets = _tier(ties["assets"], "min")
+            self.tie_inferred_assets = _tier(ties["inferred_assets"], "min")
+            self.non_business_tie_cap = int(ties["non_business_cap"])
+
+            travel = spec["travel"]
+            self.travel_count, self.travel_count_otherwise = _compile_tiers(travel["count"], "min", "travel.count")
+            self.travel_unknown_years = int(travel["unknown_years"])
+            self.recency, self.recency_otherwise = _compile_tiers(travel["recency"], "max_years", "travel.recency")
+            self.visa, self.visa_otherwise = _compile_tiers(travel["top_tier_visa"], "max_years", "travel.top_tier_visa")
+
+            financials = spec["financials"]
+            self.balance, self.balance_otherwise = _compile_tiers(
+                financials["closing_balance"], "min", "financials.closing_balance")
+            self.income, self.income_otherwise = _compile_tiers(
+                financials["annual_income"], "min", "financials.annual_income")
+            self.non_filer_factor = float(financials["non_filer"]["income_factor"])
+            self.non_filer_risk = financials["non_filer"].get("risk")
+
+            self.age, _ = _compile_tiers(spec["age"], "min", "age")
+
+            rejection = spec["penalties"]["schengen_rejection"]
+            self.rejection, self.rejection_otherwise = _compile_tiers(
+                rejection, "max_years", "penalties.schengen_rejection")
+            self.rejection_unknown_years = int(rejection["unknown_years"])
+
+            self.bands = tuple((int(b["min_score"]), int(b["ratio"])) for b in spec["bands"])
+            # Condition specs are kept alongside their predicates for the vectorized scorer
+            self.caps = tuple(
+                (int(c["max_ratio"]), compile_condition(c.get("when")), c.get("when")) for c in spec["caps"]
+            )
+            self.outcomes = tuple(
+                (int(o["min_ratio"]), o["overall_recommendation"], o["confidence_level"], o["application_strategy"])
+                for o in spec["outcomes"]
+            )
+            self.should_apply_min_ratio = int(spec["should_apply_min_ratio"])
+
+            confidence = spec["confidence"]
+            self.confidence_base = float(confidence["base"])
+            self.confidence_per_missing = float(confidence["per_missing"])
+            self.confidence_min = float(confidence["min"])
+            self.confidence_max = float(confidence["max"])
+            self.missing = tuple(compile_condition(c) for c in confidence["missing"])
+            self.missing_specs = tuple(confidence["missing"])
+
+            self.recommendations = tuple(
+                (r["text"], compile_condition(r.get("when"))) for r in spec["recommendations"]
+            )
+            self.required_documents = tuple(spec["required_documents"])
+        except RubricError:
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            raise RubricError(f"Invalid rubric definition: {e!r}")
+
+        if [b[0] for b in self.bands] != sorted((b[0] for b in self.bands), reverse=True):
+            raise RubricError("bands must be ordered by descending min_score")
+        if [o[0] for o in self.outcomes] != sorted((o[0] for o in self.outcomes), reverse=True):
+            raise RubricError("outcomes must be ordered by descending min_ratio")
+
+    # -----------------------
+    # Components
+    # -----------------------
+    def _score_ties(self, feat: NormalizedFeatures, strengths: List[str]) -> int:
         score = 0
-        risks.append("Age < 25 (higher scrutiny)")
-    return score, strengths, risks
-
-
-def _penalties(feat: NormalizedFeatures) -> Tuple[int, List[str]]:
-    p = 0
-    risks: List[str] = []
-    # Previous Schengen rejection
-    if feat.previous_schengen_rejection:
-        yrs = feat.previous_schengen_rejection_years_ago or 99
-        if yrs <= 2:
-            p += 20
-            risks.append("Schengen rejection in last 2 years")
-        elif yrs <= 5:
-            p += 15
-            risks.append("Schengen rejection 3–5 years ago")
-        elif yrs <= 10:
-            p += 10
-            risks.append("Schengen rejection 6–10 years ago")
-        else:
-            p += 8
-            risks.append("Historic Schengen rejection (>10 years)")
-    return p, risks
-
-
-def _banded_ratio(score: int) -> int:
-    if score >= 80:
-        return 90
-    if score >= 60:
-        return 70
-    if score >= 40:
-        return 50
-    return 30
-
-
-def _apply_caps_and_overrides(success_ratio: int, feat: NormalizedFeatures) -> int:
-    # Balance hard cap
-    if feat.closing_balance_pk < 2_000_000:
-        success_ratio = min(success_ratio, 50)
-
-    # Age caution override
-    if (feat.age is not None and feat.age < 25) and (feat.travel_count < 2) and (feat.business_premises is not True):
-        success_ratio = min(success_ratio, 40)
-
-    return success_ratio
-
-
-def _confidence(feat: NormalizedFeatures) -> float:
-    conf = 0.8
-    missing = 0
-    if feat.closing_balance_pk == 0:
-        missing += 1
-    if feat.annual_income_pk == 0:
-        missing += 1
-    if feat.travel_count == 0 and (feat.years_since_last_travel is None):
-        missing += 1
-    if feat.business_premises is None:
-        missing += 1
-    if feat.is_tax_filer is None:
-        missing += 1
-    conf -= 0.1 * missing
-    return max(0.3, min(0.95, conf))
-
-
-def _recommendations(feat: NormalizedFeatures) -> List[str]:
-    recs: List[str] = []
-    # First-time Schengen guidance
-    if not feat.has_schengen_travel and not (feat.has_heavy_visa is True):
-        recs.append("Apply for a Business visa for your first Schengen attempt; avoid Germany/France/Italy initially; consider Belgium/Netherlands/Norway/Spain.")
-
-    # Travel building
-    if feat.travel_count < 2 or (feat.years_since_last_travel or 99) > 5:
-        recs.append("Build or refresh travel history (consider Turkey, Malaysia, Singapore, Japan, UAE).")
-
-    # Financial documentation
-    if feat.closing_balance_pk < 2_000_000:
-        recs.append("Increase closing balance to ≥ 2M PKR to improve approval chances.")
-    if feat.annual_income_pk < 1_200_000:
-        recs.append("Strengthen declared annual income and ensure tax compliance.")
-    if feat.is_tax_filer is False:
-        recs.append("File taxes and prepare recent returns.")
-
-    # Business ties
-    if feat.business_premises is not True:
-        recs.append("Document physical business ties (lease, utility bills, payroll, photos of premises).")
-    if feat.business_online_presence is not True:
-        recs.append("Establish digital presence (website/social) to validate business existence.")
-
-    # Purpose
-    recs.append("Have a verifiable purpose (invitation, event, exhibition) and align itinerary accordingly.")
-
-    # Rejection handling
-    if feat.previous_schengen_rejection:
-        recs.append("Address previous refusal clearly; provide stronger evidence and coherent travel purpose.")
-
-    # Deduplicate while preserving order
-    seen = set()
-    unique_recs = []
-    for r in recs:
-        if r not in seen:
-            unique_recs.append(r)
-            seen.add(r)
-    return unique_recs
-
-
-def _application_strategy(feat: NormalizedFeatures, success_ratio: int) -> str:
-    if success_ratio >= 80:
-        return "Proceed with application; ensure complete documentation and clear purpose; book appointment and prepare via our portal."
-    if success_ratio >= 60:
-        return "Apply with proper preparation; reinforce weaker areas and use a strong business purpose/invitation."
-    if success_ratio >= 40:
-        return "Consider improving travel history/financials first, or apply only with a solid business invitation and strong ties."
-    return "Not recommended at this stage; build travel history and strengthen business/financial ties before applying."
-
-
-def score_profile(feat: NormalizedFeatures) -> Dict[str, Any]:
+        if feat.business_premises is True:
+            score += self.tie_premises.points
+            strengths.append(self.tie_premises.strength)
+        if feat.business_online_presence is True:
+            score += self.tie_online.points
+            strengths.append(self.tie_online.strength)
+        if feat.business_assets is True:
+            score += self.tie_assets.points
+            strengths.append(self.tie_assets.strength)
+        elif feat.business_premises is True and (feat.business_type or ""):
+            # Assets inferred from premises and business type
+            score += self.tie_inferred_assets.points
+            strengths.append(self.tie_inferred_assets.strength)
+        # No explicit employment ties yet, so non-business profiles are capped
+        if not feat.is_business:
+            score = min(score, self.non_business_tie_cap)
+        return score
+
+    @staticmethod
+    def _apply(tier: Optional[Tier], otherwise: Optional[Tier], strengths: List[str], risks: List[str]) -> int:
+        tier = tier or otherwise
+        if tier is None:
+            return 0
+        if tier.strength:
+            strengths.append(tier.strength)
+        if tier.risk:
+            risks.append(tier.risk)
+        return tier.points
+
+    def _score_travel(self, feat: NormalizedFeatures, strengths: List[str], risks: List[str]) -> int:
+        score = self._apply(_match_min(self.travel_count, feat.travel_count), self.travel_count_otherwise,
+                            strengths, risks)
+        y = feat.years_since_last_travel if feat.years_since_last_travel is not None else self.travel_unknown_years
+        score += self._apply(_match_max(self.recency, y), self.recency_otherwise, strengths, risks)
+        if feat.has_heavy_visa or feat.has_schengen_travel:
+            score += self._apply(_match_max(self.visa, y), self.visa_otherwise, strengths, risks)
+        return score
+
+    def _score_financials(self, feat: NormalizedFeatures, strengths: List[str], risks: List[str]) -> int:
+        score = self._apply(_match_min(self.balance, feat.closing_balance_pk), self.balance_otherwise,
+                            strengths, risks)
+        income = self._apply(_match_min(self.income, feat.annual_income_pk), self.income_otherwise,
+                             strengths, risks)
+        if feat.is_tax_filer is False:
+            income = int(income * self.non_filer_factor)
+            risks.append(self.non_filer_risk)
+        return score + income
+
+    def _score_age(self, feat: NormalizedFeatures, strengths: List[str], risks: List[str]) -> int:
+        if feat.age is None:
+            return 0
+        return self._apply(_match_min(self.age, feat.age), None, strengths, risks)
+
+    def _penalties(self, feat: NormalizedFeatures, risks: List[str]) -> int:
+        if not feat.previous_schengen_rejection:
+            return 0
+        # Zero years is treated as unknown, as the normalizer reports it
+        years = feat.previous_schengen_rejection_years_ago or self.rejection_unknown_years
+        return self._apply(_match_max(self.rejection, years), self.rejection_otherwise, [], risks)
+
+    def section_score(self, section: str, feat: NormalizedFeatures) -> int:
+        """Points from one breakdown component (penalties are positive)"""
+        if section == "ties":
+            return self._score_ties(feat, [])
+        if section == "travel":
+            return self._score_travel(feat, [], [])
+        if section == "financials":
+            return self._score_financials(feat, [], [])
+        if section == "age":
+            return self._score_age(feat, [], [])
+        if section == "penalties":
+            return self._penalties(feat, [])
+        raise KeyError(section)
+
+    # -----------------------
+    # Scoring
+    # -----------------------
+    @staticmethod
+    def base_score(scores: ScoreBreakdown) -> int:
+        """Component total clamped to 0..100"""
+        base_score = scores.ties + scores.travel + scores.financials + scores.age - scores.penalties
+        return max(0, min(100, base_score))
+
+    def banded_ratio(self, score: int) -> int:
+        for min_score, ratio in self.bands:
+            if score >= min_score:
+                return ratio
+        return self.bands[-1][1]
+
+    def apply_caps(self, success_ratio: int, feat: NormalizedFeatures) -> int:
+        for max_ratio, applies, _ in self.caps:
+            if applies(feat):
+                success_ratio = min(success_ratio, max_ratio)
+        return success_ratio
+
+    def confidence(self, feat: NormalizedFeatures) -> float:
+        missing = sum(1 for is_missing in self.missing if is_missing(feat))
+        conf = self.confidence_base - self.confidence_per_missing * missing
+        return max(self.confidence_min, min(self.confidence_max, conf))
+
+    def outcome(self, success_ratio: int) -> Tuple[str, str, str]:
+        """(overall_recommendation, confidence_level, application_strategy) for a ratio"""
+        for min_ratio, overall, level, strategy in self.outcomes:
+            if success_ratio >= min_ratio:
+                return overall, level, strategy
+        return self.outcomes[-1][1:]
+
+    def recommendations_for(self, feat: NormalizedFeatures) -> List[str]:
+        # Deduplicate while preserving order
+        recs: List[str] = []
+        for text, applies in self.recommendations:
+            if text not in recs and applies(feat):
+                recs.append(text)
+        return recs
+
+    def breakdown(self, feat: NormalizedFeatures) -> Tuple[ScoreBreakdown, List[str], List[str]]:
+        """Component scores with the strengths and risk factors behind them"""
+        tie_strengths: List[str] = []
+        travel_strengths: List[str] = []
+        travel_risks: List[str] = []
+        fin_strengths: List[str] = []
+        fin_risks: List[str] = []
+        age_strengths: List[str] = []
+        age_risks: List[str] = []
+        pen_risks: List[str] = []
+
+        scores = ScoreBreakdown(
+            ties=self._score_ties(feat, tie_strengths),
+            travel=self._score_travel(feat, travel_strengths, travel_risks),
+            financials=self._score_financials(feat, fin_strengths, fin_risks),
+            age=self._score_age(feat, age_strengths, age_risks),
+            penalties=self._penalties(feat, pen_risks),
+        )
+        strengths = tie_strengths + travel_strengths + fin_strengths + age_strengths
+        risk_factors = travel_risks + fin_risks + age_risks + pen_risks
+        return scores, strengths, risk_factors
+
+    def evaluate(self, feat: NormalizedFeatures) -> Tuple[Dict[str, Any], int, ScoreBreakdown]:
+        """Evaluation dict, clamped base score and breakdown for one profile"""
+        scores, strengths, risk_factors = self.breakdown(feat)
+
+        base_score = self.base_score(scores)
+        success_ratio = self.apply_caps(self.banded_ratio(base_score), feat)
+        overall_recommendation, confidence_level, application_strategy = self.outcome(success_ratio)
+
+        evaluation = {
+            "success_ratio": success_ratio,
+            "overall_recommendation": overall_recommendation,
+            "confidence_level": confidence_level,
+            "matched_scenario": "Rubric-Based Evaluation",
+            "strengths": strengths,
+            "risk_factors": risk_factors,
+            "recommendations": self.recommendations_for(feat),
+            "application_strategy": application_strategy,
+            "required_documents": list(self.required_documents),
+            "confidence": self.confidence(feat),
+            "should_apply": success_ratio >= self.should_apply_min_ratio,
+            "next_steps": [],  # optional: derive from recommendations/risks if needed
+            "rubric_version": self.version,
+        }
+        return evaluation, base_score, scores
+
+
+def load_rubric(path: str = DEFAULT_RUBRIC_PATH) -> CompiledRubric:
+    """Read and compile a rubric definition file"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        spec = json.loads(raw)
+    except ValueError as e:
+        raise RubricError(f"Rubric file {path} is not valid JSON: {e}")
+    return CompiledRubric(spec, digest=hashlib.sha256(raw).hexdigest())
+
+
+class RubricLoader:
+    """
+    Serves the compiled rubric and hot-reloads it when the file changes.
+
+    The file's mtime is checked at most every reload_interval seconds. A new
+    rubric is compiled completely before it replaces the current one, and a
+    file that fails to parse or compile is logged and ignored, so scoring never
+    sees a half-loaded rubric.
+    """
+
+    def __init__(self, path: str = DEFAULT_RUBRIC_PATH, reload_interval: float = RUBRIC_RELOAD_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self._current: Optional[CompiledRubric] = None
+        self._mtime: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> CompiledRubric:
+        """Current compiled rubric, reloading first if the file changed"""
+        if self._current is None or (
+            self.reload_interval and self.clock() - self._checked_at >= self.reload_interval
+        ):
+            self._check()
+        return self._current
+
+    def reload(self) -> CompiledRubric:
+        """Reload now regardless of the check interval"""
+        self._mtime = None
+        self._check()
+        return self._current
+
+    def _check(self):
+        with self._lock:
+            self._checked_at = self.clock()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if self._current is None:
+                    raise
+                logger.error(f"Cannot stat rubric file {self.path}, keeping {self._current.version}: {e}")
+                return
+            if mtime == self._mtime and self._current is not None:
+                return
+            try:
+                rubric = load_rubric(self.path)
+            except (OSError, RubricError) as e:
+                if self._current is None:
+                    raise
+                logger.error(f"Failed to reload rubric, keeping {self._current.version}: {e}")
+                return
+            # Single reference swap; callers holding the old rubric finish with it
+            self._current = rubric
+            self._mtime = mtime
+            logger.info(f"Loaded rubric {rubric.version} from {self.path}")
+
+
+def score_profile(feat: NormalizedFeatures, rubric: Optional[CompiledRubric] = None) -> Dict[str, Any]:
     logger.info("Scoring profile using rubric")
 
-    ties, tie_strengths = _score_ties(feat)
-    travel, travel_strengths, travel_risks = _score_travel(feat)
-    financials, fin_strengths, fin_risks = _score_financials(feat)
-    age_score, age_strengths, age_risks = _score_age(feat)
-    pen, pen_risks = _penalties(feat)
-
-    base_score = ties + travel + financials + age_score - pen
-    base_score = max(0, min(100, base_score))
-
-    success_ratio = _banded_ratio(base_score)
-    success_ratio = _apply_caps_and_overrides(success_ratio, feat)
-
-    strengths = tie_strengths + travel_strengths + fin_strengths + age_strengths
-    risk_factors = travel_risks + fin_risks + age_risks + pen_risks
-    recommendations = _recommendations(feat)
-    application_strategy = _application_strategy(feat, success_ratio)
-
-    evaluation = {
-        "success_ratio": success_ratio,
-        "overall_recommendation": (
-            "Strong approval likelihood - Proceed with application" if success_ratio >= 80 else
-            "Good approval likelihood - Apply with proper preparation" if success_ratio >= 60 else
-            "Moderate approval likelihood - Consider improvements first" if success_ratio >= 40 else
-            "Low approval likelihood - Build profile before applying"
-        ),
-        "confidence_level": (
-            "High" if success_ratio >= 80 else "Medium" if success_ratio >= 40 else "Low"
-        ),
-        "matched_scenario": "Rubric-Based Evaluation",
-        "strengths": strengths,
-        "risk_factors": risk_factors,
-        "recommendations": recommendations,
-        "application_strategy": application_strategy,
-        "required_documents": [
-            "Passport (first and second page)",
-            "CNIC (front and back)",
-            "FRC or MRC",
-            "NTN Registration",
-            "Tax Returns (last 2 years)",
-            "Bank Statement (3 months)",
-            "Bank Maintenance Letter",
-            "Business Website/Social Links",
-            "Travel Itinerary/Invitations"
-        ],
-        "confidence": _confidence(feat),
-        "should_apply": success_ratio >= 60,
-        "next_steps": []  # optional: derive from recommendations/risks if needed
-    }
+    rubric = rubric or rubric_loader.get()
+    evaluation, base_score, breakdown = rubric.evaluate(feat)
 
     logger.info({
         "base_score": base_score,
-        "breakdown": ScoreBreakdown(ties, travel, financials, age_score, pen),
+        "breakdown": breakdown,
         "evaluation": evaluation,
     })
 
     return evaluation
 
 
+# Global rubric loader for the shipped rubric definition
+rubric_loader = RubricLoader()
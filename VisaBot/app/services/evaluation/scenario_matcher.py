@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .normalizer import NormalizedFeatures
+from .parsing import parse_amount
+
+
+DEFAULT_SCENARIOS_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'prompts', 'scenarios.json')
+
+# Unknown answers earn half credit, so a complete profile outranks a sparse one
+UNKNOWN_CREDIT = 0.5
+
+
+@dataclass
+class ScenarioProfile:
+    """Everything the scenario criteria look at, extracted once per request"""
+    features: NormalizedFeatures
+    target_country: Optional[str] = None
+    salary: int = 0
+    salary_in_bank: Optional[bool] = None
+
+    @classmethod
+    def from_answers(cls, features: NormalizedFeatures, answers: Optional[Dict[str, Any]] = None,
+                     target_country: Optional[str] = None) -> "ScenarioProfile":
+        answers = answers or {}
+        salary_mode = answers.get("salary_mode")
+        return cls(
+            features=features,
+            target_country=target_country or answers.get("selected_country") or answers.get("country"),
+            salary=parse_amount(answers.get("salary")) or 0,
+            salary_in_bank=("bank" in str(salary_mode).lower()) if salary_mode else None,
+        )
+
+
+@dataclass(frozen=True)
+class Criterion:
+    name: str
+    # Returns (passed, explanation); passed is None when the profile does not say
+    check: Callable[[ScenarioProfile], Tuple[Optional[bool], str]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    success_ratio: int
+    strengths: List[str]
+    recommendations: List[str]
+    application_strategy: List[str]
+    required_documents: List[str]
+    applicant_type: Optional[str]
+    countries: frozenset
+    criteria: Tuple[Criterion, ...]
+    raw: Dict[str, Any] = field(repr=False, default_factory=dict)
+
+
+@dataclass
+class ScenarioMatch:
+    scenario: Scenario
+    score: float  # Share of criteria met, 0..1
+    matched: List[str]
+    unmet: List[str]
+    unknown: List[str]
+
+    def explanation(self) -> str:
+        parts = [f"{self.scenario.name} ({self.score:.0%} of criteria met)"]
+        if self.matched:
+            parts.append("Matches: " + "; ".join(self.matched))
+        if self.unmet:
+            parts.append("Does not meet: " + "; ".join(self.unmet))
+        if self.unknown:
+            parts.append("Unknown: " + "; ".join(self.unknown))
+        return ". ".join(parts)
+
+
+# -----------------------
+# Criterion compilers
+# -----------------------
+def _fmt_pk(amount: int) -> str:
+    return f"{amount:,} PKR"
+
+
+def _minimum(name: str, label: str, minimum: int, read: Callable[[ScenarioProfile], int],
+             unknown_when_zero: bool = True) -> Criterion:
+    def check(profile: ScenarioProfile) -> Tuple[Optional[bool], str]:
+        value = read(profile)
+        if unknown_when_zero and not value:
+            return None, f"{label} not provided (needs {_fmt_pk(minimum)})"
+        if value >= minimum:
+            return True, f"{label} {_fmt_pk(value)} ≥ {_fmt_pk(minimum)}"
+        return False, f"{label} {_fmt_pk(value)} below {_fmt_pk(minimum)}"
+    return Criterion(name, check)
+
+
+def _flag(name: str, label: str, expected: bool, read: Callable[[ScenarioProfile], Optional[bool]]) -> Criterion:
+    wanted = "yes" if expected else "no"
+
+    def check(profile: ScenarioProfile) -> Tuple[Optional[bool], str]:
+        value = read(profile)
+        if value is None:
+            return None, f"{label} not provided (needs {wanted})"
+        actual = "yes" if value else "no"
+        return bool(value) == expected, f"{label}: {actual} (needs {wanted})"
+    return Criterion(name, check)
+
+
+def _compile_criteria(criteria: Dict[str, Any]) -> Tuple[Criterion, ...]:
+    compiled: List[Criterion] = []
+
+    business = criteria.get("business") or {}
+    if "has_office_with_employees" in business:
+        compiled.append(_flag("business.has_office_with_employees", "Office with employees",
+                              business["has_office_with_employees"], lambda p: p.features.business_premises))
+    if "has_website" in business:
+        compiled.append(_flag("business.has_website", "Website/online presence",
+                              business["has_website"], lambda p: p.features.business_online_presence))
+
+    job = criteria.get("job") or {}
+    if job.get("salary_min") is not None:
+        compiled.append(_minimum("job.salary_min", "Monthly salary", job["salary_min"], lambda p: p.salary))
+    if "salary_in_bank" in job:
+        compiled.append(_flag("job.salary_in_bank", "Salary paid into bank", job["salary_in_bank"],
+                              lambda p: p.salary_in_bank))
+
+    if criteria.get("tax_filer") is not None:
+        compiled.append(_flag("tax_filer", "Tax filer", criteria["tax_filer"], lambda p: p.features.is_tax_filer))
+    if criteria.get("annual_income_min") is not None:
+        compiled.append(_minimum("annual_income_min", "Annual income", criteria["annual_income_min"],
+                                 lambda p: p.features.annual_income_pk))
+    if criteria.get("closing_balance_min") is not None:
+        compiled.append(_minimum("closing_balance_min", "Closing balance", criteria["closing_balance_min"],
+                                 lambda p: p.features.closing_balance_pk))
+
+    travel = criteria.get("travel_history") or {}
+    if travel.get("countries_min") is not None:
+        countries_min = int(travel["countries_min"])
+
+        def check_countries(profile: ScenarioProfile) -> Tuple[Optional[bool], str]:
+            count = profile.features.travel_count
+            return count >= countries_min, f"Travelled to {count} countries (needs {countries_min}+)"
+        compiled.append(Criterion("travel_history.countries_min", check_countries))
+    if travel.get("has_top_tier_visa") is not None:
+        compiled.append(_flag("travel_history.has_top_tier_visa", "US/UK/Canada/Australia visa",
+                              travel["has_top_tier_visa"], lambda p: p.features.has_heavy_visa))
+    if travel.get("last_travel_gap_years_max") is not None:
+        gap_max = int(travel["last_travel_gap_years_max"])
+
+        def check_gap(profile: ScenarioProfile) -> Tuple[Optional[bool], str]:
+            years = profile.features.years_since_last_travel
+            if years is None:
+                return None, f"Last travel year not provided (needs within {gap_max} years)"
+            return years <= gap_max, f"Last travelled {years} years ago (needs within {gap_max})"
+        compiled.append(Criterion("travel_history.last_travel_gap_years_max", check_gap))
+
+    rejection = criteria.get("previous_schengen_rejection") or {}
+    if rejection.get("has_rejection") is not None:
+        compiled.append(_flag("previous_schengen_rejection", "Previous Schengen rejection",
+                              rejection["has_rejection"], lambda p: p.features.previous_schengen_rejection))
+
+    age_min, age_max = criteria.get("age_min"), criteria.get("age_max")
+    if age_min is not None or age_max is not None:
+        low = age_min if age_min is not None else 0
+        high = age_max if age_max is not None else 200
+        wanted = f"{low}–{high}" if age_max is not None else f"{low}+"
+
+        def check_age(profile: ScenarioProfile) -> Tuple[Optional[bool], str]:
+            age = profile.features.age
+            if age is None:
+                return None, f"Age not provided (needs {wanted})"
+            return low <= age <= high, f"Age {age} (needs {wanted})"
+        compiled.append(Criterion("age", check_age))
+
+    return tuple(compiled)
+
+
+def compile_scenario(raw: Dict[str, Any]) -> Scenario:
+    criteria = raw.get("criteria") or {}
+    strategy = raw.get("application_strategy") or []
+    return Scenario(
+        name=raw["scenario_name"],
+        success_ratio=int(raw.get("success_ratio", 50)),
+        strengths=list(raw.get("strengths") or []),
+        recommendations=list(raw.get("recommendations") or []),
+        application_strategy=[strategy] if isinstance(strategy, str) else list(strategy),
+        required_documents=list(raw.get("required_documents") or []),
+        applicant_type=criteria.get("applicant_type"),
+        countries=frozenset(c.lower() for c in criteria.get("applying_schengen_country") or []),
+        criteria=_compile_criteria(criteria),
+        raw=raw,
+    )
+
+
+class ScenarioMatcher:
+    """
+    Scores a profile against the structured criteria in scenarios.json.
+
+    Scenarios are compiled once into per-criterion checks and indexed by
+    applicant type; the applicant type and destination country act as filters
+    and the remaining criteria are scored. Matching only runs plain Python
+    comparisons, so it takes microseconds and needs no LLM.
+    """
+
+    def __init__(self, scenarios: List[Dict[str, Any]]):
+        self.scenarios = [compile_scenario(raw) for raw in scenarios]
+        self._by_type: Dict[Optional[str], List[Scenario]] = {}
+        for scenario in self.scenarios:
+            self._by_type.setdefault(scenario.applicant_type, []).append(scenario)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_SCENARIOS_PATH) -> "ScenarioMatcher":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _candidates(self, profile: ScenarioProfile) -> List[Scenario]:
+        features = profile.features
+        types: List[Optional[str]] = [None]
+        if features.is_business:
+            types.append("businessman")
+        elif features.is_job_holder:
+            types.append("job_holder")
+        else:
+            # Profession unknown: every applicant type stays in play
+            types = list(self._by_type)
+        candidates = [s for t in types for s in self._by_type.get(t, [])]
+
+        country = (profile.target_country or "").strip().lower()
+        if country:
+            candidates = [s for s in candidates if not s.countries or country in s.countries]
+        return candidates
+
+    def score(self, scenario: Scenario, profile: ScenarioProfile) -> ScenarioMatch:
+        matched: List[str] = []
+        unmet: List[str] = []
+        unknown: List[str] = []
+        for criterion in scenario.criteria:
+            passed, detail = criterion.check(profile)
+            if passed is None:
+                unknown.append(detail)
+            elif passed:
+                matched.append(detail)
+            else:
+                unmet.append(detail)
+        total = len(scenario.criteria)
+        score = (len(matched) + UNKNOWN_CREDIT * len(unknown)) / total if total else 1.0
+        return ScenarioMatch(scenario, score, matched, unmet, unknown)
+
+    def match(self, features: NormalizedFeatures, answers: Optional[Dict[str, Any]] = None,
+              target_country: Optional[str] = None, top_k: int = 3) -> List[ScenarioMatch]:
+        """Best-matching scenarios, highest score first (ties keep file order)"""
+        profile = ScenarioProfile.from_answers(features, answers, target_country)
+        matches = [self.score(s, profile) for s in self._candidates(profile)]
+        matches.sort(key=lambda m: (-m.score, len(m.unmet)))
+        return matches[:top_k]
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import FeatureColumns, _tri, score_columns
+from .incremental import _walk_clauses
+from .normalizer import NormalizedFeatures
+from .rubric import CompiledRubric, rubric_loader
+
+
+# Yes/no levers an applicant can act on: (feature field, lever, label)
+_TRI_STATE_LEVERS = (
+    ("is_tax_filer", "tax", "File tax returns"),
+    ("has_heavy_visa", "visa", "Obtain a US/UK/Canada/Australia visa"),
+)
+# Only offered to business owners, who are the only ones asked about them
+_BUSINESS_LEVERS = (
+    ("business_premises", "premises", "Office/shop premises with employees"),
+    ("business_online_presence", "online", "Website or social media presence for the business"),
+    ("business_assets", "assets", "Documented business assets"),
+)
+
+
+@dataclass(frozen=True)
+class Perturbation:
+    """One hypothetical change to a profile, as column overrides"""
+    lever: str  # Changes to the same lever are never combined
+    label: str
+    changes: Tuple[Tuple[str, Any], ...]
+
+
+@dataclass
+class WhatIfResult:
+    label: str
+    levers: List[str]
+    changes: Dict[str, Any]
+    success_ratio: int
+    ratio_gain: int
+    base_score: int
+    overall_recommendation: str
+    should_apply: bool
+
+
+def _targets(rubric: CompiledRubric, field: str, tiers: Sequence, current: int) -> List[int]:
+    """Smallest values above the current one that reach a tier or clear a cap threshold"""
+    targets = {t.bound for t in tiers}
+    for _, _, when in rubric.caps:
+        for clause in _walk_clauses(when):
+            value = clause.get("value")
+            if clause["field"] != field or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            # A "<" cap is escaped at the threshold itself, a "<=" one just above it
+            targets.add(int(value) + 1 if clause["op"] in ("<=", ">") else int(value))
+    return sorted(t for t in targets if t > current)
+
+
+def candidate_perturbations(feat: NormalizedFeatures, rubric: Optional[CompiledRubric] = None) -> List[Perturbation]:
+    """Single-field improvements worth trying for a profile under a rubric"""
+    rubric = rubric or rubric_loader.get()
+    candidates: List[Perturbation] = []
+
+    for amount in _targets(rubric, "closing_balance_pk", rubric.balance, feat.closing_balance_pk):
+        candidates.append(Perturbation("balance", f"Closing balance of {amount:,} PKR",
+                                       (("closing_balance_pk", amount),)))
+    for amount in _targets(rubric, "annual_income_pk", rubric.income, feat.annual_income_pk):
+        candidates.append(Perturbation("income", f"Annual income of {amount:,} PKR",
+                                       (("annual_income_pk", amount),)))
+    for count in _targets(rubric, "travel_count", rubric.travel_count, feat.travel_count):
+        # New trips are recent ones
+        candidates.append(Perturbation("travel", f"Travel to {count} countries (trip this year)",
+                                       (("travel_count", count), ("years_since_last_travel", 0))))
+    for field, lever, label in _TRI_STATE_LEVERS + (_BUSINESS_LEVERS if feat.is_business else ()):
+        if getattr(feat, field) is not True:
+            candidates.append(Perturbation(lever, label, ((field, True),)))
+    return candidates
+
+
+def _columns(feat: NormalizedFeatures, rows: Sequence[Tuple[Perturbation, ...]]) -> FeatureColumns:
+    """The profile repeated once per row with each row's overrides applied"""
+    base = FeatureColumns.from_features([feat])
+    cols = FeatureColumns(**{f.name: np.repeat(getattr(base, f.name), len(rows)) for f in fields(FeatureColumns)})
+    for row, combo in enumerate(rows):
+        for perturbation in combo:
+            for field, value in perturbation.changes:
+                if field == "years_since_last_travel":
+                    cols.travel_known[row] = True
+                column = getattr(cols, field)
+                column[row] = _tri(value) if column.dtype == np.int8 else value
+    return cols
+
+
+def what_if(feat: NormalizedFeatures, rubric: Optional[CompiledRubric] = None,
+            pairs: bool = True, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Improvements that move a profile into a better outcome band, best first.
+
+    Every single-field change and every pair of changes to different levers is
+    scored in one vectorized pass. A pair is only reported when neither of its
+    changes moves the band on its own, and a larger amount only when it gets
+    further than the smaller one.
+    """
+    rubric = rubric or rubric_loader.get()
+    singles = candidate_perturbations(feat, rubric)
+    rows: List[Tuple[Perturbation, ...]] = [()] + [(p,) for p in singles]
+    if pairs:
+        rows += [(a, b) for a, b in itertools.combinations(singles, 2) if a.lever != b.lever]
+
+    scores = score_columns(_columns(feat, rows), rubric)
+    ratios = scores.success_ratio.tolist()
+    should_apply = scores.should_apply.tolist()
+    base_scores = scores.base_score.tolist()
+
+    baseline_ratio = ratios[0]
+    baseline_outcome = rubric.outcome(baseline_ratio)[0]
+    improved = {
+        row for row, ratio in enumerate(ratios)
+        if ratio > baseline_ratio and (rubric.outcome(ratio)[0] != baseline_outcome or should_apply[row] != should_apply[0])
+    }
+    moving_singles = {rows[row][0] for row in improved if len(rows[row]) == 1}
+
+    results: List[Tuple[int, WhatIfResult]] = []
+    reached = set()
+    for row in sorted(improved):
+        combo = rows[row]
+        if len(combo) > 1 and any(p in moving_singles for p in combo):
+            continue
+        # Rows go smallest amount first, so a larger change on the same levers is dominated
+        key = (tuple(p.lever for p in combo), ratios[row])
+        if key in reached:
+            continue
+        reached.add(key)
+        results.append((row, WhatIfResult(
+            label=" + ".join(p.label for p in combo),
+            levers=[p.lever for p in combo],
+            changes={field: value for p in combo for field, value in p.changes},
+            success_ratio=ratios[row],
+            ratio_gain=ratios[row] - baseline_ratio,
+            base_score=base_scores[row],
+            overall_recommendation=rubric.outcome(ratios[row])[0],
+            should_apply=should_apply[row],
+        )))
+    # Biggest gain first, then the fewest changes
+    results.sort(key=lambda item: (-item[1].ratio_gain, len(item[1].levers), item[0]))
+
+    return {
+        "baseline": {
+            "success_ratio": baseline_ratio,
+            "base_score": base_scores[0],
+            "overall_recommendation": baseline_outcome,
+            "should_apply": should_apply[0],
+        },
+        "improvements": [asdict(result) for _, result in results[:limit]],
+        "scenarios_scored": len(rows) - 1,
+        "rubric_version": rubric.version,
+    }
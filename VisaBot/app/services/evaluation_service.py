@@ -6,9 +6,11 @@ from typing import Dict, Any, Optional
 from loguru import logger
 
 from app.services.rag_service import rag_service, ScenarioEvaluation
-from app.services.evaluation.normalizer import normalize_answers
-from app.services.evaluation.rubric import score_profile
+from app.services.evaluation.normalizer import NormalizedFeatures, normalize_answers
+from app.services.evaluation.parsing import parse_yes_no
+from app.services.evaluation.rubric import score_profile, rubric_loader
 from app.services.evaluation.narrative import build_narrative
+from app.services.evaluation.cache import evaluation_cache
 
 
 class EvaluationService:
@@ -17,16 +19,29 @@ class EvaluationService:
     def __init__(self):
         self.rag_service = rag_service
     
-    async def evaluate_visa_application(self, user_answers: Dict[str, Any], target_country: str = None) -> Dict[str, Any]:
+    async def evaluate_visa_application(self, user_answers: Dict[str, Any], target_country: str = None,
+                                        features: Optional[NormalizedFeatures] = None) -> Dict[str, Any]:
         """
         Evaluate visa application using deterministic rubric (no scenario selection here).
+        Pass features when they were already normalized incrementally during the conversation.
         """
         try:
             logger.info(f"Starting rubric-based evaluation for country: {target_country}")
             logger.info(f"User answers: {user_answers}")
 
-            features = normalize_answers(user_answers)
-            evaluation_result = score_profile(features)
+            if features is None:
+                features = normalize_answers(user_answers)
+            # Pin the rubric for this request; a hot reload only affects later requests
+            rubric = rubric_loader.get()
+            cache_key = evaluation_cache.evaluation_key(features, rubric)
+            evaluation_result = await evaluation_cache.get(cache_key)
+            if evaluation_result is not None:
+                logger.info(f"Rubric evaluation served from cache with success ratio: {evaluation_result.get('success_ratio')}%")
+                return {**evaluation_result, "cache_version": evaluation_cache.version_for(rubric)}
+
+            # Stamped with the rubric version and code fingerprint the cache key uses
+            evaluation_result = {**score_profile(features, rubric), "cache_version": evaluation_cache.version_for(rubric)}
+            await evaluation_cache.set(cache_key, evaluation_result)
 
             logger.info(f"Rubric evaluation completed with success ratio: {evaluation_result.get('success_ratio')}%")
             return evaluation_result
@@ -40,21 +55,7 @@ class EvaluationService:
     # -----------------------
     def _normalize_bool(self, value: Any) -> Optional[bool]:
         """Attempt to normalize a value to boolean or None."""
-        try:
-            if isinstance(value, bool):
-                return value
-            if value is None:
-                return None
-            if isinstance(value, (int, float)):
-                return bool(value)
-            text = str(value).strip().lower()
-            if text in {"yes", "y", "true", "1"}:
-                return True
-            if text in {"no", "n", "false", "0"}:
-                return False
-        except Exception:
-            pass
-        return None
+        return parse_yes_no(value)
 
     def _extract_travel_info(self, user_answers: Dict[str, Any]) -> Dict[str, Any]:
         """Extract travel-related info in a tolerant way."""
@@ -339,6 +340,20 @@ class EvaluationService:
             "next_steps": ["Contact support for assistance", "Ensure all information is provided"]
         }
     
+    async def get_current_evaluation(self, user_answers: Dict[str, Any], target_country: str = None) -> Dict[str, Any]:
+        """
+        Evaluation stored in the answers if it came from the current rubric and code, otherwise a (cached) re-evaluation.
+        """
+        # If the FSM already stored an evaluation for this session, reuse it to avoid duplicate work
+        evaluation = user_answers.get("evaluation")
+        if (
+            isinstance(evaluation, dict)
+            and "success_ratio" in evaluation
+            and evaluation.get("cache_version") == evaluation_cache.version
+        ):
+            return evaluation
+        return await self.evaluate_visa_application(user_answers, target_country)
+
     async def get_evaluation_summary(self, user_answers: Dict[str, Any], target_country: str = None) -> str:
         """
         Get a human-like, concise narrative summary based on the rubric evaluation and collected answers.
@@ -351,13 +366,15 @@ class EvaluationService:
             Human-readable narrative string
         """
         try:
-            # If the FSM already stored an evaluation for this session, reuse it to avoid duplicate work
-            evaluation = user_answers.get("evaluation")
-            if not evaluation or not isinstance(evaluation, dict) or "success_ratio" not in evaluation:
-                evaluation = await self.evaluate_visa_application(user_answers, target_country)
-
-            # Build deterministic narrative; optionally, a later step could pass this to RAG for polishing
-            return build_narrative(evaluation, user_answers, target_country)
+            evaluation = await self.get_current_evaluation(user_answers, target_country)
+
+            cache_key = evaluation_cache.narrative_key(evaluation, user_answers, target_country)
+            narrative = await evaluation_cache.get(cache_key)
+            if narrative is None:
+                # Build deterministic narrative; optionally, a later step could pass this to RAG for polishing
+                narrative = build_narrative(evaluation, user_answers, target_country)
+                await evaluation_cache.set(cache_key, narrative)
+            return narrative
             
         except Exception as e:
             logger.error(f"Error generating evaluation summary: {e}")
@@ -2,12 +2,20 @@
 FSM (Finite State Machine) service for visa evaluation bot
 """
 from enum import Enum
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Dict, Any, Optional, Tuple, List, Callable, Awaitable
 from loguru import logger
 
+from app.core.config import settings
 from app.services.redis_service import redis_client
 from app.services.rag_service import rag_service
+from app.services.classification.turns import turn_classifier
 from app.services.evaluation_service import evaluation_service
+from app.services.evaluation.incremental import ANSWER_FEATURES, IncrementalProfile, ProvisionalScore
+from app.services.evaluation.rubric import rubric_loader
+from app.services.evaluation.parsing import parse_amount, parse_year, parse_yes_no
+
+# Smaller numbers in a balance answer are not amounts (e.g. "1" for option one)
+MIN_STATED_BALANCE = 1_000
 
 
 class FSMStates(Enum):
@@ -40,6 +48,12 @@ class VisaEvaluationFSM:
         self.session_id = session_id
         self.current_state = FSMStates.ASK_COUNTRY  # Start directly with country question
         self.answers: Dict[str, Any] = {}
+        # Features and provisional score kept current as answers arrive
+        self.profile = IncrementalProfile()
+        self.provisional: Optional[ProvisionalScore] = None
+        self.skippable_questions: set = set()
+        self.skipped_questions: List[str] = []
+        self.turns = 0
         
         # Questions for each state
         self.questions = {
@@ -306,37 +320,49 @@ class VisaEvaluationFSM:
         
         return questions_answered
     
-    def _find_next_unanswered_question(self, answered_questions: List[str]) -> Tuple[FSMStates, str]:
-        """
-        Find the next unanswered question based on what information is already available
-        """
-        # Define the question sequence with proper branching logic
-        question_sequence = [
-            ("country", FSMStates.ASK_COUNTRY),
-            ("profession", FSMStates.ASK_PROFESSION),
-            # Business branch
-            ("business_type", FSMStates.ASK_BUSINESS_TYPE),
-            # Job branch
-            ("salary", FSMStates.ASK_SALARY),
-            ("salary_mode", FSMStates.ASK_SALARY_MODE),
-            # Common questions
-            ("tax_info", FSMStates.ASK_TAX_INFO),
-            ("balance", FSMStates.ASK_BALANCE),
-            ("travel", FSMStates.ASK_TRAVEL),
-            ("last_travel_year", FSMStates.ASK_LAST_TRAVEL_YEAR),
-            ("valid_visa", FSMStates.ASK_VALID_VISA),
-            ("schengen_rejection", FSMStates.ASK_SCHENGEN_REJECTION),
-            ("age", FSMStates.ASK_AGE),
-            ("business_premises", FSMStates.ASK_BUSINESS_PREMISES),
-            ("business_assets", FSMStates.ASK_BUSINESS_ASSETS),
-            ("business_online_presence", FSMStates.ASK_BUSINESS_ONLINE_PRESENCE)
-        ]
-        
-        # Check what's already stored in answers (not just from current extraction)
+    # Question sequence with proper branching logic (see _pending_questions)
+    QUESTION_SEQUENCE = [
+        ("country", FSMStates.ASK_COUNTRY),
+        ("profession", FSMStates.ASK_PROFESSION),
+        # Business branch
+        ("business_type", FSMStates.ASK_BUSINESS_TYPE),
+        # Job branch
+        ("salary", FSMStates.ASK_SALARY),
+        ("salary_mode", FSMStates.ASK_SALARY_MODE),
+        # Common questions
+        ("tax_info", FSMStates.ASK_TAX_INFO),
+        ("balance", FSMStates.ASK_BALANCE),
+        ("travel", FSMStates.ASK_TRAVEL),
+        ("last_travel_year", FSMStates.ASK_LAST_TRAVEL_YEAR),
+        ("valid_visa", FSMStates.ASK_VALID_VISA),
+        ("schengen_rejection", FSMStates.ASK_SCHENGEN_REJECTION),
+        ("age", FSMStates.ASK_AGE),
+        ("business_premises", FSMStates.ASK_BUSINESS_PREMISES),
+        ("business_assets", FSMStates.ASK_BUSINESS_ASSETS),
+        ("business_online_presence", FSMStates.ASK_BUSINESS_ONLINE_PRESENCE)
+    ]
+
+    # Answer keys a pending question can still fill, including follow-ups it unlocks
+    QUESTION_ANSWER_KEYS = {
+        "profession": ("profession", "business_type", "business_premises", "business_online_presence"),
+        "business_type": ("business_type",),
+        "tax_info": ("is_tax_filer", "annual_income"),
+        "balance": ("closing_balance",),
+        "travel": ("travel_history", "last_travel_year", "valid_visa"),
+        "last_travel_year": ("last_travel_year",),
+        "valid_visa": ("valid_visa",),
+        "schengen_rejection": ("schengen_rejection",),
+        "age": ("age",),
+        "business_premises": ("business_premises",),
+        "business_assets": ("business_assets",),
+        "business_online_presence": ("business_online_presence",),
+    }
+
+    def _stored_questions(self) -> set:
+        """Questions whose answers are already stored"""
         stored_answers = set()
         if self.answers.get("selected_country") or self.answers.get("country"):
             stored_answers.add("country")
-            logger.info(f"Country already stored: {self.answers.get('selected_country') or self.answers.get('country')}")
         if self.answers.get("profession"):
             stored_answers.add("profession")
         if self.answers.get("business_type"):
@@ -351,9 +377,6 @@ class VisaEvaluationFSM:
             stored_answers.add("balance")
         if self.answers.get("travel_history") is not None:
             stored_answers.add("travel")
-            logger.info(f"TRAVEL CHECK: travel_history found in answers: {self.answers.get('travel_history')}")
-        else:
-            logger.info(f"TRAVEL CHECK: travel_history NOT found in answers")
         if self.answers.get("last_travel_year"):
             stored_answers.add("last_travel_year")
         if self.answers.get("valid_visa") is not None:
@@ -368,115 +391,104 @@ class VisaEvaluationFSM:
             stored_answers.add("business_assets")
         if self.answers.get("business_online_presence") is not None:
             stored_answers.add("business_online_presence")
-        
-        # Combine answered questions from current extraction and stored answers
-        all_answered = set(answered_questions) | stored_answers
-        logger.info(f"All answered questions: {all_answered}")
-        logger.info(f"Stored answers: {stored_answers}")
-        logger.info(f"Current extraction answers: {answered_questions}")
-        
+        return stored_answers
+
+    def _pending_questions(self, answered_questions: List[str] = ()) -> List[Tuple[str, FSMStates]]:
+        """Questions still to ask on this applicant's branch, in order"""
+        all_answered = set(answered_questions) | self._stored_questions()
+
         # Determine profession type to decide which branch to follow
         profession = self.answers.get("profession", "").lower()
         is_business = any(word in profession for word in ["business", "owner", "entrepreneur", "proprietor"])
         is_job_holder = any(word in profession for word in ["job", "employed", "employee", "worker", "salary"])
-        
-        # Find the first unanswered question based on profession type
-        for question, state in question_sequence:
-            logger.info(f"Checking question: {question}, state: {state.value}, answered: {question in all_answered}")
-            if question not in all_answered:
-                logger.info(f"Question '{question}' is NOT answered, will ask for: {state.value}")
-                logger.info(f"Current answers: {self.answers}")
-                logger.info(f"All answered questions: {all_answered}")
-                # Handle branching logic
-                if question == "business_type":
-                    if not is_business:
-                        # Skip business_type if not a business person
-                        logger.info(f"Skipping business_type - not a business person")
-                        continue
-                    else:
-                        # If business person, ask business type
-                        logger.info(f"Next unanswered question: {question} -> {state.value}")
-                        return state, self.questions[state]
-                elif question in ["salary", "salary_mode"]:
-                    if not is_job_holder:
-                        # Skip salary questions if not a job holder
-                        logger.info(f"Skipping {question} - not a job holder")
-                        continue
-                    else:
-                        # If job holder, ask salary
-                        logger.info(f"Next unanswered question: {question} -> {state.value}")
-                        return state, self.questions[state]
-                elif question == "last_travel_year":
-                    # Only ask last travel year if user has travel history
-                    travel_history = self.answers.get("travel_history", "")
-                    if isinstance(travel_history, str):
-                        travel_lower = travel_history.lower().strip()
-                        if any(phrase in travel_lower for phrase in ["no", "none", "never", "no history", "no travel", "no travel history", "never traveled", "no international travel"]):
-                            # Skip last travel year if no travel history
-                            logger.info(f"Skipping last_travel_year - no travel history")
-                            continue
-                    elif isinstance(travel_history, list) and len(travel_history) == 0:
-                        # Skip last travel year if travel history is empty list (no travel)
-                        logger.info(f"Skipping last_travel_year - empty travel history list")
-                        continue
-                    # If travel history exists, ask for last travel year
-                    logger.info(f"Next unanswered question: {question} -> {state.value}")
-                    return state, self.questions[state]
-                elif question == "valid_visa":
-                    # Only ask valid visa question if user mentioned USA, UK, Canada, Australia in travel history
-                    travel_history = self.answers.get("travel_history", "")
-                    if isinstance(travel_history, str):
-                        travel_lower = travel_history.lower().strip()
-                        target_countries = ["usa", "united states", "america", "uk", "united kingdom", "britain", "england", "canada", "australia"]
-                        has_target_country = any(country in travel_lower for country in target_countries)
-                        if not has_target_country:
-                            # Skip valid visa question if no target countries in travel history
-                            logger.info(f"Skipping valid_visa - no target countries in travel history")
-                            continue
-                    elif isinstance(travel_history, list) and len(travel_history) == 0:
-                        # Skip valid visa question if travel history is empty list (no travel)
-                        logger.info(f"Skipping valid_visa - empty travel history list")
-                        continue
-                    # If target countries mentioned, ask for valid visa
-                    logger.info(f"Next unanswered question: {question} -> {state.value}")
-                    return state, self.questions[state]
-                elif question == "age":
-                    # Always ask age question
-                    logger.info(f"Next unanswered question: {question} -> {state.value}")
-                    return state, self.questions[state]
-                elif question == "business_premises":
-                    # Only ask business premises if user is a business person
-                    profession = self.answers.get("profession", "").lower()
-                    if "business" in profession:
-                        logger.info(f"Next unanswered question: {question} -> {state.value}")
-                        return state, self.questions[state]
-                    else:
-                        # Skip business premises - not a business person
-                        logger.info(f"Skipping business_premises - not a business person")
-                        continue
-                elif question == "business_online_presence":
-                    # Only ask business online presence if user is a business person
-                    profession = self.answers.get("profession", "").lower()
-                    if "business" in profession:
-                        logger.info(f"Next unanswered question: {question} -> {state.value}")
-                        return state, self.questions[state]
-                    else:
-                        # Skip business online presence - not a business person
-                        logger.info(f"Skipping business_online_presence - not a business person")
-                        continue
-                else:
-                    # For common questions (country, profession, tax_info, balance, travel), proceed normally
-                    if question == "travel":
-                        logger.info(f"TRAVEL QUESTION: Next unanswered question: {question} -> {state.value}")
-                        logger.info(f"TRAVEL QUESTION: Current answers: {self.answers}")
-                        logger.info(f"TRAVEL QUESTION: All answered questions: {all_answered}")
-                    logger.info(f"Next unanswered question: {question} -> {state.value}")
-                    return state, self.questions[state]
-        
+
+        travel_history = self.answers.get("travel_history", "")
+        no_travel = isinstance(travel_history, list) and len(travel_history) == 0
+        if isinstance(travel_history, str):
+            travel_lower = travel_history.lower().strip()
+            no_travel = any(phrase in travel_lower for phrase in ["no", "none", "never", "no history", "no travel", "no travel history", "never traveled", "no international travel"])
+            target_countries = ["usa", "united states", "america", "uk", "united kingdom", "britain", "england", "canada", "australia"]
+            has_target_country = any(country in travel_lower for country in target_countries)
+        else:
+            has_target_country = not no_travel
+
+        pending = []
+        for question, state in self.QUESTION_SEQUENCE:
+            if question in all_answered:
+                continue
+            if question == "business_type" and not is_business:
+                # Skip business_type if not a business person
+                continue
+            if question in ["salary", "salary_mode"] and not is_job_holder:
+                # Skip salary questions if not a job holder
+                continue
+            if question == "last_travel_year" and no_travel:
+                # Only ask last travel year if user has travel history
+                continue
+            if question == "valid_visa" and not has_target_country:
+                # Only ask valid visa question if user mentioned USA, UK, Canada, Australia in travel history
+                continue
+            if question in ["business_premises", "business_online_presence"] and "business" not in profession:
+                # Only ask business premises/online presence if user is a business person
+                continue
+            pending.append((question, state))
+        return pending
+
+    def _find_next_unanswered_question(self, answered_questions: List[str]) -> Tuple[FSMStates, str]:
+        """
+        Find the next unanswered question based on what information is already available
+        """
+        logger.info(f"Current extraction answers: {answered_questions}")
+        pending = self._pending_questions(answered_questions)
+        if settings.FSM_EARLY_EXIT and pending:
+            # Skip questions whose answers can no longer change the outcome
+            self.refresh_profile(answered_questions)
+            skipped = [question for question, _ in pending if question in self.skippable_questions]
+            for question in skipped:
+                if question not in self.skipped_questions:
+                    self.skipped_questions.append(question)
+                    logger.info(f"Skipping question '{question}' - its answer cannot change the outcome")
+            pending = [(question, state) for question, state in pending if question not in self.skippable_questions]
+        if pending:
+            question, state = pending[0]
+            logger.info(f"Next unanswered question: {question} -> {state.value}")
+            return state, self.questions[state]
+
         # If all questions are answered, move to evaluation
         logger.info("All questions answered, moving to evaluation")
         return FSMStates.EVALUATION, "Evaluating your profile..."
-    
+
+    def refresh_profile(self, answered_questions: List[str] = ()) -> ProvisionalScore:
+        """Fold newly stored answers into the features and update the provisional score"""
+        self.profile.sync(self.answers)
+        pending = self._pending_questions(answered_questions)
+        open_answers = {key for question, _ in pending for key in self.QUESTION_ANSWER_KEYS.get(question, ())}
+        rubric = rubric_loader.get()
+        self.provisional = self.profile.estimate(open_answers, rubric)
+
+        # Questions that only feed fields which can no longer change the outcome
+        live = self.profile.live_fields(open_answers, self.provisional, rubric)
+        self.skippable_questions = {
+            question for question, _ in pending
+            if question in self.QUESTION_ANSWER_KEYS and not any(
+                live.intersection(ANSWER_FEATURES[key]) for key in self.QUESTION_ANSWER_KEYS[question]
+            )
+        }
+        return self.provisional
+
+    def get_progress(self) -> Dict[str, Any]:
+        """Share of this applicant's questions answered so far"""
+        if self.current_state in (FSMStates.EVALUATION, FSMStates.COMPLETE):
+            return {"answered": len(self._stored_questions()), "remaining": 0, "percent": 100.0}
+        answered = len(self._stored_questions())
+        remaining = len([q for q, _ in self._pending_questions() if q not in self.skippable_questions])
+        total = answered + remaining
+        return {
+            "answered": answered,
+            "remaining": remaining,
+            "percent": round(answered / total * 100, 1) if total else 0.0,
+        }
+
     def _generate_contextual_response(self, extracted_info: Dict[str, Any], next_question: str) -> str:
         """
         Generate a contextual response that acknowledges provided information
@@ -673,16 +685,10 @@ class VisaEvaluationFSM:
         
         elif current_state == FSMStates.ASK_TAX_INFO:
             # Store tax information and move to balance
-            input_lower = user_input.lower().strip()
-            if "yes" in input_lower:
+            if parse_yes_no(user_input):
                 self.answers["is_tax_filer"] = True
                 # Try to extract annual income if provided
-                import re
-                numbers = re.findall(r'\d+', user_input)
-                if numbers:
-                    self.answers["annual_income"] = int(numbers[0])
-                else:
-                    self.answers["annual_income"] = 0
+                self.answers["annual_income"] = parse_amount(user_input) or 0
             else:
                 self.answers["is_tax_filer"] = False
                 self.answers["annual_income"] = 0
@@ -691,11 +697,11 @@ class VisaEvaluationFSM:
         
         elif current_state == FSMStates.ASK_BALANCE:
             # Store balance information and move to travel
-            input_lower = user_input.lower().strip()
-            if "yes" in input_lower:
-                self.answers["closing_balance"] = True
+            amount = parse_amount(user_input)
+            if amount and amount >= MIN_STATED_BALANCE:
+                self.answers["closing_balance"] = amount
             else:
-                self.answers["closing_balance"] = False
+                self.answers["closing_balance"] = bool(parse_yes_no(user_input))
             
             return FSMStates.ASK_TRAVEL, self.questions[FSMStates.ASK_TRAVEL]
         
@@ -927,17 +933,9 @@ class VisaEvaluationFSM:
     
     def _safe_get_numeric_value(self, value: Any) -> int:
         """Safely extract numeric value from various data types"""
-        if isinstance(value, (int, float)):
-            return int(value)
-        elif isinstance(value, str):
-            # Extract numbers from string
-            import re
-            numbers = re.findall(r'\d+', value)
-            if numbers:
-                return int(numbers[0])
-            return 0
-        else:
-            return 0
+        if isinstance(value, (int, float, str)):
+            return parse_amount(value) or 0
+        return 0
     
     def _handle_off_track_question(self, user_input: str, current_state: FSMStates) -> Tuple[str, bool]:
         """
@@ -1015,6 +1013,11 @@ class FSMService:
     
     def __init__(self):
         self.fsm_instances: Dict[str, VisaEvaluationFSM] = {}
+        # Questionnaire length statistics for completed evaluations (this worker)
+        self.completed_evaluations = 0
+        self.completed_turns = 0
+        self.questions_skipped = 0
+        self.early_exits = 0
     
     async def get_fsm(self, session_id: str) -> VisaEvaluationFSM:
         """Get or create FSM instance for session"""
@@ -1035,7 +1038,12 @@ class FSMService:
                 # Restore state and answers
                 state_name = state_data.get('state', 'ask_country')  # Default to ask_country
                 fsm.current_state = FSMStates(state_name)
-                fsm.answers = state_data.get('answers', {})
+                # set_state stores answers and counters under "context"
+                context = state_data.get('context') or {}
+                fsm.answers = state_data.get('answers') or context.get('answers', {})
+                fsm.turns = context.get('turns', 0)
+                fsm.skipped_questions = context.get('skipped_questions', [])
+                fsm.refresh_profile()
                 logger.info(f"Restored FSM state for session {session_id}: {fsm.current_state.value}")
                 logger.info(f"Restored answers: {fsm.answers}")
             else:
@@ -1060,7 +1068,7 @@ class FSMService:
                 await redis_client.set_state(
                     session_id,
                     fsm.current_state.value,
-                    {"answers": fsm.answers}
+                    {"answers": fsm.answers, "turns": fsm.turns, "skipped_questions": fsm.skipped_questions}
                 )
                 logger.info(f"Successfully saved FSM state for session {session_id}")
             except Exception as e:
@@ -1081,61 +1089,75 @@ class FSMService:
         logger.info(f"get_current_state for session {session_id}: {state_info}")
         return state_info
     
-    async def process_user_input(self, session_id: str, user_input: str, extracted_info: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def process_user_input(
+        self,
+        session_id: str,
+        user_input: str,
+        extracted_info: Dict[str, Any] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
         """
         Process user input and return next state and response
-        Now integrates with RAG for off-track questions and complex evaluation
+        Now integrates with RAG for off-track questions and complex evaluation.
+        on_delta receives partial LLM output while an off-track answer is generated.
         """
         try:
             # Get FSM instance
             fsm = await self.get_fsm(session_id)
+            fsm.turns += 1
             
-            # Check for off-track questions first using RAG
-            rag_response = await rag_service.handle_off_track_question(
-                user_input, 
-                fsm.current_state.value, 
-                {"answers": fsm.answers, "session_id": session_id}
-            )
+            # One local classification decides whether this turn answers the current
+            # question; plain answers skip FAQ search, the LLM and the canned replies
+            decision = turn_classifier.classify(user_input, fsm.current_state.value)
+            if decision.on_track:
+                logger.info(f"Turn classified on-track by {decision.source} ({decision.confidence})")
+            else:
+                # Check for off-track questions first using RAG
+                rag_response = await rag_service.handle_off_track_question(
+                    user_input, 
+                    fsm.current_state.value, 
+                    {"answers": fsm.answers, "session_id": session_id},
+                    on_delta
+                )
             
-            if rag_response.confidence > 0.6 and not rag_response.should_return_to_fsm:
-                # RAG handled the question completely
-                logger.info(f"RAG handled off-track question with confidence: {rag_response.confidence}")
-                return {
-                    "current_state": fsm.current_state.value,
-                    "question": rag_response.answer,
-                    "answers": fsm.answers,
-                    "is_complete": False,
-                    "is_off_track": True,
-                    "rag_handled": True
-                }
+                if rag_response.confidence > 0.6 and not rag_response.should_return_to_fsm:
+                    # RAG handled the question completely
+                    logger.info(f"RAG handled off-track question with confidence: {rag_response.confidence}")
+                    return {
+                        "current_state": fsm.current_state.value,
+                        "question": rag_response.answer,
+                        "answers": fsm.answers,
+                        "is_complete": False,
+                        "is_off_track": True,
+                        "rag_handled": True
+                    }
             
-            # If RAG suggests returning to FSM, use its transition message
-            if rag_response.confidence > 0.6 and rag_response.should_return_to_fsm:
-                # Use RAG's contextual response that includes transition back to FSM
-                logger.info(f"RAG provided contextual response with transition to FSM")
-                return {
-                    "current_state": fsm.current_state.value,
-                    "question": rag_response.answer,
-                    "answers": fsm.answers,
-                    "is_complete": False,
-                    "is_off_track": True,
-                    "rag_handled": True,
-                    "rag_context": rag_response.context_for_fsm
-                }
+                # If RAG suggests returning to FSM, use its transition message
+                if rag_response.confidence > 0.6 and rag_response.should_return_to_fsm:
+                    # Use RAG's contextual response that includes transition back to FSM
+                    logger.info(f"RAG provided contextual response with transition to FSM")
+                    return {
+                        "current_state": fsm.current_state.value,
+                        "question": rag_response.answer,
+                        "answers": fsm.answers,
+                        "is_complete": False,
+                        "is_off_track": True,
+                        "rag_handled": True,
+                        "rag_context": rag_response.context_for_fsm
+                    }
             
-            # Fallback to original FSM logic for on-track questions
-            # Check for off-track questions first (original logic)
-            off_track_response, should_continue = fsm._handle_off_track_question(user_input, fsm.current_state)
-            if not should_continue:
-                # User asked an off-track question, provide response and stay in current state
-                logger.info(f"Handling off-track question: {off_track_response}")
-                return {
-                    "current_state": fsm.current_state.value,
-                    "question": off_track_response + "\n\n" + fsm._get_current_question_with_context(fsm.current_state),
-                    "answers": fsm.answers,
-                    "is_complete": False,
-                    "is_off_track": True
-                }
+                # Canned replies for off-track turns RAG did not answer
+                off_track_response, should_continue = fsm._handle_off_track_question(user_input, fsm.current_state)
+                if not should_continue:
+                    # User asked an off-track question, provide response and stay in current state
+                    logger.info(f"Handling off-track question: {off_track_response}")
+                    return {
+                        "current_state": fsm.current_state.value,
+                        "question": off_track_response + "\n\n" + fsm._get_current_question_with_context(fsm.current_state),
+                        "answers": fsm.answers,
+                        "is_complete": False,
+                        "is_off_track": True
+                    }
             
             # Initialize answered_questions
             answered_questions = []
@@ -1189,20 +1211,19 @@ class FSMService:
             elif fsm.current_state == FSMStates.ASK_TAX_INFO:
                 if "tax_info" not in answered_questions:  # Only store if not already stored by extracted_info
                     # Handle tax information more robustly
-                    input_lower = user_input.lower().strip()
-                    if "yes" in input_lower:
+                    answer = parse_yes_no(user_input)
+                    if answer:
                         fsm.answers["is_tax_filer"] = True
                         # Try to extract annual income if provided
-                        import re
-                        numbers = re.findall(r'\d+', user_input)
-                        if numbers:
-                            fsm.answers["annual_income"] = int(numbers[0])
+                        income = parse_amount(user_input)
+                        if income:
+                            fsm.answers["annual_income"] = income
                         else:
                             # If no income provided, store the response for later processing
                             fsm.answers["tax_response"] = user_input
                         logger.info(f"Stored tax answer: {user_input}")
                         answered_questions.append("tax_info")
-                    elif "no" in input_lower:
+                    elif answer is False:
                         fsm.answers["is_tax_filer"] = False
                         fsm.answers["annual_income"] = 0
                         logger.info(f"Stored tax answer: {user_input}")
@@ -1215,11 +1236,13 @@ class FSMService:
             elif fsm.current_state == FSMStates.ASK_BALANCE:
                 if "balance" not in answered_questions:  # Only store if not already stored by extracted_info
                     # Handle balance information more robustly
-                    input_lower = user_input.lower().strip()
-                    if "yes" in input_lower:
-                        fsm.answers["closing_balance"] = True
-                    elif "no" in input_lower:
-                        fsm.answers["closing_balance"] = False
+                    amount = parse_amount(user_input)
+                    answer = parse_yes_no(user_input)
+                    if amount and amount >= MIN_STATED_BALANCE:
+                        # "No, around 15 lakh" states the actual balance
+                        fsm.answers["closing_balance"] = amount
+                    elif answer is not None:
+                        fsm.answers["closing_balance"] = answer
                     else:
                         # Store the response as is for later processing
                         fsm.answers["balance_response"] = user_input
@@ -1266,11 +1289,9 @@ class FSMService:
                     answered_questions.append("last_travel_year")
             elif fsm.current_state == FSMStates.ASK_VALID_VISA:
                 if "valid_visa" not in answered_questions:  # Only store if not already stored by extracted_info
-                    input_lower = user_input.lower().strip()
-                    if "yes" in input_lower:
-                        fsm.answers["valid_visa"] = True
-                    elif "no" in input_lower:
-                        fsm.answers["valid_visa"] = False
+                    answer = parse_yes_no(user_input)
+                    if answer is not None:
+                        fsm.answers["valid_visa"] = answer
                     else:
                         fsm.answers["valid_visa"] = user_input
                     logger.info(f"Stored valid visa answer (explicit state): {user_input}")
@@ -1278,16 +1299,12 @@ class FSMService:
             elif fsm.current_state == FSMStates.ASK_SCHENGEN_REJECTION:
                 if "schengen_rejection" not in answered_questions:  # Only store if not already stored by extracted_info
                     # Handle Schengen rejection information more robustly
-                    input_lower = user_input.lower().strip()
-                    if "yes" in input_lower:
-                        # Try to extract year if provided
-                        import re
-                        years = re.findall(r'\b(20[12]\d|19[89]\d)\b', user_input)
-                        if years:
-                            fsm.answers["schengen_rejection"] = {"has_rejection": True, "year": years[0]}
-                        else:
-                            fsm.answers["schengen_rejection"] = {"has_rejection": True, "year": None}
-                    elif "no" in input_lower:
+                    answer = parse_yes_no(user_input)
+                    if answer:
+                        # Try to extract year if provided ("2021", "2 years ago")
+                        year = parse_year(user_input)
+                        fsm.answers["schengen_rejection"] = {"has_rejection": True, "year": str(year) if year else None}
+                    elif answer is False:
                         fsm.answers["schengen_rejection"] = {"has_rejection": False, "year": None}
                     else:
                         # Store the response as is for later processing
@@ -1302,11 +1319,9 @@ class FSMService:
             elif fsm.current_state == FSMStates.ASK_BUSINESS_PREMISES:
                 if "business_premises" not in answered_questions:  # Only store if not already stored by extracted_info
                     # Handle business premises information more robustly
-                    input_lower = user_input.lower().strip()
-                    if "yes" in input_lower:
-                        fsm.answers["business_premises"] = True
-                    elif "no" in input_lower:
-                        fsm.answers["business_premises"] = False
+                    answer = parse_yes_no(user_input)
+                    if answer is not None:
+                        fsm.answers["business_premises"] = answer
                     else:
                         # Store the response as is for later processing
                         fsm.answers["business_premises"] = user_input
@@ -1314,11 +1329,9 @@ class FSMService:
                     answered_questions.append("business_premises")
             elif fsm.current_state == FSMStates.ASK_BUSINESS_ASSETS:
                 if "business_assets" not in answered_questions:  # Only store if not already stored by extracted_info
-                    input_lower = user_input.lower().strip()
-                    if "yes" in input_lower:
-                        fsm.answers["business_assets"] = True
-                    elif "no" in input_lower:
-                        fsm.answers["business_assets"] = False
+                    answer = parse_yes_no(user_input)
+                    if answer is not None:
+                        fsm.answers["business_assets"] = answer
                     else:
                         # Store the response as is for later processing
                         fsm.answers["business_assets"] = user_input
@@ -1327,11 +1340,9 @@ class FSMService:
             elif fsm.current_state == FSMStates.ASK_BUSINESS_ONLINE_PRESENCE:
                 if "business_online_presence" not in answered_questions:  # Only store if not already stored by extracted_info
                     # Handle business online presence information more robustly
-                    input_lower = user_input.lower().strip()
-                    if "yes" in input_lower:
-                        fsm.answers["business_online_presence"] = True
-                    elif "no" in input_lower:
-                        fsm.answers["business_online_presence"] = False
+                    answer = parse_yes_no(user_input)
+                    if answer is not None:
+                        fsm.answers["business_online_presence"] = answer
                     else:
                         # Store the response as is for later processing
                         fsm.answers["business_online_presence"] = user_input
@@ -1349,20 +1360,29 @@ class FSMService:
                 # Update FSM state
                 fsm.current_state = next_state
             
+            # Fold this turn's answers into the incremental features and provisional score
+            provisional = fsm.refresh_profile()
+            logger.info(f"Provisional success ratio: {provisional.success_ratio}% "
+                        f"(range {provisional.min_ratio}-{provisional.max_ratio}%)")
+            
             # Check if evaluation is complete
             if next_state == FSMStates.EVALUATION:
                 # Perform scenario-based evaluation using the new evaluation service
                 target_country = fsm.answers.get("selected_country") or fsm.answers.get("country")
-                scenario_evaluation = await evaluation_service.evaluate_visa_application(fsm.answers, target_country)
+                # Features are already up to date, so evaluation only scores them
+                scenario_evaluation = await evaluation_service.evaluate_visa_application(
+                    fsm.answers, target_country, features=fsm.profile.features
+                )
+                
+                # Store evaluation results first so the summary reuses them instead of re-scoring
+                fsm.answers["evaluation"] = scenario_evaluation
                 
                 # Format response using the evaluation service
                 response_message = await evaluation_service.get_evaluation_summary(fsm.answers, target_country)
                 
-                # Store evaluation results
-                fsm.answers["evaluation"] = scenario_evaluation
-                
                 # Move to complete state
                 fsm.current_state = FSMStates.COMPLETE
+                self._record_completion(fsm)
                 
                 # Save FSM state
                 await self.save_fsm_state(session_id)
@@ -1385,7 +1405,9 @@ class FSMService:
                 "current_state": fsm.current_state.value,
                 "question": response_message,
                 "answers": fsm.answers,
-                "is_complete": False
+                "is_complete": False,
+                "progress": fsm.get_progress(),
+                "provisional": provisional.to_dict()
             }
             
         except Exception as e:
@@ -1394,12 +1416,36 @@ class FSMService:
 
 
     
+    def _record_completion(self, fsm: VisaEvaluationFSM):
+        self.completed_evaluations += 1
+        self.completed_turns += fsm.turns
+        self.questions_skipped += len(fsm.skipped_questions)
+        if fsm.skipped_questions:
+            self.early_exits += 1
+        logger.info(f"Evaluation completed in {fsm.turns} turns, skipped questions: {fsm.skipped_questions}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Average questionnaire length per completed evaluation"""
+        completed = self.completed_evaluations
+        return {
+            "early_exit_enabled": settings.FSM_EARLY_EXIT,
+            "completed_evaluations": completed,
+            "average_turns": round(self.completed_turns / completed, 2) if completed else 0.0,
+            "average_questions_skipped": round(self.questions_skipped / completed, 2) if completed else 0.0,
+            "early_exits": self.early_exits,
+            "active_sessions": len(self.fsm_instances),
+            "turn_classifier": turn_classifier.get_stats(),
+        }
+    
     async def reset_session(self, session_id: str):
         """Reset session to initial state"""
         if session_id in self.fsm_instances:
             fsm = self.fsm_instances[session_id]
             fsm.current_state = FSMStates.GREETING
             fsm.answers = {}
+            fsm.turns = 0
+            fsm.skipped_questions = []
+            fsm.refresh_profile()
             await self.save_fsm_state(session_id)
             logger.info(f"Reset session {session_id} to initial state")
 
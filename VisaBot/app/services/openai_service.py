@@ -1,12 +1,14 @@
 """
 OpenAI service for LLM interactions
 """
+import re
 import tiktoken
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 from openai import AsyncOpenAI
 from loguru import logger
 
 from app.core.config import settings
+from app.services.evaluation.parsing import parse_amount, parse_year
 
 
 class OpenAIService:
@@ -44,6 +46,44 @@ class OpenAIService:
         
         return truncated_messages
     
+    def _prepare_messages(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = None,
+        context: Dict[str, Any] = None
+    ) -> List[Dict[str, str]]:
+        """Build the API message list with system prompt and context"""
+        api_messages = []
+        
+        # Add system prompt if provided
+        if system_prompt:
+            api_messages.append({"role": "system", "content": system_prompt})
+        
+        # Add context if provided
+        if context:
+            context_message = f"Context: {str(context)}"
+            api_messages.append({"role": "system", "content": context_message})
+        
+        # Add conversation messages
+        api_messages.extend(messages)
+        
+        # Truncate messages if needed
+        truncated = self.truncate_messages(api_messages)
+        if len(truncated) < len(api_messages):
+            logger.warning(f"Dropped {len(api_messages) - len(truncated)} of {len(api_messages)} messages "
+                           f"to fit {self.max_tokens} tokens")
+        return truncated
+    
+    def _log_tokens(self, model: str, api_messages: List[Dict[str, str]], completion: str, usage: Any = None):
+        """Log the tokens a call used, from the API's usage report when there is one"""
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = sum(self.count_tokens(m["content"]) for m in api_messages)
+        if completion_tokens is None:
+            completion_tokens = self.count_tokens(completion or "")
+        logger.info(f"LLM call to {model}: {prompt_tokens} prompt + {completion_tokens} completion tokens")
+    
     async def generate_response(
         self,
         messages: List[Dict[str, str]],
@@ -56,23 +96,7 @@ class OpenAIService:
             # Choose model based on use case
             model = self.evaluation_model if use_evaluation_model else self.default_model
             
-            # Prepare messages
-            api_messages = []
-            
-            # Add system prompt if provided
-            if system_prompt:
-                api_messages.append({"role": "system", "content": system_prompt})
-            
-            # Add context if provided
-            if context:
-                context_message = f"Context: {str(context)}"
-                api_messages.append({"role": "system", "content": context_message})
-            
-            # Add conversation messages
-            api_messages.extend(messages)
-            
-            # Truncate messages if needed
-            api_messages = self.truncate_messages(api_messages)
+            api_messages = self._prepare_messages(messages, system_prompt, context)
             
             # Make API call
             response = await self.client.chat.completions.create(
@@ -82,12 +106,52 @@ class OpenAIService:
                 temperature=self.temperature
             )
             
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            self._log_tokens(model, api_messages, content, getattr(response, "usage", None))
+            return content
             
         except Exception as e:
             logger.error(f"OpenAI API error: {e}")
             raise
     
+    async def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        on_delta: Callable[[str], Awaitable[None]],
+        system_prompt: str = None,
+        context: Dict[str, Any] = None,
+        use_evaluation_model: bool = False
+    ) -> str:
+        """Generate a response, passing each content delta to on_delta, and return the full text"""
+        try:
+            model = self.evaluation_model if use_evaluation_model else self.default_model
+            api_messages = self._prepare_messages(messages, system_prompt, context)
+            
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=api_messages,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                stream=True
+            )
+            
+            parts = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    await on_delta(delta)
+            
+            content = "".join(parts)
+            self._log_tokens(model, api_messages, content)
+            return content
+            
+        except Exception as e:
+            logger.error(f"OpenAI streaming error: {e}")
+            raise
+    
     async def analyze_intent(self, message: str) -> Dict[str, Any]:
         """Analyze user intent from message"""
         system_prompt = """
@@ -316,10 +380,11 @@ class OpenAIService:
             }
             questions_answered.append("salary_mode")
         
-        # Basic financial detection
-        if "2 million" in input_lower or "2m" in input_lower or "2000000" in input_lower:
+        # Basic financial detection; a bare amount is only a balance when the balance was asked for
+        amount = parse_amount(input_lower) if state == "ask_balance" else None
+        if amount:
             extracted_info["closing_balance"] = {
-                "value": 2000000,
+                "value": amount,
                 "confidence": 0.8,
                 "source": "explicit"
             }
@@ -364,13 +429,11 @@ class OpenAIService:
                 }
                 questions_answered.append("travel")
         
-        # Basic last travel year detection
-        import re
-        year_pattern = r'\b(20[12]\d|19[89]\d)\b'  # Match years 1980-2029
-        years = re.findall(year_pattern, input_lower)
-        if years:
+        # Basic last travel year detection; "this year" or "a year ago" only mean it when asked
+        year = parse_year(input_lower) if state in ("ask_last_travel_year", "ask_schengen_rejection") else None
+        if year and state == "ask_last_travel_year":
             extracted_info["last_travel_year"] = {
-                "value": years[0],
+                "value": str(year),
                 "confidence": 0.8,
                 "source": "explicit"
             }
@@ -399,10 +462,9 @@ class OpenAIService:
         if any(phrase in input_lower for phrase in schengen_rejection_keywords):
             if "yes" in input_lower or "had" in input_lower or "rejected" in input_lower:
                 # Try to extract year if provided
-                years = re.findall(r'\b(20[12]\d|19[89]\d)\b', input_lower)
-                if years:
+                if year:
                     extracted_info["schengen_rejection"] = {
-                        "value": {"has_rejection": True, "year": years[0]},
+                        "value": {"has_rejection": True, "year": str(year)},
                         "confidence": 0.8,
                         "source": "explicit"
                     }
@@ -0,0 +1,188 @@
+"""
+Monthly partitions of chat_messages: created ahead of time, dropped after the retention period
+"""
+import asyncio
+import re
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.config import settings
+
+PARENT_TABLE = "chat_messages"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_LOCK_KEY = 0x7669736170  # Advisory lock held while partitions are created or dropped
+_PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """chat_messages_y2025m06 holds the messages created in June 2025 (UTC)"""
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def create_partition_sql(month: date) -> str:
+    lower = month_start(month)
+    upper = add_months(lower, 1)
+    return (f"CREATE TABLE IF NOT EXISTS {partition_name(lower)} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{lower.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')")
+
+
+def expired_partitions(names: Iterable[str], retention_months: int, today: date) -> List[str]:
+    """Monthly partitions entirely older than the retention period; none when retention_months is 0"""
+    if retention_months <= 0:
+        return []
+    oldest_kept = add_months(month_start(today), -retention_months)
+    return sorted(name for name in names if (month := partition_month(name)) is not None and month < oldest_kept)
+
+
+async def is_partitioned(conn) -> bool:
+    """False while chat_messages is still the unpartitioned table (before the migration)"""
+    relkind = (await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": PARENT_TABLE}
+    )).scalar()
+    return relkind == "p"
+
+
+async def list_partitions(conn) -> List[str]:
+    rows = await conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table)"
+    ), {"table": PARENT_TABLE})
+    return [row[0] for row in rows]
+
+
+async def ensure_partitions(conn, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """
+    Create the partitions for this month and the next months_ahead months, and the default one.
+
+    The default partition only catches messages outside every monthly range
+    (clock skew, back-filled history), so inserts never fail; creating months
+    ahead of time keeps it empty.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    existing = set(await list_partitions(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(month_start(today), offset)
+        if partition_name(month) not in existing:
+            await conn.execute(text(create_partition_sql(month)))
+            created.append(partition_name(month))
+    if DEFAULT_PARTITION not in existing:
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+        created.append(DEFAULT_PARTITION)
+    return created
+
+
+async def drop_expired_partitions(conn, retention_months: int, today: Optional[date] = None) -> List[str]:
+    """Detach and drop the months past the retention period; far cheaper than deleting their rows"""
+    today = today or datetime.now(timezone.utc).date()
+    dropped = expired_partitions(await list_partitions(conn), retention_months, today)
+    for name in dropped:
+        await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        await conn.execute(text(f"DROP TABLE {name}"))
+    return dropped
+
+
+class PartitionMaintainer:
+    """Creates upcoming chat_messages partitions and drops expired ones in the background"""
+
+    def __init__(self, engine_factory: Optional[Callable[[], Any]] = None, interval: float = None,
+                 months_ahead: int = None, retention_months: int = None):
+        self.engine_factory = engine_factory
+        self.interval = settings.PARTITION_MAINTENANCE_INTERVAL if interval is None else interval
+        self.months_ahead = settings.MESSAGE_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+        self.retention_months = settings.MESSAGE_RETENTION_MONTHS if retention_months is None else retention_months
+        self.runs = 0
+        self.failures = 0
+        self.created: List[str] = []
+        self.dropped: List[str] = []
+        self.last_run: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _engine(self):
+        if self.engine_factory is not None:
+            return self.engine_factory()
+        from app.core import database
+        if database.engine is None:
+            raise RuntimeError("Database is not initialized")
+        return database.engine
+
+    async def maintain(self, conn, today: Optional[date] = None) -> Dict[str, List[str]]:
+        """Create and drop partitions on an open connection, one worker at a time"""
+        if not await is_partitioned(conn):
+            return {"created": [], "dropped": []}
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+        created = await ensure_partitions(conn, self.months_ahead, today)
+        dropped = await drop_expired_partitions(conn, self.retention_months, today)
+        return {"created": created, "dropped": dropped}
+
+    async def run_once(self) -> Optional[Dict[str, List[str]]]:
+        try:
+            async with self._engine().begin() as conn:
+                result = await self.maintain(conn)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"Error maintaining chat message partitions: {e}")
+            return None
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_error = None
+        self.created.extend(result["created"])
+        self.dropped.extend(result["dropped"])
+        if result["created"] or result["dropped"]:
+            logger.info(f"Chat message partitions created: {result['created']}, dropped: {result['dropped']}")
+        return result
+
+    def start(self):
+        """Maintain now and then every interval"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._maintain_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _maintain_loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval": self.interval,
+            "months_ahead": self.months_ahead,
+            "retention_months": self.retention_months,
+            "runs": self.runs,
+            "failures": self.failures,
+            "created": self.created[-12:],
+            "dropped": self.dropped[-12:],
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+
+# Global partition maintainer instance
+partition_maintainer = PartitionMaintainer()
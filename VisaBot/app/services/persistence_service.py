@@ -0,0 +1,438 @@
+"""
+Write-behind persistence of chat messages, session states and evaluations to Postgres
+"""
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.core.config import settings
+from app.models.database import ChatMessage, ChatSession, VisaEvaluation
+from app.services.database_service import calculate_risk_level
+from app.services.fsm_service import FSMStates
+
+MESSAGE_COLUMNS = ("id", "session_id", "role", "content", "message_metadata", "created_at")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _jsonable(value: Any) -> Any:
+    """Plain JSON types only (dates and other objects become strings)"""
+    return json.loads(json.dumps(value, default=str))
+
+
+@dataclass
+class MessageRecord:
+    session_id: str
+    role: str
+    content: str
+    metadata: Optional[Dict[str, Any]] = None
+    created_at: datetime = field(default_factory=_utcnow)
+
+
+@dataclass
+class SessionRecord:
+    session_id: str
+    state: str
+    answers: Dict[str, Any]
+    last_activity: datetime = field(default_factory=_utcnow)
+
+
+@dataclass
+class EvaluationRecord:
+    session_id: str
+    evaluation: Dict[str, Any]
+    answers: Dict[str, Any]
+    target_country: Optional[str] = None
+    created_at: datetime = field(default_factory=_utcnow)
+
+
+@dataclass
+class Batch:
+    sessions: List[SessionRecord] = field(default_factory=list)
+    messages: List[MessageRecord] = field(default_factory=list)
+    evaluations: List[EvaluationRecord] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.sessions) + len(self.messages) + len(self.evaluations)
+
+    def add(self, record):
+        if isinstance(record, MessageRecord):
+            self.messages.append(record)
+        elif isinstance(record, SessionRecord):
+            self.sessions.append(record)
+        else:
+            self.evaluations.append(record)
+
+    @property
+    def records(self) -> list:
+        """Every record, sessions first; the order within each kind is kept"""
+        return [*self.sessions, *self.messages, *self.evaluations]
+
+    @classmethod
+    def of(cls, records) -> "Batch":
+        batch = cls()
+        for record in records:
+            batch.add(record)
+        return batch
+
+    @property
+    def session_ids(self) -> List[str]:
+        """Every session the batch refers to, in first-seen order"""
+        seen = dict.fromkeys(r.session_id for r in self.sessions)
+        seen.update(dict.fromkeys(r.session_id for r in self.messages))
+        seen.update(dict.fromkeys(r.session_id for r in self.evaluations))
+        return list(seen)
+
+
+def session_rows(batch: Batch) -> List[Dict[str, Any]]:
+    """One row per session with a state change, the latest one winning"""
+    latest: Dict[str, SessionRecord] = {}
+    for record in batch.sessions:
+        latest[record.session_id] = record
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "session_id": record.session_id,
+            "current_state": record.state,
+            "context": _jsonable({"answers": record.answers}),
+            "is_active": record.state != FSMStates.COMPLETE.value,
+            "last_activity": record.last_activity,
+            "updated_at": record.last_activity,
+        }
+        for record in latest.values()
+    ]
+
+
+def message_rows(batch: Batch) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "session_id": record.session_id,
+            "role": record.role,
+            "content": record.content,
+            "message_metadata": _jsonable(record.metadata) if record.metadata else None,
+            "created_at": record.created_at,
+        }
+        for record in batch.messages
+    ]
+
+
+def eligibility_status(evaluation: Dict[str, Any]) -> str:
+    if evaluation.get("should_apply"):
+        return "eligible"
+    return "conditional" if (evaluation.get("success_ratio") or 0) >= 40 else "not_eligible"
+
+
+def evaluation_rows(batch: Batch) -> List[Dict[str, Any]]:
+    rows = []
+    for record in batch.evaluations:
+        score = int(record.evaluation.get("success_ratio") or 0)
+        closing_balance = record.answers.get("closing_balance")
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "user_id": None,
+            "session_id": record.session_id,
+            "evaluation_number": f"VE{uuid.uuid4().hex[:8].upper()}",
+            "visa_type": "schengen",
+            "destination_country": record.target_country or "unknown",
+            "purpose_of_travel": str(record.answers.get("purpose_of_travel") or "evaluation"),
+            "employment_status": record.answers.get("profession"),
+            "financial_means": None if closing_balance is None else str(closing_balance),
+            "eligibility_score": score,
+            "eligibility_status": eligibility_status(record.evaluation),
+            "risk_level": calculate_risk_level(score),
+            "evaluation_data": _jsonable({"answers": record.answers, "evaluation": record.evaluation}),
+            "assessment_notes": record.evaluation.get("overall_recommendation"),
+            "created_at": record.created_at,
+            "updated_at": record.created_at,
+        })
+    return rows
+
+
+class PostgresWriter:
+    """
+    Writes a batch in one transaction.
+
+    Sessions go first, because messages and evaluations reference them:
+    state changes are upserted (latest state wins) and sessions only seen in
+    messages are inserted if missing. Messages and evaluations are then
+    inserted with multi-row INSERTs, or messages with COPY when use_copy is
+    set and the driver is asyncpg.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None, use_copy: bool = None):
+        self.session_factory = session_factory
+        self.use_copy = settings.PERSIST_USE_COPY if use_copy is None else use_copy
+
+    def _factory(self):
+        if self.session_factory is not None:
+            return self.session_factory
+        from app.core import database
+        if database.AsyncSessionLocal is None:
+            raise RuntimeError("Database is not initialized")
+        return database.AsyncSessionLocal
+
+    async def write(self, batch: Batch):
+        async with self._factory()() as db:
+            async with db.begin():
+                states = session_rows(batch)
+                if states:
+                    stmt = pg_insert(ChatSession.__table__)
+                    await db.execute(stmt.on_conflict_do_update(
+                        index_elements=["session_id"],
+                        set_={column: stmt.excluded[column]
+                              for column in ("current_state", "context", "is_active", "last_activity", "updated_at")},
+                    ), states)
+                known = {row["session_id"] for row in states}
+                placeholders = [{"id": str(uuid.uuid4()), "session_id": session_id}
+                                for session_id in batch.session_ids if session_id not in known]
+                if placeholders:
+                    stmt = pg_insert(ChatSession.__table__).on_conflict_do_nothing(index_elements=["session_id"])
+                    await db.execute(stmt, placeholders)
+
+                messages = message_rows(batch)
+                if messages and self.use_copy:
+                    await self._copy_messages(db, messages)
+                elif messages:
+                    await db.execute(insert(ChatMessage.__table__), messages)
+
+                evaluations = evaluation_rows(batch)
+                if evaluations:
+                    await db.execute(insert(VisaEvaluation.__table__), evaluations)
+
+    async def _copy_messages(self, db, rows: List[Dict[str, Any]]):
+        connection = await (await db.connection()).get_raw_connection()
+        records = [
+            tuple(json.dumps(row[c]) if c == "message_metadata" and row[c] is not None else row[c]
+                  for c in MESSAGE_COLUMNS)
+            for row in rows
+        ]
+        await connection.driver_connection.copy_records_to_table(
+            ChatMessage.__tablename__, records=records, columns=list(MESSAGE_COLUMNS)
+        )
+
+
+_STOP = object()
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """Failures that say nothing about the records themselves, so splitting the batch cannot help"""
+    return (isinstance(error, (OSError, asyncio.TimeoutError, OperationalError, InterfaceError))
+            or getattr(error, "connection_invalidated", False))
+
+
+class PersistenceService:
+    """
+    In-process write-behind queue in front of Postgres.
+
+    Turns only append a record to an asyncio queue, which never waits, so
+    request latency does not depend on the database. A background worker
+    collects records into a batch until batch_size records or flush_interval
+    seconds after the first one, and writes the batch in one transaction. A
+    failed write is retried with backoff; if it still fails because of the
+    records (a constraint or a bad value, not the connection), the batch is
+    split in halves until only the records that cannot be written are
+    dropped (and counted). When the queue is full new records are dropped
+    rather than slowing requests. stop() writes out everything queued before
+    it returns.
+    """
+
+    def __init__(self, writer: Optional[PostgresWriter] = None, batch_size: int = None,
+                 flush_interval: float = None, queue_size: int = None, max_retries: int = None,
+                 retry_delay: float = 0.5):
+        self.writer = writer or PostgresWriter()
+        self.batch_size = batch_size or settings.PERSIST_BATCH_SIZE
+        self.flush_interval = settings.PERSIST_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.queue_size = queue_size or settings.PERSIST_QUEUE_SIZE
+        self.max_retries = settings.PERSIST_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_delay = retry_delay
+        self.enqueued = 0
+        self.written = {"sessions": 0, "messages": 0, "evaluations": 0}
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_flush_ms = 0.0
+        self._in_flight = 0  # Records taken off the queue and not yet written or dropped
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None
+
+    # -----------------------
+    # Lifecycle
+    # -----------------------
+    def start(self):
+        """Start the background writer"""
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._worker = asyncio.create_task(self._run())
+            logger.info(f"Write-behind persistence started (batch {self.batch_size}, every {self.flush_interval}s)")
+
+    async def stop(self, timeout: float = None):
+        """Write out every queued record, then stop the writer"""
+        if self._worker is None:
+            return
+        worker, self._worker = self._worker, None  # New records are refused from here on
+
+        async def drain():
+            await self._queue.put(_STOP)
+            await worker
+
+        try:
+            await asyncio.wait_for(drain(), timeout or settings.PERSIST_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+            # The batch the worker was writing is lost along with everything still queued
+            lost = self._in_flight
+            while not self._queue.empty():
+                lost += self._queue.get_nowait() is not _STOP
+            self._in_flight = 0
+            self.dropped += lost
+            logger.error(f"Persistence drain timed out, {lost} records were not written")
+
+    # -----------------------
+    # Recording (called on the request path)
+    # -----------------------
+    def _enqueue(self, record) -> bool:
+        if self._worker is None:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Persistence queue full, {self.dropped} records dropped so far")
+            return False
+        self.enqueued += 1
+        return True
+
+    def record_message(self, session_id: str, role: str, content: str,
+                       metadata: Optional[Dict[str, Any]] = None) -> bool:
+        return self._enqueue(MessageRecord(session_id, role, content, metadata))
+
+    def record_session(self, session_id: str, state: str, answers: Dict[str, Any]) -> bool:
+        # Copied, as the FSM keeps updating its answers dict after this turn
+        return self._enqueue(SessionRecord(session_id, state, dict(answers)))
+
+    def record_evaluation(self, session_id: str, evaluation: Dict[str, Any], answers: Dict[str, Any],
+                          target_country: Optional[str] = None) -> bool:
+        return self._enqueue(EvaluationRecord(session_id, dict(evaluation), dict(answers), target_country))
+
+    # -----------------------
+    # Background writer
+    # -----------------------
+    async def _next_batch(self) -> "tuple[Batch, bool]":
+        """Records until the batch is full or flush_interval has passed since the first; True when stopping"""
+        loop = asyncio.get_running_loop()
+        batch = Batch()
+        record = await self._queue.get()
+        deadline = loop.time() + self.flush_interval
+        while record is not _STOP:
+            batch.add(record)
+            self._in_flight += 1
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                record = self._queue.get_nowait()
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return batch, False
+            getter = asyncio.ensure_future(self._queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=remaining)
+            if not done:
+                # A cancelled get leaves any record it was about to receive in the queue
+                getter.cancel()
+                await asyncio.gather(getter, return_exceptions=True)
+                return batch, False
+            record = getter.result()
+        return batch, True
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._next_batch()
+            if len(batch):
+                await self._flush(batch)
+            if stopping:
+                logger.info("Write-behind persistence drained and stopped")
+                return
+
+    async def _flush(self, batch: Batch):
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.writer.write(batch)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    if len(batch) > 1 and not _is_connection_error(e):
+                        logger.error(f"Writing {len(batch)} records failed {attempt + 1} times, "
+                                     f"splitting the batch to find the bad records: {e}")
+                        await self._write_split(batch)
+                    else:
+                        self._dropped_failed(batch, attempt + 1, e)
+                    return
+                logger.warning(f"Persistence write failed (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 3)
+        self._count_written(batch)
+
+    async def _write_split(self, batch: Batch):
+        """Write a batch in halves, in order, narrowing a failure down to the records that cause it"""
+        records = batch.records
+        middle = len(records) // 2
+        for part in (Batch.of(records[:middle]), Batch.of(records[middle:])):
+            try:
+                await self.writer.write(part)
+            except Exception as e:
+                if len(part) > 1 and not _is_connection_error(e):
+                    await self._write_split(part)
+                else:
+                    self._dropped_failed(part, 1, e)
+                continue
+            self._count_written(part)
+
+    def _dropped_failed(self, batch: Batch, attempts: int, error: Exception):
+        self.failed += len(batch)
+        self._in_flight -= len(batch)
+        logger.error(f"Dropping {len(batch)} records after {attempts} failed writes: {error}")
+
+    def _count_written(self, batch: Batch):
+        self._in_flight -= len(batch)
+        self.batches += 1
+        self.written["sessions"] += len(batch.sessions)
+        self.written["messages"] += len(batch.messages)
+        self.written["evaluations"] += len(batch.evaluations)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue and writer statistics (this worker)"""
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "enqueued": self.enqueued,
+            "written": dict(self.written),
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Global persistence service instance
+persistence_service = PersistenceService()
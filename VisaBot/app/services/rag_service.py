@@ -4,25 +4,23 @@ Handles off-track questions and complex evaluation scenarios
 """
 import json
 import asyncio
-import os
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
 from dataclasses import dataclass
 from loguru import logger
 
 from app.services.openai_service import openai_service
+from app.services.classification.turns import turn_classifier
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.scenario_matcher import ScenarioMatch
+from app.services.retrieval.embedding import HashedNgramEmbedder
+from app.services.retrieval.faq import FAQEntry, FAQHit, FAQIndex
+from app.services.retrieval.answer_cache import AnswerCache
+from app.services.retrieval.knowledge_base import (
+    DatabaseKnowledgeSource, FileKnowledgeSource, KnowledgeBase, KnowledgeSnapshot,
+)
 from app.core.config import settings
 
 
-@dataclass
-class FAQEntry:
-    """FAQ entry structure"""
-    question: str
-    answer: str
-    category: str
-    keywords: List[str]
-    confidence: float = 1.0
-
-
 @dataclass
 class RAGResponse:
     """RAG response structure"""
@@ -52,217 +50,73 @@ class RAGService:
     
     def __init__(self):
         self.openai_service = openai_service
-        self.faq_database = self._initialize_faq_database()
-        self.evaluation_rules = self._initialize_evaluation_rules()
-        self.scenarios = self._load_scenarios()
-        self.evaluation_rules_text = self._load_evaluation_rules()
-        
-    def _load_scenarios(self) -> str:
-        """Load scenarios from scenarios.md file"""
+        # FAQs, evaluation rules, scenarios and knowledge sections from app/prompts (or the
+        # database), rebuilt in the background and swapped in when the content changes
+        self.knowledge_base = KnowledgeBase(
+            source=DatabaseKnowledgeSource() if settings.KNOWLEDGE_SOURCE == "database" else FileKnowledgeSource(),
+            embedder_factory=lambda: HashedNgramEmbedder() if settings.FAQ_SEMANTIC_SEARCH else None,
+            cache_dir=settings.FAQ_EMBEDDING_CACHE_DIR,
+            token_counter=self.openai_service.count_tokens,
+            reload_interval=settings.KNOWLEDGE_RELOAD_INTERVAL,
+        )
+        self.knowledge_base.on_swap(self._on_knowledge_swap)
+        # Generated off-track answers, reused for repeated and rephrased questions
+        self.answer_cache = AnswerCache(
+            embedder=self.faq_index.embedder, namespace=self.knowledge_base.current.digest,
+        ) if settings.ANSWER_CACHE_ENABLED else None
+
+    @property
+    def faq_database(self) -> Tuple[FAQEntry, ...]:
+        return self.knowledge_base.current.faq_entries
+
+    @property
+    def faq_index(self) -> FAQIndex:
+        return self.knowledge_base.current.faq_index
+
+    @property
+    def evaluation_rules(self) -> Dict[str, Any]:
+        return self.knowledge_base.current.evaluation_rules
+
+    def _on_knowledge_swap(self, previous: KnowledgeSnapshot, current: KnowledgeSnapshot):
+        """Answers generated from the previous knowledge must not be served again"""
+        if self.answer_cache:
+            self.answer_cache.rekey(current.digest, embedder=current.faq_index.embedder)
+
+    def _country_rules(self, country: Optional[str] = None, text: Optional[str] = None) -> str:
+        """Rules from the country's pack (by name, or the first country mentioned in text), if there is one"""
         try:
-            scenarios_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'scenarios.md')
-            with open(scenarios_path, 'r', encoding='utf-8') as file:
-                scenarios = file.read()
-            logger.info("Successfully loaded scenarios from scenarios.md")
-            return scenarios
+            packs = self.knowledge_base.current.country_packs
+            pack = packs.get(country) if country else packs.find_in_text(text or "")
+            return pack.render() if pack else ""
         except Exception as e:
-            logger.error(f"Error loading scenarios: {e}")
-            return "# Visa Evaluation Scenarios\n\nNo scenarios available."
-    
-    def _load_evaluation_rules(self) -> str:
-        """Load evaluation rules from evaluation_rules.md file"""
+            logger.error(f"Error loading country rules: {e}")
+            return ""
+
+    def _knowledge_context(self, query: str) -> str:
+        """Most relevant knowledge sections for a query, within the prompt token budget"""
         try:
-            rules_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'evaluation_rules.md')
-            with open(rules_path, 'r', encoding='utf-8') as file:
-                rules = file.read()
-            logger.info("Successfully loaded evaluation rules from evaluation_rules.md")
-            return rules
+            return self.knowledge_base.current.chunks.context(query, settings.KNOWLEDGE_TOP_K,
+                                                              settings.KNOWLEDGE_MAX_TOKENS)
         except Exception as e:
-            logger.error(f"Error loading evaluation rules: {e}")
-            return "# Evaluation Rules\n\nNo evaluation rules available."
-    
-    def _initialize_faq_database(self) -> List[FAQEntry]:
-        """Initialize FAQ database with visa-related information"""
-        return [
-            # Country-specific information
-            FAQEntry(
-                question="Which Schengen country has the highest visa approval rate?",
-                answer="Germany typically has the highest approval rate for Schengen visas, followed by France and Italy. However, approval rates vary based on individual circumstances, documentation quality, and the specific embassy's current policies.",
-                category="country_selection",
-                keywords=["best country", "highest approval", "success rate", "which country", "approval rate", "good country"]
-            ),
-            FAQEntry(
-                question="What are the visa fees for Schengen countries?",
-                answer="Schengen visa fees are standardized: €90 for adults, €40 for children (6-12 years), and free for children under 6. Some categories like students, researchers, and family members may have reduced or waived fees.",
-                category="fees",
-                keywords=["cost", "fee", "price", "how much", "visa fee", "application cost"]
-            ),
-            FAQEntry(
-                question="How long does visa processing take?",
-                answer="Standard Schengen visa processing takes 15 calendar days, but can extend up to 30 days in some cases. During peak seasons (summer, holidays), processing may take longer. It's recommended to apply at least 3-4 weeks before travel.",
-                category="processing_time",
-                keywords=["how long", "processing time", "duration", "when", "timeline", "waiting time"]
-            ),
-            FAQEntry(
-                question="What documents are required for Schengen visa?",
-                answer="Required documents include: valid passport (3 months validity beyond stay), visa application form, recent photos, travel insurance, flight itinerary, accommodation proof, financial statements, employment letter, and travel purpose documentation.",
-                category="documents",
-                keywords=["documents", "requirements", "what needed", "papers", "documentation", "checklist"]
-            ),
-            FAQEntry(
-                question="What is the minimum bank balance for Schengen visa?",
-                answer="There's no fixed minimum, but generally €50-100 per day of stay is recommended. For a 10-day trip, €500-1000 should be sufficient. The amount varies by country and individual circumstances.",
-                category="financial_requirements",
-                keywords=["bank balance", "minimum amount", "money required", "financial proof", "bank statement"]
-            ),
-            FAQEntry(
-                question="Can I apply for multiple Schengen visas?",
-                answer="Yes, you can apply for multiple Schengen visas. However, you must apply to the country where you'll spend the most time, or the first country you'll enter if staying equal time in multiple countries.",
-                category="application_rules",
-                keywords=["multiple visas", "several countries", "more than one", "different countries"]
-            ),
-            FAQEntry(
-                question="What if my visa is rejected?",
-                answer="If rejected, you can appeal within 30 days. Common reasons include insufficient funds, unclear travel purpose, or incomplete documentation. You can reapply after addressing the issues mentioned in the rejection letter.",
-                category="rejection",
-                keywords=["rejected", "denied", "refused", "what if", "appeal", "rejection"]
-            ),
-            FAQEntry(
-                question="Do I need travel insurance for Schengen visa?",
-                answer="Yes, travel insurance is mandatory for Schengen visas. It must cover at least €30,000 for medical expenses and repatriation, and be valid for the entire duration of your stay in the Schengen area.",
-                category="insurance",
-                keywords=["travel insurance", "medical insurance", "insurance required", "health coverage"]
-            ),
-            FAQEntry(
-                question="What are the best months to apply for Schengen visa?",
-                answer="Apply 3-4 months before travel, avoiding peak seasons (May-August, December). January-March and September-November typically have faster processing times. Avoid applying during major holidays.",
-                category="timing",
-                keywords=["best time", "when to apply", "timing", "months", "season", "peak time"]
-            ),
-            FAQEntry(
-                question="Can I work on a Schengen tourist visa?",
-                answer="No, tourist visas are strictly for tourism, family visits, or business meetings. Working, studying, or conducting business activities requires specific visa types. Violating visa terms can result in future rejections.",
-                category="visa_types",
-                keywords=["work", "job", "employment", "business", "study", "student"]
-            ),
-            # New FAQs added
-            FAQEntry(
-                question="Which country has good visa ratio, visa success rate?",
-                answer="No country has good or bad ratio, it's social media hyped by agents and visa consultants. Visa approval depends upon individual's profile, financial stability and ties to home country and how visa file is prepared and presented. Every country has good success ratio if file is prepared properly.",
-                category="country_selection",
-                keywords=["good ratio", "visa ratio", "visa success", "success rate", "which country", "best country", "approval rate"]
-            ),
-            FAQEntry(
-                question="What is the visa process, how to apply?",
-                answer="Most of the Schengen countries have same visa process. a) Book your appointment first from BLS, VFS or embassy whichever it's dealing with. b) Prepare your documents/file and on day of appointment submit the hard copy, Biometric and Picture. Kindly note that for Belgium and Netherlands you need to submit the form online first and then apply for appointments from VFS portal.",
-                category="application_process",
-                keywords=["visa process", "how to apply", "application process", "procedure", "steps", "how to get visa", "apply visa"]
-            ),
-            FAQEntry(
-                question="Should I apply Schengen visa with no travel history?",
-                answer="It's better to have a travel history before applying specially if you are applying for tourist visa. You need to have a regular travel history in last 5 years.",
-                category="travel_history",
-                keywords=["no travel history", "travel history", "first time", "no previous travel", "should apply", "apply without travel"]
-            ),
-        ]
-    
-    def _initialize_evaluation_rules(self) -> Dict[str, Any]:
-        """Initialize complex evaluation rules for RAG-based assessment"""
-        return {
-            "high_risk_factors": [
-                "no travel history",
-                "low income",
-                "no tax filing",
-                "insufficient bank balance",
-                "unclear travel purpose",
-                "recent visa rejections"
-            ],
-            "positive_factors": [
-                "extensive travel history",
-                "high income",
-                "regular tax filing",
-                "substantial bank balance",
-                "clear travel purpose",
-                "previous visa approvals"
-            ],
-            "country_specific_rules": {
-                "germany": {
-                    "preferred_professions": ["engineers", "doctors", "business owners"],
-                    "financial_requirements": "higher than average",
-                    "documentation_standards": "very strict"
-                },
-                "france": {
-                    "preferred_professions": ["tourism", "business", "family visits"],
-                    "financial_requirements": "moderate",
-                    "documentation_standards": "standard"
-                },
-                "italy": {
-                    "preferred_professions": ["tourism", "business", "cultural visits"],
-                    "financial_requirements": "moderate",
-                    "documentation_standards": "standard"
-                }
-            }
-        }
-    
-    async def perform_scenario_based_evaluation(self, user_answers: Dict[str, Any], target_country: str = None) -> ScenarioEvaluation:
+            logger.error(f"Error retrieving knowledge sections: {e}")
+            return ""
+
+    async def perform_scenario_based_evaluation(self, user_answers: Dict[str, Any], target_country: str = None,
+                                                polish: bool = None) -> ScenarioEvaluation:
         """
-        Perform scenario-based evaluation using LLM with scenarios from scenarios.md
+        Match the profile against the structured scenarios in scenarios.json.
+
+        The deterministic match is the result; when polish is enabled
+        (SCENARIO_LLM_POLISH by default) the LLM rewrites it using only the
+        top-k matched scenarios, and any LLM failure falls back to the match.
         """
         try:
-            # Create detailed user profile
-            user_profile = self._create_detailed_profile(user_answers, target_country)
-            
-            # Prepare system prompt with scenarios and evaluation rules
-            system_prompt = f"""
-            You are an expert visa evaluation specialist. Analyze the user's profile against the provided scenarios and evaluation rules.
-            
-            EVALUATION RULES:
-            {self.evaluation_rules_text}
-            
-            AVAILABLE SCENARIOS:
-            {self.scenarios}
-            
-            USER PROFILE:
-            {user_profile}
-            
-            TASK: Analyze the user's profile and match it to the most appropriate scenario(s). Provide a comprehensive evaluation including:
-            
-            1. Success Ratio (0-100%)
-            2. Best matching scenario(s)
-            3. Specific recommendations
-            4. Application strategy
-            5. Risk factors
-            6. Strengths
-            7. Required documents priority
-            
-            Return your response in JSON format:
-            {{
-                "success_ratio": 85,
-                "matched_scenario": "High-Income Business Owner with Travel History",
-                "recommendations": ["list of specific recommendations"],
-                "application_strategy": "detailed strategy",
-                "risk_factors": ["list of risk factors"],
-                "strengths": ["list of strengths"],
-                "required_documents": ["priority list of documents"],
-                "confidence": 0.9,
-                "reasoning": "explanation of why this scenario matches"
-            }}
-            
-            Be realistic but encouraging. Focus on actionable advice and specific steps the user should take.
-            """
-            
-            messages = [
-                {"role": "user", "content": f"Please evaluate this visa application profile:\n\n{user_profile}"}
-            ]
-            
-            # Get LLM response
-            llm_response = await self.openai_service.generate_response(messages, system_prompt)
-            
-            # Parse the JSON response
-            evaluation_result = self._parse_scenario_evaluation_response(llm_response)
-            
-            return evaluation_result
-            
+            features = extract_features(user_answers)
+            matches = self.knowledge_base.current.scenario_matcher.match(features, user_answers, target_country, top_k=settings.SCENARIO_MATCH_TOP_K)
+            if not matches:
+                raise ValueError("No scenario applies to this profile")
+            evaluation = self._evaluation_from_match(matches[0])
+            logger.info(f"Matched scenario '{evaluation.matched_scenario}' ({matches[0].score:.0%} of criteria met)")
         except Exception as e:
             logger.error(f"Error in scenario-based evaluation: {e}")
             # Return fallback evaluation
@@ -276,6 +130,88 @@ class RAGService:
                 required_documents=["Passport", "CNIC", "Bank Statement", "Employment Letter"],
                 confidence=0.5
             )
+
+        if not (settings.SCENARIO_LLM_POLISH if polish is None else polish):
+            return evaluation
+        try:
+            return await self._polish_scenario_evaluation(matches, user_answers, target_country)
+        except Exception as e:
+            logger.error(f"Scenario evaluation polish failed, using deterministic match: {e}")
+            return evaluation
+
+    def _evaluation_from_match(self, match: ScenarioMatch) -> ScenarioEvaluation:
+        """Deterministic evaluation from the best scenario match"""
+        scenario = match.scenario
+        return ScenarioEvaluation(
+            success_ratio=scenario.success_ratio,
+            matched_scenario=scenario.name,
+            recommendations=list(scenario.recommendations),
+            application_strategy=" ".join(scenario.application_strategy),
+            risk_factors=list(match.unmet),
+            strengths=scenario.strengths + match.matched,
+            required_documents=list(scenario.required_documents),
+            confidence=round(match.score, 2)
+        )
+
+    async def _polish_scenario_evaluation(self, matches: List[ScenarioMatch], user_answers: Dict[str, Any],
+                                          target_country: str = None) -> ScenarioEvaluation:
+        """Let the LLM refine the evaluation, given only the matched scenarios"""
+        user_profile = self._create_detailed_profile(user_answers, target_country)
+        matched_scenarios = json.dumps(
+            [
+                {
+                    **{k: v for k, v in m.scenario.raw.items() if k != "criteria"},
+                    "match_score": round(m.score, 2),
+                    "match_explanation": m.explanation(),
+                }
+                for m in matches
+            ],
+            ensure_ascii=False,
+            indent=2
+        )
+        knowledge = self._knowledge_context(user_profile) or "None"
+        country = target_country or user_answers.get("selected_country") or user_answers.get("country")
+        country_rules = self._country_rules(country) or "None"
+
+        system_prompt = f"""
+        You are an expert visa evaluation specialist. The user's profile has already been matched against our scenarios; the best matches are below, with the criteria each one meets and misses.
+
+        MATCHED SCENARIOS (best first):
+        {matched_scenarios}
+
+        USER PROFILE:
+        {user_profile}
+
+        RELEVANT GUIDELINES:
+        {knowledge}
+
+        DESTINATION COUNTRY RULES:
+        {country_rules}
+
+        TASK: Starting from the best match, write the evaluation for this user. Keep the success ratio within 10 points of the best match unless the explanations clearly justify otherwise, and turn unmet criteria into risk factors and concrete recommendations.
+
+        Return your response in JSON format:
+        {{
+            "success_ratio": 85,
+            "matched_scenario": "name of the scenario you based this on",
+            "recommendations": ["list of specific recommendations"],
+            "application_strategy": "detailed strategy",
+            "risk_factors": ["list of risk factors"],
+            "strengths": ["list of strengths"],
+            "required_documents": ["priority list of documents"],
+            "confidence": 0.9,
+            "reasoning": "explanation of why this scenario matches"
+        }}
+
+        Be realistic but encouraging. Focus on actionable advice and specific steps the user should take.
+        """
+
+        messages = [
+            {"role": "user", "content": f"Please evaluate this visa application profile:\n\n{user_profile}"}
+        ]
+
+        llm_response = await self.openai_service.generate_response(messages, system_prompt)
+        return self._parse_scenario_evaluation_response(llm_response)
     
     def _create_detailed_profile(self, answers: Dict[str, Any], target_country: str = None) -> str:
         """Create a detailed profile description for scenario matching"""
@@ -414,10 +350,17 @@ class RAGService:
             confidence=0.6
         )
     
-    async def handle_off_track_question(self, user_input: str, current_fsm_state: str, user_context: Dict[str, Any] = None) -> RAGResponse:
+    async def handle_off_track_question(
+        self,
+        user_input: str,
+        current_fsm_state: str,
+        user_context: Dict[str, Any] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> RAGResponse:
         """
         Handle off-track questions using RAG
-        Returns appropriate response and whether to return to FSM
+        Returns appropriate response and whether to return to FSM.
+        When on_delta is given, LLM answers are streamed through it as they are generated.
         """
         try:
             # Analyze if this is an off-track question
@@ -437,7 +380,7 @@ class RAGService:
             if best_match and best_match.confidence > 0.7:
                 # Generate contextual response
                 response = await self._generate_contextual_response(
-                    user_input, best_match, current_fsm_state, user_context
+                    user_input, best_match.entry, current_fsm_state, user_context
                 )
                 
                 return RAGResponse(
@@ -450,12 +393,12 @@ class RAGService:
                 )
             
             # If no good FAQ match, use LLM to generate response
-            llm_response = await self._generate_llm_response(user_input, current_fsm_state, user_context)
+            llm_response = await self._generate_llm_response(user_input, current_fsm_state, user_context, on_delta)
             
             return RAGResponse(
                 answer=llm_response["answer"],
                 confidence=0.6,
-                source="llm",
+                source="answer_cache" if llm_response.get("cached") else "llm",
                 should_return_to_fsm=llm_response["return_to_fsm"],
                 transition_message=llm_response["transition_message"]
             )
@@ -472,74 +415,12 @@ class RAGService:
     
     def _classify_question(self, user_input: str, current_fsm_state: str) -> Tuple[bool, str]:
         """Classify if question is off-track and determine its type"""
-        input_lower = user_input.lower().strip()
-        
-        # FSM state-specific expected responses
-        expected_responses = {
-            "ask_country": ["country", "nation", "destination", "where"],
-            "ask_profession": ["business", "job", "employee", "profession", "work"],
-            "ask_business_type": ["sole", "proprietor", "private", "limited", "company"],
-            "ask_salary": ["salary", "income", "earnings", "pay", "amount"],
-            "ask_salary_mode": ["bank", "transfer", "cash", "payment", "mode"],
-            "ask_tax_info": ["tax", "filer", "income", "annual", "return"],
-            "ask_balance": ["balance", "bank", "money", "account", "funds"],
-            "ask_travel": ["travel", "history", "countries", "visited", "trip"]
-        }
-        
-        # Check if input matches expected response for current state
-        if current_fsm_state in expected_responses:
-            expected_keywords = expected_responses[current_fsm_state]
-            if any(keyword in input_lower for keyword in expected_keywords):
-                return False, "on_track"
-        
-        # Off-track question patterns
-        off_track_patterns = {
-            "general_info": ["what is", "how does", "can you tell", "explain", "information"],
-            "country_selection": ["best country", "which country", "recommend", "suggest", "good country", "good ratio", "visa ratio", "visa success", "success rate"],
-            "fees": ["cost", "fee", "price", "how much", "charge"],
-            "timing": ["how long", "when", "time", "duration", "processing"],
-            "documents": ["documents", "papers", "requirements", "what needed"],
-            "rejection": ["rejected", "denied", "refused", "appeal", "what if"],
-            "application_process": ["visa process", "how to apply", "application process", "procedure", "steps", "how to get visa", "apply visa"],
-            "travel_history": ["no travel history", "travel history", "first time", "no previous travel", "should apply", "apply without travel"],
-            "general_help": ["help", "assist", "guide", "advice", "support"]
-        }
-        
-        for question_type, patterns in off_track_patterns.items():
-            if any(pattern in input_lower for pattern in patterns):
-                return True, question_type
-        
-        return True, "general"
+        decision = turn_classifier.classify(user_input, current_fsm_state, record=False)
+        return not decision.on_track, decision.question_type
     
-    async def _search_faq(self, user_input: str, question_type: str) -> Optional[FAQEntry]:
+    async def _search_faq(self, user_input: str, question_type: str) -> Optional[FAQHit]:
         """Search FAQ database for relevant answers"""
-        input_lower = user_input.lower().strip()
-        best_match = None
-        best_score = 0
-        
-        for faq in self.faq_database:
-            # Calculate relevance score
-            score = 0
-            
-            # Keyword matching
-            for keyword in faq.keywords:
-                if keyword in input_lower:
-                    score += 2
-            
-            # Category matching
-            if faq.category == question_type:
-                score += 1
-            
-            # Question similarity
-            if any(word in faq.question.lower() for word in input_lower.split()):
-                score += 1
-            
-            if score > best_score:
-                best_score = score
-                best_match = faq
-                best_match.confidence = min(score / 5.0, 1.0)  # Normalize confidence
-        
-        return best_match if best_score > 1 else None
+        return self.faq_index.best(user_input, question_type)
     
     async def _generate_contextual_response(
         self, 
@@ -549,7 +430,17 @@ class RAGService:
         user_context: Dict[str, Any] = None
     ) -> Dict[str, Any]:
         """Generate contextual response that bridges FAQ answer and FSM return"""
+        transition, suffix = self._return_to_evaluation(current_fsm_state)
         
+        return {
+            "answer": f"{faq_match.answer}{suffix}",
+            "return_to_fsm": True,
+            "transition_message": transition,
+            "context": {"faq_answered": faq_match.category}
+        }
+    
+    def _return_to_evaluation(self, current_fsm_state: str) -> Tuple[str, str]:
+        """Transition message and the text that leads an answer back to the current question"""
         # Get current FSM question for context
         fsm_questions = {
             "ask_country": "Which Country visa are you interested to apply?",
@@ -576,39 +467,49 @@ class RAGService:
         import random
         transition = random.choice(transition_templates)
         
-        # Combine FAQ answer with transition
-        full_response = f"{faq_match.answer}\n\n{transition}\n\n{current_question}"
-        
-        return {
-            "answer": full_response,
-            "return_to_fsm": True,
-            "transition_message": transition,
-            "context": {"faq_answered": faq_match.category}
-        }
+        return transition, f"\n\n{transition}\n\n{current_question}"
     
     async def _generate_llm_response(
         self, 
         user_input: str, 
         current_fsm_state: str, 
-        user_context: Dict[str, Any] = None
+        user_context: Dict[str, Any] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
-        """Generate LLM response for off-track questions"""
+        """
+        Generate LLM response for off-track questions.
+        Only the answer itself is generated (and cached); the way back to the
+        current question is added per state, so a cached answer serves any state.
+        """
+        transition, suffix = self._return_to_evaluation(current_fsm_state)
+        
+        cached = await self.answer_cache.get(user_input) if self.answer_cache else None
+        if cached:
+            logger.info(f"Answer cache hit for off-track question (similarity {cached.similarity})")
+            return {
+                "answer": f"{cached.answer}{suffix}",
+                "return_to_fsm": True,
+                "transition_message": transition,
+                "cached": True
+            }
+        
+        knowledge = self._knowledge_context(user_input) or "None"
+        country_rules = self._country_rules(text=user_input) or "None"
         
         system_prompt = f"""
         You are a visa evaluation assistant. The user has asked an off-track question while in the middle of their visa evaluation.
         
-        Current FSM state: {current_fsm_state}
-        User context: {user_context or {}}
+        Relevant guidelines from our knowledge base (use them where they apply):
+        {knowledge}
         
-        Provide a helpful, accurate response to their question, then tactfully guide them back to the evaluation.
-        Keep your response concise but informative.
+        Rules for the country the user asked about:
+        {country_rules}
         
-        Format your response as:
-        1. Answer their question
-        2. A smooth transition back to the evaluation
-        3. The current evaluation question they need to answer
+        Provide a helpful, accurate answer to their question. Keep your response concise but informative.
+        Answer only the question: do not ask the user anything or mention the evaluation steps, as the
+        way back to their evaluation is added after your answer.
         
-        Be professional, helpful, and ensure they understand the importance of completing the evaluation first.
+        Be professional and helpful.
         """
         
         messages = [
@@ -616,20 +517,20 @@ class RAGService:
         ]
         
         try:
-            response = await self.openai_service.generate_response(messages, system_prompt)
+            if on_delta:
+                answer = await self.openai_service.stream_response(messages, on_delta, system_prompt)
+                await on_delta(suffix)
+            else:
+                answer = await self.openai_service.generate_response(messages, system_prompt)
             
-            # Extract transition message
-            lines = response.split('\n')
-            transition_message = ""
-            for line in lines:
-                if any(phrase in line.lower() for phrase in ["let's continue", "now", "let's proceed", "let's get back"]):
-                    transition_message = line.strip()
-                    break
+            if self.answer_cache:
+                await self.answer_cache.set(user_input, answer.strip())
             
             return {
-                "answer": response,
+                "answer": f"{answer.strip()}{suffix}",
                 "return_to_fsm": True,
-                "transition_message": transition_message or "Now, let's continue with your evaluation:"
+                "transition_message": transition,
+                "cached": False
             }
             
         except Exception as e:
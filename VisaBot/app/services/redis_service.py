@@ -5,10 +5,12 @@ import json
 import asyncio
 from typing import Optional, Dict, Any
 from datetime import datetime
-from redis.asyncio import Redis
 from loguru import logger
 
 from app.core.config import settings
+from app.services.storage.base import StorageBackend
+from app.services.storage.memory_backend import InMemoryBackend
+from app.services.storage.redis_backend import RedisBackend
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -22,53 +24,87 @@ class DateTimeEncoder(json.JSONEncoder):
 class RedisService:
     """Redis service for managing sessions and state - enhanced for visa evaluation bot"""
     
-    def __init__(self):
-        self.redis: Optional[Redis] = None
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend: Optional[StorageBackend] = backend
+        # True when Redis was unreachable and the in-memory backend took over
+        self.degraded = False
+        self._connect_lock: Optional[asyncio.Lock] = None
+    
+    @property
+    def backend_name(self) -> Optional[str]:
+        """Name of the active storage backend"""
+        return self.backend.name if self.backend else None
+    
+    def _create_memory_backend(self) -> InMemoryBackend:
+        return InMemoryBackend(tick=settings.STORAGE_WHEEL_TICK, wheel_size=settings.STORAGE_WHEEL_SIZE)
     
     async def connect(self):
-        """Connect to Redis"""
-        try:
-            self.redis = Redis.from_url(
-                settings.REDIS_URL,
-                db=settings.REDIS_DB,
-                decode_responses=True
-            )
-            await self.redis.ping()
-            logger.info("Connected to Redis")
-        except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            raise
+        """Connect to the configured storage backend"""
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        
+        async with self._connect_lock:
+            if self.backend:
+                return
+            
+            if settings.STORAGE_BACKEND == "memory":
+                self.backend = self._create_memory_backend()
+                logger.info("Using in-memory storage backend")
+                return
+            
+            backend = RedisBackend.from_url(settings.REDIS_URL, db=settings.REDIS_DB)
+            try:
+                await backend.ping()
+                self.backend = backend
+                self.degraded = False
+                logger.info("Connected to Redis")
+            except Exception as e:
+                logger.error(f"Failed to connect to Redis: {e}")
+                try:
+                    await backend.close()
+                except Exception:
+                    pass
+                if not settings.STORAGE_FALLBACK_TO_MEMORY:
+                    raise
+                # Sessions are only visible to this worker until Redis is back and the app restarts
+                self.backend = self._create_memory_backend()
+                self.degraded = True
+                logger.warning("Redis unreachable, running in degraded mode with in-memory storage")
+    
+    async def get_backend(self) -> StorageBackend:
+        """Get the active storage backend, connecting on first use"""
+        if not self.backend:
+            await self.connect()
+        return self.backend
     
     async def disconnect(self):
-        """Disconnect from Redis"""
-        if self.redis:
-            await self.redis.close()
-            logger.info("Disconnected from Redis")
+        """Disconnect from the storage backend"""
+        if self.backend:
+            await self.backend.close()
+            logger.info(f"Disconnected from {self.backend.name} storage")
+            self.backend = None
     
     async def set_session_data(self, session_id: str, data: Dict[str, Any], ttl: int = None):
         """Set session data in Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"session:{session_id}"
-        await self.redis.set(key, json.dumps(data, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
+        await backend.set(key, json.dumps(data, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
     
     async def get_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session data from Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"session:{session_id}"
-        data = await self.redis.get(key)
+        data = await backend.get(key)
         return json.loads(data) if data else None
     
     async def delete_session_data(self, session_id: str):
         """Delete session data from Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"session:{session_id}"
-        await self.redis.delete(key)
+        await backend.delete(key)
     
     async def set_state(self, session_id: str, state: str, context: Dict[str, Any] = None):
         """Set FSM state for a session"""
@@ -86,53 +122,47 @@ class RedisService:
     # Enhanced methods for visa evaluation bot
     async def set_evaluation_data(self, session_id: str, evaluation_data: Dict[str, Any], ttl: int = None):
         """Store visa evaluation data in Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"evaluation:{session_id}"
-        await self.redis.set(key, json.dumps(evaluation_data, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
+        await backend.set(key, json.dumps(evaluation_data, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
     
     async def get_evaluation_data(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get visa evaluation data from Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"evaluation:{session_id}"
-        data = await self.redis.get(key)
+        data = await backend.get(key)
         return json.loads(data) if data else None
     
     async def set_answers(self, session_id: str, answers: Dict[str, Any], ttl: int = None):
         """Store FSM answers in Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"answers:{session_id}"
-        await self.redis.set(key, json.dumps(answers, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
+        await backend.set(key, json.dumps(answers, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
     
     async def get_answers(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get FSM answers from Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"answers:{session_id}"
-        data = await self.redis.get(key)
+        data = await backend.get(key)
         return json.loads(data) if data else None
     
     async def set_conversation_history(self, session_id: str, messages: list, ttl: int = None):
         """Store conversation history in Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"conversation:{session_id}"
-        await self.redis.set(key, json.dumps(messages, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
+        await backend.set(key, json.dumps(messages, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
     
     async def get_conversation_history(self, session_id: str) -> Optional[list]:
         """Get conversation history from Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"conversation:{session_id}"
-        data = await self.redis.get(key)
+        data = await backend.get(key)
         return json.loads(data) if data else None
     
     async def add_message_to_history(self, session_id: str, message: Dict[str, Any], ttl: int = None):
@@ -148,8 +178,7 @@ class RedisService:
     
     async def clear_session_data(self, session_id: str):
         """Clear all session-related data from Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         # Delete all keys related to this session
         keys_to_delete = [
@@ -160,71 +189,63 @@ class RedisService:
             f"conversation:{session_id}"
         ]
         
-        for key in keys_to_delete:
-            await self.redis.delete(key)
+        await backend.delete(*keys_to_delete)
         
         logger.info(f"Cleared all data for session: {session_id}")
     
     async def get_session_keys(self, session_id: str) -> list:
         """Get all Redis keys for a session"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         pattern = f"*{session_id}*"
         keys = []
-        async for key in self.redis.scan_iter(match=pattern):
+        async for key in backend.scan_iter(match=pattern):
             keys.append(key)
         
         return keys
     
     async def set_session_metadata(self, session_id: str, metadata: Dict[str, Any], ttl: int = None):
         """Store session metadata in Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"metadata:{session_id}"
-        await self.redis.set(key, json.dumps(metadata, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
+        await backend.set(key, json.dumps(metadata, cls=DateTimeEncoder), ex=ttl or settings.BOT_SESSION_TIMEOUT)
     
     async def get_session_metadata(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session metadata from Redis"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"metadata:{session_id}"
-        data = await self.redis.get(key)
+        data = await backend.get(key)
         return json.loads(data) if data else None
     
     async def increment_session_counter(self, session_id: str, counter_name: str = "message_count") -> int:
         """Increment a counter for a session"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"counter:{session_id}:{counter_name}"
-        return await self.redis.incr(key)
+        return await backend.incr(key)
     
     async def get_session_counter(self, session_id: str, counter_name: str = "message_count") -> int:
         """Get a counter value for a session"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         key = f"counter:{session_id}:{counter_name}"
-        value = await self.redis.get(key)
+        value = await backend.get(key)
         return int(value) if value else 0
     
     async def set_session_ttl(self, session_id: str, ttl: int):
         """Set TTL for all session-related keys"""
-        if not self.redis:
-            await self.connect()
+        backend = await self.get_backend()
         
         keys = await self.get_session_keys(session_id)
         for key in keys:
-            await self.redis.expire(key, ttl)
+            await backend.expire(key, ttl)
     
     async def ping(self):
         """Ping Redis to check connection"""
-        if not self.redis:
-            await self.connect()
-        return await self.redis.ping()
+        backend = await self.get_backend()
+        return await backend.ping()
 
 
 # Global Redis client instance
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.services.redis_service import redis_client
+from app.services.storage.base import StorageBackend
+
+from .bm25 import tokenize
+from .embedding import HashedNgramEmbedder
+
+CACHE_KEY_PREFIX = "answercache:"
+GENERATION_KEY = f"{CACHE_KEY_PREFIX}generation"
+
+# Words that change what is being asked: two questions that differ in one of
+# them ("family of 2" / "family of 4", "for Schengen" / "for UK") need
+# different answers however similar the rest of the wording is
+KEY_TERMS = frozenset(tokenize("""
+zero one two three four five six seven eight nine ten eleven twelve fifteen twenty thirty forty fifty hundred
+thousand lakh million crore single double first second third once twice
+schengen europe eu uk britain england kingdom usa us america canada australia zealand ireland dubai uae saudi
+turkey japan china malaysia thailand singapore qatar india pakistan
+austria belgium bulgaria croatia czech czechia denmark estonia finland france germany greece hungary iceland
+italy latvia liechtenstein lithuania luxembourg malta netherlands holland norway poland portugal romania
+slovakia slovenia spain sweden switzerland
+tourist tourism business student study work transit visit family spouse child children infant minor
+"""))
+
+# Stop words that still change the question: "why was my visa rejected" and
+# "what if my visa is rejected" share every content word
+QUESTION_TERMS = frozenset(tokenize("""
+what why when where who whom whose how which if
+not no never nor without cannot can't don't doesn't didn't isn't aren't wasn't won't shouldn't
+""", drop_stop_words=False))
+
+
+def normalize_question(question: str) -> str:
+    """
+    Order-insensitive form of a question: its stemmed content words plus its
+    question and negation words, sorted; empty when it has no content words
+    """
+    content = tokenize(question)
+    if not content:
+        return ""
+    asked = [t for t in tokenize(question, drop_stop_words=False) if t in QUESTION_TERMS]
+    return " ".join(sorted(set(content + asked)))
+
+
+def key_terms(normalized: str) -> frozenset:
+    """Numbers, places, visa types, question and negation words in a normalized question"""
+    return frozenset(t for t in normalized.split()
+                     if t in KEY_TERMS or t in QUESTION_TERMS or any(c.isdigit() for c in t))
+
+
+@dataclass
+class CachedAnswer:
+    question: str  # The question the answer was generated for
+    answer: str  # Reusable body, without the state-specific return to the questionnaire
+    created_at: float
+    similarity: float = 1.0  # Below 1.0 for a near-duplicate hit
+
+
+class AnswerCache:
+    """
+    Cache of generated off-track answers, shared across FSM states.
+
+    Only the answer body is stored, keyed by the normalized question, so the
+    same answer serves a user at any point of the questionnaire; the caller
+    adds the state-specific way back to the current question. Exact lookups
+    go through the storage backend and are shared between workers. The
+    answers this worker has seen are also embedded, so a rephrasing of a
+    cached question within the similarity threshold is a hit too, as long as
+    it mentions the same numbers, places and visa types and asks the same
+    way (what/why/how..., negated or not).
+
+    invalidate() bumps a generation number in the backend, which every worker
+    checks on lookup, so one call drops the cached answers everywhere.
+    Invalidating a single question removes it from the backend and from this
+    worker; copies other workers already hold last until their TTL.
+
+    Keys also carry a namespace, the digest of the knowledge the answers were
+    generated from. rekey() moves to a new namespace when the knowledge base
+    is swapped, so answers built on old FAQs or rules are never served again
+    and workers still on the old content do not see the new answers.
+    """
+
+    def __init__(self, embedder: Optional[HashedNgramEmbedder] = None, max_entries: int = None, ttl: int = None,
+                 similarity: float = None, backend: Optional[StorageBackend] = None,
+                 clock: Callable[[], float] = time.time, namespace: str = ""):
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.namespace = namespace
+        self.max_entries = max_entries or settings.ANSWER_CACHE_SIZE
+        self.ttl = ttl or settings.ANSWER_CACHE_TTL
+        self.similarity = settings.ANSWER_CACHE_SIMILARITY if similarity is None else similarity
+        self.backend = backend
+        self.clock = clock
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        # One row per local entry, so a near-duplicate lookup is a single matrix product
+        self._vectors = np.zeros((self.max_entries, self.embedder.dim), dtype=np.float32)
+        self._slots: Dict[str, int] = {}
+        self._slot_keys: List[Optional[str]] = [None] * self.max_entries
+
+    async def _get_backend(self) -> StorageBackend:
+        return self.backend or await redis_client.get_backend()
+
+    def _key(self, normalized: str) -> str:
+        return f"{CACHE_KEY_PREFIX}{self.namespace}:{self._generation}:{normalized}"
+
+    def rekey(self, namespace: str, embedder: Optional[HashedNgramEmbedder] = None):
+        """Switch to answers for new knowledge content; local entries are dropped"""
+        if embedder is not None and embedder.dim != self.embedder.dim:
+            self._vectors = np.zeros((self.max_entries, embedder.dim), dtype=np.float32)
+        self.embedder = embedder or self.embedder
+        self._clear_local()
+        self.namespace = namespace
+
+    async def _sync_generation(self):
+        """Drop local entries when another worker has invalidated the cache"""
+        try:
+            backend = await self._get_backend()
+            generation = int(await backend.get(GENERATION_KEY) or 0)
+        except Exception as e:
+            logger.error(f"Error reading answer cache generation: {e}")
+            return
+        if generation != self._generation:
+            self._clear_local()
+            self._generation = generation
+
+    # -----------------------
+    # Local entries
+    # -----------------------
+    def _remember(self, normalized: str, entry: CachedAnswer):
+        if normalized in self._slots:
+            slot = self._slots[normalized]
+        else:
+            while len(self._entries) >= self.max_entries:
+                self._forget(next(iter(self._entries)))
+            slot = self._slot_keys.index(None)
+            self._slots[normalized] = slot
+            self._slot_keys[slot] = normalized
+        self._vectors[slot] = self.embedder.embed(entry.question)
+        self._entries[normalized] = entry
+        self._entries.move_to_end(normalized)
+
+    def _forget(self, normalized: str):
+        self._entries.pop(normalized, None)
+        slot = self._slots.pop(normalized, None)
+        if slot is not None:
+            self._vectors[slot] = 0.0
+            self._slot_keys[slot] = None
+
+    def _clear_local(self):
+        self._entries.clear()
+        self._slots.clear()
+        self._slot_keys = [None] * self.max_entries
+        self._vectors[:] = 0.0
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return self.clock() - entry.created_at >= self.ttl
+
+    def _near_duplicates(self, question: str) -> List[tuple]:
+        """(similarity, normalized) of local entries above the threshold that ask about the same things"""
+        if not self._entries:
+            return []
+        similarities = self._vectors @ self.embedder.embed(question)
+        terms = key_terms(normalize_question(question))
+        slots = np.flatnonzero(similarities >= self.similarity)
+        candidates = [(float(similarities[slot]), self._slot_keys[slot]) for slot in slots]
+        return sorted(((similarity, key) for similarity, key in candidates
+                       if key is not None and key_terms(key) == terms), reverse=True)
+
+    def _nearest(self, question: str) -> Optional[CachedAnswer]:
+        for similarity, normalized in self._near_duplicates(question):
+            entry = self._entries[normalized]
+            if self._expired(entry):
+                self._forget(normalized)
+                continue
+            return CachedAnswer(entry.question, entry.answer, entry.created_at, round(similarity, 4))
+        return None
+
+    # -----------------------
+    # Lookup
+    # -----------------------
+    async def get(self, question: str) -> Optional[CachedAnswer]:
+        """Cached answer for the question or a near-duplicate of it"""
+        normalized = normalize_question(question)
+        if not normalized:
+            self.misses += 1
+            return None
+        await self._sync_generation()
+
+        entry = self._entries.get(normalized)
+        if entry is not None and self._expired(entry):
+            self._forget(normalized)
+            entry = None
+        if entry is None:
+            try:
+                backend = await self._get_backend()
+                text = await backend.get(self._key(normalized))
+            except Exception as e:
+                logger.error(f"Error reading answer cache: {e}")
+                text = None
+            if text is not None:
+                entry = CachedAnswer(**json.loads(text))
+                # The backend's own expiry is not exact, so the age is checked here too
+                if self._expired(entry):
+                    entry = None
+                else:
+                    self._remember(normalized, entry)
+        if entry is not None:
+            self._entries.move_to_end(normalized)
+            self.hits += 1
+            return CachedAnswer(entry.question, entry.answer, entry.created_at)
+
+        entry = self._nearest(question)
+        if entry is not None:
+            self.hits += 1
+            self.near_hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    async def set(self, question: str, answer: str):
+        """Store a generated answer body for a question"""
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        entry = CachedAnswer(question, answer, self.clock())
+        self._remember(normalized, entry)
+        try:
+            backend = await self._get_backend()
+            await backend.set(self._key(normalized), json.dumps(entry.__dict__), ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Error writing answer cache: {e}")
+
+    async def invalidate(self, question: Optional[str] = None) -> int:
+        """
+        Drop the cached answer for one question (and its local near-duplicates),
+        or every cached answer on every worker when no question is given
+        """
+        if question is None:
+            dropped = len(self._entries)
+            self._clear_local()
+            try:
+                backend = await self._get_backend()
+                self._generation = await backend.incr(GENERATION_KEY)
+            except Exception as e:
+                logger.error(f"Error invalidating answer cache: {e}")
+                self._generation += 1
+            logger.info(f"Answer cache invalidated, now at generation {self._generation}")
+            return dropped
+
+        normalized = normalize_question(question)
+        stale = {normalized} & set(self._entries)
+        stale.update(key for _, key in self._near_duplicates(question))
+        for key in stale:
+            self._forget(key)
+        try:
+            backend = await self._get_backend()
+            await backend.delete(*(self._key(key) for key in stale | {normalized}))
+        except Exception as e:
+            logger.error(f"Error invalidating answer cache: {e}")
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics for monitoring (this worker)"""
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "generation": self._generation,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_duplicate_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+# Words too common to say anything about which answer is wanted
+STOP_WORDS = frozenset("""
+a about am an and any are as at be been but by can could do does did for from get got had has have
+how i if in into is it its me my of on or our so than that the their them then there these they this
+to was we were what when where which who why will with would you your i'm im it's whats
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def _stem(token: str) -> str:
+    """Light suffix stripping so "fees"/"fee" and "rejected"/"rejection" meet"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix, replacement in (("ies", "y"), ("ion", ""), ("ing", ""), ("ed", ""), ("es", "e"), ("s", "")):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            if suffix == "s" and token.endswith("ss"):
+                return token
+            return token[:-len(suffix)] + replacement
+    return token
+
+
+def tokenize(text: str, drop_stop_words: bool = True) -> List[str]:
+    """Lower-cased, lightly stemmed word tokens"""
+    tokens = _TOKEN_RE.findall(text.lower().replace("’", "'"))
+    if drop_stop_words:
+        tokens = [t for t in tokens if t not in STOP_WORDS]
+    return [_stem(t.replace("'", "")) for t in tokens]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed set of documents.
+
+    Documents are given as (text, weight) fields, so a title can count more
+    than a body. Term weights are computed once at build time and stored as
+    NumPy posting arrays; a query only adds those arrays into a score vector,
+    which keeps it well under a millisecond at tens of thousands of documents.
+    """
+
+    def __init__(self, documents: Sequence[Sequence[Tuple[str, float]]], k1: float = 1.2, b: float = 0.75):
+        self.size = len(documents)
+        self.k1 = k1
+        frequencies: List[Counter] = []
+        for fields in documents:
+            counts: Counter = Counter()
+            for text, weight in fields:
+                for token in tokenize(text):
+                    counts[token] += weight
+            frequencies.append(counts)
+
+        lengths = np.array([sum(c.values()) for c in frequencies], dtype=np.float64)
+        average = lengths.mean() if self.size and lengths.mean() > 0 else 1.0
+        norms = k1 * (1 - b + b * lengths / average)
+
+        postings: Dict[str, Tuple[List[int], List[float]]] = {}
+        for doc, counts in enumerate(frequencies):
+            for token, tf in counts.items():
+                ids, tfs = postings.setdefault(token, ([], []))
+                ids.append(doc)
+                tfs.append(tf)
+
+        self.idf: Dict[str, float] = {}
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for token, (ids, tfs) in postings.items():
+            idf = math.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            doc_ids = np.array(ids, dtype=np.int64)
+            tf = np.array(tfs, dtype=np.float64)
+            self.idf[token] = idf
+            self.postings[token] = (doc_ids, idf * tf * (k1 + 1) / (tf + norms[doc_ids]))
+
+    def scores(self, query_terms: Iterable[str]) -> Tuple[np.ndarray, float]:
+        """BM25 score per document, and the most any document could score for these terms"""
+        scores = np.zeros(self.size)
+        ceiling = 0.0
+        for term in set(query_terms):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, weights = posting
+            scores[doc_ids] += weights
+            ceiling += self.idf[term] * (self.k1 + 1)
+        return scores, ceiling
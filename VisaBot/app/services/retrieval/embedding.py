@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .bm25 import tokenize
+
+
+# Small bundled lexicon of the ideas visa questions revolve around. Words that
+# share a concept share a feature, which is what lets "how many days" reach
+# the processing-time answer when the two have no word in common.
+DOMAIN_CONCEPTS = {
+    "duration": ("day", "week", "long", "quick", "quickly", "fast", "soon", "wait", "waiting", "processing",
+                 "decide", "decision", "until", "duration", "timeline"),
+    "cost": ("fee", "cost", "price", "charge", "pay", "free", "expensive", "cheap", "euro", "afford"),
+    "documents": ("document", "paper", "file", "checklist", "bring", "contain", "requirement", "required",
+                  "passport", "form", "photo"),
+    "funds": ("balance", "bank", "fund", "account", "saving", "money", "statement", "financial", "cash"),
+    "rejection": ("reject", "rejected", "refused", "refusal", "denied", "turned down", "declined", "appeal",
+                  "not give"),
+    "insurance": ("insurance", "medical", "health", "cover", "coverage", "hospital", "compulsory", "mandatory"),
+    "season": ("season", "summer", "winter", "month", "peak", "holiday", "christmas", "avoid"),
+    "work": ("work", "job", "earn", "employment", "working", "employed"),
+    "procedure": ("process", "procedure", "step", "appointment", "book", "biometric", "vfs", "bls", "submit",
+                  "apply"),
+    "travel_history": ("abroad", "never", "travel", "trip", "first", "history", "visited", "previous"),
+    "multiple": ("multiple", "several", "two", "both", "combine", "more than one", "different"),
+    "approval": ("approve", "approval", "approved", "success", "ratio", "easiest", "easy", "chance", "likely"),
+}
+
+
+def _compile_concepts(concepts: Dict[str, Sequence[str]]) -> Dict[Tuple[str, ...], Tuple[str, ...]]:
+    """Lexicon keyed by the token sequence each word or phrase tokenizes to"""
+    compiled: Dict[Tuple[str, ...], List[str]] = {}
+    for concept, words in concepts.items():
+        for word in words:
+            key = tuple(tokenize(word, drop_stop_words=False))
+            if key and concept not in compiled.setdefault(key, []):
+                compiled[key].append(concept)
+    return {key: tuple(names) for key, names in compiled.items()}
+
+
+class HashedNgramEmbedder:
+    """
+    Network-free text embedding from hashed word and character n-grams.
+
+    Words, their character n-grams and the domain concepts they belong to are
+    hashed into a fixed number of signed buckets (crc32, so vectors are stable
+    across processes), weighted by an IDF fitted on the corpus and
+    L2-normalized. Character n-grams let "processing" and "proccessing" meet;
+    concepts let paraphrases meet. Nothing is downloaded.
+    """
+
+    def __init__(self, dim: int = 2048, char_ngrams: Tuple[int, ...] = (3, 4, 5), char_weight: float = 0.35,
+                 concepts: Optional[Dict[str, Sequence[str]]] = None, concept_weight: float = 2.0,
+                 idf: Optional[np.ndarray] = None):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.char_weight = char_weight
+        self.concepts = _compile_concepts(DOMAIN_CONCEPTS if concepts is None else concepts)
+        self._concept_span = max((len(key) for key in self.concepts), default=0)
+        self.concept_weight = concept_weight
+        self.idf = idf if idf is not None else np.ones(dim, dtype=np.float32)
+
+    @property
+    def fingerprint(self) -> str:
+        lexicon = hashlib.sha256(repr(sorted(self.concepts.items())).encode("utf-8")).hexdigest()[:8]
+        return (f"hashed-{self.dim}-{'.'.join(map(str, self.char_ngrams))}-{self.char_weight:g}"
+                f"-{lexicon}-{self.concept_weight:g}")
+
+    def features(self, text: str) -> Dict[int, float]:
+        """Signed bucket counts for a text"""
+        counts: Dict[int, float] = {}
+
+        def add(feature: str, weight: float):
+            code = zlib.crc32(feature.encode("utf-8"))
+            bucket = code % self.dim
+            sign = 1.0 if code & 0x80000000 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign * weight
+
+        for token in tokenize(text):
+            add(f"w:{token}", 1.0)
+            padded = f"<{token}>"
+            for n in self.char_ngrams:
+                for start in range(len(padded) - n + 1):
+                    add(padded[start:start + n], self.char_weight)
+
+        # Concept phrases may span stop words ("not give", "more than one")
+        tokens = tokenize(text, drop_stop_words=False)
+        for size in range(1, self._concept_span + 1):
+            for start in range(len(tokens) - size + 1):
+                for concept in self.concepts.get(tuple(tokens[start:start + size]), ()):
+                    add(f"c:{concept}", self.concept_weight)
+        return counts
+
+    def fit(self, texts: Sequence[str]) -> "HashedNgramEmbedder":
+        """Fit bucket IDF on a corpus (smoothed, so unseen buckets keep weight 1 + log(n + 1))"""
+        document_frequency = np.zeros(self.dim, dtype=np.float64)
+        for text in texts:
+            document_frequency[list(self.features(text))] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        counts = self.features(text)
+        if counts:
+            buckets = np.fromiter(counts, dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            # Sublinear term frequency keeps a repeated word from dominating
+            vector[buckets] = np.sign(values) * np.log1p(np.abs(values)) * self.idf[buckets]
+            norm = float(np.linalg.norm(vector))
+            if norm:
+                vector /= norm
+        return vector
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Row-normalized (len(texts), dim) float32 matrix, C-contiguous"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.embed(text)
+        return matrix
+
+
+class VectorIndex:
+    """Top-k cosine search over a matrix of normalized row vectors"""
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def similarities(self, vector: np.ndarray) -> np.ndarray:
+        return self.matrix @ vector
+
+    def search(self, vector: np.ndarray, top_k: int = 5) -> List[Tuple[int, float]]:
+        scores = self.similarities(vector)
+        count = min(top_k, len(scores))
+        if not count:
+            return []
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+def corpus_digest(texts: Sequence[str], embedder: HashedNgramEmbedder) -> str:
+    digest = hashlib.sha256(embedder.fingerprint.encode("utf-8"))
+    for text in texts:
+        digest.update(b"\0" + text.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def build_or_load(texts: Sequence[str], embedder: HashedNgramEmbedder,
+                  cache_dir: Optional[str] = None) -> Tuple[HashedNgramEmbedder, np.ndarray]:
+    """
+    Fit the embedder and embed a corpus, reusing a cached matrix when possible.
+
+    With a cache_dir the matrix and IDF are saved as .npy files named after a
+    digest of the corpus and embedder settings, and later loads memory-map the
+    matrix instead of recomputing it. A changed corpus gets a new file.
+    """
+    if cache_dir:
+        digest = corpus_digest(texts, embedder)
+        matrix_path = os.path.join(cache_dir, f"faq-embeddings-{digest}.npy")
+        idf_path = os.path.join(cache_dir, f"faq-idf-{digest}.npy")
+        if os.path.exists(matrix_path) and os.path.exists(idf_path):
+            embedder.idf = np.load(idf_path)
+            return embedder, np.load(matrix_path, mmap_mode="r")
+
+    embedder.fit(texts)
+    matrix = embedder.embed_many(texts)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write under a temporary name first so a concurrent reader never sees half a file
+        for path, array in ((idf_path, embedder.idf), (matrix_path, matrix)):
+            partial = f"{path}.{os.getpid()}.tmp"
+            with open(partial, "wb") as f:
+                np.save(f, array)
+            os.replace(partial, path)
+        matrix = np.load(matrix_path, mmap_mode="r")
+    return embedder, matrix
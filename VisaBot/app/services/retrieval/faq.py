@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .bm25 import BM25Index, tokenize
+from .embedding import HashedNgramEmbedder, VectorIndex, build_or_load
+
+
+# Score points, on the same scale the substring matcher used: confidence is score / 5
+KEYWORD_POINTS = 2.0  # Per keyword phrase found in the question
+CATEGORY_PRIOR = 1.0  # When the classifier already put the question in the entry's category
+TEXT_POINTS = 2.0  # For a full BM25 match of the question's words
+CONFIDENCE_SCALE = 5.0
+MIN_SCORE = 1.0  # Below this nothing is returned
+QUESTION_WEIGHT = 2.0  # The FAQ question counts double against its answer text
+# Semantic points scale linearly between these cosine similarities; below the
+# floor is what unrelated chit-chat scores
+SEMANTIC_POINTS = 4.0
+SEMANTIC_FLOOR = 0.1
+SEMANTIC_FULL = 0.3
+
+
+@dataclass(frozen=True)
+class FAQEntry:
+    """FAQ entry structure"""
+    question: str
+    answer: str
+    category: str
+    keywords: Tuple[str, ...] = field(default_factory=tuple)
+
+    def __post_init__(self):
+        # Lists are accepted for convenience but stored immutably
+        object.__setattr__(self, "keywords", tuple(self.keywords))
+
+
+@dataclass(frozen=True)
+class FAQHit:
+    """A scored FAQ match for one query; entries themselves are never modified"""
+    entry: FAQEntry
+    score: float
+    confidence: float
+    matched_keywords: Tuple[str, ...] = ()
+    similarity: float = 0.0  # Cosine similarity when semantic search is on
+
+
+class FAQIndex:
+    """
+    FAQ retrieval built once from the entries.
+
+    Each entry scores BM25 relevance of its question and answer to the query,
+    plus fixed points for every keyword phrase the query contains and a prior
+    when the question was classified into the entry's category. With an
+    embedder, cosine similarity between the query and the entry's question and
+    keywords is fused in as well, which catches paraphrases with no word in
+    common.
+    """
+
+    def __init__(self, entries: Sequence[FAQEntry], embedder: Optional[HashedNgramEmbedder] = None,
+                 cache_dir: Optional[str] = None):
+        self.entries: Tuple[FAQEntry, ...] = tuple(entries)
+        self.text_index = BM25Index([((e.question, QUESTION_WEIGHT), (e.answer, 1.0)) for e in self.entries])
+
+        # Keyword phrases keep their stop words ("how much", "what if")
+        self._phrases: Dict[Tuple[str, ...], List[int]] = {}
+        for doc, entry in enumerate(self.entries):
+            for keyword in entry.keywords:
+                phrase = tuple(tokenize(keyword, drop_stop_words=False))
+                if phrase and doc not in self._phrases.setdefault(phrase, []):
+                    self._phrases[phrase].append(doc)
+        self._phrase_docs = {phrase: np.array(docs, dtype=np.int64) for phrase, docs in self._phrases.items()}
+        self._longest_phrase = max((len(p) for p in self._phrases), default=0)
+
+        categories: Dict[str, List[int]] = {}
+        for doc, entry in enumerate(self.entries):
+            categories.setdefault(entry.category, []).append(doc)
+        self._categories = {category: np.array(docs, dtype=np.int64) for category, docs in categories.items()}
+
+        self.embedder: Optional[HashedNgramEmbedder] = None
+        self.vectors: Optional[VectorIndex] = None
+        if embedder is not None and self.entries:
+            # Answers are long and generic, so only the question side is embedded
+            texts = [f"{e.question} {' '.join(e.keywords)}" for e in self.entries]
+            self.embedder, matrix = build_or_load(texts, embedder, cache_dir)
+            self.vectors = VectorIndex(matrix)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _query_phrases(self, query: str) -> List[Tuple[str, ...]]:
+        tokens = tokenize(query, drop_stop_words=False)
+        found = []
+        for size in range(1, self._longest_phrase + 1):
+            for start in range(len(tokens) - size + 1):
+                phrase = tuple(tokens[start:start + size])
+                if phrase in self._phrase_docs and phrase not in found:
+                    found.append(phrase)
+        return found
+
+    def search(self, query: str, category: Optional[str] = None, top_k: int = 3,
+               min_score: float = MIN_SCORE) -> List[FAQHit]:
+        """Best entries for a query, highest score first"""
+        if not self.entries:
+            return []
+        bm25, ceiling = self.text_index.scores(tokenize(query))
+        scores = TEXT_POINTS * bm25 / ceiling if ceiling else bm25
+
+        phrases = self._query_phrases(query)
+        for phrase in phrases:
+            scores[self._phrase_docs[phrase]] += KEYWORD_POINTS
+        if category in self._categories:
+            scores[self._categories[category]] += CATEGORY_PRIOR
+        similarities = None
+        if self.vectors is not None:
+            similarities = self.vectors.similarities(self.embedder.embed(query))
+            scores += SEMANTIC_POINTS * np.clip(
+                (similarities - SEMANTIC_FLOOR) / (SEMANTIC_FULL - SEMANTIC_FLOOR), 0.0, 1.0)
+
+        candidates = np.flatnonzero(scores > min_score)
+        if len(candidates) > top_k:
+            # Keep everything tied with the k-th best so the order below is stable
+            kth = np.partition(scores[candidates], len(candidates) - top_k)[len(candidates) - top_k]
+            candidates = candidates[scores[candidates] >= kth]
+        # Highest score first, ties in entry order
+        top = candidates[np.lexsort((candidates, -scores[candidates]))][:top_k]
+
+        hits = []
+        for doc in top.tolist():
+            score = float(scores[doc])
+            entry = self.entries[doc]
+            matched = tuple(k for k in entry.keywords if tuple(tokenize(k, drop_stop_words=False)) in phrases)
+            similarity = float(similarities[doc]) if similarities is not None else 0.0
+            hits.append(FAQHit(entry, round(score, 4), min(score / CONFIDENCE_SCALE, 1.0), matched,
+                               round(similarity, 4)))
+        return hits
+
+    def best(self, query: str, category: Optional[str] = None) -> Optional[FAQHit]:
+        hits = self.search(query, category, top_k=1)
+        return hits[0] if hits else None
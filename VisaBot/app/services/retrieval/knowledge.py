@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .bm25 import BM25Index, tokenize
+
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "prompts")
+KNOWLEDGE_FILES = ("scenarios.md", "evaluation_rules.md", "country_specific.md")
+HEADING_WEIGHT = 2.0  # Heading words count double against the section body
+MAX_CHUNK_CHARS = 2400  # Longer sections are split between lines
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) when no tokenizer is given"""
+    return max(1, len(text) // 4)
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """One heading section of a knowledge file"""
+    source: str
+    headings: Tuple[str, ...]  # Path from the top-level heading down to this section's own
+    text: str
+    tokens: int
+
+    @property
+    def title(self) -> str:
+        return " > ".join(self.headings) or self.source
+
+    def render(self) -> str:
+        return f"[{self.source}: {self.title}]\n{self.text}"
+
+
+def _pack_lines(lines: Sequence[str], max_chars: int) -> List[str]:
+    """Group lines into parts of at most max_chars (a single longer line stays whole)"""
+    parts: List[List[str]] = [[]]
+    size = 0
+    for line in lines:
+        if parts[-1] and size + len(line) + 1 > max_chars:
+            parts.append([])
+            size = 0
+        parts[-1].append(line)
+        size += len(line) + 1
+    return ["\n".join(part).strip() for part in parts if "\n".join(part).strip()]
+
+
+def split_markdown(text: str, source: str, token_counter: Callable[[str], int] = approx_tokens,
+                   max_chars: int = MAX_CHUNK_CHARS) -> List[Chunk]:
+    """
+    Split a markdown document into one chunk per heading section.
+
+    Each chunk carries its full heading path, so a "### 1. Travel History"
+    section stays attributable to the rules it belongs to. Headings with no
+    text of their own produce no chunk, and sections longer than max_chars
+    are split between lines.
+    """
+    chunks: List[Chunk] = []
+    stack: List[Tuple[int, str]] = []
+    body: List[str] = []
+
+    def flush():
+        headings = tuple(title for _, title in stack)
+        for part in _pack_lines(body, max_chars):
+            chunks.append(Chunk(source, headings, part, token_counter(part)))
+        body.clear()
+
+    in_fence = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match is None:
+            body.append(line.rstrip())
+            continue
+        flush()
+        level = len(match.group(1))
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, match.group(2).rstrip(":")))
+    flush()
+    return chunks
+
+
+class ChunkIndex:
+    """BM25 search over knowledge chunks, with a token budget on what is returned"""
+
+    def __init__(self, chunks: Sequence[Chunk], version: str = ""):
+        self.chunks: Tuple[Chunk, ...] = tuple(chunks)
+        self.version = version
+        self.text_index = BM25Index([((" ".join(c.headings), HEADING_WEIGHT), (c.text, 1.0)) for c in self.chunks])
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(c.tokens for c in self.chunks)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[Chunk, float]]:
+        """Best matching chunks for a query, highest score first (ties in file order)"""
+        if not self.chunks:
+            return []
+        scores, _ = self.text_index.scores(tokenize(query))
+        candidates = np.flatnonzero(scores > 0)
+        ranked = candidates[np.lexsort((candidates, -scores[candidates]))][:top_k]
+        return [(self.chunks[doc], float(scores[doc])) for doc in ranked.tolist()]
+
+    def select(self, query: str, top_k: int, max_tokens: int) -> List[Chunk]:
+        """
+        Up to top_k of the best chunks whose tokens fit within max_tokens.
+
+        A chunk too large for what is left of the budget is passed over for
+        the next best one, so the prompt never grows with the knowledge base.
+        """
+        selected: List[Chunk] = []
+        budget = max_tokens
+        for chunk, _ in self.search(query, top_k=len(self.chunks)):
+            if len(selected) >= top_k:
+                break
+            if chunk.tokens <= budget:
+                selected.append(chunk)
+                budget -= chunk.tokens
+        return selected
+
+    def context(self, query: str, top_k: int, max_tokens: int) -> str:
+        """Selected chunks rendered for a prompt, or an empty string when nothing matches"""
+        return "\n\n".join(chunk.render() for chunk in self.select(query, top_k, max_tokens))
+
+
+def index_documents(documents: Dict[str, str], token_counter: Callable[[str], int] = approx_tokens,
+                    version: str = "") -> ChunkIndex:
+    """Chunk and index markdown documents given as {file name: text}"""
+    chunks: List[Chunk] = []
+    for name, text in documents.items():
+        chunks.extend(split_markdown(text, name, token_counter))
+    return ChunkIndex(chunks, version)
+
+
+def build_index(paths: Sequence[str], token_counter: Callable[[str], int] = approx_tokens,
+                version: str = "") -> ChunkIndex:
+    """Chunk and index the knowledge files that exist; missing ones are skipped"""
+    documents: Dict[str, str] = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            documents[os.path.basename(path)] = f.read()
+    return index_documents(documents, token_counter, version)
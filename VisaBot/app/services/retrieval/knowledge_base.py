@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from loguru import logger
+from sqlalchemy import select
+
+from app.services.evaluation.country_packs import PACK_PREFIX, CountryPackLoader, check_pack_files, read_pack_files
+from app.services.evaluation.scenario_matcher import ScenarioMatcher
+
+from .embedding import HashedNgramEmbedder
+from .faq import FAQEntry, FAQIndex
+from .knowledge import KNOWLEDGE_DIR, KNOWLEDGE_FILES, ChunkIndex, approx_tokens, index_documents
+
+FAQ_FILE = "faqs.json"
+RULES_FILE = "evaluation_rules.json"
+SCENARIOS_FILE = "scenarios.json"
+DOCUMENTS = (FAQ_FILE, RULES_FILE, SCENARIOS_FILE) + KNOWLEDGE_FILES
+REQUIRED_DOCUMENTS = (FAQ_FILE, RULES_FILE, SCENARIOS_FILE)
+
+
+def content_digest(documents: Dict[str, str]) -> str:
+    """Hash of every document's name and content; identical on every worker reading the same content"""
+    digest = hashlib.sha256()
+    for name in sorted(documents):
+        digest.update(name.encode("utf-8") + b"\0" + documents[name].encode("utf-8") + b"\0")
+    return digest.hexdigest()[:16]
+
+
+def pack_files(documents: Dict[str, str]) -> Dict[str, str]:
+    """The country pack documents, by file name within the countries directory"""
+    return {name[len(PACK_PREFIX):]: text for name, text in documents.items() if name.startswith(PACK_PREFIX)}
+
+
+class FileKnowledgeSource:
+    """Knowledge documents read from app/prompts, and the country packs from app/prompts/countries"""
+    name = "files"
+
+    def __init__(self, directory: str = KNOWLEDGE_DIR, names: Sequence[str] = DOCUMENTS):
+        self.directory = directory
+        self.names = tuple(names)
+
+    def read_sync(self) -> Dict[str, str]:
+        documents: Dict[str, str] = {}
+        for name in self.names:
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    documents[name] = f.read()
+        packs = read_pack_files(os.path.join(self.directory, PACK_PREFIX.rstrip("/")))
+        documents.update({PACK_PREFIX + name: text for name, text in packs.items()})
+        return documents
+
+    async def read(self) -> Dict[str, str]:
+        return await asyncio.to_thread(self.read_sync)
+
+
+class DatabaseKnowledgeSource:
+    """
+    Knowledge documents from the knowledge_documents table, over the bundled files.
+
+    A row replaces the file of the same name, so only edited documents need to
+    be stored; country packs are rows named countries/<slug>.json, and a row
+    for a country without a bundled pack adds one. Until the database is initialized (and at import, before any
+    event loop runs) the bundled files are used as they are.
+    """
+    name = "database"
+
+    def __init__(self, fallback: Optional[FileKnowledgeSource] = None):
+        self.fallback = fallback or FileKnowledgeSource()
+
+    def read_sync(self) -> Dict[str, str]:
+        return self.fallback.read_sync()
+
+    async def read(self) -> Dict[str, str]:
+        from app.core import database
+        from app.models.database import KnowledgeDocument
+
+        documents = await self.fallback.read()
+        if database.AsyncSessionLocal is None:
+            return documents
+        async with database.AsyncSessionLocal() as session:
+            rows = (await session.execute(select(KnowledgeDocument))).scalars().all()
+        documents.update({row.name: row.content for row in rows
+                          if row.name in self.fallback.names or row.name.startswith(PACK_PREFIX)})
+        return documents
+
+
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    """
+    Everything built from one version of the knowledge documents.
+
+    Snapshots are never modified: a reload builds a new one and swaps the
+    reference, so a request that took a snapshot keeps a consistent view
+    (FAQ index, rules, scenarios, country packs and chunks of the same
+    version) to its end.
+    """
+    version: int  # Incremented by every swap in this process
+    digest: str  # Content hash; the same on every worker serving this content
+    faq_entries: tuple
+    faq_index: FAQIndex
+    evaluation_rules: Dict[str, Any]
+    scenario_matcher: ScenarioMatcher
+    country_packs: CountryPackLoader
+    chunks: ChunkIndex
+    source: str
+    loaded_at: float
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "digest": self.digest,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "faqs": len(self.faq_entries),
+            "scenarios": len(self.scenario_matcher.scenarios),
+            "countries": len(self.country_packs.available()),
+            "chunks": len(self.chunks),
+        }
+
+
+def build_snapshot(documents: Dict[str, str], version: int, source: str = "files",
+                   embedder: Optional[HashedNgramEmbedder] = None, cache_dir: Optional[str] = None,
+                   token_counter: Callable[[str], int] = approx_tokens) -> KnowledgeSnapshot:
+    """Parse and index a set of documents; raises if any required document is missing or invalid"""
+    missing = [name for name in REQUIRED_DOCUMENTS if name not in documents]
+    if missing:
+        raise ValueError(f"Missing knowledge documents: {', '.join(missing)}")
+    digest = content_digest(documents)
+    faq_entries = tuple(FAQEntry(**entry) for entry in json.loads(documents[FAQ_FILE]))
+    if not faq_entries:
+        raise ValueError(f"{FAQ_FILE} has no entries")
+    evaluation_rules = json.loads(documents[RULES_FILE])
+    if not isinstance(evaluation_rules, dict):
+        raise ValueError(f"{RULES_FILE} must contain an object")
+    packs = pack_files(documents)
+    check_pack_files(packs)
+    markdown = {name: text for name, text in documents.items() if name.endswith(".md")}
+    return KnowledgeSnapshot(
+        version=version,
+        digest=digest,
+        faq_entries=faq_entries,
+        faq_index=FAQIndex(faq_entries, embedder=embedder, cache_dir=cache_dir),
+        evaluation_rules=evaluation_rules,
+        scenario_matcher=ScenarioMatcher(json.loads(documents[SCENARIOS_FILE])),
+        country_packs=CountryPackLoader(packs),
+        chunks=index_documents(markdown, token_counter, digest),
+        source=source,
+        loaded_at=time.time(),
+    )
+
+
+class KnowledgeBase:
+    """
+    FAQs, evaluation rules, scenarios, country packs and knowledge sections, hot-reloadable.
+
+    The first snapshot is built from the bundled files at startup. reload()
+    reads the source again and, if the content digest changed, builds the new
+    indexes in a worker thread while requests keep using the current snapshot,
+    then swaps it in with a single assignment and notifies the swap listeners
+    (which drop caches keyed on the old content). A document that fails to
+    parse leaves the current snapshot in place.
+    """
+
+    def __init__(self, source=None, embedder_factory: Optional[Callable[[], Optional[HashedNgramEmbedder]]] = None,
+                 cache_dir: Optional[str] = None, token_counter: Callable[[str], int] = approx_tokens,
+                 reload_interval: float = 30.0):
+        self.source = source or FileKnowledgeSource()
+        self.embedder_factory = embedder_factory or (lambda: None)
+        self.cache_dir = cache_dir
+        self.token_counter = token_counter
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._listeners: List[Callable[[KnowledgeSnapshot, KnowledgeSnapshot], None]] = []
+        self._lock = asyncio.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+        self.current = self._build(self.source.read_sync(), 1)
+
+    def _build(self, documents: Dict[str, str], version: int) -> KnowledgeSnapshot:
+        return build_snapshot(documents, version, self.source.name, self.embedder_factory(), self.cache_dir,
+                              self.token_counter)
+
+    def on_swap(self, listener: Callable[[KnowledgeSnapshot, KnowledgeSnapshot], None]):
+        """Call listener(previous, current) after every swap"""
+        self._listeners.append(listener)
+
+    async def reload(self, force: bool = False) -> bool:
+        """Rebuild and swap in the knowledge if its content changed; True when a new version was swapped in"""
+        async with self._lock:
+            try:
+                documents = await self.source.read()
+                if not force and content_digest(documents) == self.current.digest:
+                    return False
+                snapshot = await asyncio.to_thread(self._build, documents, self.current.version + 1)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Error reloading knowledge base, keeping version {self.current.version}: {e}")
+                return False
+            previous, self.current = self.current, snapshot
+            self.reloads += 1
+            self.last_error = None
+
+        logger.info(f"Knowledge base swapped to version {snapshot.version} ({snapshot.digest}, "
+                    f"{len(snapshot.faq_entries)} FAQs, {len(snapshot.chunks)} sections)")
+        for listener in self._listeners:
+            try:
+                listener(previous, snapshot)
+            except Exception as e:
+                logger.error(f"Error in knowledge swap listener: {e}")
+        return True
+
+    def start_watching(self):
+        """Poll the source for changes in the background"""
+        if self._watcher is None and self.reload_interval > 0:
+            self._watcher = asyncio.create_task(self._watch_loop())
+
+    async def stop_watching(self):
+        if self._watcher:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.current.describe(),
+            "reloads": self.reloads,
+            "failed_reloads": self.failures,
+            "last_error": self.last_error,
+            "watching": self._watcher is not None,
+        }
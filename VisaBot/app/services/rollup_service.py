@@ -0,0 +1,89 @@
+"""
+Periodic refresh of the daily dashboard rollups
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.database_service import DatabaseService
+
+
+class RollupRefresher:
+    """Keeps daily_session_rollups and daily_evaluation_rollups up to date in the background"""
+
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None, interval: float = None,
+                 lookback_days: int = None):
+        self.session_factory = session_factory
+        self.interval = settings.ROLLUP_REFRESH_INTERVAL if interval is None else interval
+        self.lookback_days = settings.ROLLUP_LOOKBACK_DAYS if lookback_days is None else lookback_days
+        self.refreshes = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_refresh: Optional[float] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _factory(self):
+        if self.session_factory is not None:
+            return self.session_factory
+        from app.core import database
+        if database.AsyncSessionLocal is None:
+            raise RuntimeError("Database is not initialized")
+        return database.AsyncSessionLocal
+
+    async def refresh(self) -> Optional[Dict[str, Any]]:
+        """Refresh the rollups once; None if another worker was refreshing or the refresh failed"""
+        start = time.perf_counter()
+        try:
+            async with self._factory()() as db:
+                refreshed = await DatabaseService(db).refresh_rollups(self.lookback_days)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"Error refreshing dashboard rollups: {e}")
+            return None
+        if refreshed is None:
+            self.skipped += 1
+            return None
+        self.refreshes += 1
+        self.last_refresh = time.time()
+        self.last_duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.last_error = None
+        return refreshed
+
+    def start(self):
+        """Refresh now and then every interval"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval": self.interval,
+            "lookback_days": self.lookback_days,
+            "refreshes": self.refreshes,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "last_refresh": self.last_refresh,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+        }
+
+
+# Global rollup refresher instance
+rollup_refresher = RollupRefresher()
@@ -1,6 +1,7 @@
 """
 Session service for managing visa evaluation bot sessions
 """
+import re
 import uuid
 from typing import List, Optional, Dict, Any
 from datetime import datetime
@@ -11,6 +12,13 @@ from app.models.session import SessionInfo
 from app.models.chat import ChatMessage, ConversationHistory
 from app.services.fsm_service import FSMStates
 
+# Ids a WebSocket client may connect with: long enough to be unguessable, safe as a storage key
+CLIENT_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    return bool(session_id) and CLIENT_SESSION_ID.match(session_id) is not None
+
 
 class SessionService:
     """Service for managing visa evaluation bot sessions"""
@@ -19,9 +27,11 @@ class SessionService:
         # In-memory session storage (as requested)
         self.sessions: Dict[str, Dict[str, Any]] = {}
     
-    async def create_session(self) -> SessionInfo:
-        """Create a new chat session"""
-        session_id = str(uuid.uuid4())
+    async def create_session(self, session_id: Optional[str] = None) -> SessionInfo:
+        """Create a new chat session, optionally under a client-chosen id (see get_or_create_session)"""
+        if session_id is not None and not is_valid_session_id(session_id):
+            raise ValueError("Invalid session id")
+        session_id = session_id or str(uuid.uuid4())
         
         session_info = SessionInfo(
             session_id=session_id,
@@ -45,12 +55,13 @@ class SessionService:
             session_info.model_dump()
         )
         
-        # Initialize conversation history
-        conversation = ConversationHistory(session_id=session_id)
-        await redis_client.set_session_data(
-            f"conversation:{session_id}",
-            conversation.model_dump()
-        )
+        # Initialize conversation history (keep it when resuming a known session id)
+        if not await redis_client.get_session_data(f"conversation:{session_id}"):
+            conversation = ConversationHistory(session_id=session_id)
+            await redis_client.set_session_data(
+                f"conversation:{session_id}",
+                conversation.model_dump()
+            )
         
         logger.info(f"Created new session: {session_id}")
         return session_info
@@ -59,8 +70,15 @@ class SessionService:
         """Get session information from memory"""
         return self.sessions.get(session_id)
     
-    async def get_or_create_session(self, session_id: Optional[str] = None) -> tuple[str, Dict[str, Any]]:
-        """Get existing session or create new one. Returns (session_id, session_data)"""
+    async def get_or_create_session(self, session_id: Optional[str] = None,
+                                    allow_client_id: bool = False) -> tuple[str, Dict[str, Any]]:
+        """
+        Get existing session or create new one. Returns (session_id, session_data)
+        
+        An unknown id gets a fresh server-generated one, except on the WebSocket
+        path (allow_client_id), where the connection is bound to the id in its
+        URL and a well-formed id is used as is.
+        """
         if session_id and session_id in self.sessions:
             session = await self.get_session(session_id)
             if session:
@@ -68,7 +86,7 @@ class SessionService:
                 return session_id, session
         
         # Create new session
-        session_info = await self.create_session()
+        session_info = await self.create_session(session_id if allow_client_id else None)
         return session_info.session_id, self.sessions[session_info.session_id]
     
     async def update_session(self, session_id: str, state: FSMStates, answer: Dict[str, Any]):
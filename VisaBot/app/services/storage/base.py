@@ -0,0 +1,130 @@
+"""
+Storage backend interface used by RedisService
+"""
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+
+class Subscription(ABC):
+    """A pub/sub subscription multiplexing any number of channels over one connection"""
+
+    @abstractmethod
+    async def subscribe(self, *channels: str):
+        """Start receiving messages published to the channels"""
+
+    @abstractmethod
+    async def unsubscribe(self, *channels: str):
+        """Stop receiving messages from the channels"""
+
+    @abstractmethod
+    async def get_message(self, timeout: Optional[float] = None) -> Optional[Tuple[str, str]]:
+        """Wait for the next (channel, data) message; None if the timeout passes first"""
+
+    @abstractmethod
+    async def close(self):
+        """Unsubscribe from everything and release the connection"""
+
+
+class StorageBackend(ABC):
+    """
+    Key/value store with the subset of Redis semantics the bot relies on:
+    strings with TTL, counters, lists, hashes and pub/sub. Values are stored as strings,
+    matching a Redis client created with ``decode_responses=True``.
+    """
+
+    name: str = "base"
+
+    # Connection lifecycle
+    @abstractmethod
+    async def ping(self) -> bool:
+        """Check that the backend is reachable"""
+
+    @abstractmethod
+    async def close(self):
+        """Release backend resources"""
+
+    # Strings
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Get a string value"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ex: Optional[int] = None):
+        """Set a string value, optionally expiring after ``ex`` seconds"""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> int:
+        """Delete keys and return how many existed"""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Check whether a key exists"""
+
+    @abstractmethod
+    async def incr(self, key: str, amount: int = 1) -> int:
+        """Increment an integer value"""
+
+    # Expiry
+    @abstractmethod
+    async def expire(self, key: str, seconds: int) -> bool:
+        """Set a TTL on an existing key"""
+
+    @abstractmethod
+    async def ttl(self, key: str) -> int:
+        """Remaining TTL in seconds (-1 without expiry, -2 if missing)"""
+
+    # Key iteration
+    @abstractmethod
+    def scan_iter(self, match: Optional[str] = None) -> AsyncIterator[str]:
+        """Iterate over keys matching a glob pattern"""
+
+    # Lists
+    @abstractmethod
+    async def rpush(self, key: str, *values: Any) -> int:
+        """Append values to a list"""
+
+    @abstractmethod
+    async def lpush(self, key: str, *values: Any) -> int:
+        """Prepend values to a list"""
+
+    @abstractmethod
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        """Get a slice of a list (inclusive end, Redis style)"""
+
+    @abstractmethod
+    async def ltrim(self, key: str, start: int, end: int):
+        """Trim a list to the given inclusive range"""
+
+    @abstractmethod
+    async def llen(self, key: str) -> int:
+        """Length of a list"""
+
+    # Hashes
+    @abstractmethod
+    async def hset(self, key: str, mapping: Dict[str, Any]) -> int:
+        """Set hash fields and return how many were added"""
+
+    @abstractmethod
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        """Get a hash field"""
+
+    @abstractmethod
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        """Get all fields of a hash"""
+
+    @abstractmethod
+    async def hdel(self, key: str, *fields: str) -> int:
+        """Delete hash fields"""
+
+    @abstractmethod
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        """Increment an integer hash field"""
+
+    # Pub/sub
+    @abstractmethod
+    async def publish(self, channel: str, message: str) -> int:
+        """Publish a message and return how many subscribers received it"""
+
+    @abstractmethod
+    def subscription(self) -> Subscription:
+        """Create a new subscription"""
@@ -0,0 +1,303 @@
+"""
+In-process storage backend for tests, benchmarks and degraded mode
+"""
+import asyncio
+import fnmatch
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.services.storage.base import StorageBackend, Subscription
+from app.services.storage.timing_wheel import TimingWheel
+
+
+def _encode(value: Any) -> str:
+    """Encode a value the way redis-py does before sending it"""
+    if isinstance(value, bool):
+        raise TypeError("Invalid input of type: 'bool'. Convert to a bytes, string, int or float first.")
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    if isinstance(value, (int, float)):
+        return repr(value) if isinstance(value, float) else str(value)
+    raise TypeError(f"Invalid input of type: '{type(value).__name__}'. Convert to a bytes, string, int or float first.")
+
+
+class InMemorySubscription(Subscription):
+    """Subscription receiving messages published on the same backend instance"""
+
+    def __init__(self, backend: "InMemoryBackend"):
+        self._backend = backend
+        self.channels: Set[str] = set()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels: str):
+        for channel in channels:
+            self._backend._subscribers.setdefault(channel, set()).add(self)
+            self.channels.add(channel)
+
+    async def unsubscribe(self, *channels: str):
+        for channel in channels:
+            subscribers = self._backend._subscribers.get(channel)
+            if subscribers:
+                subscribers.discard(self)
+                if not subscribers:
+                    del self._backend._subscribers[channel]
+            self.channels.discard(channel)
+
+    async def get_message(self, timeout: Optional[float] = None) -> Optional[Tuple[str, str]]:
+        if timeout is None:
+            return await self._queue.get()
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        await self.unsubscribe(*list(self.channels))
+
+    def _deliver(self, channel: str, message: str):
+        self._queue.put_nowait((channel, message))
+
+
+class InMemoryBackend(StorageBackend):
+    """
+    Dictionary-backed storage backend.
+
+    Expiry is tracked in a hashed timing wheel so expired keys are reclaimed in
+    amortised O(1) on every operation, and every read also checks the key's own
+    deadline so a key is never visible past its TTL.
+    """
+
+    name = "memory"
+
+    def __init__(self, tick: float = 1.0, wheel_size: int = 3600, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._wheel = TimingWheel(tick=tick, size=wheel_size, clock=clock)
+        self._subscribers: Dict[str, Set[InMemorySubscription]] = {}
+
+    # -----------------------
+    # Internal helpers
+    # -----------------------
+    def _purge(self):
+        """Drop keys whose TTL elapsed"""
+        now = self.clock()
+        for key in self._wheel.advance(now):
+            deadline = self._expires.get(key)
+            if deadline is not None and deadline <= now:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        self._data.pop(key, None)
+        self._expires.pop(key, None)
+        self._wheel.cancel(key)
+
+    def _lookup(self, key: str, expected_type: type = None) -> Any:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= self.clock():
+            self._remove(key)
+            return None
+        value = self._data.get(key)
+        if value is not None and expected_type is not None and not isinstance(value, expected_type):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _set_ttl(self, key: str, seconds: Optional[float]):
+        if seconds is None:
+            self._expires.pop(key, None)
+            self._wheel.cancel(key)
+            return
+        deadline = self.clock() + seconds
+        self._expires[key] = deadline
+        self._wheel.schedule(key, deadline)
+
+    # -----------------------
+    # Connection lifecycle
+    # -----------------------
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+    async def flushdb(self):
+        """Remove every key"""
+        for key in list(self._data):
+            self._remove(key)
+
+    # -----------------------
+    # Strings
+    # -----------------------
+    async def get(self, key: str) -> Optional[str]:
+        self._purge()
+        return self._lookup(key, str)
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None):
+        self._purge()
+        self._data[key] = _encode(value)
+        self._set_ttl(key, ex)
+
+    async def delete(self, *keys: str) -> int:
+        self._purge()
+        removed = 0
+        for key in keys:
+            if self._lookup(key) is not None:
+                self._remove(key)
+                removed += 1
+        return removed
+
+    async def exists(self, key: str) -> bool:
+        self._purge()
+        return self._lookup(key) is not None
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        self._purge()
+        current = self._lookup(key, str)
+        try:
+            value = int(current or 0) + amount
+        except ValueError:
+            raise ValueError("value is not an integer or out of range")
+        # INCR keeps an existing TTL
+        self._data[key] = str(value)
+        return value
+
+    # -----------------------
+    # Expiry
+    # -----------------------
+    async def expire(self, key: str, seconds: int) -> bool:
+        self._purge()
+        if self._lookup(key) is None:
+            return False
+        self._set_ttl(key, seconds)
+        return True
+
+    async def ttl(self, key: str) -> int:
+        self._purge()
+        if self._lookup(key) is None:
+            return -2
+        deadline = self._expires.get(key)
+        if deadline is None:
+            return -1
+        return max(0, int(round(deadline - self.clock())))
+
+    async def scan_iter(self, match: Optional[str] = None) -> AsyncIterator[str]:
+        self._purge()
+        for key in list(self._data):
+            if self._lookup(key) is None:
+                continue
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
+    # -----------------------
+    # Lists
+    # -----------------------
+    def _list(self, key: str) -> Deque[str]:
+        items = self._lookup(key, deque)
+        if items is None:
+            items = deque()
+            self._data[key] = items
+        return items
+
+    async def rpush(self, key: str, *values: Any) -> int:
+        self._purge()
+        items = self._list(key)
+        items.extend(_encode(v) for v in values)
+        return len(items)
+
+    async def lpush(self, key: str, *values: Any) -> int:
+        self._purge()
+        items = self._list(key)
+        items.extendleft(_encode(v) for v in values)
+        return len(items)
+
+    @staticmethod
+    def _bounds(length: int, start: int, end: int) -> range:
+        if start < 0:
+            start = max(0, length + start)
+        if end < 0:
+            end = length + end
+        return range(start, min(end, length - 1) + 1)
+
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        self._purge()
+        items = self._lookup(key, deque)
+        if not items:
+            return []
+        return [items[i] for i in self._bounds(len(items), start, end)]
+
+    async def ltrim(self, key: str, start: int, end: int):
+        self._purge()
+        items = self._lookup(key, deque)
+        if items is None:
+            return
+        kept = deque(items[i] for i in self._bounds(len(items), start, end))
+        if kept:
+            self._data[key] = kept
+        else:
+            self._remove(key)
+
+    async def llen(self, key: str) -> int:
+        self._purge()
+        items = self._lookup(key, deque)
+        return len(items) if items else 0
+
+    # -----------------------
+    # Hashes
+    # -----------------------
+    async def hset(self, key: str, mapping: Dict[str, Any]) -> int:
+        self._purge()
+        table = self._lookup(key, dict)
+        if table is None:
+            table = {}
+            self._data[key] = table
+        added = 0
+        for field, value in mapping.items():
+            if field not in table:
+                added += 1
+            table[field] = _encode(value)
+        return added
+
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        self._purge()
+        table = self._lookup(key, dict)
+        return table.get(field) if table else None
+
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        self._purge()
+        table = self._lookup(key, dict)
+        return dict(table) if table else {}
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        self._purge()
+        table = self._lookup(key, dict)
+        if not table:
+            return 0
+        removed = sum(1 for field in fields if table.pop(field, None) is not None)
+        if not table:
+            self._remove(key)
+        return removed
+
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        self._purge()
+        table = self._lookup(key, dict)
+        if table is None:
+            table = {}
+            self._data[key] = table
+        value = int(table.get(field, 0)) + amount
+        table[field] = str(value)
+        return value
+
+    # -----------------------
+    # Pub/sub
+    # -----------------------
+    async def publish(self, channel: str, message: str) -> int:
+        subscribers = self._subscribers.get(channel, ())
+        for subscription in list(subscribers):
+            subscription._deliver(channel, _encode(message))
+        return len(subscribers)
+
+    def subscription(self) -> InMemorySubscription:
+        return InMemorySubscription(self)
@@ -0,0 +1,116 @@
+"""
+Redis implementation of the storage backend
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from redis.asyncio import Redis
+
+from app.services.storage.base import StorageBackend, Subscription
+
+
+class RedisSubscription(Subscription):
+    """Subscription backed by one Redis pub/sub connection"""
+
+    def __init__(self, client: Redis):
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+
+    async def subscribe(self, *channels: str):
+        if channels:
+            await self.pubsub.subscribe(*channels)
+
+    async def unsubscribe(self, *channels: str):
+        if channels:
+            await self.pubsub.unsubscribe(*channels)
+
+    async def get_message(self, timeout: Optional[float] = None) -> Optional[Tuple[str, str]]:
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message and message["type"] == "message":
+            return message["channel"], message["data"]
+        return None
+
+    async def close(self):
+        await self.pubsub.aclose()
+
+
+class RedisBackend(StorageBackend):
+    """Storage backend delegating to a live Redis server"""
+
+    name = "redis"
+
+    def __init__(self, client: Redis):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str, db: int = 0) -> "RedisBackend":
+        """Create a backend from a Redis URL"""
+        return cls(Redis.from_url(url, db=db, decode_responses=True))
+
+    async def ping(self) -> bool:
+        return await self.client.ping()
+
+    async def close(self):
+        await self.client.close()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None):
+        await self.client.set(key, value, ex=ex)
+
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return await self.client.delete(*keys)
+
+    async def exists(self, key: str) -> bool:
+        return bool(await self.client.exists(key))
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        return await self.client.incr(key, amount)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        return bool(await self.client.expire(key, seconds))
+
+    async def ttl(self, key: str) -> int:
+        return await self.client.ttl(key)
+
+    async def scan_iter(self, match: Optional[str] = None) -> AsyncIterator[str]:
+        async for key in self.client.scan_iter(match=match):
+            yield key
+
+    async def rpush(self, key: str, *values: Any) -> int:
+        return await self.client.rpush(key, *values)
+
+    async def lpush(self, key: str, *values: Any) -> int:
+        return await self.client.lpush(key, *values)
+
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        return await self.client.lrange(key, start, end)
+
+    async def ltrim(self, key: str, start: int, end: int):
+        await self.client.ltrim(key, start, end)
+
+    async def llen(self, key: str) -> int:
+        return await self.client.llen(key)
+
+    async def hset(self, key: str, mapping: Dict[str, Any]) -> int:
+        return await self.client.hset(key, mapping=mapping)
+
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        return await self.client.hget(key, field)
+
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        return await self.client.hgetall(key)
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        if not fields:
+            return 0
+        return await self.client.hdel(key, *fields)
+
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        return await self.client.hincrby(key, field, amount)
+
+    async def publish(self, channel: str, message: str) -> int:
+        return await self.client.publish(channel, message)
+
+    def subscription(self) -> RedisSubscription:
+        return RedisSubscription(self.client)
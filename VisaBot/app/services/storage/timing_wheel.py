@@ -0,0 +1,79 @@
+"""
+Hashed timing wheel for cheap expiry tracking
+"""
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel.
+
+    Items are bucketed by the tick their deadline falls in, so ``advance`` only
+    has to look at the slots that elapsed since the previous call instead of
+    scanning every tracked item. Rescheduling is O(1): the old slot entry is left
+    behind and discarded lazily when its slot comes round.
+    """
+
+    def __init__(self, tick: float = 1.0, size: int = 512, clock: Callable[[], float] = time.monotonic):
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        if size <= 0:
+            raise ValueError("size must be positive")
+        self.tick = tick
+        self.size = size
+        self.clock = clock
+        self._slots: List[Set[Hashable]] = [set() for _ in range(size)]
+        # item -> (deadline, tick the item was filed under)
+        self._entries: Dict[Hashable, Tuple[float, int]] = {}
+        self._cursor = int(clock() // tick) - 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._entries
+
+    def schedule(self, item: Hashable, deadline: float):
+        """Schedule (or reschedule) an item to expire at ``deadline``"""
+        # Deadlines in already processed ticks go into the next tick to be processed
+        slot_tick = max(int(deadline // self.tick), self._cursor + 1)
+        self._entries[item] = (deadline, slot_tick)
+        self._slots[slot_tick % self.size].add(item)
+
+    def cancel(self, item: Hashable):
+        """Stop tracking an item"""
+        self._entries.pop(item, None)
+
+    def deadline(self, item: Hashable) -> Optional[float]:
+        """Get the scheduled deadline of an item"""
+        entry = self._entries.get(item)
+        return entry[0] if entry else None
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """Process every fully elapsed tick and return the items that expired"""
+        now = self.clock() if now is None else now
+        last_tick = int(now // self.tick) - 1
+        if last_tick <= self._cursor:
+            return []
+
+        expired: List[Hashable] = []
+        # After a long pause every slot has elapsed at least once; visit each only once
+        first_tick = max(self._cursor + 1, last_tick - self.size + 1)
+        for t in range(first_tick, last_tick + 1):
+            slot = self._slots[t % self.size]
+            if not slot:
+                continue
+            for item in list(slot):
+                entry = self._entries.get(item)
+                if entry is None or entry[1] % self.size != t % self.size:
+                    # Cancelled or rescheduled into another slot
+                    slot.discard(item)
+                elif entry[1] <= t:
+                    slot.discard(item)
+                    del self._entries[item]
+                    expired.append(item)
+                # Otherwise the item is due in a later rotation of the wheel
+
+        self._cursor = last_tick
+        return expired
@@ -0,0 +1,239 @@
+"""
+Pub/sub backplane fanning WebSocket broadcasts out across workers
+"""
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Dict, Optional, Set
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.redis_service import redis_client
+from app.services.storage.base import StorageBackend, Subscription
+from app.services.websocket_manager import WebSocketManager, websocket_manager
+
+SESSION_CHANNEL_PREFIX = "ws:session:"
+BROADCAST_CHANNEL = "ws:broadcast"
+NODE_KEY_PREFIX = "ws:node:"
+CONNECTIONS_KEY_PREFIX = "ws:connections:"
+
+
+class WebSocketBackplane:
+    """
+    Relays session broadcasts between workers over the storage backend's pub/sub.
+
+    Every worker keeps a single subscription and adds a channel for each session
+    that has sockets connected locally, so the number of Redis connections does
+    not grow with the number of sessions. Published frames carry the sender's
+    node id and are ignored by the node that sent them, which has already
+    delivered them locally. Per-node connection counts are kept in a hash per
+    session and only counted while the node's heartbeat key is alive.
+    """
+
+    def __init__(self, manager: WebSocketManager, node_id: str = None, heartbeat_interval: float = None):
+        self.manager = manager
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval or settings.WS_BACKPLANE_HEARTBEAT
+        self.running = False
+        self.messages_published = 0
+        self.messages_received = 0
+        self._backend: Optional[StorageBackend] = None
+        self._subscription: Optional[Subscription] = None
+        self._subscribed: Set[str] = set()
+        self._dirty: Set[str] = set()
+        self._dirty_event: Optional[asyncio.Event] = None
+        self._tasks = []
+
+    # -----------------------
+    # Lifecycle
+    # -----------------------
+    async def start(self, backend: StorageBackend = None):
+        """Subscribe and start relaying for the local WebSocket manager"""
+        if self.running:
+            return
+        self._backend = backend or await redis_client.get_backend()
+        self._dirty_event = asyncio.Event()
+        await self._open_subscription()
+        self.manager.backplane = self
+        self.running = True
+
+        for session_id in self.manager.get_active_sessions():
+            self.session_changed(session_id)
+
+        self._tasks = [
+            asyncio.create_task(self._listen_loop()),
+            asyncio.create_task(self._sync_loop()),
+            asyncio.create_task(self._heartbeat_loop()),
+        ]
+        logger.info(f"WebSocket backplane started on node {self.node_id} ({self._backend.name})")
+
+    async def stop(self):
+        """Stop relaying and remove this node's connection counts"""
+        if not self.running:
+            return
+        self.running = False
+        self.manager.backplane = None
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        try:
+            for session_id in self._subscribed:
+                await self._backend.hdel(f"{CONNECTIONS_KEY_PREFIX}{session_id}", self.node_id)
+            await self._backend.delete(f"{NODE_KEY_PREFIX}{self.node_id}")
+            await self._subscription.close()
+        except Exception as e:
+            logger.error(f"Error stopping WebSocket backplane: {e}")
+        self._subscribed.clear()
+        logger.info("WebSocket backplane stopped")
+
+    async def _open_subscription(self):
+        self._subscription = self._backend.subscription()
+        # Always subscribed to something, so the connection can be read before the first session
+        await self._subscription.subscribe(BROADCAST_CHANNEL, *(self._channel(s) for s in self._subscribed))
+
+    # -----------------------
+    # Publishing
+    # -----------------------
+    @staticmethod
+    def _channel(session_id: str) -> str:
+        return f"{SESSION_CHANNEL_PREFIX}{session_id}"
+
+    async def publish(self, session_id: Optional[str], text: str, policy: str):
+        """Publish a serialized frame to a session (or every session when session_id is None)"""
+        channel = BROADCAST_CHANNEL if session_id is None else self._channel(session_id)
+        try:
+            await self._backend.publish(channel, f"{self.node_id}|{policy}|{text}")
+            self.messages_published += 1
+        except Exception as e:
+            logger.error(f"Error publishing WebSocket frame to {channel}: {e}")
+
+    async def _listen_loop(self):
+        while True:
+            try:
+                item = await self._subscription.get_message(timeout=None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket backplane subscription failed, resubscribing: {e}")
+                await asyncio.sleep(1)
+                await self._reopen_subscription()
+                continue
+
+            if item is None:
+                continue
+            channel, data = item
+            try:
+                node_id, policy, text = data.split("|", 2)
+            except ValueError:
+                logger.warning(f"Ignoring malformed backplane message on {channel}")
+                continue
+            if node_id == self.node_id:
+                continue
+
+            self.messages_received += 1
+            if channel == BROADCAST_CHANNEL:
+                self.manager.deliver_local(None, text, policy)
+            else:
+                self.manager.deliver_local(channel[len(SESSION_CHANNEL_PREFIX):], text, policy)
+
+    async def _reopen_subscription(self):
+        try:
+            await self._subscription.close()
+        except Exception:
+            pass
+        try:
+            await self._open_subscription()
+        except Exception as e:
+            logger.error(f"Error reopening WebSocket backplane subscription: {e}")
+
+    # -----------------------
+    # Session membership and counts
+    # -----------------------
+    def session_changed(self, session_id: str):
+        """Note that the local connections of a session changed"""
+        if self._dirty_event is None:
+            return
+        self._dirty.add(session_id)
+        self._dirty_event.set()
+
+    async def _sync_loop(self):
+        # Single consumer, so subscribe/unsubscribe for a session never race each other
+        while True:
+            await self._dirty_event.wait()
+            self._dirty_event.clear()
+            dirty, self._dirty = self._dirty, set()
+            for session_id in dirty:
+                try:
+                    await self._sync_session(session_id)
+                except Exception as e:
+                    logger.error(f"Error syncing WebSocket session {session_id} with backplane: {e}")
+                    self._dirty.add(session_id)
+
+    async def _sync_session(self, session_id: str):
+        count = self.manager.get_connection_count(session_id)
+        key = f"{CONNECTIONS_KEY_PREFIX}{session_id}"
+        if count:
+            if session_id not in self._subscribed:
+                await self._subscription.subscribe(self._channel(session_id))
+                self._subscribed.add(session_id)
+            await self._backend.hset(key, {self.node_id: count})
+        else:
+            if session_id in self._subscribed:
+                await self._subscription.unsubscribe(self._channel(session_id))
+                self._subscribed.discard(session_id)
+            await self._backend.hdel(key, self.node_id)
+
+    async def _heartbeat_loop(self):
+        while True:
+            try:
+                await self._backend.set(
+                    f"{NODE_KEY_PREFIX}{self.node_id}",
+                    int(time.time()),
+                    ex=max(1, int(self.heartbeat_interval * 3))
+                )
+                # Re-assert counts in case Redis lost them, and retry sessions that failed to sync
+                for session_id in self._subscribed.union(self.manager.get_active_sessions()):
+                    self.session_changed(session_id)
+            except Exception as e:
+                logger.error(f"WebSocket backplane heartbeat failed: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def get_session_counts(self, session_id: str) -> Dict[str, int]:
+        """Connection counts per live node for a session"""
+        key = f"{CONNECTIONS_KEY_PREFIX}{session_id}"
+        counts = {}
+        stale = []
+        for node_id, count in (await self._backend.hgetall(key)).items():
+            if node_id == self.node_id or await self._backend.exists(f"{NODE_KEY_PREFIX}{node_id}"):
+                counts[node_id] = int(count)
+            else:
+                stale.append(node_id)
+        if stale:
+            # Left behind by a worker that died without cleaning up
+            await self._backend.hdel(key, *stale)
+        # Our own count may not be synced yet
+        local = self.manager.get_connection_count(session_id)
+        if local:
+            counts[self.node_id] = local
+        else:
+            counts.pop(self.node_id, None)
+        return counts
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Backplane statistics for monitoring"""
+        return {
+            "node_id": self.node_id,
+            "running": self.running,
+            "subscribed_sessions": len(self._subscribed),
+            "messages_published": self.messages_published,
+            "messages_received": self.messages_received
+        }
+
+
+# Global backplane instance for the shared WebSocket manager
+websocket_backplane = WebSocketBackplane(websocket_manager)
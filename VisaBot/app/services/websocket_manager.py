@@ -1,103 +1,363 @@
 """
 WebSocket manager for handling multiple connections
 """
+import asyncio
 import json
-from typing import Dict, List, Set, Any
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, List, Optional, Set, Union, Any
 from fastapi import WebSocket
 from loguru import logger
 
+from app.core.config import settings
+from app.services.storage.timing_wheel import TimingWheel
+
+# Frame delivery policies
+FRAME_REQUIRED = "required"  # Must be delivered; overflowing the queue evicts the client
+FRAME_MERGE = "merge"  # Replaces the pending frame of the same kind; dropped when backlogged
+
+# Close codes
+WS_CLOSE_NORMAL = 1000  # Idle timeout
+WS_CLOSE_GOING_AWAY = 1001  # No pong received
+WS_CLOSE_TRY_AGAIN_LATER = 1013  # Evicted as a slow consumer
+
+# Close reasons counted as reaped rather than evicted
+REAP_HEARTBEAT_TIMEOUT = "heartbeat_timeout"
+REAP_IDLE_TIMEOUT = "idle_timeout"
+
+
+class _MergedFrame:
+    """A queued merge-policy frame; superseded by the next one of its kind"""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class WebSocketConnection:
+    """
+    A WebSocket with a bounded outbound queue drained by its own writer task.
+
+    Producers never call ``send_text`` directly: frames are serialized once by
+    the caller and enqueued without waiting, so a broadcast costs one append per
+    socket and a slow client cannot hold up anyone else. A client that lets its
+    queue fill up, or takes longer than the send timeout to accept a frame, is
+    evicted. Typing frames are merged - only the latest pending one is kept, at
+    the end of the queue so it never overtakes message frames - and dropped
+    when the client is backlogged.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        max_queue: int = None,
+        send_timeout: float = None,
+        on_close: Optional[Callable[["WebSocketConnection", str], None]] = None
+    ):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.max_queue = max_queue or settings.WS_SEND_QUEUE_SIZE
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self.frames_dropped = 0
+        self._outbox: Deque[Union[str, _MergedFrame]] = deque()
+        self._typing_frame: Optional[_MergedFrame] = None  # Pending merged frame, also in _outbox
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._on_close = on_close
+        self._writer: Optional[asyncio.Task] = None
+        # Heartbeat bookkeeping (monotonic seconds)
+        now = time.monotonic()
+        self.connected_at = now
+        self.last_seen = now  # Any frame from the client
+        self.last_activity = now  # A chat or typing frame from the client
+        self.ping_sent_at: Optional[float] = None
+        # Set while the endpoint runs a turn and is not reading from the socket
+        self.busy = False
+
+    def touch(self, activity: bool = False):
+        """Record a frame from the client; activity marks a user action rather than a pong/ping"""
+        now = time.monotonic()
+        self.last_seen = now
+        self.ping_sent_at = None
+        if activity:
+            self.last_activity = now
+
+    @property
+    def pending(self) -> int:
+        """Number of frames waiting to be written"""
+        return len(self._outbox)
+
+    @property
+    def _required_pending(self) -> int:
+        return len(self._outbox) - (self._typing_frame is not None)
+
+    def start(self):
+        """Start the writer task"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, text: str, policy: str = FRAME_REQUIRED) -> bool:
+        """
+        Queue an already serialized frame without waiting.
+        Returns False if the frame was dropped or the connection is (now) closed.
+        """
+        if self.closed:
+            return False
+
+        if policy == FRAME_MERGE:
+            if self._required_pending >= self.max_queue:
+                # The client is backlogged; a stale typing state is not worth sending
+                self.frames_dropped += 1
+                return False
+            if self._typing_frame is not None:
+                self._outbox.remove(self._typing_frame)
+            self._typing_frame = _MergedFrame(text)
+            self._outbox.append(self._typing_frame)
+        elif self._required_pending >= self.max_queue:
+            self.evict("slow_consumer")
+            return False
+        else:
+            self._outbox.append(text)
+
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    async def send(self, message: Dict[str, Any], policy: str = FRAME_REQUIRED) -> bool:
+        """Serialize and queue a frame"""
+        return self.enqueue(json.dumps(message), policy)
+
+    async def flush(self, timeout: float = 1.0):
+        """Wait until queued frames are written (or the timeout passes)"""
+        if self.closed:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out flushing WebSocket queue for session: {self.session_id}")
+
+    def close(self, reason: str = "closed"):
+        """Stop the writer and discard pending frames"""
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._outbox.clear()
+        self._typing_frame = None
+        self._idle.set()
+
+    async def wait_closed(self):
+        """Wait for the writer task to finish after close()"""
+        if self._writer:
+            await asyncio.gather(self._writer, return_exceptions=True)
+
+    def evict(self, reason: str, code: int = WS_CLOSE_TRY_AGAIN_LATER):
+        """Close the connection and the underlying socket"""
+        if self.closed:
+            return
+        logger.warning(f"Evicting WebSocket for session {self.session_id}: {reason}")
+        self.close(reason)
+        # Tell the client, so it can reconnect instead of waiting on a dead stream
+        asyncio.create_task(self._close_socket(code))
+        if self._on_close:
+            self._on_close(self, reason)
+
+    async def _close_socket(self, code: int):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
+
+    async def _write_loop(self):
+        while True:
+            while not self._outbox:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            frame = self._outbox.popleft()
+            if frame is self._typing_frame:
+                self._typing_frame = None
+            text = frame.text if isinstance(frame, _MergedFrame) else frame
+
+            try:
+                # asyncio.timeout avoids the extra task wait_for creates per frame
+                async with asyncio.timeout(self.send_timeout):
+                    await self.websocket.send_text(text)
+            except TimeoutError:
+                self.evict("send_timeout")
+                return
+            except Exception as e:
+                logger.error(f"Error writing to WebSocket for session {self.session_id}: {e}")
+                self.close("send_error")
+                if self._on_close:
+                    self._on_close(self, "send_error")
+                return
+
 
 class WebSocketManager:
     """Manages WebSocket connections for real-time chat"""
-    
+
     def __init__(self):
         # Map session_id to set of WebSocket connections
         self.active_connections: Dict[str, Set[WebSocket]] = {}
         # Map WebSocket to session_id for cleanup
         self.websocket_sessions: Dict[WebSocket, str] = {}
-    
-    async def connect(self, websocket: WebSocket, session_id: str):
+        # Map WebSocket to its outbound queue and writer
+        self.connections: Dict[WebSocket, WebSocketConnection] = {}
+        # Connections closed by the manager, keyed by reason
+        self.evictions: Dict[str, int] = {}
+        self.frames_dropped = 0
+        # Cross-worker relay, attached by WebSocketBackplane.start()
+        self.backplane = None
+        # Heartbeats: each connection sits in the wheel until its next ping, pong or idle deadline
+        self.ping_interval = settings.WS_PING_INTERVAL
+        self.pong_timeout = settings.WS_PONG_TIMEOUT
+        self.idle_timeout = settings.WS_IDLE_TIMEOUT
+        self.reaped: Dict[str, int] = {}
+        self._heartbeats = TimingWheel(tick=settings.WS_REAPER_TICK, size=512)
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def connect(self, websocket: WebSocket, session_id: str) -> WebSocketConnection:
         """Connect a WebSocket to a session"""
         await websocket.accept()
-        
+
         if session_id not in self.active_connections:
             self.active_connections[session_id] = set()
-        
+
+        connection = WebSocketConnection(
+            websocket,
+            session_id,
+            on_close=self._on_connection_closed
+        )
+        connection.start()
+
         self.active_connections[session_id].add(websocket)
         self.websocket_sessions[websocket] = session_id
-        
+        self.connections[websocket] = connection
+        self._heartbeats.schedule(connection, connection.connected_at + self.ping_interval)
+        if self.backplane:
+            self.backplane.session_changed(session_id)
+
         logger.info(f"WebSocket connected to session: {session_id}")
-    
+        return connection
+
     def disconnect(self, websocket: WebSocket, session_id: str):
         """Disconnect a WebSocket from a session"""
         if session_id in self.active_connections:
             self.active_connections[session_id].discard(websocket)
-            
+
             # Remove empty session
             if not self.active_connections[session_id]:
                 del self.active_connections[session_id]
-        
+
         if websocket in self.websocket_sessions:
             del self.websocket_sessions[websocket]
-        
-        logger.info(f"WebSocket disconnected from session: {session_id}")
-    
+
+        connection = self.connections.pop(websocket, None)
+        if connection:
+            connection.close()
+            self._heartbeats.cancel(connection)
+            if self.backplane:
+                self.backplane.session_changed(session_id)
+            logger.info(f"WebSocket disconnected from session: {session_id}")
+
+    def _on_connection_closed(self, connection: WebSocketConnection, reason: str):
+        counts = self.reaped if reason in (REAP_HEARTBEAT_TIMEOUT, REAP_IDLE_TIMEOUT) else self.evictions
+        counts[reason] = counts.get(reason, 0) + 1
+        self.disconnect(connection.websocket, connection.session_id)
+
+    def get_connection(self, websocket: WebSocket) -> Optional[WebSocketConnection]:
+        """Get the queued connection wrapping a WebSocket"""
+        return self.connections.get(websocket)
+
     async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket):
         """Send message to a specific WebSocket"""
-        try:
-            await websocket.send_text(json.dumps(message))
-        except Exception as e:
-            logger.error(f"Error sending personal message: {e}")
-            # Remove broken connection
-            session_id = self.websocket_sessions.get(websocket)
-            if session_id:
-                self.disconnect(websocket, session_id)
-    
+        connection = self.connections.get(websocket)
+        if connection:
+            await connection.send(message, self._frame_policy(message))
+
+    @staticmethod
+    def _frame_policy(message: Dict[str, Any]) -> str:
+        return FRAME_MERGE if message.get("type") == "typing" else FRAME_REQUIRED
+
+    def _fan_out(self, websockets, text: str, policy: str, exclude_websocket: WebSocket = None) -> int:
+        delivered = 0
+        for websocket in websockets:
+            if websocket is exclude_websocket:
+                continue
+            connection = self.connections.get(websocket)
+            if connection is None:
+                continue
+            if connection.enqueue(text, policy):
+                delivered += 1
+            elif policy == FRAME_MERGE and not connection.closed:
+                self.frames_dropped += 1
+        return delivered
+
     async def broadcast_to_session(
         self,
         session_id: str,
         message: Dict[str, Any],
         exclude_websocket: WebSocket = None
-    ):
-        """Broadcast message to all WebSockets in a session"""
+    ) -> int:
+        """Broadcast message to all WebSockets in a session; returns how many local sockets accepted it"""
+        # Serialize once; enqueueing never waits, so the loop cannot be stalled by a client
+        text = json.dumps(message)
+        policy = self._frame_policy(message)
+        if self.backplane:
+            await self.backplane.publish(session_id, text, policy)
+
         if session_id not in self.active_connections:
-            return
-        
-        disconnected_websockets = set()
-        
-        for websocket in self.active_connections[session_id]:
-            if websocket != exclude_websocket:
-                try:
-                    await websocket.send_text(json.dumps(message))
-                except Exception as e:
-                    logger.error(f"Error broadcasting to session {session_id}: {e}")
-                    disconnected_websockets.add(websocket)
-        
-        # Clean up disconnected WebSockets
-        for websocket in disconnected_websockets:
-            self.disconnect(websocket, session_id)
-    
-    async def broadcast_to_all(self, message: Dict[str, Any]):
+            return 0
+        return self._fan_out(list(self.active_connections[session_id]), text, policy, exclude_websocket)
+
+    async def broadcast_to_all(self, message: Dict[str, Any]) -> int:
         """Broadcast message to all connected WebSockets"""
-        for session_id in list(self.active_connections.keys()):
-            await self.broadcast_to_session(session_id, message)
-    
+        text = json.dumps(message)
+        policy = self._frame_policy(message)
+        if self.backplane:
+            await self.backplane.publish(None, text, policy)
+        return self._fan_out(list(self.connections), text, policy)
+
+    def deliver_local(self, session_id: Optional[str], text: str, policy: str = FRAME_REQUIRED) -> int:
+        """Deliver a frame relayed from another worker to local sockets (all of them when session_id is None)"""
+        if session_id is None:
+            return self._fan_out(list(self.connections), text, policy)
+        if session_id not in self.active_connections:
+            return 0
+        return self._fan_out(list(self.active_connections[session_id]), text, policy)
+
+    async def get_cluster_connection_counts(self, session_id: str) -> Dict[str, int]:
+        """Connections for a session per worker node (just this one without a backplane)"""
+        if self.backplane:
+            return await self.backplane.get_session_counts(session_id)
+        count = self.get_connection_count(session_id)
+        return {"local": count} if count else {}
+
     def get_session_connections(self, session_id: str) -> List[WebSocket]:
         """Get all WebSocket connections for a session"""
         return list(self.active_connections.get(session_id, set()))
-    
+
     def get_connection_count(self, session_id: str) -> int:
         """Get number of connections for a session"""
         return len(self.active_connections.get(session_id, set()))
-    
+
     def get_total_connections(self) -> int:
         """Get total number of active connections"""
         return sum(len(connections) for connections in self.active_connections.values())
-    
+
     def get_active_sessions(self) -> List[str]:
         """Get list of active session IDs"""
         return list(self.active_connections.keys())
-    
+
     async def send_typing_indicator(self, session_id: str, is_typing: bool = True):
         """Send typing indicator to session"""
         await self.broadcast_to_session(session_id, {
@@ -105,7 +365,29 @@ class WebSocketManager:
             "session_id": session_id,
             "is_typing": is_typing
         })
-    
+
+    @asynccontextmanager
+    async def typing(self, session_id: str, refresh_interval: float = None):
+        """Show the bot as typing for the duration of the block, refreshing the indicator periodically"""
+        interval = refresh_interval or settings.WS_TYPING_REFRESH_INTERVAL
+
+        async def refresh():
+            while True:
+                await asyncio.sleep(interval)
+                await self.send_typing_indicator(session_id, True)
+
+        await self.send_typing_indicator(session_id, True)
+        refresher = asyncio.create_task(refresh())
+        try:
+            yield
+        finally:
+            refresher.cancel()
+            try:
+                await refresher
+            except asyncio.CancelledError:
+                pass
+            await self.send_typing_indicator(session_id, False)
+
     async def send_system_message(self, session_id: str, message: str, message_type: str = "info"):
         """Send system message to session"""
         await self.broadcast_to_session(session_id, {
@@ -114,7 +396,7 @@ class WebSocketManager:
             "message": message,
             "message_type": message_type
         })
-    
+
     async def send_error_message(self, session_id: str, error_message: str):
         """Send error message to session"""
         await self.broadcast_to_session(session_id, {
@@ -122,9 +404,96 @@ class WebSocketManager:
             "session_id": session_id,
             "message": error_message
         })
-    
-    def cleanup_inactive_connections(self):
-        """Clean up inactive connections (can be called periodically)"""
-        # This method can be extended to implement connection health checks
-        # For now, we rely on exception handling during message sending
-        pass 
\ No newline at end of file
+
+    async def close_all(self):
+        """Disconnect every WebSocket (used on shutdown)"""
+        connections = list(self.connections.values())
+        for connection in connections:
+            self.disconnect(connection.websocket, connection.session_id)
+        await asyncio.gather(*(connection.wait_closed() for connection in connections))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Delivery and heartbeat statistics for monitoring"""
+        now = time.monotonic()
+        connections = list(self.connections.values())
+        return {
+            "connections": len(connections),
+            "sessions": len(self.active_connections),
+            "live": sum(1 for c in connections if now - c.last_activity < self.ping_interval),
+            "idle": sum(1 for c in connections if now - c.last_activity >= self.ping_interval),
+            "awaiting_pong": sum(1 for c in connections if c.ping_sent_at is not None),
+            "pending_frames": sum(c.pending for c in connections),
+            "frames_dropped": self.frames_dropped,
+            "evictions": dict(self.evictions),
+            "reaped": dict(self.reaped)
+        }
+
+    # -----------------------
+    # Heartbeats
+    # -----------------------
+    def start_heartbeat(self):
+        """Start the background reaper"""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reaper_loop())
+
+    async def stop_heartbeat(self):
+        """Stop the background reaper"""
+        if self._reaper:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+
+    async def _reaper_loop(self):
+        while True:
+            await asyncio.sleep(self._heartbeats.tick)
+            try:
+                await self.cleanup_inactive_connections()
+            except Exception as e:
+                logger.error(f"Error reaping WebSocket connections: {e}")
+
+    async def cleanup_inactive_connections(self, now: float = None) -> int:
+        """
+        Ping, and close, connections whose heartbeat deadline passed.
+        Only connections due in the elapsed wheel slots are examined. Returns how many were reaped.
+        """
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        for connection in self._heartbeats.advance(now):
+            if not connection.closed and self._check_heartbeat(connection, now):
+                reaped += 1
+        return reaped
+
+    def _check_heartbeat(self, connection: WebSocketConnection, now: float) -> bool:
+        if connection.busy:
+            # Pongs are not read while a turn runs; look again later
+            connection.touch(activity=True)
+            self._heartbeats.schedule(connection, now + self.ping_interval)
+            return False
+
+        if connection.ping_sent_at is not None and now - connection.ping_sent_at >= self.pong_timeout:
+            connection.evict(REAP_HEARTBEAT_TIMEOUT, WS_CLOSE_GOING_AWAY)
+            return True
+
+        idle_deadline = connection.last_activity + self.idle_timeout if self.idle_timeout > 0 else float("inf")
+        if now >= idle_deadline:
+            connection.evict(REAP_IDLE_TIMEOUT, WS_CLOSE_NORMAL)
+            return True
+
+        if connection.ping_sent_at is None:
+            ping_due = connection.last_seen + self.ping_interval
+            if now >= ping_due:
+                if not connection.enqueue(json.dumps({"type": "ping", "session_id": connection.session_id})):
+                    return False
+                connection.ping_sent_at = now
+                next_deadline = now + self.pong_timeout
+            else:
+                next_deadline = ping_due
+        else:
+            next_deadline = connection.ping_sent_at + self.pong_timeout
+
+        self._heartbeats.schedule(connection, min(next_deadline, idle_deadline))
+        return False
+
+
+# Global WebSocket manager instance
+websocket_manager = WebSocketManager()
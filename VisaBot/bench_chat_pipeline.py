@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark the full chat pipeline against in-process storage.
+
+Runs scripted conversations through ChatService with the in-memory storage
+backend and an offline LLM stub, so no Redis or OpenAI access is needed.
+Reports turns/sec, p50/p95 per-turn latency and the average questionnaire
+length per completed evaluation.
+
+Usage: python bench_chat_pipeline.py [--sessions 50] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from loguru import logger
+
+from app.models.chat import ChatRequest
+from app.services.chat_service import chat_service
+from app.services.fsm_service import fsm_service
+from app.services.openai_service import openai_service
+
+
+# A business applicant walking through the whole questionnaire
+CONVERSATION = [
+    "hi",
+    "France",
+    "I run my own business",
+    "sole proprietor",
+    "yes I am a tax filer, annual income 2500000",
+    "closing balance 3000000",
+    "Dubai, Turkey, Malaysia",
+    "2023",
+    "no",
+    "35",
+    "yes we have an office with 5 employees",
+    "yes, machinery and vehicles",
+    "yes we have a website and facebook page",
+]
+
+
+async def offline_generate_response(messages, system_prompt=None, context=None, use_evaluation_model=False):
+    """Stand-in for the OpenAI call; non-JSON output sends parsing down the regex fallback"""
+    return "Thanks for your question. Let's continue with your visa evaluation."
+
+
+async def run_conversation(latencies: list) -> int:
+    session_id = None
+    turns = 0
+    for message in CONVERSATION:
+        start = time.perf_counter()
+        response = await chat_service.process_chat_message(ChatRequest(session_id=session_id, message=message))
+        latencies.append(time.perf_counter() - start)
+        session_id = response.session_id
+        turns += 1
+        if response.state == "complete":
+            break
+    return turns
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main(sessions: int, concurrency: int):
+    logger.remove()
+    openai_service.generate_response = offline_generate_response
+
+    latencies: list = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with semaphore:
+            return await run_conversation(latencies)
+
+    start = time.perf_counter()
+    turns = sum(await asyncio.gather(*(bounded() for _ in range(sessions))))
+    elapsed = time.perf_counter() - start
+
+    print(f"Sessions:     {sessions} (concurrency {concurrency})")
+    print(f"Turns:        {turns}")
+    print(f"Elapsed:      {elapsed:.3f}s")
+    print(f"Turns/sec:    {turns / elapsed:.1f}")
+    print(f"p50 latency:  {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"p95 latency:  {percentile(latencies, 95) * 1000:.2f} ms")
+    print(f"mean latency: {statistics.mean(latencies) * 1000:.2f} ms")
+
+    stats = fsm_service.get_stats()
+    print(f"Early exit:   {'on' if stats['early_exit_enabled'] else 'off'}")
+    print(f"Completed:    {stats['completed_evaluations']}")
+    print(f"Avg turns:    {stats['average_turns']} (skipped {stats['average_questions_skipped']} questions)")
+    turns_stats = stats["turn_classifier"]
+    print(f"On-track:     {turns_stats['on_track']} of {turns_stats['turns']} turns "
+          f"({turns_stats['llm_calls_avoided']} LLM calls avoided)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the chat pipeline on in-memory storage")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.concurrency))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark FAQ retrieval with and without offline semantic search.
+
+Replays labelled off-track questions through the same decision
+RAGService.handle_off_track_question makes: a hit above 0.7 confidence is
+answered from the FAQ, anything else falls through to a paid LLM call.
+Reports LLM fallbacks, correct/wrong FAQ answers and per-query latency for
+keyword-only and fused retrieval, plus search latency on a synthetic index.
+
+Usage: python bench_faq_retrieval.py [--entries 10000] [--queries 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from loguru import logger
+
+from app.services.rag_service import rag_service
+from app.services.retrieval.embedding import HashedNgramEmbedder
+from app.services.retrieval.faq import FAQEntry, FAQIndex
+
+FAQ_CONFIDENCE_THRESHOLD = 0.7  # As in handle_off_track_question
+
+# (question, FAQ question it should be answered with, or None for no FAQ)
+QUERIES = [
+    # Keyword-style questions
+    ("how much is the visa fee", "What are the visa fees for Schengen countries?"),
+    ("how long will processing take", "How long does visa processing take?"),
+    ("what documents do I need", "What documents are required for Schengen visa?"),
+    ("what bank balance should I show", "What is the minimum bank balance for Schengen visa?"),
+    ("my visa got refused, can I appeal?", "What if my visa is rejected?"),
+    ("is travel insurance mandatory", "Do I need travel insurance for Schengen visa?"),
+    ("can I work on a tourist visa", "Can I work on a Schengen tourist visa?"),
+    ("which country has good visa ratio", "Which country has good visa ratio, visa success rate?"),
+    ("what are the steps of the procedure", "What is the visa process, how to apply?"),
+    ("I have no travel history, should I apply", "Should I apply Schengen visa with no travel history?"),
+    # Paraphrases sharing few or no keywords with the FAQ
+    ("how many days for visa", "How long does visa processing take?"),
+    ("how many weeks until I get my passport back", "How long does visa processing take?"),
+    ("will the embassy decide quickly", "How long does visa processing take?"),
+    ("what's the charge for applying", "What are the visa fees for Schengen countries?"),
+    ("do children pay less", "What are the visa fees for Schengen countries?"),
+    ("is the application free for infants", "What are the visa fees for Schengen countries?"),
+    ("which papers must I bring to the appointment", "What documents are required for Schengen visa?"),
+    ("what should my file contain", "What documents are required for Schengen visa?"),
+    ("how much funds should be in my account", "What is the minimum bank balance for Schengen visa?"),
+    ("savings needed to show", "What is the minimum bank balance for Schengen visa?"),
+    ("my application was turned down", "What if my visa is rejected?"),
+    ("they did not give me the visa, now what", "What if my visa is rejected?"),
+    ("is medical cover compulsory", "Do I need travel insurance for Schengen visa?"),
+    ("do I have to buy insurance", "Do I need travel insurance for Schengen visa?"),
+    ("which season gets faster decisions", "What are the best months to apply for Schengen visa?"),
+    ("should I avoid summer", "What are the best months to apply for Schengen visa?"),
+    ("can I take a job while visiting", "Can I work on a Schengen tourist visa?"),
+    ("am I allowed to earn money there", "Can I work on a Schengen tourist visa?"),
+    ("where do I book an appointment", "What is the visa process, how to apply?"),
+    ("do I submit biometrics", "What is the visa process, how to apply?"),
+    ("I have never been abroad", "Should I apply Schengen visa with no travel history?"),
+    ("is a first trip to europe a problem", "Should I apply Schengen visa with no travel history?"),
+    ("can I visit germany and italy in one trip", "Can I apply for multiple Schengen visas?"),
+    ("where should I submit if visiting two countries", "Can I apply for multiple Schengen visas?"),
+    ("easiest embassy to get approved", "Which Schengen country has the highest visa approval rate?"),
+    ("which embassy approves most", "Which Schengen country has the highest visa approval rate?"),
+    # Chit-chat that must not get a canned FAQ answer
+    ("what is your name", None),
+    ("thanks a lot", None),
+    ("tell me a joke", None),
+    ("what is the weather in paris", None),
+]
+
+
+def replay(index: FAQIndex) -> dict:
+    counts = {"faq_correct": 0, "faq_wrong": 0, "llm": 0}
+    latencies = []
+    for query, expected in QUERIES:
+        _, question_type = rag_service._classify_question(query, "ask_age")
+        start = time.perf_counter()
+        hit = index.best(query, question_type)
+        latencies.append(time.perf_counter() - start)
+        if hit and hit.confidence > FAQ_CONFIDENCE_THRESHOLD:
+            counts["faq_correct" if hit.entry.question == expected else "faq_wrong"] += 1
+        else:
+            counts["llm"] += 1
+    counts["mean_ms"] = sum(latencies) / len(latencies) * 1000
+    return counts
+
+
+def synthetic_latency(entries: int, queries: int, embedder) -> float:
+    rng = random.Random(42)
+    words = [f"term{i}" for i in range(3000)] + ["visa", "fee", "bank", "balance", "insurance", "travel"]
+    index = FAQIndex([
+        FAQEntry(" ".join(rng.choices(words, k=10)), " ".join(rng.choices(words, k=40)), f"category{i % 20}",
+                 [" ".join(rng.choices(words, k=2)) for _ in range(4)])
+        for i in range(entries)
+    ], embedder=embedder)
+    texts = ["how much is the visa fee", "bank balance for travel insurance", "term12 term400 visa"]
+    start = time.perf_counter()
+    for i in range(queries):
+        index.search(texts[i % len(texts)], "category3")
+    return (time.perf_counter() - start) / queries * 1000
+
+
+def main(entries: int, queries: int):
+    logger.remove()
+    answerable = sum(1 for _, expected in QUERIES if expected)
+    print(f"Labelled questions: {len(QUERIES)} ({answerable} answerable from the FAQ)")
+    for name, embedder in (("keyword", None), ("fused", HashedNgramEmbedder())):
+        result = replay(FAQIndex(rag_service.faq_database, embedder=embedder))
+        print(f"{name:8s} LLM fallbacks {result['llm']:3d}  FAQ correct {result['faq_correct']:3d}  "
+              f"FAQ wrong {result['faq_wrong']:3d}  {result['mean_ms']:.3f} ms/query")
+    for name, embedder in (("keyword", None), ("fused", HashedNgramEmbedder())):
+        print(f"{name:8s} {entries:,} entries: {synthetic_latency(entries, queries, embedder):.3f} ms/query")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark keyword vs fused FAQ retrieval")
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.entries, args.queries)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark the answer parsers used by the normalizer and the FSM.
+
+Parses a corpus of amounts, years and yes/no answers in the shapes users type
+and reports calls/sec for each parser. The amount parser is compared with the
+regex-per-call implementation it replaced, which only understood "million".
+
+Usage: python bench_parsing.py [--values 200000] [--seed 36]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from app.services.evaluation.parsing import parse_amount, parse_year, parse_yes_no
+
+
+AMOUNTS = [
+    "2 million", "2.5 million", "1.5m", "500k", "25 lakh", "12 lacs", "1.2 crore", "PKR 25,00,000",
+    "Rs. 1,500,000", "around 800000 rupees", "2000000", "no idea", 1_200_000, "",
+]
+YEARS = ["2019", "in 2021", "2 years ago", "a year ago", "last year", "few months ago", "never", 2018, ""]
+YES_NO = [
+    "yes", "Yes, I have an office", "no", "no, never", "nope", "not sure", "I don't have one",
+    "haan", "nahi", "maybe", True, "",
+]
+
+
+def legacy_to_int(value) -> int:
+    """The normalizer's previous amount parser, kept here as the baseline"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        import re
+        text = value.strip().lower()
+        if any(token in text for token in ["million", "mn", "m ", " m", "mio", "m."]):
+            numbers = re.findall(r"\d+", text)
+            if numbers:
+                return int(numbers[0]) * 1_000_000
+        numbers = re.findall(r"\d+", text)
+        if numbers:
+            return int(numbers[0])
+    return 0
+
+
+def rate(count: int, elapsed: float) -> str:
+    return f"{count / elapsed:>12,.0f} calls/sec ({elapsed * 1000:.1f} ms)"
+
+
+def timed(parser, values) -> float:
+    start = time.perf_counter()
+    for value in values:
+        parser(value)
+    return time.perf_counter() - start
+
+
+def run(count: int, seed: int):
+    rng = random.Random(seed)
+    amounts = [rng.choice(AMOUNTS) for _ in range(count)]
+    years = [rng.choice(YEARS) for _ in range(count)]
+    answers = [rng.choice(YES_NO) for _ in range(count)]
+
+    misread = sum(1 for v in AMOUNTS if legacy_to_int(v) != (parse_amount(v) or 0))
+    print(f"Values per parser:       {count}")
+    print(f"Legacy amount parser:    {rate(count, timed(legacy_to_int, amounts))}")
+    print(f"parse_amount:            {rate(count, timed(parse_amount, amounts))}")
+    print(f"parse_year:              {rate(count, timed(parse_year, years))}")
+    print(f"parse_yes_no:            {rate(count, timed(parse_yes_no, answers))}")
+    print(f"Legacy misreads:         {misread} of {len(AMOUNTS)} amount shapes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the answer parsers")
+    parser.add_argument("--values", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=36)
+    args = parser.parse_args()
+    run(args.values, args.seed)
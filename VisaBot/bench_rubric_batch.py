@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark rubric re-scoring throughput.
+
+Generates N synthetic answer dicts and scores them one at a time through
+normalize_answers/score_profile, then through the vectorized batch path.
+Reports profiles/sec for normalization and scoring separately, since only the
+scoring half is vectorized.
+
+Usage: python bench_rubric_batch.py [--profiles 50000] [--seed 31]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from loguru import logger
+
+from app.services.evaluation.batch import FeatureColumns, score_columns
+from app.services.evaluation.normalizer import extract_features, normalize_answers
+from app.services.evaluation.rubric import score_profile
+
+
+COUNTRIES = ["UAE", "Turkey", "France", "Germany", "USA", "UK", "Malaysia", "Japan", "Spain", "Canada"]
+
+
+def synthetic_answers(rng: random.Random) -> dict:
+    return {
+        "profession": rng.choice(["business owner", "job holder", "entrepreneur"]),
+        "business_type": rng.choice([None, "sole proprietor", "partnership"]),
+        "business_premises": rng.choice([True, False, None]),
+        "business_online_presence": rng.choice([True, False, None]),
+        "is_tax_filer": rng.choice([True, False, None]),
+        "annual_income": rng.choice([0, 600_000, 900_000, 1_500_000, "2 million"]),
+        "closing_balance": rng.choice([0, 1_200_000, 1_700_000, 2_500_000, True]),
+        "travel_history": rng.sample(COUNTRIES, rng.randint(0, 4)),
+        "last_travel_year": rng.choice([None, 2012, 2018, 2022, 2024]),
+        "schengen_rejection": rng.choice([False, {"has_rejection": True, "year": "2021"}]),
+        "age": rng.randint(20, 60),
+    }
+
+
+def rate(count: int, elapsed: float) -> str:
+    return f"{count / elapsed:>12,.0f} profiles/sec ({elapsed * 1000:.1f} ms)"
+
+
+def run(count: int, seed: int):
+    logger.remove()
+    rng = random.Random(seed)
+    answers_list = [synthetic_answers(rng) for _ in range(count)]
+
+    start = time.perf_counter()
+    for answers in answers_list:
+        score_profile(normalize_answers(answers))
+    scalar_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    features = [extract_features(answers) for answers in answers_list]
+    normalize_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = FeatureColumns.from_features(features)
+    columns_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = score_columns(columns)
+    score_elapsed = time.perf_counter() - start
+
+    batch_elapsed = normalize_elapsed + columns_elapsed + score_elapsed
+    print(f"Profiles:                {count}")
+    print(f"Scalar one at a time:    {rate(count, scalar_elapsed)}")
+    print(f"Batch normalize:         {rate(count, normalize_elapsed)}")
+    print(f"Batch build columns:     {rate(count, columns_elapsed)}")
+    print(f"Batch vectorized score:  {rate(count, score_elapsed)}")
+    print(f"Batch end to end:        {rate(count, batch_elapsed)}")
+    print(f"Should apply:            {int(scores.should_apply.sum())} of {len(scores)}")
+    print(f"Rubric version:          {scores.rubric_version}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark rubric re-scoring throughput")
+    parser.add_argument("--profiles", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=31)
+    args = parser.parse_args()
+    run(args.profiles, args.seed)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark WebSocket broadcast fan-out.
+
+Connects N fake sockets (a fraction of them slow) to one session and measures
+how long a broadcast takes to enqueue and to reach every fast client, compared
+with the previous serial loop that awaited send_text on each socket in turn.
+
+Usage: python bench_websocket_broadcast.py [--sockets 10000] [--slow 0.01] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from loguru import logger
+
+from app.services.websocket_manager import WebSocketManager
+
+
+class Countdown:
+    """Fires once a number of fast sends have completed"""
+
+    def __init__(self):
+        self.remaining = 0
+        self.done = asyncio.Event()
+
+    def reset(self, count: int):
+        self.remaining = count
+        self.done.clear()
+
+    def tick(self):
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.done.set()
+
+
+class FakeWebSocket:
+    """Socket whose send completes after a fixed delay"""
+
+    def __init__(self, delay: float, countdown: Countdown = None):
+        self.delay = delay
+        self.countdown = countdown
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        if self.countdown:
+            self.countdown.tick()
+
+
+async def serial_broadcast(sockets, message):
+    """The pre-queue implementation: serialize and await each socket in turn"""
+    for websocket in sockets:
+        await websocket.send_text(json.dumps(message))
+
+
+async def run(sockets_count: int, slow_fraction: float, slow_delay: float, rounds: int):
+    logger.remove()
+    message = {"type": "system", "session_id": "bench", "message": "Server maintenance in 5 minutes", "message_type": "info"}
+    slow_count = int(sockets_count * slow_fraction)
+
+    # Serial baseline, fast sockets only (with slow ones it would take slow_count * slow_delay)
+    sockets = [FakeWebSocket(0) for _ in range(sockets_count)]
+    start = time.perf_counter()
+    await serial_broadcast(sockets, message)
+    serial_elapsed = time.perf_counter() - start
+
+    manager = WebSocketManager()
+    countdown = Countdown()
+    fast = [FakeWebSocket(0, countdown) for _ in range(sockets_count - slow_count)]
+    slow = [FakeWebSocket(slow_delay) for _ in range(slow_count)]
+    for websocket in fast + slow:
+        connection = await manager.connect(websocket, "bench")
+        connection.send_timeout = slow_delay / 2
+
+    enqueue_times, delivery_times = [], []
+    for _ in range(rounds):
+        countdown.reset(len(fast))
+        start = time.perf_counter()
+        await manager.broadcast_to_session("bench", message)
+        enqueue_times.append(time.perf_counter() - start)
+        await countdown.done.wait()
+        delivery_times.append(time.perf_counter() - start)
+
+    # Let the slow sockets hit their send timeout before reporting evictions
+    if slow_count:
+        await asyncio.sleep(slow_delay)
+    stats = manager.get_stats()
+    await manager.close_all()
+
+    print(f"Sockets:                 {sockets_count} ({slow_count} slow, {slow_delay * 1000:.0f} ms per send)")
+    print(f"Serial broadcast (fast): {serial_elapsed * 1000:.1f} ms")
+    print(f"Serial broadcast (est.): {(serial_elapsed + slow_count * slow_delay) * 1000:.1f} ms with slow sockets")
+    print(f"Queued enqueue p50:      {statistics.median(enqueue_times) * 1000:.1f} ms")
+    print(f"Queued delivery p50:     {statistics.median(delivery_times) * 1000:.1f} ms")
+    print(f"Queued delivery max:     {max(delivery_times) * 1000:.1f} ms")
+    print(f"Evictions:               {stats['evictions']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark WebSocket broadcast fan-out")
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--slow", type=float, default=0.01, help="Fraction of slow sockets")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="Seconds a slow socket takes per send")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sockets, args.slow, args.slow_delay, args.rounds))
@@ -9,6 +9,9 @@ import os
 # Add the app directory to the Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 
+# Run against in-process storage unless a backend is configured explicitly
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
 from app.services.fsm_service import FSMStates, VisaEvaluationFSM, FSMService
 from app.services.session_service import SessionService
 from app.services.chat_service import ChatService
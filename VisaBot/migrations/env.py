@@ -0,0 +1,53 @@
+"""
+Alembic environment: runs the migrations in migrations/versions against the app's database
+"""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import get_database_url
+from app.models.database import Base
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+    url = config.get_main_option("sqlalchemy.url") or get_database_url()
+    if not url:
+        raise RuntimeError("Set DATABASE_URL (or the DB_* settings) to run migrations")
+    return url
+
+
+def run_migrations_offline():
+    """Emit the migration SQL without connecting (alembic upgrade head --sql)"""
+    context.configure(url=database_url(), target_metadata=target_metadata, literal_binds=True,
+                      dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online():
+    # No prepared statement cache, as in app/core/database.py, for PgBouncer
+    engine = create_async_engine(database_url().replace("postgresql://", "postgresql+asyncpg://"),
+                                 connect_args={"statement_cache_size": 0})
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
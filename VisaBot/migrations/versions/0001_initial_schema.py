@@ -0,0 +1,108 @@
+"""Initial schema, as created by create_tables() before migrations were introduced
+
+Databases created by create_tables() already have these tables: mark them with
+`alembic stamp 0001` and then run `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-06-01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String()),
+        sa.Column("phone", sa.String()),
+        sa.Column("nationality", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("user_metadata", sa.JSON()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "chat_sessions",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id")),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("current_state", sa.String()),
+        sa.Column("context", sa.JSON()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("last_activity", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_chat_sessions_id", "chat_sessions", ["id"])
+    op.create_index("ix_chat_sessions_session_id", "chat_sessions", ["session_id"], unique=True)
+
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("session_id", sa.String(), sa.ForeignKey("chat_sessions.session_id"), nullable=False),
+        sa.Column("role", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("message_metadata", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_chat_messages_id", "chat_messages", ["id"])
+
+    op.create_table(
+        "visa_evaluations",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("session_id", sa.String(), sa.ForeignKey("chat_sessions.session_id"), nullable=False),
+        sa.Column("evaluation_number", sa.String()),
+        sa.Column("visa_type", sa.String(), nullable=False),
+        sa.Column("destination_country", sa.String(), nullable=False),
+        sa.Column("purpose_of_travel", sa.String(), nullable=False),
+        sa.Column("travel_dates", sa.JSON()),
+        sa.Column("nationality", sa.String()),
+        sa.Column("current_residence", sa.String()),
+        sa.Column("employment_status", sa.String()),
+        sa.Column("financial_means", sa.String()),
+        sa.Column("eligibility_score", sa.Integer()),
+        sa.Column("eligibility_status", sa.String(), nullable=False),
+        sa.Column("risk_level", sa.String()),
+        sa.Column("evaluation_data", sa.JSON()),
+        sa.Column("assessment_notes", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_visa_evaluations_id", "visa_evaluations", ["id"])
+    op.create_index("ix_visa_evaluations_evaluation_number", "visa_evaluations", ["evaluation_number"], unique=True)
+
+    op.create_table(
+        "visa_recommendations",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("evaluation_id", sa.String(), sa.ForeignKey("visa_evaluations.id"), nullable=False),
+        sa.Column("recommendation_type", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("priority", sa.String()),
+        sa.Column("action_items", sa.JSON()),
+        sa.Column("required_documents", sa.JSON()),
+        sa.Column("timeline", sa.String()),
+        sa.Column("estimated_processing_time", sa.String()),
+        sa.Column("tips", sa.JSON()),
+        sa.Column("warnings", sa.JSON()),
+        sa.Column("alternatives", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_visa_recommendations_id", "visa_recommendations", ["id"])
+
+
+def downgrade():
+    for table in ("visa_recommendations", "visa_evaluations", "chat_messages", "chat_sessions", "users"):
+        op.drop_table(table)
@@ -0,0 +1,68 @@
+"""Anonymous evaluations, daily rollup tables and indexes, knowledge_documents
+
+visa_evaluations.user_id becomes nullable because chat evaluations are
+usually anonymous. daily_session_rollups and daily_evaluation_rollups are
+refreshed by day from chat_sessions and visa_evaluations, which get
+created_at indexes for that (and an updated_at index on chat_sessions for
+the sessions that changed state) plus user_id indexes for the per-user
+stats. knowledge_documents holds knowledge files edited in the database.
+Downgrading fails while evaluations without a user exist.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-06-01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_chat_sessions_user_id", "chat_sessions", "user_id"),
+    ("ix_chat_sessions_created_at", "chat_sessions", "created_at"),
+    ("ix_chat_sessions_updated_at", "chat_sessions", "updated_at"),
+    ("ix_visa_evaluations_user_id", "visa_evaluations", "user_id"),
+    ("ix_visa_evaluations_created_at", "visa_evaluations", "created_at"),
+)
+
+
+def upgrade():
+    op.alter_column("visa_evaluations", "user_id", existing_type=sa.String(), nullable=True)
+    for name, table, column in INDEXES:
+        op.create_index(name, table, [column])
+
+    op.create_table(
+        "daily_session_rollups",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("current_state", sa.String(), primary_key=True),
+        sa.Column("sessions", sa.Integer(), nullable=False),
+        sa.Column("active_sessions", sa.Integer(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "daily_evaluation_rollups",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("destination_country", sa.String(), primary_key=True),
+        sa.Column("score_band", sa.String(), primary_key=True),
+        sa.Column("eligibility_status", sa.String(), primary_key=True),
+        sa.Column("evaluations", sa.Integer(), nullable=False),
+        sa.Column("score_sum", sa.Integer(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "knowledge_documents",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    for table in ("knowledge_documents", "daily_evaluation_rollups", "daily_session_rollups"):
+        op.drop_table(table)
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
+    op.alter_column("visa_evaluations", "user_id", existing_type=sa.String(), nullable=False)
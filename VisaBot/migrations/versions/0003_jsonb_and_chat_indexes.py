@@ -0,0 +1,47 @@
+"""JSONB for the JSON columns that are queried, composite and GIN indexes for the chat tables
+
+get_chat_history filters chat_messages on session_id and orders by
+created_at, which had no index at all. The GIN indexes (jsonb_path_ops)
+serve containment queries (@>) on session context, message metadata and
+evaluation data. Changing a column type rewrites its table under an
+exclusive lock, so run this in a maintenance window on large tables.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-06-01
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+JSON_COLUMNS = (
+    ("chat_sessions", "context"),
+    ("chat_messages", "message_metadata"),
+    ("visa_evaluations", "evaluation_data"),
+)
+GIN_INDEXES = (
+    ("ix_chat_sessions_context", "chat_sessions", "context"),
+    ("ix_chat_messages_metadata", "chat_messages", "message_metadata"),
+    ("ix_visa_evaluations_evaluation_data", "visa_evaluations", "evaluation_data"),
+)
+
+
+def upgrade():
+    for table, column in JSON_COLUMNS:
+        op.alter_column(table, column, type_=postgresql.JSONB(), postgresql_using=f"{column}::jsonb")
+    op.create_index("ix_chat_messages_session_created", "chat_messages", ["session_id", "created_at"])
+    for name, table, column in GIN_INDEXES:
+        op.create_index(name, table, [column], postgresql_using="gin", postgresql_ops={column: "jsonb_path_ops"})
+
+
+def downgrade():
+    for name, table, _ in GIN_INDEXES:
+        op.drop_index(name, table_name=table)
+    op.drop_index("ix_chat_messages_session_created", table_name="chat_messages")
+    for table, column in JSON_COLUMNS:
+        op.alter_column(table, column, type_=sa.JSON(), postgresql_using=f"{column}::json")
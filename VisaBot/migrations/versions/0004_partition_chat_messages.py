@@ -0,0 +1,93 @@
+"""Range-partition chat_messages by month on created_at
+
+The table is rebuilt as a partitioned table with one partition per month
+(chat_messages_yYYYYmMM, UTC) from the oldest message to two months ahead,
+plus a default partition, and the existing rows are copied over. The
+primary key becomes (id, created_at) because Postgres requires the
+partition key in it. Afterwards app/services/partition_service.py creates
+upcoming months and drops those past MESSAGE_RETENTION_MONTHS.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-06-01
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 2
+COLUMNS = "id, session_id, role, content, message_metadata, created_at"
+
+# One partition per month from the oldest copied message to MONTHS_AHEAD months from now.
+# Names and bounds match partition_service.partition_name/create_partition_sql.
+CREATE_MONTHLY_PARTITIONS = f"""
+DO $$
+DECLARE
+    month date;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', coalesce((SELECT min(created_at) FROM chat_messages_unpartitioned), now()) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{MONTHS_AHEAD} months',
+            interval '1 month'
+        )::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF chat_messages FOR VALUES FROM (%L) TO (%L)',
+            'chat_messages_y' || to_char(month, 'YYYY"m"MM'),
+            to_char(month, 'YYYY-MM-DD') || ' 00:00:00+00',
+            to_char(month + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+        );
+    END LOOP;
+END $$
+"""
+
+
+def create_message_table(partitioned: bool):
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("session_id", sa.String(), sa.ForeignKey("chat_sessions.session_id"), nullable=False),
+        sa.Column("role", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("message_metadata", postgresql.JSONB()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=not partitioned),
+        sa.PrimaryKeyConstraint(*(("id", "created_at") if partitioned else ("id",)), name="chat_messages_pkey"),
+        **({"postgresql_partition_by": "RANGE (created_at)"} if partitioned else {}),
+    )
+    op.create_index("ix_chat_messages_session_created", "chat_messages", ["session_id", "created_at"])
+    op.create_index("ix_chat_messages_metadata", "chat_messages", ["message_metadata"], postgresql_using="gin",
+                    postgresql_ops={"message_metadata": "jsonb_path_ops"})
+    if not partitioned:
+        op.create_index("ix_chat_messages_id", "chat_messages", ["id"])
+
+
+def set_aside(old_name: str):
+    """Rename chat_messages out of the way, freeing its constraint and index names"""
+    op.rename_table("chat_messages", old_name)
+    op.execute(f"ALTER TABLE {old_name} RENAME CONSTRAINT chat_messages_pkey TO {old_name}_pkey")
+    for index in ("ix_chat_messages_session_created", "ix_chat_messages_metadata", "ix_chat_messages_id"):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+def upgrade():
+    set_aside("chat_messages_unpartitioned")
+    create_message_table(partitioned=True)
+    op.execute(CREATE_MONTHLY_PARTITIONS)
+    op.execute("CREATE TABLE chat_messages_default PARTITION OF chat_messages DEFAULT")
+    op.execute(f"INSERT INTO chat_messages ({COLUMNS}) "
+               f"SELECT id, session_id, role, content, message_metadata, coalesce(created_at, now()) "
+               f"FROM chat_messages_unpartitioned")
+    op.drop_table("chat_messages_unpartitioned")
+
+
+def downgrade():
+    set_aside("chat_messages_partitioned")
+    create_message_table(partitioned=False)
+    op.execute(f"INSERT INTO chat_messages ({COLUMNS}) SELECT {COLUMNS} FROM chat_messages_partitioned")
+    op.execute("DROP TABLE chat_messages_partitioned CASCADE")  # With its partitions
@@ -13,6 +13,7 @@ sys.path.append('.')
 
 from app.core.database import init_database, create_tables
 from app.models.database import Base
+from app.services.partition_service import partition_maintainer
 
 
 async def get_engine():
@@ -64,6 +65,7 @@ async def create_tables_with_engine():
         engine = await get_engine()
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await partition_maintainer.maintain(conn)  # chat_messages takes no rows until its partitions exist
         logger.info("All tables created successfully with new schemas")
     except Exception as e:
         logger.error(f"Error creating tables: {e}")
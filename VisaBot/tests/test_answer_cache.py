@@ -0,0 +1,131 @@
+"""
+Tests for the off-track answer cache
+"""
+import pytest
+
+from app.services.rag_service import rag_service
+from app.services.retrieval.answer_cache import AnswerCache, normalize_question
+from app.services.storage.memory_backend import InMemoryBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(backend, clock=None, **kwargs):
+    return AnswerCache(embedder=rag_service.faq_index.embedder, max_entries=8, ttl=60, similarity=0.85,
+                       backend=backend, clock=clock or FakeClock(), **kwargs)
+
+
+@pytest.fixture
+def backend():
+    return InMemoryBackend()
+
+
+def test_normalized_questions_ignore_case_order_and_filler_words():
+    assert normalize_question("What is the FEE?") == normalize_question("fee what is") == "fee what"
+    assert normalize_question("what is it") == ""
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Why was my visa rejected?", "What if my visa is rejected?"),
+    ("When should I apply for the visa?", "Where should I apply for the visa?"),
+    ("How can I apply for visa", "Who can apply for visa"),
+    ("Do I need a bank statement?", "Do I not need a bank statement?"),
+])
+@pytest.mark.asyncio
+async def test_questions_asked_differently_do_not_share_answers(backend, first, second):
+    assert normalize_question(first) != normalize_question(second)
+    cache = make_cache(backend)
+    cache.similarity = 0.0  # Any cached entry is close enough to be a near-duplicate
+    await cache.set(first, "Cached answer.")
+    assert await cache.get(second) is None
+    assert (await cache.get(first)).answer == "Cached answer."
+
+
+@pytest.mark.asyncio
+async def test_exact_and_near_duplicate_hits(backend):
+    cache = make_cache(backend)
+    assert await cache.get("what is the visa fee") is None
+    await cache.set("what is the visa fee", "The fee is 90 EUR.")
+
+    exact = await cache.get("What is the visa fee?")
+    assert exact.answer == "The fee is 90 EUR." and exact.similarity == 1.0
+    near = await cache.get("what is the fee")
+    assert near.answer == "The fee is 90 EUR." and 0.85 <= near.similarity < 1.0
+    assert await cache.get("what is the visa fee for children") is None
+    assert await cache.get("which country is easiest") is None
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["near_duplicate_hits"], stats["misses"]) == (2, 1, 3)
+    assert stats["hit_rate"] == 0.4
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl(backend):
+    clock = FakeClock()
+    cache = make_cache(backend, clock)
+    await cache.set("how long does processing take", "About 15 days.")
+    clock.now += 59
+    assert (await cache.get("how long does processing take")).answer == "About 15 days."
+    clock.now += 1
+    assert await cache.get("how long does processing take") is None
+    assert await cache.get("how long does it take") is None
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_workers(backend):
+    writer, reader = make_cache(backend), make_cache(backend)
+    await writer.set("which country is easiest", "Hungary is often suggested.")
+    await writer.set("what is the visa fee", "The fee is 90 EUR.")
+    assert (await reader.get("which country is easiest")).answer == "Hungary is often suggested."
+
+    assert await writer.invalidate("what is the fee") == 1
+    assert await writer.get("what is the visa fee") is None
+    assert await reader.get("what is the visa fee") is None
+
+    await writer.invalidate()
+    assert await reader.get("which country is easiest") is None
+    assert reader.get_stats()["entries"] == 0
+    assert reader.get_stats()["generation"] == writer.get_stats()["generation"] == 1
+
+
+@pytest.mark.asyncio
+async def test_one_generated_answer_serves_every_state(backend, monkeypatch):
+    calls = []
+
+    async def generate_response(messages, system_prompt=None, **kwargs):
+        calls.append(messages)
+        return "You can usually take your family along on the same application."
+
+    monkeypatch.setattr(rag_service, "answer_cache", make_cache(backend))
+    monkeypatch.setattr(rag_service.openai_service, "generate_response", generate_response)
+
+    first = await rag_service._generate_llm_response("can my family come along", "ask_profession")
+    second = await rag_service._generate_llm_response("Can my family come along?", "ask_balance")
+
+    assert len(calls) == 1
+    assert not first["cached"] and second["cached"]
+    assert first["answer"].startswith("You can usually take your family along")
+    assert first["answer"].endswith("Are you a business person or job holder?")
+    assert second["answer"].startswith("You can usually take your family along")
+    assert second["answer"].endswith("Can you manage a closing balance of 2 million PKR?")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cached, asked", [
+    ("How much bank balance do I need for a family of 4?", "How much bank balance do I need for a family of 2?"),
+    ("Is travel insurance mandatory for Schengen?", "Is travel insurance mandatory for UK?"),
+])
+async def test_near_duplicates_must_ask_about_the_same_numbers_and_places(backend, cached, asked):
+    """Questions differing only in a number or a place are similar enough to embed close, but are misses"""
+    cache = make_cache(backend)
+    await cache.set(cached, "Cached answer.")
+    assert (cache._vectors @ cache.embedder.embed(asked)).max() >= cache.similarity
+    assert await cache.get(asked) is None
+    assert (await cache.get(cached.lower())).answer == "Cached answer."
+    assert await cache.invalidate(asked) == 0
@@ -0,0 +1,118 @@
+"""
+Tests for the offline bulk evaluation CLI
+"""
+import json
+
+import pytest
+from loguru import logger
+
+from app.services.evaluation.bulk import main, read_records, run_bulk
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.rubric import DEFAULT_RUBRIC_PATH, load_rubric, score_profile
+
+
+ANSWERS = [
+    {"profession": "business owner", "business_type": "trading", "business_premises": True,
+     "business_online_presence": True, "is_tax_filer": True, "annual_income": 1_500_000,
+     "closing_balance": 2_500_000, "travel_history": ["France", "UK", "Japan"], "age": 40,
+     "selected_country": "Spain"},
+    {"profession": "job holder", "closing_balance": 1_800_000, "travel_history": "Turkey", "age": 23},
+    {"profession": "business owner", "closing_balance": 1_200_000, "is_tax_filer": False,
+     "annual_income": "900000", "schengen_rejection": {"has_rejection": True, "year": "2019"}},
+    {},
+]
+
+
+@pytest.fixture(autouse=True)
+def quiet_rubric():
+    logger.disable("app.services.evaluation")
+    yield
+    logger.enable("app.services.evaluation")
+
+
+@pytest.fixture
+def answers_file(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i, answers in enumerate(ANSWERS):
+            f.write(json.dumps({"session_id": f"s{i}", "answers": answers}) + "\n")
+    return path
+
+
+def read_results(path):
+    return list(read_records(str(path)))
+
+
+def test_results_match_score_profile(answers_file, tmp_path):
+    """Each output record carries score_profile's result and a narrative, in input order"""
+    output = tmp_path / "results.jsonl"
+    summary = run_bulk(str(answers_file), str(output), workers=0, chunk_size=3)
+    assert summary.records == len(ANSWERS)
+    assert summary.errors == 0
+
+    results = read_results(output)
+    assert [r["id"] for r in results] == [f"s{i}" for i in range(len(ANSWERS))]
+    for answers, result in zip(ANSWERS, results):
+        expected = score_profile(extract_features(answers))
+        assert result["success_ratio"] == expected["success_ratio"]
+        assert result["recommendations"] == expected["recommendations"]
+        assert result["rubric_version"] == expected["rubric_version"]
+        assert result["narrative"].startswith("Thanks for sharing your details.")
+    assert "for Spain." in results[0]["narrative"]
+
+
+def test_process_pool_and_scores_only_agree(answers_file, tmp_path):
+    """Worker processes and the vectorized scores-only path produce the same scores"""
+    full = tmp_path / "full.jsonl"
+    fast = tmp_path / "fast.csv"
+    run_bulk(str(answers_file), str(full), workers=2, chunk_size=1)
+    summary = run_bulk(str(answers_file), str(fast), workers=0, scores_only=True, baseline_path=str(full))
+    assert summary.compared == len(ANSWERS)
+    assert summary.changed == 0
+    assert [r["id"] for r in read_results(fast)] == [r["id"] for r in read_results(full)]
+
+
+def test_diff_against_baseline_with_tuned_rubric(answers_file, tmp_path):
+    """A rubric change shows up as per-record diffs and ratio transitions"""
+    spec = json.loads(open(DEFAULT_RUBRIC_PATH, encoding="utf-8").read())
+    spec["version"] = "tuned"
+    spec["bands"][-1]["ratio"] = 35
+    tuned = tmp_path / "rubric.json"
+    tuned.write_text(json.dumps(spec), encoding="utf-8")
+
+    baseline = tmp_path / "baseline.jsonl"
+    run_bulk(str(answers_file), str(baseline), workers=0)
+    diff = tmp_path / "diff.jsonl"
+    exit_code = main([str(answers_file), "-o", str(tmp_path / "after.jsonl"), "--workers", "0",
+                      "--rubric", str(tuned), "--baseline", str(baseline), "--diff", str(diff)])
+    assert exit_code == 0
+
+    changes = read_results(diff)
+    # Only the profiles in the lowest band move
+    assert [c["id"] for c in changes] == ["s1", "s2", "s3"]
+    assert all(c["changes"]["success_ratio"] == {"before": 30, "after": 35} for c in changes)
+    assert changes[0]["rubric_version"]["after"] == load_rubric(str(tuned)).version
+
+
+@pytest.mark.parametrize("scores_only", [False, True])
+def test_csv_keeps_result_columns_when_first_record_fails(tmp_path, monkeypatch, scores_only):
+    """The CSV header is fixed up front, not taken from the first (error) row"""
+    from app.services.evaluation import bulk
+
+    def extract(answers):
+        if answers.get("broken"):
+            raise ValueError("unreadable answers")
+        return extract_features(answers)
+
+    monkeypatch.setattr(bulk, "extract_features", extract)
+    answers = tmp_path / "answers.jsonl"
+    answers.write_text("\n".join(json.dumps(a) for a in [{"broken": True}] + ANSWERS[:2]), encoding="utf-8")
+    output = tmp_path / "results.csv"
+    summary = run_bulk(str(answers), str(output), workers=0, scores_only=scores_only)
+    assert summary.errors == 1
+
+    failed, *results = read_results(output)
+    assert "unreadable answers" in failed["error"] and failed["success_ratio"] is None
+    for answers, result in zip(ANSWERS, results):
+        assert result["error"] is None
+        assert result["success_ratio"] == score_profile(extract_features(answers))["success_ratio"]
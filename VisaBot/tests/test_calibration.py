@@ -0,0 +1,96 @@
+"""
+Tests for the offline rubric calibration job
+"""
+import json
+import math
+import random
+
+import numpy as np
+import pytest
+from loguru import logger
+
+from app.services.evaluation.calibration import (
+    auc, calibrate, calibrated_spec, calibration_error, load_history, main, record_outcome,
+)
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.rubric import CompiledRubric, rubric_loader
+from tests.test_rubric_batch import random_answers
+
+
+@pytest.fixture(autouse=True)
+def quiet_rubric():
+    logger.disable("app.services.evaluation")
+    yield
+    logger.enable("app.services.evaluation")
+
+
+@pytest.fixture(scope="module")
+def history(tmp_path_factory):
+    """Synthetic outcomes driven by financials far more than the current rubric weighs them"""
+    rubric = rubric_loader.get()
+    rng = random.Random(40)
+    path = tmp_path_factory.mktemp("calibration") / "history.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(4000):
+            answers = random_answers(rng)
+            _, _, scores = rubric.evaluate(extract_features(answers))
+            z = (0.5 * scores.ties + scores.travel + 1.5 * scores.financials + scores.age
+                 - scores.penalties - 35) / 8
+            approved = rng.random() < 1 / (1 + math.exp(-z))
+            f.write(json.dumps({"session_id": str(index), "answers": answers,
+                                "outcome": "approved" if approved else "refused"}) + "\n")
+        f.write(json.dumps({"answers": {"age": 30}, "outcome": "pending"}) + "\n")
+    return str(path)
+
+
+def test_metrics_match_brute_force():
+    rng = np.random.default_rng(4)
+    values = rng.integers(0, 101, 500)
+    approved = rng.random(500) < values / 100
+    pos, neg = values[approved], values[~approved]
+    wins = (pos[:, None] > neg[None, :]).sum() + 0.5 * (pos[:, None] == neg[None, :]).sum()
+    assert auc(values, approved) == pytest.approx(wins / (len(pos) * len(neg)))
+
+    # 70% predicted and 7 of 10 approved is perfectly calibrated
+    ratios = np.full(10, 70)
+    assert calibration_error(ratios, np.arange(10) < 7) == pytest.approx(0.0)
+    assert calibration_error(ratios, np.arange(10) < 2) == pytest.approx(0.5)
+
+
+def test_record_outcome():
+    assert record_outcome({"approved": True}) is True
+    assert record_outcome({"approved": "no"}) is False
+    assert record_outcome({"outcome": "Refused"}) is False
+    assert record_outcome({"outcome": "granted"}) is True
+    assert record_outcome({"outcome": "pending"}) is None
+    assert record_outcome({}) is None
+
+
+def test_calibration_improves_fit_and_emits_a_valid_rubric(history):
+    rubric = rubric_loader.get()
+    data = load_history(history, rubric)
+    assert len(data) == 4000 and data.skipped == 1
+
+    report = calibrate(data, rubric, weight_grid=(0.5, 1.0, 1.5), top_k=5, min_samples=20)
+    best = report.best
+    assert best.weights[2] > best.weights[0]  # financials outweigh ties, as in the data
+    assert best.auc > report.baseline_auc
+    assert best.calibration_error < report.baseline_calibration_error
+    assert list(best.band_ratios) == sorted(best.band_ratios, reverse=True)
+
+    spec = calibrated_spec(rubric, best, version="test")
+    calibrated = CompiledRubric(spec)
+    assert calibrated.version == "test"
+    assert [b[0] for b in calibrated.bands] == list(best.cutoffs) + [0]
+    assert [c[0] for c in calibrated.caps] == list(best.cap_ratios)
+    # The definition on disk is untouched
+    assert rubric_loader.get().spec["bands"] == rubric.spec["bands"]
+
+
+def test_cli_writes_calibrated_rubric(history, tmp_path, capsys):
+    output = tmp_path / "rubric.calibrated.json"
+    assert main([history, "-o", str(output), "--weights", "1,1.5", "--top-k", "3"]) == 0
+    spec = json.loads(output.read_text())
+    assert spec["version"].endswith("-calibrated")
+    CompiledRubric(spec)
+    assert "Calibrated:" in capsys.readouterr().out
@@ -0,0 +1,101 @@
+"""
+Tests for the lazily compiled per-country rule packs
+"""
+import json
+import shutil
+
+import pytest
+
+from app.services.evaluation.country_packs import COUNTRY_PACKS_DIR, CountryPackLoader
+from app.services.evaluation.normalizer import SCHENGEN_COUNTRIES
+from app.services.rag_service import rag_service
+from app.services.retrieval.knowledge import KNOWLEDGE_DIR
+from app.services.retrieval.knowledge_base import DOCUMENTS, FileKnowledgeSource, KnowledgeBase
+
+
+@pytest.fixture
+def knowledge_dir(tmp_path):
+    for name in DOCUMENTS:
+        shutil.copy(f"{KNOWLEDGE_DIR}/{name}", tmp_path / name)
+    shutil.copytree(COUNTRY_PACKS_DIR, tmp_path / "countries")
+    return tmp_path
+
+
+def test_every_schengen_country_has_a_pack_and_nothing_loads_up_front():
+    loader = CountryPackLoader.from_directory(max_packs=64)
+    assert loader.get_stats()["resident"] == 0
+    for country in SCHENGEN_COUNTRIES:
+        pack = loader.get(country)
+        assert pack is not None, country
+        assert pack.notes and pack.financial_requirements and pack.documentation_standards
+
+    assert loader.get("czechia").country == loader.get("Czech").country == "Czech Republic"
+    assert loader.get("Holland").country == "Netherlands"
+    assert loader.get("Turkey") is None and loader.get("") is None
+    # Former built-in rules are kept, merged over the shared defaults
+    germany = loader.get("germany")
+    assert germany.preferred_professions == ("engineers", "doctors", "business owners")
+    assert germany.documentation_standards == "very strict"
+    assert any("EUR 30,000" in note for note in germany.notes)
+    assert "Schengen member outside the EU." in loader.get("Norway").notes
+
+
+def test_least_recently_used_packs_are_evicted_and_measured():
+    loader = CountryPackLoader.from_directory(max_packs=2)
+    loader.get("Germany")
+    loader.get("France")
+    loader.get("Germany")
+    loader.get("Italy")  # Evicts France
+
+    stats = loader.get_stats()
+    assert sorted(stats["packs"]) == ["germany", "italy"]
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+    assert stats["packs"]["germany"]["hits"] == 2
+    assert all(p["load_ms"] >= 0 and p["size_bytes"] > 0 for p in stats["packs"].values())
+    assert stats["resident_bytes"] == sum(p["size_bytes"] for p in stats["packs"].values())
+    assert stats["available"] == len(loader.available()) >= 29
+
+
+@pytest.mark.asyncio
+async def test_edited_packs_arrive_with_a_new_knowledge_snapshot(knowledge_dir):
+    """A pack edit changes the content digest (and so the answer cache namespace); a broken pack is not swapped in"""
+    knowledge = KnowledgeBase(FileKnowledgeSource(str(knowledge_dir)))
+    first = knowledge.current
+    assert first.country_packs.get("Spain").documentation_standards != "strict"
+
+    path = knowledge_dir / "countries" / "spain.json"
+    path.write_text(json.dumps({"country": "Spain", "documentation_standards": "strict"}), encoding="utf-8")
+    assert await knowledge.reload() is True
+    assert knowledge.current.digest != first.digest
+    assert knowledge.current.country_packs.get("Spain").documentation_standards == "strict"
+
+    path.write_text("{", encoding="utf-8")
+    current = knowledge.current
+    assert await knowledge.reload() is False
+    assert knowledge.current is current
+    assert knowledge.current.country_packs.get("Spain").documentation_standards == "strict"
+
+
+def test_countries_are_found_in_free_text():
+    packs = rag_service.knowledge_base.current.country_packs
+    assert packs.find_in_text("What does the German embassy ask for?").country == "Germany"
+    assert packs.find_in_text("is the czech republic easier than austria").country == "Czech Republic"
+    assert packs.find_in_text("how long does processing take") is None
+
+
+@pytest.mark.asyncio
+async def test_evaluation_prompt_includes_the_destination_rules(monkeypatch):
+    prompts = []
+
+    async def generate_response(messages, system_prompt=None, **kwargs):
+        prompts.append(system_prompt)
+        return json.dumps({"success_ratio": 70, "matched_scenario": "x", "recommendations": [],
+                           "application_strategy": "", "risk_factors": [], "strengths": [],
+                           "required_documents": [], "confidence": 0.8})
+
+    monkeypatch.setattr(rag_service.openai_service, "generate_response", generate_response)
+    answers = {"profession": "business owner", "is_tax_filer": True, "annual_income": 1_500_000,
+               "travel_history": ["UK"], "age": 40, "selected_country": "Germany"}
+
+    await rag_service.perform_scenario_based_evaluation(answers, polish=True)
+    assert "Documentation standards: very strict" in prompts[0]
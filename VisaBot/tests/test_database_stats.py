@@ -0,0 +1,215 @@
+"""
+Tests for the database-side session/evaluation statistics and the daily rollups
+
+The query shapes are checked against the Postgres dialect everywhere; set
+TEST_DATABASE_URL (postgresql://...) to also run them against a database and
+check their plans.
+"""
+import os
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import postgresql
+
+from app.models.database import (
+    Base, ChatSession, DailyEvaluationRollup, DailySessionRollup, User, VisaEvaluation,
+)
+from app.services.database_service import (
+    DatabaseService, evaluation_rollup_select, evaluation_stats_query, session_stats_query,
+)
+from app.services.rollup_service import RollupRefresher
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+STATS_USER = "stats-user"
+
+
+def sql(statement) -> str:
+    return " ".join(str(statement.compile(dialect=postgresql.dialect())).split())
+
+
+class ScriptedResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self.value or [])
+
+
+class ScriptedSession:
+    """Stands in for an AsyncSession, answering scalar queries from a script"""
+
+    def __init__(self, *scalars):
+        self.scalars = list(scalars)
+        self.statements = []
+        self.committed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.statements.append(sql(statement))
+        return ScriptedResult(self.scalars.pop(0) if self.scalars else None)
+
+    async def commit(self):
+        self.committed = True
+
+
+def test_stats_are_aggregated_in_one_statement_each():
+    sessions = sql(session_stats_query("user-1"))
+    assert "GROUP BY chat_sessions.current_state" in sessions
+    assert "count(*) FILTER (WHERE chat_sessions.is_active IS true)" in sessions
+    assert "WHERE chat_sessions.user_id" in sessions
+
+    evaluations = sql(evaluation_stats_query())
+    assert evaluations.count("count(*) FILTER") == 4
+    assert "percentile_cont" in evaluations and "WITHIN GROUP (ORDER BY visa_evaluations.eligibility_score)" in evaluations
+    assert "GROUP BY" not in evaluations  # A single row, no rows shipped to Python
+
+
+@pytest.mark.asyncio
+async def test_rollup_refresh_only_rescans_recent_and_changed_days():
+    last_day = date(2025, 6, 10)
+    changed = [date(2025, 5, 2), date(2025, 5, 3), date(2025, 5, 20)]
+    db = ScriptedSession(True, last_day, changed, None, None, last_day, None, None)
+    refreshed = await DatabaseService(db).refresh_rollups(lookback_days=2)
+
+    assert refreshed == {"daily_session_rollups": "2025-06-08", "daily_evaluation_rollups": "2025-06-08"}
+    lock, _, changed_days, delete_sessions, insert_sessions, _, delete_evaluations, insert_evaluations = db.statements
+    assert "pg_try_advisory_xact_lock" in lock
+    # Older days are rescanned when one of their sessions changed state inside the window
+    assert "WHERE chat_sessions.updated_at >=" in changed_days and "chat_sessions.created_at <" in changed_days
+    assert delete_sessions.startswith("DELETE FROM daily_session_rollups WHERE daily_session_rollups.day >=")
+    assert "daily_session_rollups.day IN" in delete_sessions
+    assert insert_sessions.startswith("INSERT INTO daily_session_rollups (day, current_state, sessions, active_sessions)")
+    # Consecutive changed days are merged into one created_at range
+    assert insert_sessions.count("chat_sessions.created_at <") == 2
+    assert "WHERE chat_sessions.created_at >=" in insert_sessions and insert_sessions.endswith("GROUP BY 1, 2")
+    assert delete_evaluations.startswith("DELETE FROM daily_evaluation_rollups WHERE")
+    assert "CASE WHEN" in insert_evaluations and insert_evaluations.endswith("GROUP BY 1, 2, 3, 4")
+    assert db.committed
+
+
+@pytest.mark.asyncio
+async def test_refresh_is_skipped_while_another_worker_holds_the_lock():
+    db = ScriptedSession(False)
+    refresher = RollupRefresher(session_factory=lambda: db, interval=0)
+    assert await refresher.refresh() is None
+    assert len(db.statements) == 1 and not db.committed
+    assert refresher.get_stats()["skipped"] == 1
+
+    first = ScriptedSession(True)  # Nothing rolled up yet: the whole history is
+    refresher.session_factory = lambda: first
+    assert await refresher.refresh() == {"daily_session_rollups": "all", "daily_evaluation_rollups": "all"}
+    assert "WHERE" not in first.statements[2] and "created_at >=" not in first.statements[3]
+
+
+@pytest_asyncio.fixture
+async def pg_session():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    engine = create_async_engine(TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        yield db
+        await db.rollback()
+        for model in (VisaEvaluation, ChatSession):
+            await db.execute(delete(model).where(model.session_id.like("stats-%")))
+        await db.execute(delete(User).where(User.id == STATS_USER))
+        await db.execute(delete(DailySessionRollup))
+        await db.execute(delete(DailyEvaluationRollup))
+        await db.commit()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_database_aggregates_match_the_rows(pg_session):
+    now = datetime.now(timezone.utc)
+    states = ["ask_age", "ask_salary", "evaluation"]
+    scores = [None, 10, 25, 26, 50, 70, 75, 76, 90, 100]
+    pg_session.add(User(id=STATS_USER, email=f"{STATS_USER}@example.com"))
+    for i, score in enumerate(scores):
+        pg_session.add(ChatSession(id=f"stats-{i}", session_id=f"stats-{i}", user_id=STATS_USER,
+                                   current_state=states[i % 3], is_active=i % 2 == 0,
+                                   created_at=now - timedelta(days=i % 3)))
+        pg_session.add(VisaEvaluation(id=f"stats-{i}", user_id=STATS_USER, session_id=f"stats-{i}",
+                                      visa_type="schengen", purpose_of_travel="tourism",
+                                      destination_country="Stats-Land", eligibility_score=score,
+                                      eligibility_status="eligible" if (score or 0) > 50 else "not_eligible",
+                                      created_at=now - timedelta(days=i % 3)))
+    await pg_session.commit()
+    service = DatabaseService(pg_session)
+
+    session_stats = await service.get_session_stats(STATS_USER)
+    assert (session_stats["total_sessions"], session_stats["active_sessions"], session_stats["completed_sessions"]) == (10, 5, 5)
+    assert session_stats["state_breakdown"] == {"ask_age": 4, "ask_salary": 3, "evaluation": 3}
+
+    evaluation_stats = await service.get_evaluation_stats(STATS_USER)
+    assert evaluation_stats["total_evaluations"] == 10
+    assert evaluation_stats["score_breakdown"] == {"0-25": 3, "26-50": 2, "51-75": 2, "76-100": 3}
+    assert evaluation_stats["status_breakdown"] == {"eligible": 5, "not_eligible": 5}
+    assert evaluation_stats["average_score"] == pytest.approx(sum(s or 0 for s in scores) / len(scores))
+    assert evaluation_stats["median_score"] == pytest.approx(70)  # Unscored evaluations are left out
+
+    assert await service.refresh_rollups() is not None
+    daily = await service.get_daily_stats(days=3)
+    ours = [row for row in daily["evaluations"] if row["country"] == "stats-land"]
+    assert sum(row["evaluations"] for row in ours) == 10
+    assert sum(row["score_sum"] for row in ours) == sum(s or 0 for s in scores)
+    assert sum(row["sessions"] for row in daily["sessions"]) >= 10
+
+
+@pytest.mark.asyncio
+async def test_dashboard_queries_use_the_indexes(pg_session):
+    async def plan(statement):
+        compiled = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        rows = await pg_session.execute(text(f"EXPLAIN {compiled}"))
+        return "\n".join(row[0] for row in rows)
+
+    await pg_session.execute(text("SET LOCAL enable_seqscan = off"))
+    since = datetime.now(timezone.utc).date() - timedelta(days=29)
+    assert "Index" in await plan(select(DailySessionRollup).where(DailySessionRollup.day >= since))
+    assert "Index" in await plan(session_stats_query("stats-user"))
+    assert "Index" in await plan(evaluation_rollup_select(since))
+    stats_plan = await plan(evaluation_stats_query("stats-user"))
+    assert stats_plan.lstrip().startswith("Aggregate") and "Index" in stats_plan
+
+
+@pytest.mark.asyncio
+async def test_state_changes_of_older_sessions_reach_the_rollups(pg_session):
+    created = datetime.now(timezone.utc) - timedelta(days=10)
+    pg_session.add(User(id=STATS_USER, email=f"{STATS_USER}@example.com"))
+    pg_session.add(ChatSession(id="stats-old", session_id="stats-old", user_id=STATS_USER, current_state="ask_age",
+                               is_active=True, created_at=created))
+    await pg_session.commit()
+    service = DatabaseService(pg_session)
+
+    async def day_counts():
+        rows = await pg_session.execute(select(DailySessionRollup.current_state, DailySessionRollup.sessions)
+                                        .where(DailySessionRollup.day == created.date()))
+        return dict(rows.all())
+
+    await service.refresh_rollups()
+    before = await day_counts()
+    session = await pg_session.get(ChatSession, "stats-old")
+    session.current_state, session.is_active = "complete", False
+    await pg_session.commit()
+
+    await service.refresh_rollups(lookback_days=2)
+    after = await day_counts()
+    assert after.get("ask_age", 0) == before["ask_age"] - 1
+    assert after["complete"] == before.get("complete", 0) + 1
@@ -0,0 +1,103 @@
+"""
+Tests for the content-addressed evaluation cache
+"""
+import pytest
+
+from app.services.evaluation.cache import EvaluationCache
+from app.services.evaluation.normalizer import extract_features
+from app.services.storage.memory_backend import InMemoryBackend
+
+
+ANSWERS = {
+    "profession": "business owner",
+    "business_premises": "yes",
+    "closing_balance": 2_500_000,
+    "travel_history": ["Turkey", "UAE"],
+    "age": 35,
+}
+
+
+@pytest.fixture
+def backend():
+    return InMemoryBackend()
+
+
+@pytest.mark.asyncio
+async def test_same_features_share_a_key(backend):
+    """Answers that normalize identically hit the same entry"""
+    cache = EvaluationCache(max_entries=8, ttl=60, version="v1", backend=backend)
+    key = cache.evaluation_key(extract_features(ANSWERS))
+    same = cache.evaluation_key(extract_features({**ANSWERS, "business_premises": True, "age": "35"}))
+    other = cache.evaluation_key(extract_features({**ANSWERS, "age": 24}))
+    assert key == same
+    assert key != other
+
+    assert await cache.get(key) is None
+    await cache.set(key, {"success_ratio": 50})
+    assert await cache.get(same) == {"success_ratio": 50}
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hits_are_independent_copies(backend):
+    """Mutating a returned evaluation does not change the cached one"""
+    cache = EvaluationCache(max_entries=8, ttl=60, version="v1", backend=backend)
+    await cache.set("k", {"strengths": ["a"]})
+    (await cache.get("k"))["strengths"].append("b")
+    assert await cache.get("k") == {"strengths": ["a"]}
+
+
+@pytest.mark.asyncio
+async def test_shared_through_backend_and_versioned(backend):
+    """Another worker finds entries via the backend; a new rubric version does not"""
+    writer = EvaluationCache(max_entries=8, ttl=60, version="v1", backend=backend)
+    features = extract_features(ANSWERS)
+    await writer.set(writer.evaluation_key(features), {"success_ratio": 70})
+
+    reader = EvaluationCache(max_entries=8, ttl=60, version="v1", backend=backend)
+    assert await reader.get(reader.evaluation_key(features)) == {"success_ratio": 70}
+    assert await backend.ttl(reader.evaluation_key(features)) == 60
+
+    upgraded = EvaluationCache(max_entries=8, ttl=60, version="v2", backend=backend)
+    assert await upgraded.get(upgraded.evaluation_key(features)) is None
+
+
+@pytest.mark.asyncio
+async def test_lru_bounds_local_entries(backend):
+    """Only the most recently used entries stay in process"""
+    cache = EvaluationCache(max_entries=2, ttl=60, version="v1", backend=backend)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    await cache.get("a")
+    await cache.set("c", 3)
+    assert list(cache._entries) == ["a", "c"]
+    # Evicted locally but still shared
+    assert await cache.get("b") == 2
+
+
+def test_narrative_key_tracks_narrative_inputs():
+    """Only fields the narrative reads change its key"""
+    cache = EvaluationCache(max_entries=8, ttl=60, version="v1")
+    evaluation = {"success_ratio": 70, "recommendations": ["x"], "strengths": ["s"]}
+    key = cache.narrative_key(evaluation, ANSWERS, "France")
+    assert key == cache.narrative_key({**evaluation, "strengths": []}, {**ANSWERS, "age": 50}, "France")
+    assert key != cache.narrative_key({**evaluation, "success_ratio": 90}, ANSWERS, "France")
+    assert key != cache.narrative_key(evaluation, ANSWERS, "Spain")
+
+
+@pytest.mark.asyncio
+async def test_stored_evaluations_are_reused_only_for_the_same_rubric_and_code(monkeypatch):
+    from app.services.evaluation import cache as cache_module
+    from app.services.evaluation_service import evaluation_service
+
+    evaluation = await evaluation_service.evaluate_visa_application(ANSWERS)
+    assert evaluation["cache_version"] == cache_module.evaluation_cache.version
+    answers = {**ANSWERS, "evaluation": {**evaluation, "success_ratio": -1}}
+    assert (await evaluation_service.get_current_evaluation(answers))["success_ratio"] == -1
+
+    # Same rubric, different code: the stored evaluation is stale
+    monkeypatch.setattr(cache_module, "CODE_VERSION", "changed")
+    current = await evaluation_service.get_current_evaluation(answers)
+    assert current["success_ratio"] == evaluation["success_ratio"]
+    assert current["cache_version"].endswith(".changed")
@@ -0,0 +1,142 @@
+"""
+Retrieval-quality and latency tests for the FAQ index
+"""
+import dataclasses
+import random
+import time
+
+import numpy as np
+import pytest
+
+from app.services.rag_service import rag_service
+from app.services.retrieval.bm25 import tokenize
+from app.services.retrieval.embedding import HashedNgramEmbedder, build_or_load
+from app.services.retrieval.faq import FAQEntry, FAQIndex
+
+
+# (user question, FAQ question it should retrieve or None)
+LABELLED_QUERIES = [
+    ("how much is the visa fee", "What are the visa fees for Schengen countries?"),
+    ("what does the application cost for my kids", "What are the visa fees for Schengen countries?"),
+    ("how long will processing take", "How long does visa processing take?"),
+    ("what documents do I need", "What documents are required for Schengen visa?"),
+    ("give me the checklist of papers", "What documents are required for Schengen visa?"),
+    ("what bank balance should I show", "What is the minimum bank balance for Schengen visa?"),
+    ("how much money required in bank statement", "What is the minimum bank balance for Schengen visa?"),
+    ("my visa got refused, can I appeal?", "What if my visa is rejected?"),
+    ("is travel insurance mandatory", "Do I need travel insurance for Schengen visa?"),
+    ("do I need health coverage", "Do I need travel insurance for Schengen visa?"),
+    ("which month is best to apply", "What are the best months to apply for Schengen visa?"),
+    ("can I work on a tourist visa", "Can I work on a Schengen tourist visa?"),
+    ("which country has good visa ratio", "Which country has good visa ratio, visa success rate?"),
+    ("what is the process to apply for visa", "What is the visa process, how to apply?"),
+    ("what are the steps of the procedure", "What is the visa process, how to apply?"),
+    ("I have no travel history, should I apply", "Should I apply Schengen visa with no travel history?"),
+    ("is it ok to apply the first time without travel", "Should I apply Schengen visa with no travel history?"),
+    ("can I apply to several countries at once", "Can I apply for multiple Schengen visas?"),
+    ("which schengen country gives visas most easily?", "Which Schengen country has the highest visa approval rate?"),
+    ("what is the weather in paris", None),
+    ("tell me a joke", None),
+]
+
+
+def _top_question(query):
+    _, question_type = rag_service._classify_question(query, "ask_age")
+    hit = rag_service.faq_index.best(query, question_type)
+    return hit.entry.question if hit else None
+
+
+def test_retrieval_quality():
+    correct = [query for query, expected in LABELLED_QUERIES if _top_question(query) == expected]
+    assert len(correct) / len(LABELLED_QUERIES) >= 0.9
+    # Chit-chat never pulls an FAQ answer
+    assert all(_top_question(query) is None for query, expected in LABELLED_QUERIES if expected is None)
+
+
+def test_confident_hits_for_clear_keyword_questions():
+    hit = rag_service.faq_index.best("how much is the visa fee", "fees")
+    assert hit.confidence > 0.7
+    assert "how much" in hit.matched_keywords
+
+
+def test_tokenizer_stems_and_drops_stop_words():
+    assert tokenize("What are the Fees?") == ["fee"]
+    assert tokenize("rejected rejection countries") == ["reject", "reject", "country"]
+    assert tokenize("how much", drop_stop_words=False) == ["how", "much"]
+
+
+def test_hits_are_immutable_and_entries_untouched():
+    before = [dataclasses.asdict(e) for e in rag_service.faq_database]
+    hits = rag_service.faq_index.search("visa fee cost how much", "fees", top_k=5)
+    assert [h.score for h in hits] == sorted((h.score for h in hits), reverse=True)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        hits[0].confidence = 0.0
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        hits[0].entry.category = "other"
+    assert [dataclasses.asdict(e) for e in rag_service.faq_database] == before
+
+
+def test_search_is_sub_millisecond_at_10k_entries():
+    rng = random.Random(41)
+    words = [f"term{i}" for i in range(3000)] + ["visa", "fee", "bank", "balance", "insurance", "travel"]
+    entries = [
+        FAQEntry(
+            question=" ".join(rng.choices(words, k=10)) + "?",
+            answer=" ".join(rng.choices(words, k=40)),
+            category=f"category{i % 20}",
+            keywords=[" ".join(rng.choices(words, k=rng.randint(1, 2))) for _ in range(4)],
+        )
+        for i in range(10_000)
+    ]
+    index = FAQIndex(entries)
+    queries = ["how much is the visa fee", "bank balance for travel insurance", "term12 term400 visa"] * 100
+    index.search(queries[0], "category3")
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, "category3")
+    assert (time.perf_counter() - start) / len(queries) < 0.001
+
+
+PARAPHRASES = [
+    ("how many days for visa", "How long does visa processing take?"),
+    ("will the embassy decide quickly", "How long does visa processing take?"),
+    ("do children pay less", "What are the visa fees for Schengen countries?"),
+    ("which papers must I bring to the appointment", "What documents are required for Schengen visa?"),
+    ("how much funds should be in my account", "What is the minimum bank balance for Schengen visa?"),
+    ("my application was turned down", "What if my visa is rejected?"),
+    ("is medical cover compulsory", "Do I need travel insurance for Schengen visa?"),
+    ("should I avoid summer", "What are the best months to apply for Schengen visa?"),
+    ("can I take a job while visiting", "Can I work on a Schengen tourist visa?"),
+    ("I have never been abroad", "Should I apply Schengen visa with no travel history?"),
+]
+
+
+def test_semantic_search_catches_paraphrases():
+    keyword_only = FAQIndex(rag_service.faq_database)
+    fused = FAQIndex(rag_service.faq_database, embedder=HashedNgramEmbedder())
+
+    def confident(index, query):
+        hit = index.best(query, rag_service._classify_question(query, "ask_age")[1])
+        return hit.entry.question if hit and hit.confidence > 0.7 else None
+
+    keyword_answers = sum(confident(keyword_only, q) == expected for q, expected in PARAPHRASES)
+    fused_answers = sum(confident(fused, q) == expected for q, expected in PARAPHRASES)
+    assert fused_answers >= 7 > keyword_answers
+    for query in ("what is your name", "thanks a lot", "tell me a joke"):
+        assert confident(fused, query) is None
+
+
+def test_embeddings_are_stable_and_cached_as_memory_maps(tmp_path):
+    texts = [f"{e.question} {' '.join(e.keywords)}" for e in rag_service.faq_database]
+    first, matrix = build_or_load(texts, HashedNgramEmbedder(), str(tmp_path))
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-5)
+
+    second, cached = build_or_load(texts, HashedNgramEmbedder(), str(tmp_path))
+    assert isinstance(cached, np.memmap)
+    np.testing.assert_array_equal(np.asarray(cached), np.asarray(matrix))
+    np.testing.assert_array_equal(first.embed("visa fee"), second.embed("visa fee"))
+
+    # A different corpus never reads the old file
+    _, changed = build_or_load(texts[:-1], HashedNgramEmbedder(), str(tmp_path))
+    assert changed.shape[0] == len(texts) - 1
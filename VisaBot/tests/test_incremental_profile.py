@@ -0,0 +1,181 @@
+"""
+Tests for incremental feature updates and provisional score bounds
+"""
+import random
+from dataclasses import asdict
+
+import pytest
+from loguru import logger
+
+from app.services.evaluation.incremental import ANSWER_FEATURES, IncrementalProfile
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.rubric import rubric_loader
+from tests.test_rubric_batch import random_answers
+
+
+@pytest.fixture(autouse=True)
+def quiet_rubric():
+    logger.disable("app.services")
+    yield
+    logger.enable("app.services")
+
+
+def test_sync_matches_full_normalization():
+    """Features built one answer at a time equal normalizing all answers at once"""
+    rng = random.Random(37)
+    for _ in range(200):
+        answers = random_answers(rng)
+        profile = IncrementalProfile()
+        partial = {}
+        for key, value in answers.items():
+            partial[key] = value
+            assert set(profile.sync(partial)) <= {key}
+            assert asdict(profile.features) == asdict(extract_features(partial))
+        assert profile.sync(partial) == []
+
+
+def test_sync_sees_in_place_edits_and_removals():
+    profile = IncrementalProfile()
+    answers = {"travel_history": ["France"], "schengen_rejection": {"has_rejection": False, "year": None}}
+    profile.sync(answers)
+    answers["travel_history"].append("UK")
+    answers["schengen_rejection"]["has_rejection"] = True
+    assert sorted(profile.sync(answers)) == ["schengen_rejection", "travel_history"]
+    assert profile.features.travel_count == 2
+    assert profile.features.previous_schengen_rejection is True
+
+    answers.clear()
+    profile.sync(answers)
+    assert asdict(profile.features) == asdict(extract_features({}))
+
+
+def test_bounds_contain_final_ratio_and_settle():
+    """At every step the final ratio lies within the bounds, which collapse once all answers are in"""
+    rubric = rubric_loader.get()
+    rng = random.Random(370)
+    for _ in range(300):
+        answers = random_answers(rng)
+        final = rubric.evaluate(extract_features(answers))[0]["success_ratio"]
+        order = list(ANSWER_FEATURES)
+        rng.shuffle(order)
+        profile = IncrementalProfile()
+        partial = {}
+        for key in [None] + order:
+            if key is not None and key in answers:
+                partial[key] = answers[key]
+            profile.sync(partial)
+            estimate = profile.estimate([k for k in ANSWER_FEATURES if k not in partial])
+            assert estimate.min_ratio <= final <= estimate.max_ratio, (answers, partial, estimate)
+            assert estimate.min_ratio <= estimate.success_ratio <= estimate.max_ratio
+        assert estimate.is_settled and estimate.success_ratio == final
+
+
+def test_early_answers_narrow_the_range():
+    profile = IncrementalProfile()
+    assert not profile.estimate().is_settled
+    wide = profile.estimate()
+    profile.sync({"closing_balance": False})
+    narrowed = profile.estimate()
+    # A balance under 2M caps the ratio at 50
+    assert narrowed.max_ratio == 50 < wide.max_ratio
+
+
+def test_fsm_progress_follows_the_applicant_branch():
+    from app.services.fsm_service import FSMStates, VisaEvaluationFSM
+
+    fsm = VisaEvaluationFSM("progress-test")
+    fsm.answers = {"selected_country": "Spain", "profession": "job holder"}
+    job = fsm.get_progress()
+    assert job["answered"] == 2
+    pending = [question for question, _ in fsm._pending_questions()]
+    assert "salary" in pending and "business_type" not in pending
+
+    fsm.answers["profession"] = "business owner"
+    pending = [question for question, _ in fsm._pending_questions()]
+    assert "business_type" in pending and "salary" not in pending
+
+    fsm.answers.update({"travel_history": [], "closing_balance": False})
+    provisional = fsm.refresh_profile()
+    assert provisional.max_ratio == 50
+    assert fsm._find_next_unanswered_question([])[0] == FSMStates.ASK_BUSINESS_TYPE
+
+    fsm.current_state = FSMStates.COMPLETE
+    assert fsm.get_progress()["percent"] == 100.0
+
+
+def _walk_questionnaire(answers, early_exit, monkeypatch):
+    """Answer whatever the FSM asks next from a complete answer set; returns (turns, evaluation)"""
+    from app.core.config import settings
+    from app.services.fsm_service import FSMStates, VisaEvaluationFSM
+
+    monkeypatch.setattr(settings, "FSM_EARLY_EXIT", early_exit)
+    keys_by_state = {
+        FSMStates.ASK_COUNTRY: ("selected_country",), FSMStates.ASK_PROFESSION: ("profession",),
+        FSMStates.ASK_BUSINESS_TYPE: ("business_type",), FSMStates.ASK_SALARY: ("salary",),
+        FSMStates.ASK_SALARY_MODE: ("salary_mode",), FSMStates.ASK_TAX_INFO: ("is_tax_filer", "annual_income"),
+        FSMStates.ASK_BALANCE: ("closing_balance",), FSMStates.ASK_TRAVEL: ("travel_history",),
+        FSMStates.ASK_LAST_TRAVEL_YEAR: ("last_travel_year",), FSMStates.ASK_VALID_VISA: ("valid_visa",),
+        FSMStates.ASK_SCHENGEN_REJECTION: ("schengen_rejection",), FSMStates.ASK_AGE: ("age",),
+        FSMStates.ASK_BUSINESS_PREMISES: ("business_premises",), FSMStates.ASK_BUSINESS_ASSETS: ("business_assets",),
+        FSMStates.ASK_BUSINESS_ONLINE_PRESENCE: ("business_online_presence",),
+    }
+    fsm = VisaEvaluationFSM("early-exit-test")
+    turns = 0
+    while True:
+        state, _ = fsm._find_next_unanswered_question([])
+        if state == FSMStates.EVALUATION:
+            break
+        for key in keys_by_state.get(state, ()):
+            fsm.answers[key] = answers.get(key)
+        turns += 1
+        assert turns <= len(VisaEvaluationFSM.QUESTION_SEQUENCE)
+    return turns, rubric_loader.get().evaluate(extract_features(fsm.answers))[0]
+
+
+def test_early_exit_never_changes_the_outcome(monkeypatch):
+    rng = random.Random(380)
+    full_turns = early_turns = 0
+    for _ in range(150):
+        answers = {"selected_country": "Spain", "salary": "150000", "salary_mode": "bank", **random_answers(rng)}
+        # Every question must end up stored, so give "no answer" a concrete value
+        for key, default in (("profession", "student"), ("business_type", "partnership"), ("age", "n/a"),
+                             ("travel_history", "none"), ("last_travel_year", "unknown")):
+            answers[key] = answers.get(key) or default
+        for key in ("is_tax_filer", "closing_balance", "valid_visa", "schengen_rejection",
+                    "business_premises", "business_assets", "business_online_presence"):
+            if answers.get(key) is None:
+                answers[key] = "not sure"
+
+        turns, full = _walk_questionnaire(answers, False, monkeypatch)
+        full_turns += turns
+        turns, early = _walk_questionnaire(answers, True, monkeypatch)
+        early_turns += turns
+        for key in ("success_ratio", "overall_recommendation", "should_apply", "recommendations"):
+            assert early[key] == full[key], (answers, key)
+    assert early_turns < full_turns
+
+
+def test_age_is_asked_when_a_cap_can_still_lower_the_ratio(monkeypatch):
+    # 40% and 50% share the "Moderate" outcome, but the young first-timer cap changes the ratio shown
+    answers = {"selected_country": "Spain", "profession": "job", "salary": "150000", "salary_mode": "bank",
+               "is_tax_filer": True, "annual_income": 900000, "closing_balance": 2500000, "travel_history": ["USA"],
+               "last_travel_year": "2024", "valid_visa": True, "schengen_rejection": False, "age": "22",
+               "business_premises": False, "business_assets": False, "business_online_presence": False}
+    _, full = _walk_questionnaire(answers, False, monkeypatch)
+    _, early = _walk_questionnaire(answers, True, monkeypatch)
+    assert early["success_ratio"] == full["success_ratio"] == 40
+
+
+def test_stats_average_turns_per_completed_evaluation():
+    from app.services.fsm_service import FSMService, VisaEvaluationFSM
+
+    service = FSMService()
+    for turns, skipped in ((8, ["age"]), (10, [])):
+        fsm = VisaEvaluationFSM("stats-test")
+        fsm.turns, fsm.skipped_questions = turns, skipped
+        service._record_completion(fsm)
+    stats = service.get_stats()
+    assert stats["completed_evaluations"] == 2
+    assert stats["average_turns"] == 9.0
+    assert stats["average_questions_skipped"] == 0.5
+    assert stats["early_exits"] == 1
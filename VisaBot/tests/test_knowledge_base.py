@@ -0,0 +1,112 @@
+"""
+Tests for the hot-reloadable knowledge base
+"""
+import json
+import shutil
+
+import pytest
+
+from app.services.rag_service import rag_service
+from app.services.retrieval.answer_cache import AnswerCache
+from app.services.retrieval.knowledge import KNOWLEDGE_DIR
+from app.services.retrieval.knowledge_base import (
+    DOCUMENTS, DatabaseKnowledgeSource, FileKnowledgeSource, KnowledgeBase, content_digest,
+)
+from app.services.storage.memory_backend import InMemoryBackend
+
+NEW_FAQ = {
+    "question": "Can I apply for a Schengen visa from Dubai?",
+    "answer": "Residents of the UAE with a valid residence permit can apply at the embassy in Dubai.",
+    "category": "application_location",
+    "keywords": ["dubai", "uae resident", "apply from dubai"],
+}
+
+
+@pytest.fixture
+def knowledge_dir(tmp_path):
+    for name in DOCUMENTS:
+        shutil.copy(f"{KNOWLEDGE_DIR}/{name}", tmp_path / name)
+    return tmp_path
+
+
+def add_faq(directory, entry=NEW_FAQ):
+    path = directory / "faqs.json"
+    faqs = json.loads(path.read_text(encoding="utf-8"))
+    path.write_text(json.dumps(faqs + [entry]), encoding="utf-8")
+
+
+def test_bundled_files_hold_the_former_built_in_knowledge():
+    snapshot = rag_service.knowledge_base.current
+    assert len(snapshot.faq_entries) == 13
+    assert "recent visa rejections" in rag_service.evaluation_rules["high_risk_factors"]
+    assert rag_service.faq_index is snapshot.faq_index
+    assert snapshot.digest == content_digest(FileKnowledgeSource().read_sync())
+
+
+@pytest.mark.asyncio
+async def test_changed_content_is_swapped_in_with_a_new_version(knowledge_dir):
+    knowledge = KnowledgeBase(FileKnowledgeSource(str(knowledge_dir)))
+    first = knowledge.current
+    assert await knowledge.reload() is False
+    assert knowledge.current is first  # Unchanged content is not rebuilt
+
+    add_faq(knowledge_dir)
+    assert await knowledge.reload() is True
+    current = knowledge.current
+    assert (current.version, len(current.faq_entries)) == (2, 14)
+    assert current.digest != first.digest
+    assert current.faq_index.best("can i apply from dubai", "general").entry.question == NEW_FAQ["question"]
+
+    # A request still holding the old snapshot keeps a consistent view of it
+    assert len(first.faq_entries) == 13
+    old_hit = first.faq_index.best("can i apply from dubai", "general")
+    assert old_hit is None or old_hit.entry.question != NEW_FAQ["question"]
+
+
+@pytest.mark.asyncio
+async def test_invalid_content_keeps_the_current_version(knowledge_dir):
+    knowledge = KnowledgeBase(FileKnowledgeSource(str(knowledge_dir)))
+    first = knowledge.current
+
+    (knowledge_dir / "scenarios.json").write_text("[{", encoding="utf-8")
+    assert await knowledge.reload() is False
+    assert knowledge.current is first
+    stats = knowledge.get_stats()
+    assert stats["failed_reloads"] == 1 and stats["last_error"]
+
+    shutil.copy(f"{KNOWLEDGE_DIR}/scenarios.json", knowledge_dir / "scenarios.json")
+    (knowledge_dir / "faqs.json").unlink()
+    assert await knowledge.reload() is False
+    assert knowledge.current is first
+
+    (knowledge_dir / "faqs.json").write_text(json.dumps([NEW_FAQ]), encoding="utf-8")
+    assert await knowledge.reload() is True
+    assert knowledge.get_stats()["last_error"] is None
+
+
+@pytest.mark.asyncio
+async def test_swap_invalidates_answers_generated_from_the_old_knowledge(knowledge_dir):
+    knowledge = KnowledgeBase(FileKnowledgeSource(str(knowledge_dir)))
+    backend = InMemoryBackend()
+    swapped, lagging = (AnswerCache(embedder=knowledge.current.faq_index.embedder, backend=backend,
+                                    namespace=knowledge.current.digest) for _ in range(2))
+    knowledge.on_swap(lambda previous, current: swapped.rekey(current.digest, current.faq_index.embedder))
+
+    await swapped.set("can i apply from dubai", "Only at the embassy in Islamabad.")
+    add_faq(knowledge_dir)
+    assert await knowledge.reload() is True
+
+    assert swapped.namespace == knowledge.current.digest
+    assert await swapped.get("can i apply from dubai") is None
+    await swapped.set("can i apply from dubai", "Yes, with a UAE residence permit.")
+    # A worker that has not reloaded yet keeps serving answers for the content it has
+    assert (await lagging.get("can i apply from dubai")).answer == "Only at the embassy in Islamabad."
+
+
+@pytest.mark.asyncio
+async def test_database_source_falls_back_to_files_without_a_database(knowledge_dir):
+    source = DatabaseKnowledgeSource(FileKnowledgeSource(str(knowledge_dir)))
+    knowledge = KnowledgeBase(source)
+    assert knowledge.current.source == "database"
+    assert await source.read() == FileKnowledgeSource(str(knowledge_dir)).read_sync()
+    assert await knowledge.reload() is False
@@ -0,0 +1,76 @@
+"""
+Tests for the heading-chunked knowledge index behind LLM prompt context
+"""
+import os
+
+from app.services.retrieval.knowledge import KNOWLEDGE_DIR, KNOWLEDGE_FILES, build_index, split_markdown
+
+
+RULES = """# Evaluation Rules
+
+## Primary Evaluation Factors:
+
+### 1. Travel History
+Travel to Schengen, USA or UK strengthens a profile.
+
+### 2. Homeland Ties
+#### A. Business Profile
+Tax returns and an office with employees show strong ties.
+
+## Document Checklist
+- Passport
+- Bank statement
+"""
+
+
+def test_split_markdown_keeps_heading_paths_and_skips_empty_sections():
+    chunks = split_markdown(RULES, "rules.md")
+
+    assert [c.headings for c in chunks] == [
+        ("Evaluation Rules", "Primary Evaluation Factors", "1. Travel History"),
+        ("Evaluation Rules", "Primary Evaluation Factors", "2. Homeland Ties", "A. Business Profile"),
+        ("Evaluation Rules", "Document Checklist"),
+    ]
+    assert chunks[2].text == "- Passport\n- Bank statement"
+    assert chunks[0].render().startswith("[rules.md: Evaluation Rules > Primary Evaluation Factors > 1. Travel")
+    assert all(c.tokens > 0 for c in chunks)
+
+
+def test_long_sections_are_split_between_lines():
+    text = "## Scenario: Long\n" + "\n".join(f"- recommendation number {i}" for i in range(200))
+    chunks = split_markdown(text, "scenarios.md", max_chars=500)
+
+    assert len(chunks) > 1
+    assert all(len(c.text) <= 500 for c in chunks)
+    assert all(c.headings == ("Scenario: Long",) for c in chunks)
+    assert "\n".join(c.text for c in chunks).count("recommendation number") == 200
+
+
+def test_bundled_knowledge_retrieves_the_matching_scenario():
+    index = build_index([os.path.join(KNOWLEDGE_DIR, name) for name in KNOWLEDGE_FILES])
+    profile = ("Profession: business owner\nTax Filer: No\nAnnual Income: 1500000\n"
+               "Travel History: None\nSelected Country: Germany")
+
+    top = index.select(profile, top_k=3, max_tokens=1000)
+
+    assert top[0].source == "scenarios.md"
+    assert "Low-Income Business Owner with no travel history" in top[0].title
+    assert sum(c.tokens for c in top) <= 1000
+    assert index.total_tokens > 5 * 1000
+
+
+def test_prompt_context_stays_within_budget_as_knowledge_grows(tmp_path):
+    path = tmp_path / "scenarios.md"
+    query = "business owner with no travel history and a tax filer"
+    sizes = []
+    for scenarios in (10, 100, 1000):
+        path.write_text("\n\n".join(
+            f"## Scenario: {i} business owner variant\n- **Profile**: tax filer, travel history of {i} countries"
+            for i in range(scenarios)), encoding="utf-8")
+        index = build_index([str(path)])
+        selected = index.select(query, top_k=4, max_tokens=120)
+        assert len(selected) <= 4 and sum(c.tokens for c in selected) <= 120
+        sizes.append(len(index.context(query, top_k=4, max_tokens=120)))
+
+    assert max(sizes) - min(sizes) < 20
+
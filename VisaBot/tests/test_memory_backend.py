@@ -0,0 +1,136 @@
+"""
+Tests for the in-memory storage backend
+"""
+import pytest
+
+from app.services.storage.memory_backend import InMemoryBackend
+from app.services.storage.timing_wheel import TimingWheel
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def backend(clock):
+    return InMemoryBackend(tick=1.0, wheel_size=16, clock=clock)
+
+
+@pytest.mark.asyncio
+async def test_set_get_with_ttl(backend, clock):
+    """Keys expire once their TTL elapses"""
+    await backend.set("session:a", "value", ex=10)
+    await backend.set("session:b", 42)
+
+    assert await backend.get("session:a") == "value"
+    assert await backend.get("session:b") == "42"
+    assert await backend.ttl("session:a") == 10
+    assert await backend.ttl("session:b") == -1
+
+    clock.now += 10
+    assert await backend.get("session:a") is None
+    assert await backend.ttl("session:a") == -2
+    assert await backend.get("session:b") == "42"
+
+
+@pytest.mark.asyncio
+async def test_ttl_longer_than_wheel(backend, clock):
+    """Deadlines beyond one wheel rotation are not expired early"""
+    await backend.set("key", "v", ex=40)
+
+    clock.now += 20
+    assert await backend.get("key") == "v"
+
+    clock.now += 20
+    assert await backend.get("key") is None
+    assert len(backend._data) == 0
+
+
+@pytest.mark.asyncio
+async def test_expire_reschedules_and_set_clears_ttl(backend, clock):
+    """EXPIRE moves the deadline and a plain SET removes it"""
+    await backend.set("key", "v", ex=5)
+    assert await backend.expire("key", 30)
+
+    clock.now += 10
+    assert await backend.get("key") == "v"
+
+    await backend.set("key", "w")
+    clock.now += 100
+    assert await backend.get("key") == "w"
+    assert not await backend.expire("missing", 5)
+
+
+@pytest.mark.asyncio
+async def test_counters_and_delete(backend):
+    """INCR creates counters and DELETE reports removed keys"""
+    assert await backend.incr("counter:s:message_count") == 1
+    assert await backend.incr("counter:s:message_count", 4) == 5
+    assert await backend.delete("counter:s:message_count", "missing") == 1
+    assert not await backend.exists("counter:s:message_count")
+
+
+@pytest.mark.asyncio
+async def test_lists(backend):
+    """List operations follow Redis index semantics"""
+    await backend.rpush("history", "a", "b", "c")
+    await backend.lpush("history", "z")
+
+    assert await backend.lrange("history", 0, -1) == ["z", "a", "b", "c"]
+    assert await backend.lrange("history", -2, -1) == ["b", "c"]
+    assert await backend.llen("history") == 4
+
+    await backend.ltrim("history", -2, -1)
+    assert await backend.lrange("history", 0, -1) == ["b", "c"]
+
+    with pytest.raises(TypeError):
+        await backend.get("history")
+
+
+@pytest.mark.asyncio
+async def test_hashes(backend):
+    """Hash fields are stored as strings"""
+    assert await backend.hset("meta", {"state": "ask_age", "turns": 3}) == 2
+    assert await backend.hincrby("meta", "turns", 2) == 5
+    assert await backend.hgetall("meta") == {"state": "ask_age", "turns": "5"}
+    assert await backend.hdel("meta", "state", "turns") == 2
+    assert not await backend.exists("meta")
+
+
+@pytest.mark.asyncio
+async def test_scan_iter_skips_expired(backend, clock):
+    """SCAN matches glob patterns and never returns expired keys"""
+    await backend.set("session:abc", "1", ex=5)
+    await backend.set("answers:abc", "2")
+    await backend.set("answers:xyz", "3")
+
+    assert sorted([k async for k in backend.scan_iter(match="*abc*")]) == ["answers:abc", "session:abc"]
+
+    clock.now += 5
+    assert [k async for k in backend.scan_iter(match="*abc*")] == ["answers:abc"]
+
+
+def test_timing_wheel_cancel_and_reschedule(clock):
+    """Cancelled and rescheduled items only fire at their current deadline"""
+    wheel = TimingWheel(tick=1.0, size=8, clock=clock)
+    wheel.schedule("a", clock.now + 2)
+    wheel.schedule("b", clock.now + 2)
+    wheel.schedule("c", clock.now + 3)
+    wheel.cancel("b")
+    wheel.schedule("c", clock.now + 20)
+
+    assert wheel.advance(clock.now + 3) == ["a"]
+    assert wheel.advance(clock.now + 10) == []
+    assert wheel.advance(clock.now + 21) == ["c"]
+    assert len(wheel) == 0
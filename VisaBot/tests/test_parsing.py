@@ -0,0 +1,156 @@
+"""
+Tests for the amount, year and yes/no parsers, including a fuzz corpus
+"""
+import random
+import string
+from datetime import date
+
+import pytest
+
+from app.services.evaluation.parsing import parse_amount, parse_year, parse_yes_no, years_since
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2 million", 2_000_000),
+    ("2.5 million", 2_500_000),
+    ("2.3 million", 2_300_000),
+    ("1.5m", 1_500_000),
+    ("2 mio", 2_000_000),
+    ("3mn", 3_000_000),
+    ("500k", 500_000),
+    ("250 thousand", 250_000),
+    ("25 lakh", 2_500_000),
+    ("12 lacs", 1_200_000),
+    ("1.2 crore", 12_000_000),
+    ("2 cr", 20_000_000),
+    ("PKR 25,00,000", 2_500_000),
+    ("2,5 million", 2_500_000),
+    ("12,5 lakh", 1_250_000),
+    ("1e6", 1_000_000),
+    ("2.5e6 rupees", 2_500_000),
+    ("Rs. 1,500,000", 1_500_000),
+    ("pkr2000000", 2_000_000),
+    ("around 800000 rupees", 800_000),
+    ("5 months", 5),
+    ("2000000", 2_000_000),
+    (1_200_000, 1_200_000),
+    (2.5, 2),
+    ("no idea", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2019", 2019),
+    ("in 2021 for a conference", 2021),
+    (2018, 2018),
+    ("2 years ago", 2024),
+    ("a year ago", 2025),
+    ("three years back", 2023),
+    ("last year", 2025),
+    ("this year", 2026),
+    ("a few months ago", 2026),
+    ("2030", None),
+    ("1850", None),
+    ("never", None),
+    (True, None),
+    (None, None),
+])
+def test_parse_year(text, expected):
+    assert parse_year(text, current_year=2026) == expected
+
+
+def test_years_since():
+    assert years_since("2 years ago", current_year=2026) == 2
+    assert years_since("2026", current_year=2026) == 0
+    assert years_since("unknown", current_year=2026) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("yes", True),
+    ("Y", True),
+    ("Yes, I have an office with 5 employees", True),
+    ("yeah sure", True),
+    ("haan", True),
+    ("true", True),
+    ("1", True),
+    ("no", False),
+    ("N", False),
+    ("no, never", False),
+    ("nope", False),
+    ("I don't have one", False),
+    ("I don’t have one", False),
+    ("nahi", False),
+    ("0", False),
+    ("not sure", None),
+    ("I don't know", None),
+    ("maybe", None),
+    ("n/a", None),
+    ("I know it", None),
+    ("", None),
+    (None, None),
+    (False, False),
+])
+def test_parse_yes_no(text, expected):
+    assert parse_yes_no(text) == expected
+
+
+def _formats(amount: int, rng: random.Random):
+    """The same amount written the ways users write it"""
+    yield str(amount)
+    yield f"{amount:,}"
+    yield f"PKR {amount:,}"
+    if amount % 100_000 == 0:
+        lakhs = amount // 100_000
+        yield f"{lakhs} lakh"
+        # South-Asian grouping: last three digits, then pairs
+        head, tail = str(amount)[:-3], str(amount)[-3:]
+        pairs = []
+        while len(head) > 2:
+            head, pairs = head[:-2], [head[-2:]] + pairs
+        yield "Rs. " + ",".join([head] + pairs + [tail])
+    if amount % 100_000 == 0:
+        yield f"{amount / 1_000_000:g} million"
+        yield f"{amount / 1_000_000:g}{rng.choice(['m', 'mn', ' mio'])}"
+    if amount % 1_000 == 0:
+        yield f"{amount // 1_000}k"
+
+
+def test_fuzz_amount_formats_round_trip():
+    """Every way of writing a random amount parses back to the same amount"""
+    rng = random.Random(36)
+    for _ in range(2000):
+        amount = rng.choice([rng.randint(1, 99) * 100_000, rng.randint(1, 9_999) * 1_000, rng.randint(1, 10 ** 9)])
+        for text in _formats(amount, rng):
+            assert parse_amount(text) == amount, text
+
+
+def test_fuzz_junk_never_raises():
+    """Random printable junk parses to a value of the right type or None"""
+    rng = random.Random(360)
+    alphabet = string.printable + "’₨٠ "
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        amount = parse_amount(text)
+        assert amount is None or (isinstance(amount, int) and amount >= 0)
+        year = parse_year(text, current_year=2026)
+        assert year is None or 1900 <= year <= 2026
+        assert parse_yes_no(text) in (True, False, None)
+
+
+@pytest.mark.parametrize("state, text, field, expected", [
+    ("ask_last_travel_year", "a year ago", "last_travel_year", str(date.today().year - 1)),
+    ("ask_age", "I turned 30 this year", "last_travel_year", None),
+    ("ask_travel", "went to Dubai a year ago", "last_travel_year", None),
+    ("ask_balance", "2,5 million", "closing_balance", 2_500_000),
+    ("ask_salary", "150000", "closing_balance", None),
+    ("ask_age", "35", "closing_balance", None),
+])
+def test_fallback_parse_only_reads_years_and_balances_when_asked(state, text, field, expected):
+    from app.services.openai_service import openai_service
+
+    parsed = openai_service._fallback_parse(text, state)
+    assert parsed["extracted_info"][field]["value"] == expected
@@ -0,0 +1,131 @@
+"""
+Tests for the chat_messages schema: monthly partitions, JSONB columns, indexes and migrations
+"""
+import io
+import os
+from datetime import date
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.models.database import Base
+from app.services.partition_service import (
+    DEFAULT_PARTITION, PartitionMaintainer, add_months, create_partition_sql, expired_partitions, partition_month,
+    partition_name,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ScriptedResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+    def __iter__(self):
+        return iter([(name,) for name in self.value or []])
+
+
+class ScriptedConnection:
+    """Stands in for an AsyncConnection: answers the catalog queries, records the DDL"""
+
+    def __init__(self, relkind="p", partitions=()):
+        self.relkind = relkind
+        self.partitions = list(partitions)
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if "relkind" in sql:
+            return ScriptedResult(self.relkind)
+        if "pg_inherits" in sql:
+            return ScriptedResult(self.partitions)
+        self.statements.append(sql)
+        return ScriptedResult(None)
+
+
+def ddl(table: str) -> str:
+    table = Base.metadata.tables[table]
+    statements = [CreateTable(table)] + [CreateIndex(index) for index in table.indexes]
+    return "\n".join(" ".join(str(s.compile(dialect=postgresql.dialect())).split()) for s in statements)
+
+
+def test_partitions_are_named_and_bounded_by_utc_month():
+    assert partition_name(date(2025, 6, 17)) == "chat_messages_y2025m06"
+    assert partition_month("chat_messages_y2025m06") == date(2025, 6, 1)
+    assert partition_month(DEFAULT_PARTITION) is None
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert create_partition_sql(date(2025, 12, 9)).endswith(
+        "chat_messages_y2025m12 PARTITION OF chat_messages "
+        "FOR VALUES FROM ('2025-12-01 00:00:00+00') TO ('2026-01-01 00:00:00+00')"
+    )
+
+
+def test_only_months_past_retention_expire():
+    names = [partition_name(date(2025, month, 1)) for month in range(1, 13)] + [DEFAULT_PARTITION]
+    assert expired_partitions(names, 3, today=date(2025, 6, 15)) == [
+        "chat_messages_y2025m01", "chat_messages_y2025m02"
+    ]
+    assert expired_partitions(names, 0, today=date(2025, 6, 15)) == []  # Retention disabled
+
+
+@pytest.mark.asyncio
+async def test_maintenance_creates_upcoming_months_and_drops_expired_ones():
+    conn = ScriptedConnection(partitions=["chat_messages_y2025m04", "chat_messages_y2025m05", "chat_messages_y2025m06"])
+    maintainer = PartitionMaintainer(months_ahead=2, retention_months=1, interval=0)
+    result = await maintainer.maintain(conn, today=date(2025, 6, 15))
+
+    assert result == {
+        "created": ["chat_messages_y2025m07", "chat_messages_y2025m08", DEFAULT_PARTITION],
+        "dropped": ["chat_messages_y2025m04"],  # May still holds messages newer than a month
+    }
+    assert "pg_advisory_xact_lock" in conn.statements[0]
+    assert conn.statements[-2:] == [
+        "ALTER TABLE chat_messages DETACH PARTITION chat_messages_y2025m04",
+        "DROP TABLE chat_messages_y2025m04",
+    ]
+
+    legacy = ScriptedConnection(relkind="r")  # Not migrated yet: leave the table alone
+    assert await maintainer.maintain(legacy) == {"created": [], "dropped": []}
+    assert legacy.statements == []
+
+
+def test_models_declare_jsonb_composite_and_gin_indexes():
+    messages = ddl("chat_messages")
+    assert "PARTITION BY RANGE (created_at)" in messages
+    assert "PRIMARY KEY (id, created_at)" in messages and "message_metadata JSONB" in messages
+    assert "CREATE INDEX ix_chat_messages_session_created ON chat_messages (session_id, created_at)" in messages
+    assert "USING gin (message_metadata jsonb_path_ops)" in messages
+    assert "context JSONB" in ddl("chat_sessions")
+    assert "USING gin (evaluation_data jsonb_path_ops)" in ddl("visa_evaluations")
+
+
+def test_migrations_form_one_chain_and_render_offline():
+    config = Config()
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.set_main_option("sqlalchemy.url", "postgresql://visabot@localhost/visabot")
+    script = ScriptDirectory.from_config(config)
+    assert script.get_heads() == ["0004"]
+    assert [rev.revision for rev in script.walk_revisions()] == ["0004", "0003", "0002", "0001"]
+
+    config.output_buffer = io.StringIO()
+    command.upgrade(config, "head", sql=True)
+    sql = config.output_buffer.getvalue()
+    assert "ALTER TABLE chat_messages ALTER COLUMN message_metadata TYPE JSONB USING message_metadata::jsonb" in sql
+    assert "CREATE INDEX ix_chat_messages_session_created ON chat_messages (session_id, created_at)" in sql
+    assert "PARTITION BY RANGE (created_at)" in sql and "PARTITION OF chat_messages DEFAULT" in sql
+    assert sql.index("INSERT INTO chat_messages") < sql.index("DROP TABLE chat_messages_unpartitioned")
+    assert "ALTER TABLE visa_evaluations ALTER COLUMN user_id DROP NOT NULL" in sql
+    assert "CREATE INDEX ix_chat_sessions_updated_at ON chat_sessions (updated_at)" in sql
+    assert "CREATE TABLE daily_session_rollups" in sql and "CREATE TABLE knowledge_documents" in sql
+
+    config.output_buffer = io.StringIO()
+    command.downgrade(config, "0004:0003", sql=True)
+    assert "DROP TABLE chat_messages_partitioned CASCADE" in config.output_buffer.getvalue()
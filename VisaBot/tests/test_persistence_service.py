@@ -0,0 +1,202 @@
+"""
+Tests for the write-behind persistence pipeline
+"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from app.services.persistence_service import (
+    Batch, EvaluationRecord, MessageRecord, PersistenceService, PostgresWriter, SessionRecord, evaluation_rows,
+    session_rows,
+)
+
+
+class RecordingWriter:
+    def __init__(self, failures=0, delay=0.0):
+        self.batches = []
+        self.failures = failures
+        self.delay = delay
+
+    async def write(self, batch):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        self.batches.append(batch)
+
+
+class RejectingWriter(RecordingWriter):
+    """Fails any batch holding a message with the given content, as a constraint violation would"""
+
+    def __init__(self, bad_content):
+        super().__init__()
+        self.bad_content = bad_content
+        self.attempts = 0
+
+    async def write(self, batch):
+        self.attempts += 1
+        if any(m.content == self.bad_content for m in batch.messages):
+            raise IntegrityError("INSERT INTO chat_messages", {}, Exception("violates check constraint"))
+        self.batches.append(batch)
+
+
+class RecordingSession:
+    """Stands in for an AsyncSession, keeping each statement as Postgres SQL"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    async def execute(self, statement, params=None):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.statements.append((" ".join(sql.split()), params))
+
+
+def make_service(writer, **kwargs):
+    options = {"batch_size": 3, "flush_interval": 10.0, "queue_size": 100, "max_retries": 2, "retry_delay": 0.0}
+    return PersistenceService(writer, **{**options, **kwargs})
+
+
+@pytest.mark.asyncio
+async def test_batches_flush_when_full_and_drain_on_stop():
+    writer = RecordingWriter()
+    service = make_service(writer)
+    assert service.record_message("s1", "user", "hi") is False  # Not started
+
+    service.start()
+    for i in range(7):
+        assert service.record_message("s1", "user", f"message {i}")
+    await asyncio.sleep(0.05)
+    assert [len(b) for b in writer.batches] == [3, 3]
+
+    await service.stop()
+    assert [len(b) for b in writer.batches] == [3, 3, 1]
+    assert [m.content for b in writer.batches for m in b.messages] == [f"message {i}" for i in range(7)]
+    assert service.get_stats()["written"]["messages"] == 7
+    assert service.record_message("s1", "user", "late") is False
+
+
+@pytest.mark.asyncio
+async def test_partial_batches_flush_after_the_interval():
+    writer = RecordingWriter()
+    service = make_service(writer, batch_size=100, flush_interval=0.05)
+    service.start()
+    service.record_session("s1", "ask_age", {"profession": "business"})
+    service.record_message("s1", "assistant", "What is your age?")
+    await asyncio.sleep(0.2)
+
+    assert len(writer.batches) == 1
+    assert (len(writer.batches[0].sessions), len(writer.batches[0].messages)) == (1, 1)
+    await service.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_are_retried_then_dropped():
+    writer = RecordingWriter(failures=2)
+    service = make_service(writer, batch_size=1)
+    service.start()
+    service.record_message("s1", "user", "kept")
+    await asyncio.sleep(0.05)
+    assert len(writer.batches) == 1 and service.failed == 0
+
+    writer.failures = 3
+    service.record_message("s1", "user", "lost")
+    await service.stop()
+    assert len(writer.batches) == 1
+    assert service.get_stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_only_the_bad_record_of_a_failing_batch_is_dropped():
+    writer = RejectingWriter("bad")
+    service = make_service(writer, batch_size=8)
+    service.start()
+    service.record_session("s1", "ask_age", {})
+    for content in ["one", "two", "bad", "three", "four"]:
+        service.record_message("s1", "user", content)
+    service.record_session("s1", "ask_salary", {"age": "30"})
+    await service.stop()
+
+    assert [m.content for b in writer.batches for m in b.messages] == ["one", "two", "three", "four"]
+    # Split batches are written in order, so the latest state still wins
+    assert [s.state for b in writer.batches for s in b.sessions] == ["ask_age", "ask_salary"]
+    stats = service.get_stats()
+    assert (stats["failed"], stats["written"]["messages"], stats["written"]["sessions"]) == (1, 4, 2)
+
+
+@pytest.mark.asyncio
+async def test_drain_timeout_counts_the_batch_being_written():
+    writer = RecordingWriter(delay=0.5)
+    service = make_service(writer, batch_size=1)
+    service.start()
+    for i in range(3):
+        service.record_message("s1", "user", str(i))
+    await asyncio.sleep(0.05)  # The first record is being written
+
+    await service.stop(timeout=0.1)
+    assert writer.batches == []
+    assert service.get_stats()["dropped"] == 3
+
+
+@pytest.mark.asyncio
+async def test_recording_never_waits_for_the_database():
+    writer = RecordingWriter(delay=0.5)
+    service = make_service(writer, batch_size=1, queue_size=5)
+    service.start()
+
+    start = time.perf_counter()
+    results = [service.record_message("s1", "user", str(i)) for i in range(20)]
+    assert time.perf_counter() - start < 0.05
+    assert results.count(False) == service.dropped > 0
+
+    await service.stop(timeout=0.1)
+    assert service.get_stats()["dropped"] >= results.count(False)
+
+
+@pytest.mark.asyncio
+async def test_writer_upserts_sessions_before_inserting_rows_that_reference_them():
+    session = RecordingSession()
+    batch = Batch()
+    batch.add(SessionRecord("s1", "ask_age", {"profession": "job"}))
+    batch.add(SessionRecord("s1", "ask_salary", {"age": "30"}))
+    batch.add(MessageRecord("s2", "user", "hello"))
+    await PostgresWriter(session_factory=lambda: session, use_copy=False).write(batch)
+
+    (upsert, states), (placeholder, placeholders), (messages, message_params) = session.statements
+    assert upsert.startswith("INSERT INTO chat_sessions") and "ON CONFLICT (session_id) DO UPDATE" in upsert
+    assert [row["current_state"] for row in states] == ["ask_salary"]  # Latest state wins
+    assert "ON CONFLICT (session_id) DO NOTHING" in placeholder
+    assert [row["session_id"] for row in placeholders] == ["s2"]
+    assert messages.startswith("INSERT INTO chat_messages")
+    assert [row["content"] for row in message_params] == ["hello"]
+
+
+def test_evaluations_are_stored_without_a_user():
+    batch = Batch()
+    batch.add(EvaluationRecord(
+        "s1", {"success_ratio": 72, "should_apply": True, "overall_recommendation": "Apply"},
+        {"profession": "business owner", "closing_balance": 2_500_000}, "Germany",
+    ))
+    row, = evaluation_rows(batch)
+    assert row["user_id"] is None
+    assert (row["eligibility_score"], row["eligibility_status"], row["risk_level"]) == (72, "eligible", "low")
+    assert row["destination_country"] == "Germany" and row["financial_means"] == "2500000"
+
+
+def test_completed_sessions_are_stored_inactive():
+    batch = Batch()
+    batch.add(SessionRecord("s1", "ask_age", {}))
+    batch.add(SessionRecord("s2", "evaluation", {}))
+    batch.add(SessionRecord("s2", "complete", {}))
+    assert {row["session_id"]: row["is_active"] for row in session_rows(batch)} == {"s1": True, "s2": False}
@@ -0,0 +1,122 @@
+"""
+Tests for the data-driven rubric and its hot reload
+"""
+import json
+import os
+
+import pytest
+from loguru import logger
+
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.rubric import (
+    DEFAULT_RUBRIC_PATH, RubricError, RubricLoader, CompiledRubric, load_rubric, score_profile,
+)
+
+
+STRONG_PROFILE = {
+    "profession": "business owner", "business_type": "trading", "business_premises": True,
+    "business_online_presence": True, "is_tax_filer": True, "annual_income": 1_200_000,
+    "closing_balance": 2_000_000, "travel_history": ["France", "UK", "Japan"], "age": 31,
+}
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def quiet_rubric():
+    logger.disable("app.services.evaluation")
+    yield
+    logger.enable("app.services.evaluation")
+
+
+@pytest.fixture
+def shipped_spec():
+    with open(DEFAULT_RUBRIC_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_rubric(path, spec, mtime_ns):
+    path.write_text(json.dumps(spec), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_shipped_rubric_scores_known_profiles():
+    """The shipped definition keeps the rubric's established results"""
+    rubric = load_rubric()
+    strong = score_profile(extract_features(STRONG_PROFILE), rubric)
+    assert strong["success_ratio"] == 90
+    assert strong["should_apply"] is True
+    assert strong["rubric_version"] == rubric.version
+    assert strong["rubric_version"].startswith("2025.1+")
+
+    young = score_profile(extract_features({"age": 22, "closing_balance": 5_000_000, "travel_history": "Turkey"}), rubric)
+    assert young["success_ratio"] == 30
+    assert "Age < 25 (higher scrutiny)" in young["risk_factors"]
+    assert young["confidence"] == pytest.approx(0.5)
+
+
+def test_hot_reload_swaps_after_interval(tmp_path, shipped_spec):
+    """Edits are picked up after the check interval, and evaluations carry the new version"""
+    path = tmp_path / "rubric.json"
+    write_rubric(path, shipped_spec, 1_000_000_000)
+    clock = FakeClock()
+    loader = RubricLoader(str(path), reload_interval=5.0, clock=clock)
+    original = loader.get()
+
+    tuned = dict(shipped_spec, version="2025.2", should_apply_min_ratio=95)
+    write_rubric(path, tuned, 2_000_000_000)
+    assert loader.get() is original  # not checked yet
+
+    clock.now += 5.0
+    reloaded = loader.get()
+    assert reloaded is not original
+    assert reloaded.version.startswith("2025.2+")
+    feat = extract_features(STRONG_PROFILE)
+    # A request that already holds the old rubric finishes with it
+    assert score_profile(feat, original)["should_apply"] is True
+    assert score_profile(feat, reloaded)["should_apply"] is False
+
+
+def test_bad_reload_keeps_current_rubric(tmp_path, shipped_spec):
+    """A half-written or invalid file never replaces a working rubric"""
+    path = tmp_path / "rubric.json"
+    write_rubric(path, shipped_spec, 1_000_000_000)
+    clock = FakeClock()
+    loader = RubricLoader(str(path), reload_interval=1.0, clock=clock)
+    original = loader.get()
+
+    path.write_text('{"version": "broken", "ties": ', encoding="utf-8")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    clock.now += 1.0
+    assert loader.get() is original
+
+    # Retried on the next check once the file is complete
+    write_rubric(path, dict(shipped_spec, version="2025.3"), 3_000_000_000)
+    clock.now += 1.0
+    assert loader.get().version.startswith("2025.3+")
+
+
+def test_invalid_definitions_are_rejected(shipped_spec):
+    """Unordered tiers, unknown fields and missing sections fail at compile time"""
+    unordered = json.loads(json.dumps(shipped_spec))
+    unordered["financials"]["closing_balance"]["tiers"].reverse()
+    with pytest.raises(RubricError):
+        CompiledRubric(unordered)
+
+    unknown_field = json.loads(json.dumps(shipped_spec))
+    unknown_field["caps"][0]["when"] = {"field": "salary", "op": "<", "value": 1}
+    with pytest.raises(RubricError):
+        CompiledRubric(unknown_field)
+
+    missing = dict(shipped_spec)
+    del missing["bands"]
+    with pytest.raises(RubricError):
+        CompiledRubric(missing)
@@ -0,0 +1,139 @@
+"""
+Equivalence tests for the vectorized rubric scorer
+"""
+import copy
+import random
+from datetime import datetime
+
+import pytest
+from loguru import logger
+
+from app.services.evaluation.batch import FeatureColumns, score_batch, score_columns
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.rubric import CompiledRubric, rubric_loader, score_profile
+
+
+@pytest.fixture(autouse=True)
+def quiet_rubric():
+    logger.disable("app.services.evaluation")
+    yield
+    logger.enable("app.services.evaluation")
+
+
+def random_answers(rng: random.Random) -> dict:
+    """Answer dicts in the shapes the FSM actually stores, plus junk"""
+    this_year = datetime.now().year
+    tri = [True, False, None, "yes", "no", "maybe", 1, 0]
+    amounts = [None, 0, 499_999, 500_000, 800_000, 1_000_000, 1_199_999, 1_200_000, 1_500_000,
+               1_999_999, 2_000_000, 5_000_000, "2 million", "1.5m", "PKR 900000", "unknown", True, False]
+    years = [None, this_year, this_year - 1, this_year - 2, this_year - 3, this_year - 5, this_year - 6,
+             this_year - 10, this_year - 11, 1950, "never", this_year + 3]
+    countries = ["UAE", "Turkey", "France", "Germany", "USA", "UK", "Malaysia", "Japan", "Spain", "Canada"]
+    travel = rng.choice([
+        None, "no travel history", "none", [],
+        rng.sample(countries, rng.randint(1, 5)),
+        ", ".join(rng.sample(countries, rng.randint(1, 4))),
+    ])
+    rejection = rng.choice([
+        None, False, True, "no", "yes",
+        {"has_rejection": rng.choice(tri), "year": rng.choice(years)},
+    ])
+    return {
+        "profession": rng.choice(["business owner", "job holder", "student", "", "entrepreneur"]),
+        "business_type": rng.choice([None, "", "sole proprietor", "partnership"]),
+        "business_premises": rng.choice(tri),
+        "business_online_presence": rng.choice(tri),
+        "business_assets": rng.choice(tri),
+        "is_tax_filer": rng.choice(tri),
+        "annual_income": rng.choice(amounts),
+        "closing_balance": rng.choice(amounts),
+        "travel_history": travel,
+        "valid_visa": rng.choice(tri),
+        "last_travel_year": rng.choice(years),
+        "schengen_rejection": rejection,
+        "age": rng.choice([None, 18, 24, 25, 30, 31, 45, "29", "n/a", -3]),
+    }
+
+
+def assert_matches_scalar(answers_list, compiled=None):
+    compiled = compiled or rubric_loader.get()
+    batch = score_batch(answers_list, compiled)
+    assert len(batch) == len(answers_list)
+    assert batch.rubric_version == compiled.version
+
+    for i, answers in enumerate(answers_list):
+        feat = extract_features(answers)
+        expected = score_profile(feat, compiled)
+        breakdown, _, _ = compiled.breakdown(feat)
+        assert batch.ties[i] == breakdown.ties, answers
+        assert batch.travel[i] == breakdown.travel, answers
+        assert batch.financials[i] == breakdown.financials, answers
+        assert batch.age[i] == breakdown.age, answers
+        assert batch.penalties[i] == breakdown.penalties, answers
+        assert batch.success_ratio[i] == expected["success_ratio"], answers
+        assert batch.confidence[i] == expected["confidence"], answers
+        assert bool(batch.should_apply[i]) == expected["should_apply"], answers
+
+
+def test_random_profiles_match_score_profile():
+    """Vectorized scores equal score_profile for every random profile"""
+    rng = random.Random(31)
+    assert_matches_scalar([random_answers(rng) for _ in range(3000)])
+
+
+def test_edge_profiles_match_score_profile():
+    """Threshold boundaries, empty answers and the override caps"""
+    this_year = datetime.now().year
+    profiles = [
+        {},
+        # Strong business profile, no caps
+        {"profession": "business owner", "business_type": "trading", "business_premises": True,
+         "business_online_presence": True, "is_tax_filer": True, "annual_income": 1_200_000,
+         "closing_balance": 2_000_000, "travel_history": ["France", "UK", "Japan"],
+         "last_travel_year": this_year - 2, "age": 31},
+        # Same, one rupee under the balance cap
+        {"profession": "business owner", "business_type": "trading", "business_premises": True,
+         "business_online_presence": True, "is_tax_filer": True, "annual_income": 1_200_000,
+         "closing_balance": 1_999_999, "travel_history": ["France", "UK", "Japan"],
+         "last_travel_year": this_year - 2, "age": 31},
+        # Young, one trip, no premises: age cap
+        {"profession": "job holder", "closing_balance": 5_000_000, "travel_history": "Turkey",
+         "last_travel_year": this_year, "age": 24, "valid_visa": True},
+        # Non-business ties capped at 10; non-filer halves income credit
+        {"profession": "job", "business_premises": True, "business_online_presence": True,
+         "business_assets": True, "is_tax_filer": False, "annual_income": 800_000},
+        # Rejection with a zero/unknown year counts as historic
+        {"schengen_rejection": {"has_rejection": True, "year": this_year}},
+        {"schengen_rejection": {"has_rejection": True, "year": None}},
+        {"schengen_rejection": {"has_rejection": True, "year": this_year - 3}},
+        # Penalties can push the base score below zero
+        {"schengen_rejection": True, "travel_history": "none", "age": 20},
+        # Historic heavy visa
+        {"travel_history": ["USA"], "last_travel_year": 1990, "age": 50},
+    ]
+    assert_matches_scalar(profiles)
+
+
+def test_tuned_rubric_matches_score_profile():
+    """Equivalence holds for a different rubric definition, not just the shipped one"""
+    spec = copy.deepcopy(rubric_loader.get().spec)
+    spec["version"] = "tuned"
+    spec["ties"]["premises"]["points"] = 25
+    spec["travel"]["recency"]["tiers"][0]["max_years"] = 3
+    spec["financials"]["non_filer"]["income_factor"] = 0.25
+    spec["bands"][0]["min_score"] = 75
+    spec["caps"][0]["max_ratio"] = 60
+    spec["caps"].append({"max_ratio": 30, "when": {"any": [
+        {"field": "is_business", "op": "falsy"},
+        {"field": "years_since_last_travel", "op": ">=", "value": 8, "or": 99},
+    ]}})
+    rng = random.Random(33)
+    assert_matches_scalar([random_answers(rng) for _ in range(1000)], CompiledRubric(spec))
+
+
+def test_columns_round_trip_types():
+    """Tri-state fields keep unknown apart from False"""
+    features = [extract_features({"business_premises": None}), extract_features({"business_premises": "no"})]
+    cols = FeatureColumns.from_features(features)
+    assert cols.business_premises.tolist() == [-1, 0]
+    assert len(score_columns(cols).to_dicts()) == 2
@@ -0,0 +1,85 @@
+"""
+Tests for the deterministic scenario matcher
+"""
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.scenario_matcher import ScenarioMatcher
+
+scenario_matcher = ScenarioMatcher.from_file()
+
+
+STRONG_BUSINESS = {
+    "profession": "business owner", "business_premises": True, "business_online_presence": True,
+    "is_tax_filer": True, "annual_income": 1_500_000, "closing_balance": 2_500_000,
+    "travel_history": ["France", "UK", "Turkey"], "valid_visa": True, "schengen_rejection": False,
+    "age": 40, "selected_country": "Spain",
+}
+
+YOUNG_JOB_HOLDER = {
+    "profession": "job holder", "salary": "150000", "salary_mode": "bank transfer",
+    "travel_history": "none", "age": 22,
+}
+
+
+def match(answers, target_country=None, top_k=3, matcher=scenario_matcher):
+    return matcher.match(extract_features(answers), answers, target_country, top_k=top_k)
+
+
+def test_strong_business_profile_matches_business_scenarios():
+    """Only businessman scenarios are candidates, ranked by criteria met"""
+    matches = match(STRONG_BUSINESS)
+    assert len(matches) == 3
+    assert all(m.scenario.applicant_type == "businessman" for m in matches)
+    best = matches[0]
+    assert best.scenario.success_ratio == 90
+    assert not best.unmet
+    # Last travel year was not given
+    assert len(best.unknown) == 1 and best.score < 1.0
+
+
+def test_unmet_criteria_are_explained():
+    """Failing criteria lower the score and appear in the explanation"""
+    weaker = {**STRONG_BUSINESS, "closing_balance": 1_500_000, "valid_visa": False}
+    best = match(weaker)[0]
+    assert "Closing balance 1,500,000 PKR below 2,000,000 PKR" in best.unmet
+    assert "US/UK/Canada/Australia visa: no (needs yes)" in best.unmet
+    assert best.score < match(STRONG_BUSINESS)[0].score
+    assert "Does not meet: " in best.explanation()
+
+
+def test_job_holder_and_country_filters():
+    """Applicant type and destination select candidates; unsupported countries match nothing"""
+    matches = match(YOUNG_JOB_HOLDER, target_country="Germany")
+    assert [m.scenario.name for m in matches] == ["Young applicant under 25 with no travel history"]
+    assert "Age 22 (needs 18–25)" in matches[0].matched
+    assert "Salary paid into bank: yes (needs yes)" in matches[0].matched
+
+    assert match(YOUNG_JOB_HOLDER, target_country="USA") == []
+
+
+def test_unknown_profession_considers_every_scenario():
+    """Without a profession every applicant type stays in play, complete answers rank first"""
+    matcher = ScenarioMatcher([
+        {"scenario_name": "Job", "success_ratio": 40, "criteria": {"applicant_type": "job_holder", "age_min": 18}},
+        {"scenario_name": "Business", "success_ratio": 80,
+         "criteria": {"applicant_type": "businessman", "tax_filer": True, "closing_balance_min": 2_000_000}},
+    ])
+    matches = match({"age": 30}, matcher=matcher)
+    assert [m.scenario.name for m in matches] == ["Job", "Business"]
+    assert matches[0].score == 1.0
+    assert matches[1].score == 0.5
+
+
+def test_evaluation_from_match_does_not_share_the_scenario_lists():
+    """Editing an evaluation leaves the compiled scenario untouched for later requests"""
+    from app.services.rag_service import rag_service
+
+    best = match(STRONG_BUSINESS)[0]
+    recommendations = list(best.scenario.recommendations)
+    documents = list(best.scenario.required_documents)
+    evaluation = rag_service._evaluation_from_match(best)
+    evaluation.recommendations.append("extra")
+    evaluation.required_documents.clear()
+    evaluation.risk_factors.append("extra")
+    assert best.scenario.recommendations == recommendations
+    assert best.scenario.required_documents == documents
+    assert "extra" not in best.unmet
@@ -0,0 +1,122 @@
+"""
+Tests for the on-track/off-track turn classifier
+"""
+import json
+import random
+import time
+
+import pytest
+
+from app.services.classification.turns import (
+    DEFAULT_MODEL_PATH, TurnClassifier, load_model, main, read_examples, train_model,
+)
+from app.services.rag_service import RAGResponse, rag_service
+
+SEED_PATH = DEFAULT_MODEL_PATH.replace("turn_model.json", "turn_examples.jsonl")
+
+
+@pytest.mark.parametrize("state, text", [
+    ("ask_age", "32"),
+    ("ask_age", "I am 45 years old"),
+    ("ask_valid_visa", "no"),
+    ("ask_schengen_rejection", "yes in 2021"),
+    ("ask_last_travel_year", "2 years ago"),
+    ("ask_business_premises", "yes we have a shop"),
+    ("ask_business_online_presence", "nope"),
+    ("ask_business_assets", "not sure"),
+    ("ask_travel", "dubai and turkey"),
+    ("ask_salary", "1.5 lakh"),
+])
+def test_plain_answers_in_every_state_are_on_track(state, text):
+    decision = TurnClassifier(load_model()).classify(text, state, record=False)
+    assert decision.on_track
+    assert decision.question_type == "on_track"
+
+
+@pytest.mark.parametrize("state, text, question_type", [
+    ("ask_age", "how much is the visa fee?", "fees"),
+    ("ask_valid_visa", "which country is easiest", "country_selection"),
+    ("ask_tax_info", "how long does processing take", "timing"),
+    ("ask_balance", "wait", "general"),
+])
+def test_questions_are_off_track_with_a_type(state, text, question_type):
+    decision = TurnClassifier(load_model()).classify(text, state, record=False)
+    assert not decision.on_track
+    assert decision.question_type == question_type
+
+
+def test_held_out_accuracy_on_seed_examples():
+    examples = list(read_examples([SEED_PATH]))
+    random.Random(1).shuffle(examples)
+    correct = 0
+    for fold in range(5):
+        train = [e for i, e in enumerate(examples) if i % 5 != fold]
+        classifier = TurnClassifier(train_model(train))
+        correct += sum(classifier.classify(text, state, record=False).on_track == label
+                       for state, text, label in examples[fold::5])
+    assert correct / len(examples) >= 0.95
+
+
+def test_classification_takes_microseconds():
+    classifier = TurnClassifier(load_model())
+    examples = list(read_examples([SEED_PATH]))
+    start = time.perf_counter()
+    for state, text, _ in examples * 5:
+        classifier.classify(text, state, record=False)
+    assert (time.perf_counter() - start) / (len(examples) * 5) < 200e-6
+
+
+def test_turn_log_trains_only_on_rule_decisions(tmp_path):
+    log_path = tmp_path / "turns.jsonl"
+    classifier = TurnClassifier(load_model(), log_path=str(log_path))
+    classifier.classify("32", "ask_age")  # Rule: answer
+    classifier.classify("what is the fee?", "ask_age")  # Rule: question
+    classifier.classify("yes, is that ok?", "ask_tax_info")  # Model
+    classifier.flush()
+
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [r["source"] for r in records] == ["rule", "rule", "model"]
+    # Only redacted features are logged: no raw text, no numbers the applicant typed
+    assert all("text" not in r for r in records)
+    assert "32" not in log_path.read_text()
+    assert "answer:ask_age" in records[0]["features"] and "number" in records[0]["features"]
+    assert list(read_examples([str(log_path)])) == [
+        ("ask_age", records[0]["features"], True), ("ask_age", records[1]["features"], False)
+    ]
+
+    stats = classifier.get_stats()
+    assert stats["turns"] == 3 and stats["decided_by"]["rule"] == 2
+    # "32" never matched the old keyword list for ask_age, so it used to reach the LLM path
+    assert stats["llm_calls_avoided"] >= 1
+
+    output = tmp_path / "model.json"
+    assert main([SEED_PATH, str(log_path), "-o", str(output)]) == 0
+    assert load_model(str(output)).examples == len(list(read_examples([SEED_PATH]))) + 2
+
+
+@pytest.mark.asyncio
+async def test_on_track_answers_skip_the_rag_path(monkeypatch):
+    from app.services.fsm_service import FSMStates, VisaEvaluationFSM, fsm_service
+
+    calls = []
+
+    async def handle_off_track_question(user_input, *args, **kwargs):
+        calls.append(user_input)
+        return RAGResponse(answer="", confidence=0.0, source="not_off_track", should_return_to_fsm=True)
+
+    async def save_fsm_state(session_id):
+        return None
+
+    monkeypatch.setattr(rag_service, "handle_off_track_question", handle_off_track_question)
+    monkeypatch.setattr(fsm_service, "save_fsm_state", save_fsm_state)
+    fsm = VisaEvaluationFSM("turn-classifier-test")
+    fsm.current_state = FSMStates.ASK_AGE
+    monkeypatch.setitem(fsm_service.fsm_instances, "turn-classifier-test", fsm)
+
+    await fsm_service.process_user_input("turn-classifier-test", "32", {})
+    assert calls == []
+    assert fsm.answers["age"] == "32"
+
+    fsm.current_state = FSMStates.ASK_AGE
+    await fsm_service.process_user_input("turn-classifier-test", "how long does processing take?", {})
+    assert calls == ["how long does processing take?"]
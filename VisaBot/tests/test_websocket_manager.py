@@ -0,0 +1,261 @@
+"""
+Tests for the WebSocket manager
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.services.session_service import SessionService, is_valid_session_id
+from app.services.storage.memory_backend import InMemoryBackend
+from app.services.websocket_backplane import WebSocketBackplane
+from app.services.websocket_manager import WebSocketManager
+
+
+class FakeWebSocket:
+    """Records frames written by the connection's writer task"""
+
+    def __init__(self, fail: bool = False, delay: float = 0.0):
+        self.accepted = False
+        self.sent = []
+        self.fail = fail
+        self.delay = delay
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("connection reset")
+        self.sent.append(json.loads(text))
+
+
+@pytest.mark.asyncio
+async def test_frames_are_written_in_order():
+    """Frames queued on a connection reach the socket in order"""
+    manager = WebSocketManager()
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket, "s1")
+
+    for i in range(5):
+        await connection.send({"type": "message_delta", "delta": str(i)})
+    await connection.flush()
+
+    assert websocket.accepted
+    assert [frame["delta"] for frame in websocket.sent] == ["0", "1", "2", "3", "4"]
+    await manager.close_all()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_excludes_sender_and_drops_broken_sockets():
+    """A failing socket is disconnected without affecting the others"""
+    manager = WebSocketManager()
+    sender, other, broken = FakeWebSocket(), FakeWebSocket(), FakeWebSocket(fail=True)
+    for websocket in (sender, other, broken):
+        await manager.connect(websocket, "s1")
+
+    await manager.broadcast_to_session("s1", {"type": "message_sent"}, exclude_websocket=sender)
+    await manager.get_connection(other).flush()
+    await asyncio.sleep(0)
+
+    assert sender.sent == []
+    assert other.sent == [{"type": "message_sent"}]
+    assert manager.get_connection_count("s1") == 2
+    assert manager.get_connection(broken) is None
+    await manager.close_all()
+
+
+@pytest.mark.asyncio
+async def test_typing_indicator_wraps_work():
+    """typing() sends is_typing true while the block runs and false afterwards"""
+    manager = WebSocketManager()
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket, "s1")
+
+    async with manager.typing("s1", refresh_interval=0.01):
+        await asyncio.sleep(0.035)
+    await connection.flush()
+
+    flags = [frame["is_typing"] for frame in websocket.sent]
+    assert flags[0] is True
+    assert flags[-1] is False
+    assert len(flags) >= 3
+    await manager.close_all()
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_evicted_without_blocking_others():
+    """A client that stops reading is evicted while fast clients keep receiving"""
+    manager = WebSocketManager()
+    fast = FakeWebSocket()
+    slow = FakeWebSocket(delay=10)
+    await manager.connect(fast, "s1")
+    slow_connection = await manager.connect(slow, "s1")
+    slow_connection.max_queue = 3
+
+    for i in range(10):
+        await manager.broadcast_to_session("s1", {"type": "message", "n": i})
+    await manager.get_connection(fast).flush()
+
+    assert [frame["n"] for frame in fast.sent] == list(range(10))
+    assert manager.get_connection(slow) is None
+    assert slow_connection.close_reason == "slow_consumer"
+    assert manager.get_stats()["evictions"] == {"slow_consumer": 1}
+    await manager.close_all()
+
+
+@pytest.mark.asyncio
+async def test_send_timeout_evicts():
+    """A frame that takes longer than the send timeout evicts the client"""
+    manager = WebSocketManager()
+    stuck = FakeWebSocket(delay=10)
+    connection = await manager.connect(stuck, "s1")
+    connection.send_timeout = 0.01
+
+    await manager.broadcast_to_session("s1", {"type": "message"})
+    await connection.wait_closed()
+
+    assert connection.close_reason == "send_timeout"
+    assert manager.get_connection_count("s1") == 0
+    await manager.close_all()
+
+
+@pytest.mark.asyncio
+async def test_typing_frames_merge_and_drop():
+    """Pending typing frames collapse to the latest one and are dropped when backlogged"""
+    manager = WebSocketManager()
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket, "s1")
+
+    # Queue before the writer gets a chance to run
+    await manager.send_typing_indicator("s1", True)
+    await manager.send_typing_indicator("s1", False)
+    await manager.broadcast_to_session("s1", {"type": "message"})
+    await connection.flush()
+
+    assert websocket.sent == [
+        {"type": "typing", "session_id": "s1", "is_typing": False},
+        {"type": "message"},
+    ]
+
+    # The latest typing state waits behind the frames queued before it
+    websocket.sent.clear()
+    await manager.broadcast_to_session("s1", {"type": "message_delta"})
+    await manager.send_typing_indicator("s1", True)
+    await manager.broadcast_to_session("s1", {"type": "message"})
+    await manager.send_typing_indicator("s1", False)
+    await connection.flush()
+    assert websocket.sent == [
+        {"type": "message_delta"},
+        {"type": "message"},
+        {"type": "typing", "session_id": "s1", "is_typing": False},
+    ]
+
+    connection.max_queue = 1
+    await manager.broadcast_to_session("s1", {"type": "message"})
+    await manager.send_typing_indicator("s1", True)
+    assert manager.get_stats()["frames_dropped"] == 1
+    assert manager.get_connection(websocket) is connection
+    await manager.close_all()
+
+
+@pytest.mark.asyncio
+async def test_backplane_relays_between_nodes():
+    """Session broadcasts reach sockets connected to another worker"""
+    storage = InMemoryBackend()
+    manager_a, manager_b = WebSocketManager(), WebSocketManager()
+    node_a = WebSocketBackplane(manager_a, node_id="node-a", heartbeat_interval=60)
+    node_b = WebSocketBackplane(manager_b, node_id="node-b", heartbeat_interval=60)
+    await node_a.start(storage)
+    await node_b.start(storage)
+
+    tab_a, tab_b, other_session = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager_a.connect(tab_a, "s1")
+    await manager_b.connect(tab_b, "s1")
+    await manager_b.connect(other_session, "s2")
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+    await manager_a.broadcast_to_session("s1", {"type": "system", "message": "hello"})
+    for _ in range(5):
+        await asyncio.sleep(0)
+    await manager_b.get_connection(tab_b).flush()
+
+    assert tab_a.sent == [{"type": "system", "message": "hello"}]
+    assert tab_b.sent == [{"type": "system", "message": "hello"}]
+    assert other_session.sent == []
+    assert await manager_a.get_cluster_connection_counts("s1") == {"node-a": 1, "node-b": 1}
+
+    await node_b.stop()
+    assert await manager_a.get_cluster_connection_counts("s1") == {"node-a": 1}
+
+    await node_a.stop()
+    await manager_a.close_all()
+    await manager_b.close_all()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_pings_then_reaps_silent_clients():
+    """Quiet clients are pinged; those that never answer are reaped"""
+    manager = WebSocketManager()
+    manager.ping_interval, manager.pong_timeout, manager.idle_timeout = 20, 10, 0
+    silent, responsive = FakeWebSocket(), FakeWebSocket()
+    silent_connection = await manager.connect(silent, "s1")
+    responsive_connection = await manager.connect(responsive, "s1")
+    start = silent_connection.connected_at
+
+    assert await manager.cleanup_inactive_connections(start + 22) == 0
+    await silent_connection.flush()
+    assert silent.sent[-1]["type"] == "ping"
+    assert manager.get_stats()["awaiting_pong"] == 2
+
+    # The responsive client answers; its clock moves on from the pong
+    responsive_connection.touch()
+    responsive_connection.last_seen = start + 25
+
+    assert await manager.cleanup_inactive_connections(start + 33) == 1
+    assert manager.get_connection(silent) is None
+    assert manager.get_connection(responsive) is responsive_connection
+    assert manager.get_stats()["reaped"] == {"heartbeat_timeout": 1}
+    await manager.close_all()
+
+
+@pytest.mark.asyncio
+async def test_idle_connections_are_closed():
+    """Connections without chat activity are closed after the idle timeout"""
+    manager = WebSocketManager()
+    manager.ping_interval, manager.pong_timeout, manager.idle_timeout = 20, 10, 60
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket, "s1")
+    start = connection.connected_at
+
+    # Keeps answering pings, but never chats
+    for t in (22, 44):
+        await manager.cleanup_inactive_connections(start + t)
+        connection.touch()
+        connection.last_seen = start + t
+
+    assert await manager.cleanup_inactive_connections(start + 62) == 1
+    assert connection.close_reason == "idle_timeout"
+    assert manager.get_stats()["reaped"] == {"idle_timeout": 1}
+    await manager.close_all()
+
+
+@pytest.mark.asyncio
+async def test_only_the_websocket_path_keeps_client_session_ids():
+    service = SessionService()
+    client_id = "0f8fad5b-d9cb-469f-a165-70867728950e"
+
+    rest_id, _ = await service.get_or_create_session("attacker-picked-id-0001")
+    assert rest_id != "attacker-picked-id-0001"  # REST callers get a server-generated id
+
+    ws_id, _ = await service.get_or_create_session(client_id, allow_client_id=True)
+    assert ws_id == client_id
+    assert (await service.get_or_create_session(client_id))[0] == client_id  # Known ids resume on either path
+
+    for bad in ("short", "../../etc/passwd-and-more", "x" * 65, "conversation:abc1234567890"):
+        assert not is_valid_session_id(bad)
+        with pytest.raises(ValueError):
+            await service.get_or_create_session(bad, allow_client_id=True)
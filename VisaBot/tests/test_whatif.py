@@ -0,0 +1,93 @@
+"""
+Tests for what-if scoring of evaluated profiles
+"""
+import random
+import time
+from dataclasses import replace
+
+import pytest
+from loguru import logger
+
+from app.services.evaluation.normalizer import extract_features
+from app.services.evaluation.rubric import rubric_loader
+from app.services.evaluation.whatif import candidate_perturbations, what_if
+from tests.test_rubric_batch import random_answers
+
+
+@pytest.fixture(autouse=True)
+def quiet_rubric():
+    logger.disable("app.services.evaluation")
+    yield
+    logger.enable("app.services.evaluation")
+
+
+BORDERLINE = {
+    "profession": "business", "business_type": "sole proprietor", "business_premises": True,
+    "is_tax_filer": False, "annual_income": 900_000, "closing_balance": 1_200_000,
+    "travel_history": ["UAE"], "last_travel_year": 2019, "age": 35,
+}
+
+
+def test_improvements_match_scalar_rubric():
+    """Every reported change scores the same through the scalar rubric and beats the baseline band"""
+    rubric = rubric_loader.get()
+    rng = random.Random(39)
+    for _ in range(200):
+        feat = extract_features(random_answers(rng))
+        baseline, _, _ = rubric.evaluate(feat)
+        result = what_if(feat, rubric)
+        assert result["baseline"]["success_ratio"] == baseline["success_ratio"]
+        for improvement in result["improvements"]:
+            evaluation, base_score, _ = rubric.evaluate(replace(feat, **improvement["changes"]))
+            assert evaluation["success_ratio"] == improvement["success_ratio"] > baseline["success_ratio"]
+            assert base_score == improvement["base_score"]
+            assert (evaluation["overall_recommendation"] != baseline["overall_recommendation"]
+                    or evaluation["should_apply"] != baseline["should_apply"])
+
+
+def test_no_single_change_that_moves_the_band_is_missed():
+    rubric = rubric_loader.get()
+    rng = random.Random(390)
+    for _ in range(200):
+        feat = extract_features(random_answers(rng))
+        baseline = rubric.evaluate(feat)[0]
+        reported = {tuple(i["levers"]) for i in what_if(feat, rubric)["improvements"]}
+        for perturbation in candidate_perturbations(feat, rubric):
+            evaluation = rubric.evaluate(replace(feat, **dict(perturbation.changes)))[0]
+            if (evaluation["success_ratio"] > baseline["success_ratio"]
+                    and evaluation["overall_recommendation"] != baseline["overall_recommendation"]):
+                assert (perturbation.lever,) in reported
+
+
+def test_job_holders_get_no_business_levers():
+    feat = extract_features({"profession": "job", "closing_balance": 800_000, "annual_income": 900_000,
+                             "travel_history": [], "age": 35})
+    levers = {p.lever for p in candidate_perturbations(feat)}
+    assert {"tax", "visa"} <= levers
+    assert not levers & {"premises", "online", "assets"}
+    for improvement in what_if(feat)["improvements"]:
+        assert not set(improvement["levers"]) & {"premises", "online", "assets"}
+    # BORDERLINE is a business owner who already has premises
+    assert {"online", "assets"} <= {p.lever for p in candidate_perturbations(extract_features(BORDERLINE))}
+
+
+def test_ranked_by_impact_and_pairs_only_when_needed():
+    result = what_if(extract_features(BORDERLINE))
+    assert result["baseline"]["should_apply"] is False
+    improvements = result["improvements"]
+    assert improvements
+    gains = [i["ratio_gain"] for i in improvements]
+    assert gains == sorted(gains, reverse=True)
+    # A 2M balance lifts the balance cap but only changes the band together with a second lever
+    assert all(len(i["levers"]) == 2 and "balance" in i["levers"] for i in improvements)
+    assert "Travel to 3 countries (trip this year)" not in " ".join(i["label"] for i in improvements)
+    assert not what_if(extract_features(BORDERLINE), pairs=False)["improvements"]
+
+
+def test_whatif_is_fast():
+    feat = extract_features(BORDERLINE)
+    what_if(feat)
+    start = time.perf_counter()
+    for _ in range(50):
+        what_if(feat)
+    assert (time.perf_counter() - start) / 50 < 0.01